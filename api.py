@@ -8,13 +8,14 @@ Wraps the Clinical Decision Support Client for the React frontend
 import warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning, module="pyiceberg")
 
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form, BackgroundTasks, Body
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Body, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from sse_starlette.sse import EventSourceResponse, ServerSentEvent
 from pydantic import BaseModel
 from typing import Optional, AsyncGenerator
 from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from pathlib import Path
 from dotenv import load_dotenv
 import os
@@ -22,7 +23,6 @@ import sys
 import re
 import json
 import httpx
-import tempfile
 import time
 import asyncio
 import uuid
@@ -32,7 +32,6 @@ from google.cloud import storage
 import firebase_admin
 from firebase_admin import credentials
 from functools import lru_cache
-import copy
 
 # Load environment variables from .env file
 load_dotenv()
@@ -81,20 +80,59 @@ def get_git_branch() -> str:
 # Add servers directory to path (servers is in the backend repo root)
 sys.path.insert(0, str(Path(__file__).parent / "servers"))
 from clinical_decision_support.client import ClinicalDecisionSupportClient
+from clinical_decision_support.session_pool import MCPSessionPool
 from clinical_decision_support import ConsultationSummary
+from servers.utils.llm_gateway import get_llm_gateway, close_llm_gateway, cached_system_prompt, cache_usage
+from servers.utils.supabase_db import get_db, get_db_stats, close_db
+from servers.utils.form_schema_cache import get_form_schema_cache
+from servers.utils.streaming_json import StreamingObjectParser
+from servers.utils.sarvam_jobs import get_sarvam_job_manager, get_sarvam_job_stats, close_sarvam_job_manager
+from servers.utils.job_queue import JobContext, get_job_queue, get_job_queue_stats, close_job_queue
+from servers.utils.extraction_profiles import (
+    ExtractionProfile, get_extraction_profile_cache, get_extraction_profile_stats,
+)
+from servers.utils.browser_pool import get_browser_pool, get_browser_pool_stats, close_browser_pool
+from servers.utils import pdf_cache
+from servers.utils.pdf_cache import (
+    cached_pdf_response, get_pdf_cache, get_pdf_cache_stats, invalidate_pdfs, pdf_cache_key, source_version,
+)
+from servers.utils.elevenlabs_stt import get_elevenlabs_stt, get_elevenlabs_stt_stats, close_elevenlabs_stt
+from servers.utils.audio_transcoder import (
+    MP3_16K_MONO, PCM_16K_MONO, TranscodedAudio, TranscodeError, get_audio_transcoder, get_audio_transcoder_stats,
+    mime_type_for, pcm_duration, pcm_slice, window_ranges,
+)
+from servers.utils.extraction_sessions import ExtractionSession, get_extraction_session_store, close_extraction_session_store
+from servers.utils.speaker_stitching import OVERLAP_SECONDS, RecordingStitcher, calculate_overlap_stats, get_speaker_stitch_store
+from servers.utils.speaker_roles import MIN_TURNS, apply_roles, get_speaker_role_identifier, relabel_transcript
 
 # Global instances (reused across requests)
 client: Optional[ClinicalDecisionSupportClient] = None
-elevenlabs_client = None  # ElevenLabs API client for transcription
+mcp_pool: Optional[MCPSessionPool] = None  # Warm MCP sessions per region, checked out per request
 consultation_summary: Optional[ConsultationSummary] = None  # Consultation summarizer
 gcs_client = None  # Google Cloud Storage client
 GCS_BUCKET_NAME = "aneya-audio-recordings"
 
+# Windowed re-transcription: long recordings are split into overlapping windows
+# that are diarized concurrently and stitched back together
+RERUN_WINDOW_SECONDS = float(os.getenv("RERUN_WINDOW_SECONDS", "120"))
+RERUN_WINDOW_OVERLAP_SECONDS = float(os.getenv("RERUN_WINDOW_OVERLAP_SECONDS", "10"))
+RERUN_WINDOW_CONCURRENCY = int(os.getenv("RERUN_WINDOW_CONCURRENCY", "4"))  # Also capped by the provider's job queue limit
+RERUN_WINDOW_ATTEMPTS = int(os.getenv("RERUN_WINDOW_ATTEMPTS", "2"))
+RERUN_WINDOWED_MIN_SECONDS = float(os.getenv("RERUN_WINDOWED_MIN_SECONDS", "300"))  # "auto" mode threshold
+# How long a wait=true rerun request blocks before answering 202 with the job ID
+RERUN_WAIT_TIMEOUT_SECONDS = float(os.getenv("RERUN_WAIT_TIMEOUT_SECONDS", "300"))
+
+# Languages transcribed with Sarvam (ElevenLabs is unusable for Indian languages)
+SARVAM_LANGUAGES = {
+    'en-IN', 'hi-IN', 'bn-IN', 'gu-IN', 'kn-IN', 'ml-IN',
+    'mr-IN', 'od-IN', 'pa-IN', 'ta-IN', 'te-IN'
+}
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan event handler for startup and shutdown"""
-    global client, elevenlabs_client, consultation_summary, gcs_client
+    global client, mcp_pool, consultation_summary, gcs_client
 
     # Startup
     print("🚀 Starting Aneya API...")
@@ -121,11 +159,14 @@ async def lifespan(app: FastAPI):
 
     print(f"✅ Anthropic API key loaded (ends with ...{anthropic_key[-4:]})")
 
-    # Initialize ElevenLabs client for transcription
+    # Initialize the shared async LLM gateway (one keep-alive pool for all Claude calls)
+    get_llm_gateway(anthropic_key)
+    print("✅ LLM gateway initialized (shared AsyncAnthropic client)")
+
+    # Initialize the shared ElevenLabs client (one keep-alive pool for all transcription calls)
     elevenlabs_key = os.getenv("ELEVENLABS_API_KEY")
     if elevenlabs_key:
-        from elevenlabs import ElevenLabs
-        elevenlabs_client = ElevenLabs(api_key=elevenlabs_key)
+        get_elevenlabs_stt()
         print(f"✅ ElevenLabs API key loaded (ends with ...{elevenlabs_key[-4:]})")
     else:
         print("⚠️  ELEVENLABS_API_KEY not found - voice transcription and diarization will not work")
@@ -135,6 +176,11 @@ async def lifespan(app: FastAPI):
     client = ClinicalDecisionSupportClient(anthropic_api_key=anthropic_key)
     print("✅ Client initialized (servers will be loaded based on user region)")
 
+    # Pool of region-bound clients: each request checks out its own warm MCP sessions,
+    # so a request from another region never disconnects sessions still in use
+    mcp_pool = MCPSessionPool(lambda: ClinicalDecisionSupportClient(anthropic_api_key=anthropic_key))
+    print(f"✅ MCP session pool initialized (max {mcp_pool.max_sessions_per_region} per region)")
+
     # Initialize consultation summary system
     consultation_summary = ConsultationSummary(anthropic_api_key=anthropic_key)
     print("✅ Consultation summary system initialized")
@@ -146,13 +192,64 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️  GCS client initialization failed: {e} - audio upload will not work")
 
+    # Durable background jobs (jobs left by a previous instance resume here)
+    job_queue = get_job_queue()
+    job_queue.register(
+        "final_chunk", _run_final_chunk_job,
+        on_failure=_mark_final_chunk_failed, retryable=_is_retryable_job_error
+    )
+    job_queue.register(
+        "rerun_transcription", _run_rerun_transcription_job,
+        max_attempts=2, retryable=_is_retryable_job_error
+    )
+    job_queue.register(
+        "pdf_prerender", _run_pdf_prerender_job,
+        max_attempts=2, retryable=_is_retryable_job_error
+    )
+    await job_queue.start()
+
+    # PDF bundles and CSS are read once and inlined into every PDF page
+    from pdf_generator_headless import get_pdf_assets
+    get_pdf_assets()
+
+    # Warm headless Chromium pool for PDF rendering (launched once, not per PDF)
+    try:
+        await get_browser_pool().start()
+    except Exception as e:
+        print(f"⚠️  PDF browser pool failed to start: {e} - PDFs will retry on first request")
+
     yield
 
     # Shutdown
+    await close_job_queue()
+    print("✅ Job queue stopped (running jobs returned to the queue)")
+
+    if mcp_pool:
+        await mcp_pool.close()
+        print("✅ MCP session pool closed")
+
     if client:
         await client.cleanup()
         print("✅ Client cleanup complete")
 
+    await close_llm_gateway()
+    print("✅ LLM gateway closed")
+
+    await close_db()
+    print("✅ Supabase connection pool closed")
+
+    await close_sarvam_job_manager()
+    print("✅ Sarvam job manager closed")
+
+    await close_elevenlabs_stt()
+    print("✅ ElevenLabs connection pool closed")
+
+    close_extraction_session_store()
+    print("✅ Extraction session store closed")
+
+    await close_browser_pool()
+    print("✅ PDF browser pool closed")
+
 
 app = FastAPI(
     title="Aneya Clinical Decision Support API",
@@ -190,7 +287,7 @@ from routers.auth import router as auth_router
 app.include_router(auth_router)
 
 # Include custom forms API router
-from custom_forms_api import router as custom_forms_router
+from custom_forms_api import router as custom_forms_router, verify_firebase_token_and_get_user_id
 app.include_router(custom_forms_router)
 
 
@@ -385,24 +482,18 @@ async def analyze_consultation(request: AnalysisRequest):
                 print(f"⚠️  Geolocation failed. Backend will auto-detect.")
                 location_to_use = None
 
-        # Step 2: Connect to region-specific MCP servers
-        # Only connect if not already connected (check if we have sessions)
-        if not client.diagnosis_engine.sessions:
-            print(f"🔄 Connecting to region-specific MCP servers for {location_to_use or 'default'}...")
-            await client.connect_to_servers(country_code=location_to_use, verbose=True)
-        else:
-            print(f"✅ Using existing MCP server connections")
-
+        # Step 2: Check out warm region-specific MCP sessions from the pool
         # Step 3: Run the clinical decision support workflow
-        result = await client.clinical_decision_support(
-            clinical_scenario=request.consultation,
-            patient_id=patient_id,  # Use normalized value (None if empty)
-            patient_age=patient_age,  # Use normalized value (None if empty)
-            allergies=allergies,  # Use normalized value (None if empty)
-            location_override=location_to_use,
-            verbose=True,  # This will show ALL the Anthropic API calls and processing steps
-            max_drugs=0  # Disable BNF drug lookups for faster analysis
-        )
+        async with mcp_pool.checkout(location_to_use, verbose=True) as region_client:
+            result = await region_client.clinical_decision_support(
+                clinical_scenario=request.consultation,
+                patient_id=patient_id,  # Use normalized value (None if empty)
+                patient_age=patient_age,  # Use normalized value (None if empty)
+                allergies=allergies,  # Use normalized value (None if empty)
+                location_override=location_to_use,
+                verbose=True,  # This will show ALL the Anthropic API calls and processing steps
+                max_drugs=0  # Disable BNF drug lookups for faster analysis
+            )
 
         print(f"\n{'='*70}")
         print(f"✅ ANALYSIS COMPLETE")
@@ -455,6 +546,7 @@ async def analyze_consultation_stream(request: AnalysisRequest):
 
     async def event_generator() -> AsyncGenerator[dict, None]:
         """Generate SSE events for progress updates using sse-starlette"""
+        pooled = None  # MCP sessions checked out for this request
         try:
             # Helper to send SSE event - uses dict format for sse-starlette
             def send_event(event_type: str, data: dict) -> dict:
@@ -493,12 +585,13 @@ async def analyze_consultation_stream(request: AnalysisRequest):
                 else:
                     yield send_event("progress", {"step": "geolocation", "message": "Using default region"})
 
-            # Step 2: Connect to servers (will auto-reconnect if region changed)
+            # Step 2: Check out warm MCP sessions for this region (connects on first use)
             yield send_event("progress", {
                 "step": "connecting",
                 "message": f"Loading medical guidelines for {detected_country or 'default region'}..."
             })
-            await client.connect_to_servers(country_code=location_to_use, verbose=True)
+            pooled = await mcp_pool.acquire(location_to_use, verbose=True)
+            region_client = pooled.client
 
             # Step 3: Validate input
             yield send_event("progress", {"step": "validating", "message": "Validating clinical input..."})
@@ -513,7 +606,7 @@ async def analyze_consultation_stream(request: AnalysisRequest):
             print(f"[API] Phase 1: Getting diagnoses...", flush=True)
 
             # Phase 1: Get diagnoses (blocking call is fine - we stream result immediately after)
-            diagnosis_result = await client.get_diagnoses(
+            diagnosis_result = await region_client.get_diagnoses(
                 clinical_scenario=request.consultation,
                 patient_id=patient_id,
                 patient_name=patient_name,
@@ -554,7 +647,7 @@ async def analyze_consultation_stream(request: AnalysisRequest):
 
             # Phase 2: Stream drug lookups - each drug_update is yielded as it completes
             drug_results = []
-            async for drug_update in client.stream_drug_lookups(drugs_to_lookup, patient_context):
+            async for drug_update in region_client.stream_drug_lookups(drugs_to_lookup, patient_context):
                 print(f"[API] [{time.time():.3f}] Streaming drug_update: {drug_update.get('drug_name')} - {drug_update.get('status')}", flush=True)
                 yield send_event("drug_update", drug_update)
                 await asyncio.sleep(0)  # Force event loop to flush
@@ -587,6 +680,9 @@ async def analyze_consultation_stream(request: AnalysisRequest):
 
         except Exception as e:
             yield send_event("error", {"message": str(e)})
+        finally:
+            if pooled:
+                await mcp_pool.release(pooled)
 
     # Use EventSourceResponse from sse-starlette for proper SSE flushing
     # ping=15 sends ping every 15 seconds to keep connection alive
@@ -666,7 +762,6 @@ async def analyze_consultation_with_research(request: ResearchAnalysisRequest):
     Returns:
         Updated consultation object with research_findings populated
     """
-    from supabase import create_client, Client
     from servers.clinical_decision_support.research_analysis import ResearchAnalysisEngine
 
     try:
@@ -680,7 +775,7 @@ async def analyze_consultation_with_research(request: ResearchAnalysisRequest):
                 detail="Supabase configuration missing"
             )
 
-        supabase: Client = create_client(supabase_url, supabase_key)
+        supabase = get_db(supabase_url, supabase_key)
 
         print(f"\n{'='*70}")
         print(f"📄 RESEARCH ANALYSIS REQUEST")
@@ -691,7 +786,7 @@ async def analyze_consultation_with_research(request: ResearchAnalysisRequest):
         print(f"{'='*70}\n")
 
         # Fetch the existing consultation from Supabase
-        result = supabase.table("consultations").select("*").eq("id", request.consultation_id).execute()
+        result = await supabase.table("consultations").select("*").eq("id", request.consultation_id).execute()
 
         if not result.data or len(result.data) == 0:
             raise HTTPException(
@@ -751,7 +846,7 @@ async def analyze_consultation_with_research(request: ResearchAnalysisRequest):
         print(f"   - Papers reviewed: {len(tool_calls)}")
 
         # Update consultation in Supabase
-        update_result = supabase.table("consultations").update({
+        update_result = await supabase.table("consultations").update({
             "research_findings": research_findings
         }).eq("id", request.consultation_id).execute()
 
@@ -854,7 +949,8 @@ async def summarize_text(request: dict = Body(...)):
                 "allergies": "None"
             },
             "is_from_transcription": true,  # Default true - enables transcription error handling
-            "transcription_language": "en"  # Optional - language of original speech for homophone handling
+            "transcription_language": "en",  # Optional - language of original speech for homophone handling
+            "recording_id" / "consultation_id" / "appointment_id": "..."  # Optional - reuse memoised speaker roles
         }
 
     Returns:
@@ -881,6 +977,11 @@ async def summarize_text(request: dict = Body(...)):
     is_from_transcription = request.get("is_from_transcription", True)  # Default True for voice consultations
     transcription_language = request.get("transcription_language")  # Language of original transcription
 
+    # Speaker roles identified during recording (or an earlier summary) are reused, not re-asked
+    roles_key = get_speaker_role_identifier().resolve_key(
+        request.get("recording_id"), request.get("consultation_id"), request.get("appointment_id")
+    )
+
     try:
         # Determine which transcript to use for summarization
         # Prefer original language transcript if provided - Claude handles non-English better than translation
@@ -905,7 +1006,8 @@ async def summarize_text(request: dict = Body(...)):
             patient_info=patient_info,
             output_in_english=has_original,  # Tell Claude to output in English if input is non-English
             is_from_transcription=is_from_transcription,  # Flag for transcription error handling
-            transcription_language=transcription_language  # Language of original speech
+            transcription_language=transcription_language,  # Language of original speech
+            roles_key=roles_key  # Memoised speaker roles for this recording/consultation
         )
 
         print(f"\n{'='*70}")
@@ -989,8 +1091,8 @@ async def get_transcription_token():
     Returns:
         JSON with temporary token for WebSocket authentication
     """
-    elevenlabs_key = os.getenv("ELEVENLABS_API_KEY")
-    if not elevenlabs_key:
+    stt = get_elevenlabs_stt()
+    if not stt.available:
         raise HTTPException(
             status_code=503,
             detail="Transcription service not configured. ELEVENLABS_API_KEY is required."
@@ -1000,13 +1102,7 @@ async def get_transcription_token():
         print("🔑 Generating ElevenLabs temporary token...")
 
         # Call ElevenLabs API to generate single-use token
-        async with httpx.AsyncClient() as http_client:
-            response = await http_client.post(
-                "https://api.elevenlabs.io/v1/single-use-token/realtime_scribe",
-                headers={"xi-api-key": elevenlabs_key}
-            )
-            response.raise_for_status()
-            data = response.json()
+        data = await stt.single_use_token("realtime_scribe")
 
         print(f"✅ Token generated (expires in 15 minutes)")
 
@@ -1073,8 +1169,8 @@ async def diarize_audio(
             "full_transcript": "complete text"
         }
     """
-    elevenlabs_key = os.getenv("ELEVENLABS_API_KEY")
-    if not elevenlabs_key:
+    stt = get_elevenlabs_stt()
+    if not stt.available:
         raise HTTPException(
             status_code=503,
             detail="Diarization service not configured. ELEVENLABS_API_KEY is required."
@@ -1088,151 +1184,92 @@ async def diarize_audio(
         audio_size_kb = len(content) / 1024
         print(f"📊 Audio file size: {audio_size_kb:.2f} KB ({len(content)} bytes)")
 
-        # Save to temporary file
-        # Note: ElevenLabs Scribe v1 may prefer common formats like mp3, wav
-        # Convert webm to mp3 if needed
-        import subprocess
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as temp_file:
-            temp_file.write(content)
-            webm_path = temp_file.name
-
-        # Convert to mp3 format which is more universally supported
-        mp3_path = webm_path.replace('.webm', '.mp3')
-        try:
-            # Use ffmpeg to convert webm to mp3
-            result = subprocess.run(
-                ['ffmpeg', '-i', webm_path, '-acodec', 'libmp3lame', '-ab', '128k', mp3_path, '-y'],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            if result.returncode != 0:
-                print(f"⚠️  FFmpeg conversion failed: {result.stderr}")
-                print(f"   Trying with webm directly...")
-                temp_path = webm_path
-            else:
-                print(f"✅ Converted webm to mp3 for better compatibility")
-                os.unlink(webm_path)  # Remove webm file
-                temp_path = mp3_path
-        except FileNotFoundError:
-            print("⚠️  FFmpeg not found - using webm directly (may fail)")
-            temp_path = webm_path
-        except Exception as e:
-            print(f"⚠️  Conversion error: {e} - using webm directly")
-            temp_path = webm_path
-
-        try:
-            start = time.time()
-
-            # Call ElevenLabs Scribe v1 API with diarization
-            async with httpx.AsyncClient(timeout=120.0) as http_client:
-                with open(temp_path, 'rb') as audio_file:
-                    # Set correct MIME type based on file format
-                    mime_type = 'audio/mpeg' if temp_path.endswith('.mp3') else 'audio/webm'
-                    filename = 'audio.mp3' if temp_path.endswith('.mp3') else (audio.filename or 'audio.webm')
-                    # IMPORTANT: ElevenLabs expects 'file' not 'audio'
-                    files = {'file': (filename, audio_file, mime_type)}
-
-                    # Build parameters
-                    params = {
-                        'model_id': 'scribe_v1',
-                        'diarize': 'true',
-                        'diarization_threshold': str(diarization_threshold),
-                        'timestamps_granularity': 'word'
-                    }
-
-                    if num_speakers:
-                        params['num_speakers'] = str(num_speakers)
-
-                    response = await http_client.post(
-                        'https://api.elevenlabs.io/v1/speech-to-text',
-                        headers={'xi-api-key': elevenlabs_key},
-                        files=files,
-                        data=params
-                    )
-
-                    # Debug: Log response status and body
-                    if not response.is_success:
-                        error_body = response.text
-                        print(f"❌ ElevenLabs API Error ({response.status_code}): {error_body}")
+        # ElevenLabs accepts WebM/Opus directly; other containers pass through too
+        provider_audio = await prepare_provider_audio(content, "elevenlabs", audio.filename)
 
-                    response.raise_for_status()
-                    data = response.json()
+        start = time.time()
 
-            latency = time.time() - start
+        # Call ElevenLabs Scribe v1 API with diarization (shared keep-alive client, retries 429/5xx)
+        data = await stt.speech_to_text(
+            provider_audio.data,
+            provider_audio.filename,
+            provider_audio.mime_type,
+            model_id='scribe_v1',
+            diarize=True,
+            num_speakers=num_speakers,
+            diarization_threshold=diarization_threshold,
+            timestamps_granularity='word'
+        )
 
-            # Debug: Log raw API response
-            print(f"📋 Raw API response keys: {list(data.keys())}")
-            if 'words' in data and len(data['words']) > 0:
-                print(f"📝 First word example: {data['words'][0]}")
-                print(f"📝 Total words: {len(data['words'])}")
+        latency = time.time() - start
 
-            # Parse response - Scribe v1 with diarization returns:
-            # {
-            #   "text": "full transcript",
-            #   "words": [{"text": "...", "start": 0.0, "end": 0.5, "speaker": "speaker_1"}, ...]
-            # }
+        # Debug: Log raw API response
+        print(f"📋 Raw API response keys: {list(data.keys())}")
+        if 'words' in data and len(data['words']) > 0:
+            print(f"📝 First word example: {data['words'][0]}")
+            print(f"📝 Total words: {len(data['words'])}")
 
-            full_transcript = data.get('text', '')
-            words = data.get('words', [])
+        # Parse response - Scribe v1 with diarization returns:
+        # {
+        #   "text": "full transcript",
+        #   "words": [{"text": "...", "start": 0.0, "end": 0.5, "speaker": "speaker_1"}, ...]
+        # }
 
-            # Group words by speaker into segments
-            segments = []
-            detected_speakers = set()
+        full_transcript = data.get('text', '')
+        words = data.get('words', [])
 
-            if words:
-                current_speaker = words[0].get('speaker_id')
-                current_text = []
-                segment_start = words[0].get('start', 0.0)
+        # Group words by speaker into segments
+        segments = []
+        detected_speakers = set()
 
-                for word_data in words:
-                    speaker = word_data.get('speaker_id')
-                    word_text = word_data.get('text', '')
+        if words:
+            current_speaker = words[0].get('speaker_id')
+            current_text = []
+            segment_start = words[0].get('start', 0.0)
 
-                    detected_speakers.add(speaker)
+            for word_data in words:
+                speaker = word_data.get('speaker_id')
+                word_text = word_data.get('text', '')
 
-                    if speaker == current_speaker:
-                        current_text.append(word_text)
-                    else:
-                        # Speaker changed - save current segment
-                        segments.append({
-                            'speaker_id': current_speaker,
-                            'text': ' '.join(current_text),
-                            'start_time': segment_start,
-                            'end_time': word_data.get('start', 0.0)
-                        })
-
-                        # Start new segment
-                        current_speaker = speaker
-                        current_text = [word_text]
-                        segment_start = word_data.get('start', 0.0)
+                detected_speakers.add(speaker)
 
-                # Add final segment
-                if current_text:
+                if speaker == current_speaker:
+                    current_text.append(word_text)
+                else:
+                    # Speaker changed - save current segment
                     segments.append({
                         'speaker_id': current_speaker,
                         'text': ' '.join(current_text),
                         'start_time': segment_start,
-                        'end_time': words[-1].get('end', 0.0)
+                        'end_time': word_data.get('start', 0.0)
                     })
 
-            print(f"✅ Diarization complete in {latency:.2f}s")
-            print(f"👥 Detected {len(detected_speakers)} speakers: {sorted(detected_speakers)}")
-            print(f"📝 Generated {len(segments)} speaker segments")
+                    # Start new segment
+                    current_speaker = speaker
+                    current_text = [word_text]
+                    segment_start = word_data.get('start', 0.0)
 
-            return {
-                'success': True,
-                'segments': segments,
-                'detected_speakers': sorted(list(detected_speakers)),
-                'full_transcript': full_transcript,
-                'latency_seconds': round(latency, 2),
-                'model': 'elevenlabs/scribe_v1'
-            }
+            # Add final segment
+            if current_text:
+                segments.append({
+                    'speaker_id': current_speaker,
+                    'text': ' '.join(current_text),
+                    'start_time': segment_start,
+                    'end_time': words[-1].get('end', 0.0)
+                })
 
-        finally:
-            # Clean up temp file
-            os.unlink(temp_path)
+        print(f"✅ Diarization complete in {latency:.2f}s")
+        print(f"👥 Detected {len(detected_speakers)} speakers: {sorted(detected_speakers)}")
+        print(f"📝 Generated {len(segments)} speaker segments")
+
+        return {
+            'success': True,
+            'segments': segments,
+            'detected_speakers': sorted(list(detected_speakers)),
+            'full_transcript': full_transcript,
+            'latency_seconds': round(latency, 2),
+            'model': 'elevenlabs/scribe_v1'
+        }
 
     except Exception as e:
         print(f"❌ Diarization error: {str(e)}")
@@ -1265,10 +1302,8 @@ async def diarize_audio_sarvam(
             "full_transcript": "complete translated text in English"
         }
     """
-    from sarvamai import SarvamAI
-
-    sarvam_key = os.getenv("SARVAM_API_KEY")
-    if not sarvam_key:
+    manager = get_sarvam_job_manager()
+    if not manager.available:
         raise HTTPException(
             status_code=503,
             detail="Sarvam diarization service not configured. SARVAM_API_KEY is required."
@@ -1282,117 +1317,62 @@ async def diarize_audio_sarvam(
         audio_size_kb = len(content) / 1024
         print(f"📊 Audio file size: {audio_size_kb:.2f} KB")
 
-        # Save to temporary file for conversion
-        import subprocess
+        # Transcode to 16 kHz mono MP3 (piped through ffmpeg, no temp files)
+        provider_audio = await prepare_provider_audio(content, "sarvam", audio.filename)
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as temp_file:
-            temp_file.write(content)
-            webm_path = temp_file.name
+        start = time.time()
 
-        # Convert to mp3 for Sarvam (better compatibility)
-        mp3_path = webm_path.replace('.webm', '.mp3')
-        try:
-            result = subprocess.run(
-                ['ffmpeg', '-i', webm_path, '-acodec', 'libmp3lame', '-ab', '128k', mp3_path, '-y'],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            if result.returncode != 0:
-                print(f"⚠️  FFmpeg conversion failed, using webm")
-                temp_path = webm_path
-            else:
-                print(f"✅ Converted to mp3")
-                os.unlink(webm_path)
-                temp_path = mp3_path
-        except Exception as e:
-            print(f"⚠️  Conversion error: {e}")
-            temp_path = webm_path
+        # Create, upload and start the batch job with diarization, then await
+        # completion (polled by the shared scheduler without blocking the event loop)
+        print(f"📤 Creating Sarvam batch job with diarization (speakers={num_speakers})...")
+        job = await manager.run_job(provider_audio.data, num_speakers=num_speakers, suffix=provider_audio.suffix)
 
-        try:
-            start = time.time()
+        latency = time.time() - start
+        print(f"✅ Job completed after {latency:.1f}s")
 
-            # Initialize Sarvam client
-            client = SarvamAI(api_subscription_key=sarvam_key)
+        results = job.results
+        print(f"📥 Got results: {results}")
 
-            # Create batch job with diarization
-            print(f"📤 Creating Sarvam batch job with diarization (speakers={num_speakers})...")
-            job = client.speech_to_text_translate_job.create_job(
-                model="saaras:v2.5",
-                with_diarization=True,
-                num_speakers=num_speakers
-            )
+        # Extract diarized transcript from results
+        full_transcript = ""
+        diarized = []
 
-            job_id = job.job_id
-            print(f"📋 Job created: {job_id}")
-
-            # Upload audio file
-            print(f"📤 Uploading audio file: {temp_path}")
-            upload_success = job.upload_files([temp_path], timeout=60.0)
-            if not upload_success:
-                raise Exception("Failed to upload audio file to Sarvam")
-            print(f"✅ Audio file uploaded")
-
-            # Start the job
-            print(f"▶️  Starting job...")
-            job.start()
-
-            # Wait for job completion (uses SDK's built-in polling)
-            print(f"⏳ Waiting for job completion...")
-            job.wait_until_complete(poll_interval=3, timeout=120)
-
-            latency = time.time() - start
-            print(f"✅ Job completed after {latency:.1f}s")
-
-            # Get results
-            results = job.get_file_results()
-            print(f"📥 Got results: {results}")
-
-            # Extract diarized transcript from results
-            full_transcript = ""
-            diarized = []
-
-            if results and 'successful' in results:
-                for file_result in results['successful']:
-                    print(f"📄 File result keys: {file_result.keys() if isinstance(file_result, dict) else type(file_result)}")
-                    print(f"📄 File result: {file_result}")
-                    if 'transcript' in file_result:
-                        full_transcript = file_result.get('transcript', '')
-                    if 'diarized_transcript' in file_result:
-                        diarized = file_result.get('diarized_transcript', [])
-
-            # Convert Sarvam format to our standard format
-            segments = []
-            detected_speakers = set()
-
-            if diarized:
-                for entry in diarized:
-                    speaker = entry.get('speaker', 'speaker 1')
-                    detected_speakers.add(speaker)
-                    segments.append({
-                        'speaker_id': speaker,
-                        'text': entry.get('text', ''),
-                        'start_time': entry.get('start', 0.0),
-                        'end_time': entry.get('end', 0.0)
-                    })
+        if results and 'successful' in results:
+            for file_result in results['successful']:
+                print(f"📄 File result keys: {file_result.keys() if isinstance(file_result, dict) else type(file_result)}")
+                print(f"📄 File result: {file_result}")
+                if 'transcript' in file_result:
+                    full_transcript = file_result.get('transcript', '')
+                if 'diarized_transcript' in file_result:
+                    diarized = file_result.get('diarized_transcript', [])
 
-            print(f"✅ Sarvam diarization complete in {latency:.2f}s")
-            print(f"👥 Detected {len(detected_speakers)} speakers")
-            print(f"📝 Generated {len(segments)} speaker segments")
+        # Convert Sarvam format to our standard format
+        segments = []
+        detected_speakers = set()
 
-            return {
-                'success': True,
-                'segments': segments,
-                'detected_speakers': sorted(list(detected_speakers)) or ['speaker 1', 'speaker 2'],
-                'full_transcript': full_transcript,
-                'latency_seconds': round(latency, 2),
-                'model': 'sarvam/saaras:v2.5'
-            }
+        if diarized:
+            for entry in diarized:
+                speaker = entry.get('speaker', 'speaker 1')
+                detected_speakers.add(speaker)
+                segments.append({
+                    'speaker_id': speaker,
+                    'text': entry.get('text', ''),
+                    'start_time': entry.get('start', 0.0),
+                    'end_time': entry.get('end', 0.0)
+                })
 
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+        print(f"✅ Sarvam diarization complete in {latency:.2f}s")
+        print(f"👥 Detected {len(detected_speakers)} speakers")
+        print(f"📝 Generated {len(segments)} speaker segments")
+
+        return {
+            'success': True,
+            'segments': segments,
+            'detected_speakers': sorted(list(detected_speakers)) or ['speaker 1', 'speaker 2'],
+            'full_transcript': full_transcript,
+            'latency_seconds': round(latency, 2),
+            'model': 'sarvam/saaras:v2.5'
+        }
 
     except Exception as e:
         print(f"❌ Sarvam diarization error: {str(e)}")
@@ -1404,6 +1384,8 @@ async def diarize_audio_sarvam(
 class SpeakerRoleRequest(BaseModel):
     segments: list[dict]  # List of {speaker_id, text, start_time, end_time}
     language: Optional[str] = "en-IN"
+    recording_id: Optional[str] = None  # Stitched recording to attach the roles to
+    consultation_id: Optional[str] = None  # Memoise the mapping for this consultation
 
 
 @app.post("/api/identify-speaker-roles")
@@ -1411,87 +1393,51 @@ async def identify_speaker_roles(request: SpeakerRoleRequest):
     """
     Identify which speaker is the doctor vs patient using LLM analysis
 
-    Analyzes the FULL conversation to determine speaker roles.
-    Uses Claude Haiku for fast, cost-effective inference.
+    Sends a bounded sample of the conversation (opening turns, each speaker's
+    first turns and question/answer exchanges) to Claude Haiku. With a
+    recording_id or consultation_id the mapping is memoised: later calls for
+    the same recording reuse it and only ask the LLM again when a new
+    speaker appears.
 
     Args:
-        segments: ALL diarized segments from the consultation
+        segments: Diarized segments from the consultation
         language: Conversation language (for context)
+        recording_id / consultation_id: Optional key to memoise the mapping under
 
     Returns:
         Speaker role mapping: {"speaker_0": "Doctor", "speaker_1": "Patient"}
     """
-    try:
-        import anthropic
-
-        anthropic_client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-
-        # Format conversation for analysis
-        conversation_text = ""
-        for seg in request.segments:  # Use ALL segments for better accuracy
-            conversation_text += f"{seg['speaker_id']}: {seg['text']}\n"
-
-        print(f"🔍 Identifying speaker roles from {len(request.segments)} segments (full consultation)")
-
-        # Prompt for role identification
-        prompt = f"""You are analyzing a medical consultation conversation between a doctor and a patient.
-The conversation has been transcribed with speaker diarization, identifying speakers as "speaker_0" and "speaker_1".
-
-Your task: Determine which speaker is the DOCTOR and which is the PATIENT.
-
-Conversation transcript:
-{conversation_text}
-
-Analysis guidelines:
-- Doctors typically: ask diagnostic questions, use medical terminology, lead the consultation, give advice
-- Patients typically: describe symptoms, answer questions about their health, express concerns
-- Look at speech patterns, question types, and conversational dynamics
-
-Respond with ONLY a JSON object in this exact format (no other text):
-{{"speaker_0": "Doctor", "speaker_1": "Patient"}}
-OR
-{{"speaker_0": "Patient", "speaker_1": "Doctor"}}
-
-Your response:"""
+    identifier = get_speaker_role_identifier()
+    key = identifier.resolve_key(request.recording_id, request.consultation_id)
 
-        # Call Claude Haiku for fast inference
-        start_time = time.time()
-
-        response = anthropic_client.messages.create(
-            model="claude-haiku-4-5-20251001",
-            max_tokens=100,
-            temperature=0,
-            messages=[{
-                "role": "user",
-                "content": prompt
-            }]
-        )
-
-        latency = time.time() - start_time
-
-        # Parse response
-        response_text = response.content[0].text.strip()
-
-        # Extract JSON (handle markdown code blocks if present)
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
+    try:
+        result = await identifier.identify(request.segments, key=key, language=request.language)
+        role_mapping = result.roles
 
-        role_mapping = json.loads(response_text)
+        if result.cached:
+            print(f"♻️  Speaker roles reused for {key}: {role_mapping}")
+        else:
+            print(f"✅ Speaker roles identified in {result.latency_seconds:.2f}s: {role_mapping}")
 
-        print(f"✅ Speaker roles identified in {latency:.2f}s: {role_mapping}")
+        # Later chunks of a stitched recording carry these roles with their global speaker IDs
+        stitcher = get_speaker_stitch_store().get(request.recording_id) if request.recording_id else None
+        if stitcher is not None:
+            stitcher.set_roles(role_mapping)
+        if request.recording_id and request.consultation_id:
+            identifier.alias(request.consultation_id, request.recording_id)
 
         return {
             "success": True,
             "role_mapping": role_mapping,
-            "latency_seconds": round(latency, 2),
-            "model": "claude-haiku-4-5-20251001",
-            "segments_analyzed": len(request.segments)
+            "latency_seconds": result.latency_seconds,
+            "model": result.model,
+            "cached": result.cached,
+            "segments_analyzed": result.segments_analyzed,
+            "segments_received": len(request.segments)
         }
 
     except json.JSONDecodeError as e:
-        print(f"❌ Failed to parse LLM response: {response_text}")
+        print(f"❌ Failed to parse LLM response: {e.doc}")
         # Fallback: default mapping
         return {
             "success": False,
@@ -1509,6 +1455,8 @@ Your response:"""
 class RerunTranscriptionRequest(BaseModel):
     consultation_id: str  # UUID of consultation to reprocess
     language: Optional[str] = None  # Optional language override
+    wait: bool = True  # False = return the job id immediately and poll /api/jobs/{job_id}
+    mode: str = "auto"  # "single" (one provider job), "windowed" (parallel windows) or "auto" (windowed when long)
 
 
 @app.post("/api/rerun-transcription")
@@ -1516,12 +1464,23 @@ async def rerun_transcription(request: RerunTranscriptionRequest):
     """
     Rerun transcription/diarization on a past consultation's audio file.
 
-    Processes the entire audio file at once with speaker diarization and role
-    identification (Doctor vs Patient), then updates the consultation record.
+    Runs speaker diarization and role identification (Doctor vs Patient), then
+    updates the consultation record. The work runs as a durable job on the job
+    queue (bounded per provider and retried on provider errors); by default
+    the request waits for it.
+
+    Long recordings are split into overlapping windows (RERUN_WINDOW_SECONDS,
+    sharing RERUN_WINDOW_OVERLAP_SECONDS) that are diarized concurrently and
+    stitched back together across the overlaps, instead of one long provider
+    job that can time out. Progress (windows_done / windows_total) is reported
+    at GET /api/jobs/{job_id}.
 
     Args:
         consultation_id: UUID of the consultation to reprocess
         language: Optional language code override (e.g., "en-IN", "hi-IN")
+        wait: If false, return {"job_id", "status": "queued"} without waiting. If the job
+              is still running after RERUN_WAIT_TIMEOUT_SECONDS, responds 202 with the job ID
+        mode: "auto" (windowed above RERUN_WINDOWED_MIN_SECONDS), "windowed" or "single"
 
     Returns:
         {
@@ -1532,196 +1491,282 @@ async def rerun_transcription(request: RerunTranscriptionRequest):
             "provider": "sarvam" | "elevenlabs",
             "speaker_roles": {"speaker_0": "Doctor", "speaker_1": "Patient"},
             "segments_count": 42,
-            "processing_time_seconds": 45.2
+            "mode": "windowed" | "single",
+            "windows": 20,
+            "processing_time_seconds": 45.2,
+            "job_id": "uuid"
         }
     """
-    import anthropic
-
-    start_time = time.time()
-    temp_audio_path = None
+    if request.mode not in ("auto", "single", "windowed"):
+        raise HTTPException(status_code=400, detail="mode must be one of: auto, single, windowed")
 
     try:
-        # 1. Validate and fetch consultation
+        # 1. Validate the consultation up front so bad requests fail fast
         print(f"🔄 Rerun transcription request for consultation {request.consultation_id}")
+        consultation = await _fetch_rerun_consultation(request.consultation_id)
 
-        supabase = get_supabase_client()
-
-        # Fetch consultation with appointment data for language detection
-        consultation_result = supabase.from_('consultations').select(
-            '*'
-        ).eq('id', request.consultation_id).single().execute()
+        language = request.language or consultation.get('transcription_language') or 'en-IN'
+        queue = get_job_queue()
+        job = queue.enqueue(
+            "rerun_transcription",
+            {"consultation_id": request.consultation_id, "language": language, "mode": request.mode},
+            concurrency_key=transcription_provider(language)
+        )
 
-        if not consultation_result.data:
-            raise HTTPException(status_code=404, detail="Consultation not found")
+        if not request.wait:
+            return {
+                "success": True,
+                "consultation_id": request.consultation_id,
+                "job_id": job.id,
+                "status": job.status
+            }
 
-        consultation = consultation_result.data
+        try:
+            result = await queue.wait(job.id, timeout=RERUN_WAIT_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"⏳ Rerun job {job.id} still running after {RERUN_WAIT_TIMEOUT_SECONDS:.0f}s, returning 202")
+            return JSONResponse(status_code=202, content={
+                "success": True,
+                "consultation_id": request.consultation_id,
+                "job_id": job.id,
+                "status": (queue.get(job.id) or job).status
+            })
+        return {**result, "job_id": job.id}
 
-        if not consultation.get('audio_url'):
-            raise HTTPException(status_code=400, detail="No audio file available for this consultation")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Rerun transcription error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Transcription rerun failed: {str(e)}")
 
-        print(f"✅ Found consultation with audio URL: {consultation['audio_url'][:50]}...")
 
-        # 2. Download audio from GCS
-        audio_url = consultation['audio_url']
+async def _fetch_rerun_consultation(consultation_id: str) -> dict:
+    """Fetch a consultation to rerun, checking it has a stored recording."""
+    supabase = get_supabase_client()
 
-        # Parse GCS URL: https://storage.googleapis.com/aneya-audio-recordings/recordings/...
-        if 'aneya-audio-recordings' not in audio_url:
-            raise HTTPException(status_code=400, detail="Invalid audio URL format")
+    # Fetch consultation with appointment data for language detection
+    consultation_result = await supabase.from_('consultations').select(
+        '*'
+    ).eq('id', consultation_id).single().execute()
 
-        blob_path = audio_url.split('aneya-audio-recordings/')[-1]
-        print(f"📥 Downloading audio from GCS: {blob_path}")
+    if not consultation_result.data:
+        raise HTTPException(status_code=404, detail="Consultation not found")
 
-        bucket = gcs_client.bucket(GCS_BUCKET_NAME)
-        blob = bucket.blob(blob_path)
+    consultation = consultation_result.data
 
-        if not blob.exists():
-            raise HTTPException(status_code=404, detail="Audio file not found in storage")
+    if not consultation.get('audio_url'):
+        raise HTTPException(status_code=400, detail="No audio file available for this consultation")
 
-        audio_bytes = blob.download_as_bytes()
-        print(f"✅ Downloaded {len(audio_bytes)} bytes")
+    # Parse GCS URL: https://storage.googleapis.com/aneya-audio-recordings/recordings/...
+    if 'aneya-audio-recordings' not in consultation['audio_url']:
+        raise HTTPException(status_code=400, detail="Invalid audio URL format")
 
-        # Save to temporary file
-        temp_audio = tempfile.NamedTemporaryFile(delete=False, suffix='.webm')
-        temp_audio.write(audio_bytes)
-        temp_audio.close()
-        temp_audio_path = temp_audio.name
+    print(f"✅ Found consultation with audio URL: {consultation['audio_url'][:50]}...")
+    return consultation
 
-        # 3. Detect language
-        language = request.language or consultation.get('transcription_language') or 'en-IN'
 
-        # Determine provider based on language
-        use_sarvam = language in [
-            'en-IN', 'hi-IN', 'bn-IN', 'gu-IN', 'kn-IN',
-            'ml-IN', 'mr-IN', 'od-IN', 'pa-IN', 'ta-IN', 'te-IN'
-        ]
+async def _run_rerun_transcription_job(ctx: JobContext) -> dict:
+    """Job queue handler for /api/rerun-transcription."""
+    start_time = time.time()
+    consultation_id = ctx.payload['consultation_id']
+    language = ctx.payload['language']
+    supabase = get_supabase_client()
 
-        provider = "sarvam" if use_sarvam else "elevenlabs"
-        print(f"🌐 Language: {language}, Provider: {provider}")
+    # 2. Download audio from GCS
+    ctx.set_progress(stage="downloading")
+    consultation = await _fetch_rerun_consultation(consultation_id)
+    blob_path = consultation['audio_url'].split('aneya-audio-recordings/')[-1]
+    print(f"📥 Downloading audio from GCS: {blob_path}")
 
-        # 4. Run diarization
-        print(f"🎙️ Starting diarization with {provider}...")
+    bucket = gcs_client.bucket(GCS_BUCKET_NAME)
+    blob = bucket.blob(blob_path)
 
-        if use_sarvam:
-            diarization_result = await _diarize_chunk_sarvam(
-                temp_audio_path,
-                language,
-                num_speakers=2
-            )
-        else:
-            diarization_result = await _diarize_chunk_elevenlabs(
-                temp_audio_path,
-                num_speakers=2,
-                threshold=0.22
-            )
+    if not await asyncio.to_thread(blob.exists):
+        raise HTTPException(status_code=404, detail="Audio file not found in storage")
 
-        segments = diarization_result.get('segments', [])
-        print(f"✅ Diarization complete: {len(segments)} segments")
+    audio_bytes = await asyncio.to_thread(blob.download_as_bytes)
+    print(f"✅ Downloaded {len(audio_bytes)} bytes")
 
-        if not segments:
-            raise HTTPException(status_code=500, detail="Diarization produced no segments")
+    # 3. Determine provider based on language
+    provider = transcription_provider(language)
+    print(f"🌐 Language: {language}, Provider: {provider}")
 
-        # 5. Identify speaker roles using Claude Haiku
-        print(f"🔍 Identifying speaker roles...")
+    # 4. Run diarization, in parallel overlapping windows for long recordings
+    mode = ctx.payload.get('mode', 'auto')
+    windows = 1
+    pcm = None
+    if mode != 'single':
+        try:
+            pcm = await get_audio_transcoder().transcode(
+                audio_bytes, PCM_16K_MONO, timeout=120, input_suffix=os.path.splitext(blob_path)[1]
+            )
+        except TranscodeError as e:
+            if mode == 'windowed':
+                raise
+            print(f"⚠️  PCM decode failed, diarizing the whole recording: {e}")
+
+    if pcm is not None and (mode == 'windowed' or pcm_duration(pcm) > RERUN_WINDOWED_MIN_SECONDS):
+        segments, windows = await _diarize_windowed(ctx, pcm, provider, language)
+        mode = 'windowed'
+    else:
+        print(f"🎙️ Starting diarization with {provider}...")
+        ctx.set_progress(stage="diarizing", provider=provider)
+        provider_audio = await prepare_provider_audio(audio_bytes, provider, blob_path)
+        segments = (await _diarize_rerun_audio(provider_audio, provider, language)).get('segments', [])
+        mode = 'single'
+    print(f"✅ Diarization complete: {len(segments)} segments ({mode}, {windows} window(s))")
+
+    if not segments:
+        raise HTTPException(status_code=500, detail="Diarization produced no segments")
+
+    # 5. Identify speaker roles using Claude Haiku (on a bounded sample of the turns)
+    print(f"🔍 Identifying speaker roles...")
+    ctx.set_progress(stage="identifying_roles", segments=len(segments))
+
+    # Re-diarizing relabels the speakers, so the consultation's memoised roles are replaced
+    roles_result = await get_speaker_role_identifier().identify(
+        segments, key=consultation_id, language=language, refresh=True
+    )
+    role_mapping = roles_result.roles
+    print(f"✅ Speaker roles identified: {role_mapping}")
 
-        anthropic_client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    # 6. Format transcript with speaker roles
+    formatted_transcript = ""
+    for seg in segments:
+        speaker_role = role_mapping.get(seg['speaker_id'], seg['speaker_id'])
+        formatted_transcript += f"{speaker_role}: {seg['text']}\n"
 
-        # Format conversation for analysis (use first 50 segments for efficiency)
-        conversation_text = ""
-        for seg in segments[:50]:
-            conversation_text += f"{seg['speaker_id']}: {seg['text']}\n"
+    print(f"✅ Formatted transcript: {len(formatted_transcript)} characters")
 
-        # Prompt for role identification
-        prompt = f"""You are analyzing a medical consultation conversation between a doctor and a patient.
-The conversation has been transcribed with speaker diarization, identifying speakers as "speaker_0" and "speaker_1".
+    # 7. Update database
+    print(f"💾 Updating consultation record...")
 
-Your task: Determine which speaker is the DOCTOR and which is the PATIENT.
+    await supabase.from_('consultations').update({
+        'original_transcript': formatted_transcript,
+        'transcription_language': language
+    }).eq('id', consultation_id).execute()
 
-Conversation transcript:
-{conversation_text}
+    print(f"✅ Database updated successfully")
 
-Analysis guidelines:
-- Doctors typically: ask diagnostic questions, use medical terminology, lead the consultation, give advice
-- Patients typically: describe symptoms, answer questions about their health, express concerns
-- Look at speech patterns, question types, and conversational dynamics
+    processing_time = time.time() - start_time
 
-Respond with ONLY a JSON object in this exact format (no other text):
-{{"speaker_0": "Doctor", "speaker_1": "Patient"}}
-OR
-{{"speaker_0": "Patient", "speaker_1": "Doctor"}}
+    # 8. Return response
+    return {
+        "success": True,
+        "consultation_id": consultation_id,
+        "transcript": formatted_transcript,
+        "language": language,
+        "provider": provider,
+        "speaker_roles": role_mapping,
+        "segments_count": len(segments),
+        "mode": mode,
+        "windows": windows,
+        "processing_time_seconds": round(processing_time, 2)
+    }
 
-Your response:"""
 
-        response = anthropic_client.messages.create(
-            model="claude-haiku-4-5-20251001",
-            max_tokens=100,
-            temperature=0,
-            messages=[{
-                "role": "user",
-                "content": prompt
-            }]
-        )
+async def _diarize_rerun_audio(audio: TranscodedAudio, provider: str, language: str) -> dict:
+    """Diarize a whole recording (or one window of it) for a transcription rerun."""
+    if provider == "sarvam":
+        return await _diarize_chunk_sarvam(audio, language, num_speakers=2)
+    return await _diarize_chunk_elevenlabs(audio, num_speakers=2, threshold=0.22)
 
-        response_text = response.content[0].text.strip()
 
-        # Extract JSON (handle markdown code blocks if present)
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
+async def _diarize_windowed(ctx: JobContext, pcm: bytes, provider: str, language: str) -> tuple:
+    """
+    Diarize decoded 16 kHz mono PCM in overlapping windows, concurrently.
 
-        role_mapping = json.loads(response_text)
-        print(f"✅ Speaker roles identified: {role_mapping}")
+    Windows are cut from the PCM in memory (no ffmpeg seeking), encoded for the
+    provider and diarized by at most RERUN_WINDOW_CONCURRENCY workers, each
+    retried up to RERUN_WINDOW_ATTEMPTS times. One provider call runs on the
+    job's own queue slot; every further concurrent call takes an extra slot
+    for the provider, so the fan-out stays within the job queue's per-provider
+    cap (e.g. sarvam=2) alongside other running jobs. Results are stitched in window
+    order across the overlaps, so speaker labels stay consistent and overlap
+    words are not duplicated.
 
-        # 6. Format transcript with speaker roles
-        formatted_transcript = ""
-        for seg in segments:
-            speaker_role = role_mapping.get(seg['speaker_id'], seg['speaker_id'])
-            formatted_transcript += f"{speaker_role}: {seg['text']}\n"
+    Returns:
+        (merged segments with recording-relative times, number of windows)
+    """
+    ranges = window_ranges(pcm_duration(pcm), RERUN_WINDOW_SECONDS, RERUN_WINDOW_OVERLAP_SECONDS)
+    semaphore = asyncio.Semaphore(RERUN_WINDOW_CONCURRENCY)
+    queue = get_job_queue()
+    own_slot = asyncio.Lock() if ctx.job.concurrency_key == provider else None
+    transcoder = get_audio_transcoder()
+    print(f"🎙️ Diarizing {len(ranges)} windows with {provider} (concurrency {RERUN_WINDOW_CONCURRENCY})...")
+    ctx.set_progress(stage="diarizing", provider=provider, windows_total=len(ranges), windows_done=0)
+
+    @asynccontextmanager
+    async def provider_slot():
+        if own_slot is not None and not own_slot.locked():
+            async with own_slot:
+                yield
+        else:
+            async with queue.slot(provider):
+                yield
+
+    async def diarize_window(index: int, start: float, end: float):
+        async with semaphore:
+            encoded = await transcoder.transcode(pcm_slice(pcm, start, end), MP3_16K_MONO, input_format=PCM_16K_MONO)
+            audio = TranscodedAudio(encoded, MP3_16K_MONO.suffix, MP3_16K_MONO.mime_type, transcoded=True)
+            for attempt in range(1, RERUN_WINDOW_ATTEMPTS + 1):
+                try:
+                    async with provider_slot():
+                        result = await _diarize_rerun_audio(audio, provider, language)
+                    return index, start, end, result.get('segments', [])
+                except Exception as e:
+                    if attempt == RERUN_WINDOW_ATTEMPTS or not _is_retryable_job_error(e):
+                        raise
+                    print(f"⚠️  Window {index} ({start:.0f}-{end:.0f}s) failed, retrying: {e}")
+
+    tasks = [asyncio.create_task(diarize_window(i, start, end)) for i, (start, end) in enumerate(ranges)]
+    results = []
+    try:
+        for done, next_result in enumerate(asyncio.as_completed(tasks), start=1):
+            results.append(await next_result)
+            ctx.set_progress(stage="diarizing", provider=provider, windows_total=len(ranges), windows_done=done)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
-        print(f"✅ Formatted transcript: {len(formatted_transcript)} characters")
+    # Stitch only once every window is in: fed in completion order, the stitcher
+    # would give up on a slow early window and drop its segments
+    stitcher = RecordingStitcher(ctx.job.id)
+    for index, start, end, segments in sorted(results, key=lambda result: result[0]):
+        stitcher.add_chunk(index, start, end, segments)
+    stitcher.flush()
+    return stitcher.merged_segments(), len(ranges)
 
-        # 7. Update database
-        print(f"💾 Updating consultation record...")
 
-        supabase.from_('consultations').update({
-            'original_transcript': formatted_transcript,
-            'transcription_language': language
-        }).eq('id', request.consultation_id).execute()
+def _is_retryable_job_error(error: BaseException) -> bool:
+    """Client errors (missing consultation/audio) are permanent; everything else is retried."""
+    return not (isinstance(error, HTTPException) and error.status_code < 500)
 
-        print(f"✅ Database updated successfully")
 
-        processing_time = time.time() - start_time
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Get the status of a background job (final-chunk processing, transcription rerun).
 
-        # 8. Return response
-        return {
-            "success": True,
-            "consultation_id": request.consultation_id,
-            "transcript": formatted_transcript,
-            "language": language,
-            "provider": provider,
-            "speaker_roles": role_mapping,
-            "segments_count": len(segments),
-            "processing_time_seconds": round(processing_time, 2)
+    Returns:
+        {
+            "job_id": "uuid",
+            "kind": "final_chunk",
+            "status": "queued" | "running" | "succeeded" | "failed",
+            "attempts": 1,
+            "progress": {...},
+            "result": {...},
+            "error": null,
+            ...
         }
-
-    except HTTPException:
-        raise
-    except json.JSONDecodeError as e:
-        print(f"❌ Failed to parse speaker role response: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to identify speaker roles")
-    except Exception as e:
-        print(f"❌ Rerun transcription error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Transcription rerun failed: {str(e)}")
-    finally:
-        # Cleanup temporary file
-        if temp_audio_path and os.path.exists(temp_audio_path):
-            try:
-                os.unlink(temp_audio_path)
-                print(f"🧹 Cleaned up temporary file")
-            except Exception as e:
-                print(f"⚠️ Failed to cleanup temp file: {e}")
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 
 @app.post("/api/diarize-chunk")
@@ -1735,7 +1780,8 @@ async def diarize_audio_chunk(
     language: Optional[str] = Form(None),
     appointment_id: Optional[str] = Form(None),
     patient_id: Optional[str] = Form(None),
-    appointment_type: Optional[str] = Form(None)
+    appointment_type: Optional[str] = Form(None),
+    recording_id: Optional[str] = Form(None)
 ):
     """
     Diarize audio chunk with overlap metadata for speaker ID matching
@@ -1744,6 +1790,13 @@ async def diarize_audio_chunk(
     real-time speaker-labeled transcription. Returns segments with overlap
     statistics for cross-chunk speaker matching.
 
+    When a recording_id (or appointment_id) is given, the chunk is also
+    stitched into that recording on the server: local speaker labels are
+    mapped to stable global IDs, the overlap with the previous chunk is
+    de-duplicated and the merged transcript is kept up to date (see
+    GET /api/recordings/{recording_id}/transcript). Chunk 0 starts a new
+    recording.
+
     Args:
         audio: Audio chunk file (webm, 30 seconds)
         chunk_index: Chunk number (0, 1, 2, ...)
@@ -1752,6 +1805,7 @@ async def diarize_audio_chunk(
         num_speakers: Optional expected number of speakers
         diarization_threshold: Speaker change detection threshold
         language: Language code (e.g., "en-IN", "hi-IN")
+        recording_id: Recording to stitch into (defaults to appointment_id)
 
     Returns:
         {
@@ -1763,7 +1817,16 @@ async def diarize_audio_chunk(
             "detected_speakers": ["speaker_0", "speaker_1"],
             "start_overlap_stats": {...},
             "end_overlap_stats": {...},
-            "latency_seconds": 2.3
+            "latency_seconds": 2.3,
+            "stitching": {
+                "recording_id": "...",
+                "stitched": true,               # false while an earlier chunk is missing
+                "speaker_map": {"speaker_1": "speaker_0", ...},
+                "stitched_segments": [...],     # recording time, global IDs (+ speaker_role)
+                "replace_from": 25.0,           # these segments replace earlier ones from here
+                "global_speakers": ["speaker_0", "speaker_1"],
+                "speaker_roles": {"speaker_0": "Doctor", ...}
+            }
         }
     """
     print(f"🎬 Chunk {chunk_index}: Received {audio.filename} ({chunk_start:.1f}s-{chunk_end:.1f}s)")
@@ -1787,143 +1850,100 @@ async def diarize_audio_chunk(
         audio_size_kb = len(content) / 1024
         print(f"📦 Audio size: {audio_size_kb:.2f} KB")
 
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as temp_file:
-            temp_file.write(content)
-            webm_path = temp_file.name
+        # Convert to 16 kHz mono MP3 for Sarvam (required for reliability with Indian languages);
+        # ElevenLabs supports webm directly. Piped through the shared ffmpeg pool, no temp files.
+        provider_audio = await prepare_provider_audio(
+            content, "sarvam" if use_sarvam else "elevenlabs", audio.filename
+        )
+
+        start_time = time.time()
 
-        # Convert to MP3 for Sarvam (required for reliability with Indian languages)
-        # ElevenLabs supports webm directly, but Sarvam works better with MP3
         if use_sarvam:
-            mp3_path = webm_path.replace('.webm', '.mp3')
-            try:
-                import subprocess
-
-                # First, diagnose the WebM file with ffprobe
-                probe_result = subprocess.run(
-                    ['ffprobe', '-v', 'error', '-show_format', '-show_streams', webm_path],
-                    capture_output=True,
-                    text=True,
-                    timeout=10
-                )
-                print(f"🔍 WebM probe results:")
-                print(f"   codec info: {probe_result.stdout[:300]}")
-
-                # Add -vn flag to ignore video streams (WebM might have video metadata)
-                # Add -nostdin to prevent FFmpeg from reading stdin
-                result = subprocess.run(
-                    [
-                        'ffmpeg',
-                        '-i', webm_path,
-                        '-vn',  # Ignore video streams
-                        '-acodec', 'libmp3lame',
-                        '-ab', '128k',
-                        '-nostdin',  # Prevent FFmpeg from reading stdin
-                        '-y',  # Overwrite output
-                        mp3_path
-                    ],
-                    capture_output=True,
-                    text=True,
-                    timeout=30  # Increased from 15s
-                )
-                if result.returncode == 0:
-                    temp_path = mp3_path
-                    os.unlink(webm_path)
-                    print(f"✅ Converted to MP3: {mp3_path}")
-                else:
-                    print(f"⚠️  FFmpeg conversion failed (exit {result.returncode}), using WebM")
-                    print(f"    Full stderr: {result.stderr}")  # Print FULL stderr
-                    print(f"    Full stdout: {result.stdout}")  # Print FULL stdout
-                    print(f"    Using WebM directly (may fail on Sarvam API)")
-                    temp_path = webm_path
-            except Exception as e:
-                print(f"⚠️  FFmpeg error: {e}")
-                print(f"    Using WebM directly")
-                temp_path = webm_path
+            # Call Sarvam diarization
+            result_data = await _diarize_chunk_sarvam(provider_audio, language, num_speakers)
         else:
-            # ElevenLabs - use webm directly (no conversion needed)
-            temp_path = webm_path
-            print(f"✅ Using WebM directly for ElevenLabs")
+            # Call ElevenLabs diarization
+            result_data = await _diarize_chunk_elevenlabs(
+                provider_audio, num_speakers, diarization_threshold
+            )
 
-        try:
-            start_time = time.time()
+        latency = time.time() - start_time
 
-            if use_sarvam:
-                # Call Sarvam diarization
-                result_data = await _diarize_chunk_sarvam(temp_path, language, num_speakers)
-            else:
-                # Call ElevenLabs diarization
-                result_data = await _diarize_chunk_elevenlabs(
-                    temp_path, num_speakers, diarization_threshold
-                )
+        segments = result_data['segments']
+        detected_speakers = result_data['detected_speakers']
 
-            latency = time.time() - start_time
+        print(f"  ✓ {latency:.1f}s | Speakers: {detected_speakers} | Segments: {len(segments)}")
 
-            segments = result_data['segments']
-            detected_speakers = result_data['detected_speakers']
+        # Calculate overlap statistics
+        # Overlap duration is 10 seconds (SPEAKER_STITCH_OVERLAP_SECONDS)
+        OVERLAP_DURATION = OVERLAP_SECONDS
 
-            print(f"  ✓ {latency:.1f}s | Speakers: {detected_speakers} | Segments: {len(segments)}")
+        # Start overlap: first 10 seconds of chunk (shared with previous chunk)
+        start_overlap_stats = {}
+        if chunk_index > 0:
+            start_overlap_stats = calculate_overlap_stats(
+                segments, 0.0, OVERLAP_DURATION
+            )
+            if start_overlap_stats:
+                print(f"  📍 Start overlap (0-{OVERLAP_DURATION}s): ", end='')
+                print(', '.join([f"{sid}={st['duration']:.1f}s" for sid, st in start_overlap_stats.items()]))
+
+        # End overlap: last 10 seconds of chunk (shared with next chunk)
+        chunk_duration = chunk_end - chunk_start
+        end_overlap_start = chunk_duration - OVERLAP_DURATION
+        end_overlap_stats = calculate_overlap_stats(
+            segments, end_overlap_start, chunk_duration
+        )
+        if end_overlap_stats:
+            print(f"  📍 End overlap ({end_overlap_start:.1f}-{chunk_duration:.1f}s): ", end='')
+            print(', '.join([f"{sid}={st['duration']:.1f}s" for sid, st in end_overlap_stats.items()]))
+
+        # Stitch into the recording's global speaker map and merged transcript
+        stitching = None
+        stitch_key = recording_id or appointment_id
+        if stitch_key:
+            store = get_speaker_stitch_store()
+            async with store.lock(stitch_key):
+                stitcher, stitch_result = store.add_chunk(stitch_key, chunk_index, chunk_start, chunk_end, segments)
+            stitching = {**stitch_result, **stitcher.summary()}
+            if stitch_result['stitched']:
+                print(f"  🧵 Stitched: {stitch_result['speaker_map']} | Global speakers: {stitcher.speakers}")
+                _schedule_recording_roles(stitch_key, stitcher, language)
+            else:
+                print(f"  🧵 Buffered (waiting for chunk {stitcher.next_index})")
 
-            # Calculate overlap statistics
-            # Overlap duration is 10 seconds (configurable)
-            OVERLAP_DURATION = 10.0
+        # Determine form type from appointment_type if provided
+        form_type = None
+        form_updates = {}
+        form_confidence = {}
 
-            # Start overlap: first 10 seconds of chunk (shared with previous chunk)
-            start_overlap_stats = {}
-            if chunk_index > 0:
-                start_overlap_stats = _calculate_overlap_stats(
-                    segments, 0.0, OVERLAP_DURATION
-                )
-                if start_overlap_stats:
-                    print(f"  📍 Start overlap (0-{OVERLAP_DURATION}s): ", end='')
-                    print(', '.join([f"{sid}={st['duration']:.1f}s" for sid, st in start_overlap_stats.items()]))
-
-            # End overlap: last 10 seconds of chunk (shared with next chunk)
-            chunk_duration = chunk_end - chunk_start
-            end_overlap_start = chunk_duration - OVERLAP_DURATION
-            end_overlap_stats = _calculate_overlap_stats(
-                segments, end_overlap_start, chunk_duration
-            )
-            if end_overlap_stats:
-                print(f"  📍 End overlap ({end_overlap_start:.1f}-{chunk_duration:.1f}s): ", end='')
-                print(', '.join([f"{sid}={st['duration']:.1f}s" for sid, st in end_overlap_stats.items()]))
-
-            # Determine form type from appointment_type if provided
-            form_type = None
-            form_updates = {}
-            form_confidence = {}
-
-            if appointment_type:
-                # Map appointment_type to form_type
-                if appointment_type == 'obgyn_infertility' or 'infertility' in appointment_type.lower():
-                    form_type = 'infertility'
-                elif appointment_type == 'obgyn_antenatal' or 'antenatal' in appointment_type.lower():
-                    form_type = 'antenatal'
-                elif appointment_type.startswith('obgyn_'):
-                    form_type = 'obgyn'
-
-                print(f"  📋 Determined form_type: {form_type} from appointment_type: {appointment_type}")
+        if appointment_type:
+            # Map appointment_type to form_type
+            if appointment_type == 'obgyn_infertility' or 'infertility' in appointment_type.lower():
+                form_type = 'infertility'
+            elif appointment_type == 'obgyn_antenatal' or 'antenatal' in appointment_type.lower():
+                form_type = 'antenatal'
+            elif appointment_type.startswith('obgyn_'):
+                form_type = 'obgyn'
 
-            return {
-                'success': True,
-                'chunk_index': chunk_index,
-                'chunk_start': chunk_start,
-                'chunk_end': chunk_end,
-                'segments': segments,
-                'detected_speakers': detected_speakers,
-                'start_overlap_stats': start_overlap_stats,
-                'end_overlap_stats': end_overlap_stats,
-                'latency_seconds': round(latency, 2),
-                'model': result_data.get('model', 'unknown'),
-                'form_type': form_type,
-                'form_updates': form_updates,
-                'form_confidence': form_confidence
-            }
+            print(f"  📋 Determined form_type: {form_type} from appointment_type: {appointment_type}")
 
-        finally:
-            # Cleanup temp files
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+        return {
+            'success': True,
+            'chunk_index': chunk_index,
+            'chunk_start': chunk_start,
+            'chunk_end': chunk_end,
+            'segments': segments,
+            'detected_speakers': detected_speakers,
+            'start_overlap_stats': start_overlap_stats,
+            'end_overlap_stats': end_overlap_stats,
+            'latency_seconds': round(latency, 2),
+            'model': result_data.get('model', 'unknown'),
+            'form_type': form_type,
+            'form_updates': form_updates,
+            'form_confidence': form_confidence,
+            'stitching': stitching
+        }
 
     except Exception as e:
         print(f"❌ Chunk {chunk_index} error: {e}")
@@ -1932,9 +1952,71 @@ async def diarize_audio_chunk(
         raise HTTPException(status_code=500, detail=f"Chunk diarization failed: {str(e)}")
 
 
+# Recordings with a role identification running in the background
+_role_tasks: dict[str, asyncio.Task] = {}
+
+
+def _schedule_recording_roles(recording_id: str, stitcher, language: Optional[str]):
+    """
+    Identify roles in the background once a stitched recording has a speaker without one.
+
+    Runs when there is enough conversation and again only when a new global
+    speaker appears; later chunk responses then carry the roles.
+    """
+    if recording_id in _role_tasks or all(s in stitcher.roles for s in stitcher.speakers):
+        return
+    segments = stitcher.merged_segments()
+    if len(segments) < MIN_TURNS or len(stitcher.speakers) < 2:
+        return
+
+    async def identify():
+        try:
+            result = await get_speaker_role_identifier().identify(segments, key=recording_id, language=language)
+            stitcher.set_roles(result.roles)
+            print(f"  🎭 Roles for {recording_id}: {result.roles}")
+        except Exception as e:
+            print(f"⚠️  Background role identification failed for {recording_id}: {e}")
+        finally:
+            _role_tasks.pop(recording_id, None)
+
+    _role_tasks[recording_id] = asyncio.create_task(identify())
+
+
+@app.get("/api/recordings/{recording_id}/transcript")
+async def get_recording_transcript(recording_id: str):
+    """
+    Get the merged, speaker-stitched transcript of a chunked recording
+
+    Built incrementally by /api/diarize-chunk, so it is ready as soon as the
+    last chunk has been diarized. Chunks still waiting for a missing earlier
+    chunk are stitched across the gap.
+
+    Returns:
+        {
+            "recording_id": "...",
+            "segments": [{"speaker_id", "speaker_role"?, "text", "start_time", "end_time"}, ...],
+            "transcript": "speaker_0: ...",
+            "global_speakers": ["speaker_0", "speaker_1"],
+            "speaker_roles": {...},
+            "chunks_stitched": 12,
+            "pending_chunks": []
+        }
+    """
+    store = get_speaker_stitch_store()
+    async with store.lock(recording_id):
+        stitcher = store.get(recording_id)
+        if stitcher is None:
+            raise HTTPException(status_code=404, detail="Recording not found or expired")
+        stitcher.flush()
+        return {
+            **stitcher.summary(),
+            "segments": stitcher.merged_segments(),
+            "transcript": stitcher.formatted_transcript(),
+        }
+
+
 @app.post("/api/process-final-chunk-async")
 async def process_final_chunk_async(
-    background_tasks: BackgroundTasks,
     consultation_id: str = Form(...),
     audio: UploadFile = File(...),
     chunk_index: int = Form(0),
@@ -1942,13 +2024,16 @@ async def process_final_chunk_async(
     chunk_end: float = Form(30.0),
     language: Optional[str] = Form(None),
     num_speakers: Optional[int] = Form(None),
-    diarization_threshold: float = Form(0.22)
+    diarization_threshold: float = Form(0.22),
+    recording_id: Optional[str] = Form(None)
 ):
     """
     Process final audio chunk asynchronously and update consultation
 
-    This endpoint returns immediately after queuing the background task.
-    The consultation is updated via Supabase when processing completes.
+    This endpoint returns immediately after queuing a durable background job
+    (it survives an instance restart and is retried on failure). The
+    consultation is updated via Supabase when processing completes; job
+    progress is available at GET /api/jobs/{job_id}.
 
     Args:
         consultation_id: UUID of the consultation to update
@@ -1959,37 +2044,43 @@ async def process_final_chunk_async(
         language: Language code (e.g., "en-IN", "hi-IN")
         num_speakers: Expected number of speakers
         diarization_threshold: Speaker change detection threshold
+        recording_id: Stitched recording this chunk ends; the consultation then
+            gets the whole merged transcript rather than just this chunk's
 
     Returns:
         {
             "success": true,
             "consultation_id": "...",
+            "job_id": "...",
             "message": "Processing in background"
         }
     """
     print(f"🚀 Starting async processing for consultation {consultation_id}")
 
-    # Read audio content before background task (file handles can't be passed)
+    # The audio is stored with the job so it survives a restart
     audio_content = await audio.read()
-    audio_filename = audio.filename or "chunk.webm"
-
-    # Queue background processing
-    background_tasks.add_task(
-        _process_final_chunk_background,
-        consultation_id=consultation_id,
-        audio_content=audio_content,
-        audio_filename=audio_filename,
-        chunk_index=chunk_index,
-        chunk_start=chunk_start,
-        chunk_end=chunk_end,
-        language=language,
-        num_speakers=num_speakers,
-        diarization_threshold=diarization_threshold
+
+    job = get_job_queue().enqueue(
+        "final_chunk",
+        {
+            "consultation_id": consultation_id,
+            "audio_filename": audio.filename or "chunk.webm",
+            "chunk_index": chunk_index,
+            "chunk_start": chunk_start,
+            "chunk_end": chunk_end,
+            "language": language,
+            "num_speakers": num_speakers,
+            "diarization_threshold": diarization_threshold,
+            "recording_id": recording_id,
+        },
+        data=audio_content,
+        concurrency_key=transcription_provider(language)
     )
 
     return {
         "success": True,
         "consultation_id": consultation_id,
+        "job_id": job.id,
         "message": "Processing in background"
     }
 
@@ -2003,133 +2094,148 @@ async def _process_final_chunk_background(
     chunk_end: float,
     language: Optional[str],
     num_speakers: Optional[int],
-    diarization_threshold: float
+    diarization_threshold: float,
+    recording_id: Optional[str] = None
 ):
-    """Background task to process final chunk and update consultation"""
+    """Process the final chunk and update the consultation (errors propagate so the job is retried)"""
     supabase = get_supabase_client()
 
-    try:
-        # Update status to 'processing'
-        print(f"🔄 Updating consultation {consultation_id} to 'processing'")
-        supabase.table('consultations').update({
-            'transcription_status': 'processing',
-            'transcription_started_at': 'now()'
+    # Update status to 'processing'
+    print(f"🔄 Updating consultation {consultation_id} to 'processing'")
+    await supabase.table('consultations').update({
+        'transcription_status': 'processing',
+        'transcription_started_at': 'now()'
+    }).eq('id', consultation_id).execute()
+
+    # Determine which service to use (Sarvam for Indian languages)
+    use_sarvam = transcription_provider(language) == "sarvam"
+
+    # Convert WebM to 16 kHz mono MP3 if using Sarvam (it requires MP3)
+    provider_audio = await prepare_provider_audio(
+        audio_content, "sarvam" if use_sarvam else "elevenlabs", audio_filename
+    )
+
+    # Call diarization (reuse existing functions)
+    print(f"🎬 Diarizing chunk {chunk_index} (language: {language}, service: {'Sarvam' if use_sarvam else 'ElevenLabs'})")
+
+    if use_sarvam:
+        result = await _diarize_chunk_sarvam(provider_audio, language, num_speakers)
+    else:
+        result = await _diarize_chunk_elevenlabs(provider_audio, num_speakers, diarization_threshold)
+
+    # Format transcript as "Speaker: text" format
+    segments = result.get('segments', [])
+
+    # If the earlier chunks were stitched on the server, finish the merged transcript
+    store = get_speaker_stitch_store()
+    stitcher = store.get(recording_id) if recording_id else None
+    if stitcher is not None:
+        async with store.lock(recording_id):
+            stitcher, _ = store.add_chunk(recording_id, chunk_index, chunk_start, chunk_end, segments)
+            stitcher.flush()
+            segments = stitcher.merged_segments()
+        print(f"🧵 Using stitched transcript for recording {recording_id} ({stitcher.chunks_stitched} chunks)")
+
+        # Roles are memoised per recording; only ask the LLM if a speaker is still unassigned
+        identifier = get_speaker_role_identifier()
+        identifier.alias(consultation_id, recording_id)
+        if segments and not all(s in stitcher.roles for s in stitcher.speakers):
+            try:
+                roles_result = await identifier.identify(segments, key=recording_id, language=language)
+                stitcher.set_roles(roles_result.roles)
+                segments = apply_roles(segments, stitcher.roles)
+            except Exception as e:
+                print(f"⚠️  Speaker role identification failed, keeping speaker IDs: {e}")
+
+    if segments:
+        segments_sorted = sorted(segments, key=lambda s: s.get('start_time', 0))
+        transcript_lines = []
+        for seg in segments_sorted:
+            speaker = seg.get('speaker_role') or seg.get('speaker_id', 'Unknown')
+            text = seg.get('text', '')
+            transcript_lines.append(f"{speaker}: {text}")
+
+        formatted_transcript = '\n\n'.join(transcript_lines)
+
+        # Update consultation with results
+        print(f"✅ Updating consultation {consultation_id} with diarized transcript")
+        await supabase.table('consultations').update({
+            'original_transcript': formatted_transcript,
+            'consultation_text': formatted_transcript,
+            'transcription_status': 'completed',
+            'transcription_completed_at': 'now()'
         }).eq('id', consultation_id).execute()
 
-        # Save audio to temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as f:
-            f.write(audio_content)
-            temp_path = f.name
+        print(f"✅ Consultation {consultation_id} updated successfully")
+    else:
+        # No segments found - mark as failed
+        print(f"⚠️  No segments found for consultation {consultation_id}")
+        await supabase.table('consultations').update({
+            'transcription_status': 'failed',
+            'transcription_error': 'No speaker segments detected',
+            'transcription_completed_at': 'now()'
+        }).eq('id', consultation_id).execute()
 
-        try:
-            # Determine which service to use (Sarvam for Indian languages)
-            use_sarvam = language and language in [
-                'en-IN', 'hi-IN', 'bn-IN', 'gu-IN', 'kn-IN', 'ml-IN',
-                'mr-IN', 'od-IN', 'pa-IN', 'ta-IN', 'te-IN'
-            ]
 
-            # Convert WebM to MP3 if using Sarvam (it requires MP3)
-            if use_sarvam and temp_path.endswith('.webm'):
-                mp3_path = temp_path.replace('.webm', '.mp3')
-                import subprocess
-                subprocess.run([
-                    'ffmpeg', '-i', temp_path, '-ar', '16000', '-ac', '1',
-                    '-b:a', '128k', mp3_path, '-y'
-                ], check=True, capture_output=True)
-                os.unlink(temp_path)
-                temp_path = mp3_path
-
-            # Call diarization (reuse existing functions)
-            print(f"🎬 Diarizing chunk {chunk_index} (language: {language}, service: {'Sarvam' if use_sarvam else 'ElevenLabs'})")
-
-            if use_sarvam:
-                result = await _diarize_chunk_sarvam(temp_path, language, num_speakers)
-            else:
-                result = await _diarize_chunk_elevenlabs(temp_path, num_speakers, diarization_threshold)
-
-            # Format transcript as "Speaker: text" format
-            segments = result.get('segments', [])
-            if segments:
-                segments_sorted = sorted(segments, key=lambda s: s.get('start_time', 0))
-                transcript_lines = []
-                for seg in segments_sorted:
-                    speaker = seg.get('speaker_role') or seg.get('speaker_id', 'Unknown')
-                    text = seg.get('text', '')
-                    transcript_lines.append(f"{speaker}: {text}")
-
-                formatted_transcript = '\n\n'.join(transcript_lines)
-
-                # Update consultation with results
-                print(f"✅ Updating consultation {consultation_id} with diarized transcript")
-                supabase.table('consultations').update({
-                    'original_transcript': formatted_transcript,
-                    'consultation_text': formatted_transcript,
-                    'transcription_status': 'completed',
-                    'transcription_completed_at': 'now()'
-                }).eq('id', consultation_id).execute()
-
-                print(f"✅ Consultation {consultation_id} updated successfully")
-            else:
-                # No segments found - mark as failed
-                print(f"⚠️  No segments found for consultation {consultation_id}")
-                supabase.table('consultations').update({
-                    'transcription_status': 'failed',
-                    'transcription_error': 'No speaker segments detected',
-                    'transcription_completed_at': 'now()'
-                }).eq('id', consultation_id).execute()
+async def _run_final_chunk_job(ctx: JobContext) -> dict:
+    """Job queue handler for /api/process-final-chunk-async."""
+    await _process_final_chunk_background(audio_content=ctx.data, **ctx.payload)
+    return {"consultation_id": ctx.payload["consultation_id"]}
 
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
 
-    except Exception as e:
-        print(f"❌ Background processing failed for consultation {consultation_id}: {e}")
-        import traceback
-        traceback.print_exc()
+async def _mark_final_chunk_failed(ctx: JobContext, error: BaseException):
+    """Called once the final-chunk job has used up its retries."""
+    consultation_id = ctx.payload["consultation_id"]
+    print(f"❌ Background processing failed for consultation {consultation_id}: {error}")
+    await get_supabase_client().table('consultations').update({
+        'transcription_status': 'failed',
+        'transcription_error': str(error),
+        'transcription_completed_at': 'now()'
+    }).eq('id', consultation_id).execute()
 
-        try:
-            # Update consultation with error status
-            supabase.table('consultations').update({
-                'transcription_status': 'failed',
-                'transcription_error': str(e),
-                'transcription_completed_at': 'now()'
-            }).eq('id', consultation_id).execute()
-        except Exception as update_error:
-            print(f"❌ Failed to update error status: {update_error}")
 
+def transcription_provider(language: Optional[str]) -> str:
+    """Provider for a language: Sarvam for Indian languages, ElevenLabs otherwise."""
+    return "sarvam" if language in SARVAM_LANGUAGES else "elevenlabs"
 
-async def _diarize_chunk_elevenlabs(audio_path: str, num_speakers: Optional[int], threshold: float) -> dict:
-    """Diarize chunk using ElevenLabs Scribe v1"""
-    elevenlabs_key = os.getenv("ELEVENLABS_API_KEY")
-    if not elevenlabs_key:
-        raise HTTPException(status_code=503, detail="ELEVENLABS_API_KEY not configured")
 
-    async with httpx.AsyncClient(timeout=60.0) as http_client:
-        with open(audio_path, 'rb') as audio_file:
-            mime_type = 'audio/mpeg' if audio_path.endswith('.mp3') else 'audio/webm'
-            filename = os.path.basename(audio_path)
-            files = {'file': (filename, audio_file, mime_type)}
+async def prepare_provider_audio(content: bytes, provider: str, filename: Optional[str] = None) -> TranscodedAudio:
+    """
+    Convert uploaded audio to the provider's preferred format (16 kHz mono MP3 for Sarvam,
+    original WebM for ElevenLabs) via the shared ffmpeg pool.
 
-            params = {
-                'model_id': 'scribe_v1',
-                'diarize': 'true',
-                'diarization_threshold': str(threshold),
-                'timestamps_granularity': 'word'
-            }
+    Falls back to the original bytes if ffmpeg fails, as the provider may still accept them.
+    """
+    suffix = os.path.splitext(filename or '')[1] or '.webm'
+    mime_type = mime_type_for(suffix)
+    try:
+        audio = await get_audio_transcoder().transcode_for_provider(content, provider, suffix, mime_type)
+        if audio.transcoded:
+            print(f"✅ Converted {len(content)} bytes to {audio.suffix} ({len(audio.data)} bytes) for {provider}")
+        return audio
+    except TranscodeError as e:
+        print(f"⚠️  FFmpeg conversion failed: {e}")
+        print(f"    Using {suffix} directly (may fail on {provider})")
+        return TranscodedAudio(content, suffix, mime_type, transcoded=False)
 
-            if num_speakers:
-                params['num_speakers'] = str(num_speakers)
 
-            response = await http_client.post(
-                'https://api.elevenlabs.io/v1/speech-to-text',
-                headers={'xi-api-key': elevenlabs_key},
-                files=files,
-                params=params
-            )
+async def _diarize_chunk_elevenlabs(audio: TranscodedAudio, num_speakers: Optional[int], threshold: float) -> dict:
+    """Diarize chunk using ElevenLabs Scribe v1"""
+    stt = get_elevenlabs_stt()
+    if not stt.available:
+        raise HTTPException(status_code=503, detail="ELEVENLABS_API_KEY not configured")
 
-    response.raise_for_status()
-    data = response.json()
+    data = await stt.speech_to_text(
+        audio.data,
+        audio.filename,
+        audio.mime_type,
+        model_id='scribe_v1',
+        diarize=True,
+        num_speakers=num_speakers,
+        diarization_threshold=threshold,
+        timestamps_granularity='word',
+        timeout=60.0
+    )
 
     # Group words by speaker into segments
     segments = _group_words_by_speaker(data.get('words', []))
@@ -2142,72 +2248,19 @@ async def _diarize_chunk_elevenlabs(audio_path: str, num_speakers: Optional[int]
     }
 
 
-async def _diarize_chunk_sarvam(audio_path: str, language: str, num_speakers: Optional[int]) -> dict:
+async def _diarize_chunk_sarvam(audio: TranscodedAudio, language: str, num_speakers: Optional[int]) -> dict:
     """Diarize chunk using Sarvam AI"""
-    from sarvamai import SarvamAI
-
-    sarvam_key = os.getenv("SARVAM_API_KEY")
-    if not sarvam_key:
+    manager = get_sarvam_job_manager()
+    if not manager.available:
         raise HTTPException(status_code=503, detail="SARVAM_API_KEY not configured")
 
     try:
-        # Initialize Sarvam client
-        client = SarvamAI(api_subscription_key=sarvam_key)
-
-        # Create batch job with diarization (same pattern as working endpoint)
+        # Submit the batch job with diarization and await its completion; the
+        # shared scheduler polls all outstanding jobs without blocking the event loop
         print(f"📤 Creating Sarvam batch job with diarization...")
-        job = client.speech_to_text_translate_job.create_job(
-            model="saaras:v2.5",
-            with_diarization=True,
-            num_speakers=num_speakers or 2
-        )
-
-        job_id = job.job_id
-        print(f"📋 Job created: {job_id}")
-
-        # Upload audio file
-        print(f"📤 Uploading audio file: {audio_path}")
-        upload_success = job.upload_files([audio_path], timeout=60.0)
-        if not upload_success:
-            raise Exception("Failed to upload audio file to Sarvam")
-        print(f"✅ Audio file uploaded")
-
-        # Start the job
-        print(f"▶️  Starting job...")
-        job.start()
-
-        # Wait for job completion (same as working endpoint)
-        print(f"⏳ Waiting for job completion...")
-        job.wait_until_complete(poll_interval=3, timeout=120)
-
-        # Small delay to ensure Sarvam API has finalized the job
-        # (prevents race condition where get_file_results returns empty)
-        time.sleep(2)
-
-        # Verify job completed successfully
-        job_status = job.get_status()
-        print(f"📊 Job status after wait: {job_status}")
-
-        # Check if job_status has job_state attribute or is a string
-        if hasattr(job_status, 'job_state'):
-            state = job_status.job_state
-            print(f"✓ Job state: {state}")
-        else:
-            state = str(job_status)
-            print(f"✓ Job state (string): {state}")
+        job = await manager.run_job(audio.data, num_speakers=num_speakers or 2, suffix=audio.suffix)
 
-        if state.lower() != 'completed':
-            # Get more details about why it failed
-            error_message = getattr(job_status, 'error_message', 'No error message')
-            job_details = getattr(job_status, 'job_details', [])
-            raise Exception(
-                f"Job did not complete successfully. "
-                f"State: {state}, Error: {error_message}, Details: {job_details}"
-            )
-
-        # Get results
-        print(f"📥 Got results...")
-        results = job.get_file_results()
+        results = job.results
         print(f"📊 Results: {results}")
 
         segments = []
@@ -2258,59 +2311,45 @@ async def _diarize_chunk_sarvam(audio_path: str, language: str, num_speakers: Op
                     output_filename = file_result.get('output_file')
                     print(f"📄 Need to download output_file: {output_filename}")
 
-                    # Get download link
-                    download_response = client.speech_to_text_translate_job.get_download_links(
-                        job_id=job_id,
-                        files=[output_filename]
-                    )
-
-                    if output_filename in download_response.download_urls:
-                        download_url = download_response.download_urls[output_filename].file_url
-                        print(f"⬇️  Downloading from: {download_url[:50]}...")
-
-                        # Download and parse JSON
-                        with httpx.Client(timeout=30.0) as http_client:
-                            response = http_client.get(download_url)
-                            response.raise_for_status()
-                            transcript_data = response.json()
-
-                        print(f"✅ Downloaded transcript data")
-
-                        # Extract diarized transcript from downloaded file
-                        if 'diarized_transcript' in transcript_data:
-                            diarized = transcript_data.get('diarized_transcript', [])
-
-                            # Handle both dict format (with 'entries' key) and list format
-                            entries = []
-                            if isinstance(diarized, dict) and 'entries' in diarized:
-                                entries = diarized.get('entries', [])
-                                print(f"✅ Found {len(entries)} entries in diarized dict")
-                            elif isinstance(diarized, list):
-                                entries = diarized
-                                print(f"✅ Found {len(entries)} entries in diarized list")
-                            else:
-                                print(f"⚠️  Unexpected diarized type: {type(diarized)}")
-
-                            # Convert Sarvam format to our standard format
-                            for entry in entries:
-                                if isinstance(entry, dict):
-                                    # Handle both field naming conventions
-                                    speaker = entry.get('speaker_id', entry.get('speaker', 'speaker 1'))
-                                    text = entry.get('transcript', entry.get('text', ''))
-                                    start = entry.get('start_time_seconds', entry.get('start', 0.0))
-                                    end = entry.get('end_time_seconds', entry.get('end', 0.0))
-
-                                    detected_speakers.add(speaker)
-                                    segments.append({
-                                        'speaker_id': speaker,
-                                        'text': text,
-                                        'start_time': start,
-                                        'end_time': end
-                                    })
-                            break
+                    # Download and parse the output JSON (async, shared keep-alive client)
+                    transcript_data = await manager.download_output(job, output_filename)
+                    print(f"✅ Downloaded transcript data")
+
+                    # Extract diarized transcript from downloaded file
+                    if 'diarized_transcript' in transcript_data:
+                        diarized = transcript_data.get('diarized_transcript', [])
+
+                        # Handle both dict format (with 'entries' key) and list format
+                        entries = []
+                        if isinstance(diarized, dict) and 'entries' in diarized:
+                            entries = diarized.get('entries', [])
+                            print(f"✅ Found {len(entries)} entries in diarized dict")
+                        elif isinstance(diarized, list):
+                            entries = diarized
+                            print(f"✅ Found {len(entries)} entries in diarized list")
                         else:
-                            print(f"⚠️  No diarized_transcript in downloaded file")
-                            print(f"    Keys: {list(transcript_data.keys())}")
+                            print(f"⚠️  Unexpected diarized type: {type(diarized)}")
+
+                        # Convert Sarvam format to our standard format
+                        for entry in entries:
+                            if isinstance(entry, dict):
+                                # Handle both field naming conventions
+                                speaker = entry.get('speaker_id', entry.get('speaker', 'speaker 1'))
+                                text = entry.get('transcript', entry.get('text', ''))
+                                start = entry.get('start_time_seconds', entry.get('start', 0.0))
+                                end = entry.get('end_time_seconds', entry.get('end', 0.0))
+
+                                detected_speakers.add(speaker)
+                                segments.append({
+                                    'speaker_id': speaker,
+                                    'text': text,
+                                    'start_time': start,
+                                    'end_time': end
+                                })
+                        break
+                    else:
+                        print(f"⚠️  No diarized_transcript in downloaded file")
+                        print(f"    Keys: {list(transcript_data.keys())}")
         else:
             print(f"⚠️  No successful results")
             if results:
@@ -2381,41 +2420,6 @@ def _group_words_by_speaker(words: list) -> list:
     return segments
 
 
-def _calculate_overlap_stats(segments: list, overlap_start: float, overlap_end: float) -> dict:
-    """Calculate speaker statistics in overlap region"""
-    # Filter segments in overlap region
-    overlap_segments = [
-        seg for seg in segments
-        if seg['start_time'] < overlap_end and seg['end_time'] > overlap_start
-    ]
-
-    speaker_stats = {}
-
-    for seg in overlap_segments:
-        speaker_id = seg['speaker_id']
-
-        if speaker_id not in speaker_stats:
-            speaker_stats[speaker_id] = {
-                'speaker_id': speaker_id,
-                'word_count': 0,
-                'duration': 0.0,
-                'segment_count': 0
-            }
-
-        stats = speaker_stats[speaker_id]
-
-        # Calculate actual overlap duration
-        seg_start = max(seg['start_time'], overlap_start)
-        seg_end = min(seg['end_time'], overlap_end)
-        duration = seg_end - seg_start
-
-        stats['word_count'] += len(seg['text'].split())
-        stats['duration'] += duration
-        stats['segment_count'] += 1
-
-    return speaker_stats
-
-
 @app.post("/api/transcribe")
 async def transcribe_audio(audio: UploadFile = File(...)):
     """
@@ -2427,7 +2431,8 @@ async def transcribe_audio(audio: UploadFile = File(...)):
     Returns:
         Transcribed text with ultra-low latency (~150ms) and automatic language detection
     """
-    if elevenlabs_client is None:
+    stt = get_elevenlabs_stt()
+    if not stt.available:
         raise HTTPException(
             status_code=503,
             detail="Transcription service not configured. ELEVENLABS_API_KEY is required."
@@ -2444,23 +2449,20 @@ async def transcribe_audio(audio: UploadFile = File(...)):
         # Transcribe using ElevenLabs Scribe v2 Realtime
         start = time.time()
 
-        # Convert bytes to BytesIO for file-like object
-        from io import BytesIO
-        audio_data = BytesIO(content)
-        audio_data.name = audio.filename or "audio.webm"
-
-        # Call ElevenLabs speech-to-text API
+        # Call ElevenLabs speech-to-text API with the uploaded bytes
         # No language_code specified - auto-detect from 90+ languages
-        response = elevenlabs_client.speech_to_text.convert(
-            file=audio_data,
+        response = await stt.speech_to_text(
+            content,
+            audio.filename or "audio.webm",
+            audio.content_type or "audio/webm",
             model_id="scribe_v2_realtime"
         )
         latency = time.time() - start
 
         # Extract transcription from response
         # ElevenLabs response includes: text, language_code, and other metadata
-        transcription = response.text if hasattr(response, 'text') else ""
-        detected_language = response.language_code if hasattr(response, 'language_code') else None
+        transcription = response.get('text') or ""
+        detected_language = response.get('language_code')
 
         print(f"✅ Transcription complete in {latency:.2f}s")
         print(f"🌍 Detected language: {detected_language}")
@@ -3550,14 +3552,14 @@ async def delete_appointment(appointment_id: str):
         supabase = get_supabase_client()
 
         # Verify the appointment exists before deleting
-        get_result = supabase.table("appointments").select("id").eq("id", appointment_id).execute()
+        get_result = await supabase.table("appointments").select("id").eq("id", appointment_id).execute()
         if not get_result.data:
             raise HTTPException(status_code=404, detail=f"Appointment with ID {appointment_id} not found")
 
         print(f"🗑️  Deleting appointment: {appointment_id}")
 
         # Delete the appointment
-        supabase.table("appointments").delete().eq("id", appointment_id).execute()
+        await supabase.table("appointments").delete().eq("id", appointment_id).execute()
 
         print(f"✅ Appointment deleted: {appointment_id}")
 
@@ -3574,121 +3576,104 @@ async def delete_appointment(appointment_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to delete appointment: {str(e)}")
 
 
-@app.get("/api/appointments/{appointment_id}/consultation-pdf")
-async def download_consultation_pdf(appointment_id: str):
+async def _consultation_pdf_spec(appointment_id: str) -> tuple:
     """
-    Generate and download a PDF of the consultation form using DoctorReportCard styling.
-    Uses headless browser (Playwright) to render React components as PDF.
-
-    Args:
-        appointment_id: UUID of the appointment
+    Load everything the consultation PDF is rendered from.
 
     Returns:
-        StreamingResponse with PDF file
-
-    Raises:
-        400: Invalid appointment ID format
-        404: Appointment not found or no consultation form found
-        500: PDF generation failed
+        (cache key, render coroutine function, filename, invalidation tags)
     """
-    try:
-        # Validate UUID format
-        try:
-            uuid.UUID(appointment_id)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid appointment ID format")
-
-        # Get Supabase client
-        supabase = get_supabase_client()
-
-        # Fetch appointment with patient, doctor, and clinic data
-        print(f"📄 Fetching appointment data for PDF generation: {appointment_id}")
-
-        appointment_result = supabase.table("appointments")\
-            .select("*, patient:patients(*), doctor:doctors(*)")\
-            .eq("id", appointment_id)\
-            .execute()
-
-        if not appointment_result.data:
-            raise HTTPException(status_code=404, detail="Appointment not found")
-
-        appointment = appointment_result.data[0]
-        patient = appointment['patient']
-
-        # Fetch consultation form
-        form_result = supabase.table("consultation_forms")\
-            .select("*")\
-            .eq("appointment_id", appointment_id)\
-            .order("created_at", desc=True)\
-            .limit(1)\
-            .execute()
+    # Get Supabase client
+    supabase = get_supabase_client()
 
-        if not form_result.data:
-            raise HTTPException(
-                status_code=404,
-                detail="No consultation form found for this appointment"
-            )
+    # Fetch appointment with patient, doctor, and clinic data
+    print(f"📄 Fetching appointment data for PDF generation: {appointment_id}")
 
-        form_record = form_result.data[0]
-        form_data = form_record['form_data']
-        form_type = form_record['form_type']
-        specialty = form_record.get('specialty', 'general')
-        print(f"✅ Found consultation form (type: {form_type}, specialty: {specialty})")
+    appointment_result = await supabase.table("appointments")\
+        .select("*, patient:patients(*), doctor:doctors(*)")\
+        .eq("id", appointment_id)\
+        .execute()
 
-        # Get form schema from custom_forms table
-        custom_form_result = supabase.table("custom_forms")\
-            .select("*")\
-            .ilike("form_name", f"%{form_type}%")\
-            .eq("specialty", specialty)\
-            .eq("status", "active")\
-            .limit(1)\
-            .execute()
+    if not appointment_result.data:
+        raise HTTPException(status_code=404, detail="Appointment not found")
 
-        if not custom_form_result.data:
-            raise HTTPException(
-                status_code=404,
-                detail=f"No active custom form template found for form type '{form_type}'"
-            )
+    appointment = appointment_result.data[0]
+    patient = appointment['patient']
 
-        custom_form = custom_form_result.data[0]
-        form_schema = custom_form.get('form_schema', {})
-        print(f"✅ Found custom form schema: {custom_form['form_name']}")
+    # Fetch consultation form
+    form_result = await supabase.table("consultation_forms")\
+        .select("*")\
+        .eq("appointment_id", appointment_id)\
+        .order("created_at", desc=True)\
+        .limit(1)\
+        .execute()
 
-        # Get clinic branding (logos, colors, contact info)
-        from models.design_tokens import get_clinic_design_tokens
-
-        clinic_id = None
-        if appointment.get('doctor'):
-            # Try to get clinic_id from doctor record directly
-            clinic_id = appointment['doctor'].get('clinic_id')
+    if not form_result.data:
+        raise HTTPException(
+            status_code=404,
+            detail="No consultation form found for this appointment"
+        )
 
-        clinic_branding = get_clinic_design_tokens(clinic_id, supabase) if clinic_id else None
+    form_record = form_result.data[0]
+    form_data = form_record['form_data']
+    form_type = form_record['form_type']
+    specialty = form_record.get('specialty', 'general')
+    print(f"✅ Found consultation form (type: {form_type}, specialty: {specialty})")
+
+    # Get form schema from custom_forms table
+    custom_form_result = await supabase.table("custom_forms")\
+        .select("*")\
+        .ilike("form_name", f"%{form_type}%")\
+        .eq("specialty", specialty)\
+        .eq("status", "active")\
+        .limit(1)\
+        .execute()
+
+    if not custom_form_result.data:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No active custom form template found for form type '{form_type}'"
+        )
 
-        # Prepare patient info
-        patient_info = {
-            "name": patient['name'],
-            "id": patient.get('id'),
-            "date_of_birth": patient.get('date_of_birth'),
-            "age": patient.get('age'),
-            "sex": patient.get('sex'),
-            "phone": patient.get('phone'),
-            "address": patient.get('address')
-        }
+    custom_form = custom_form_result.data[0]
+    form_schema = custom_form.get('form_schema', {})
+    print(f"✅ Found custom form schema: {custom_form['form_name']}")
+
+    # Get clinic branding (logos, colors, contact info)
+    from models.design_tokens import get_clinic_design_tokens
+
+    clinic_id = None
+    if appointment.get('doctor'):
+        # Try to get clinic_id from doctor record directly
+        clinic_id = appointment['doctor'].get('clinic_id')
+
+    clinic_branding = await get_clinic_design_tokens(clinic_id, supabase) if clinic_id else None
+
+    # Prepare patient info
+    patient_info = {
+        "name": patient['name'],
+        "id": patient.get('id'),
+        "date_of_birth": patient.get('date_of_birth'),
+        "age": patient.get('age'),
+        "sex": patient.get('sex'),
+        "phone": patient.get('phone'),
+        "address": patient.get('address')
+    }
 
-        # Prepare appointment info
-        appointment_info = {
-            "id": appointment['id'],
-            "scheduled_time": appointment['scheduled_time'],
-            "status": appointment.get('status', 'completed'),
-            "doctor": {
-                "name": appointment['doctor']['name'] if appointment.get('doctor') else None,
-                "license_number": appointment['doctor'].get('license_number') if appointment.get('doctor') else None
-            }
+    # Prepare appointment info
+    appointment_info = {
+        "id": appointment['id'],
+        "scheduled_time": appointment['scheduled_time'],
+        "status": appointment.get('status', 'completed'),
+        "doctor": {
+            "name": appointment['doctor']['name'] if appointment.get('doctor') else None,
+            "license_number": appointment['doctor'].get('license_number') if appointment.get('doctor') else None
         }
+    }
 
-        # Generate PDF using headless browser
-        from pdf_generator_headless import generate_consultation_pdf
+    from pdf_generator_headless import generate_consultation_pdf, get_pdf_assets
 
+    async def render() -> bytes:
         print(f"🎨 Generating PDF with React components...")
         pdf_buffer = await generate_consultation_pdf(
             form_schema=form_schema,
@@ -3697,22 +3682,58 @@ async def download_consultation_pdf(appointment_id: str):
             appointment_info=appointment_info,
             clinic_branding=clinic_branding
         )
+        return pdf_buffer.getvalue()
+
+    key = pdf_cache_key("consultation", {
+        "form_schema": form_schema,
+        "schema_version": custom_form.get('version'),
+        "form_data": form_data,
+        "patient_info": patient_info,
+        "appointment_info": appointment_info,
+        "clinic_branding": clinic_branding,
+    }, get_pdf_assets().version)
+
+    # Create safe filename
+    patient_name = patient['name'].replace(' ', '_').replace('/', '_')
+    date_str = appointment['scheduled_time'][:10] if appointment.get('scheduled_time') else 'unknown'
+    filename = f"consultation_{patient_name}_{date_str}.pdf"
+
+    doctor_id = (appointment.get('doctor') or {}).get('id')
+    tags = [f"appointment:{appointment_id}", f"doctor:{doctor_id}", f"clinic:{clinic_id}"]
+    return key, render, filename, tags
+
+
+@app.get("/api/appointments/{appointment_id}/consultation-pdf")
+async def download_consultation_pdf(appointment_id: str, if_none_match: Optional[str] = Header(None)):
+    """
+    Generate and download a PDF of the consultation form using DoctorReportCard styling.
+    Uses headless browser (Playwright) to render React components as PDF.
+
+    The PDF is cached by a hash of its inputs (see servers/utils/pdf_cache.py);
+    the response carries that hash as its ETag, and a matching If-None-Match
+    gets 304 Not Modified.
+
+    Args:
+        appointment_id: UUID of the appointment
 
-        # Create safe filename
-        patient_name = patient['name'].replace(' ', '_').replace('/', '_')
-        date_str = appointment['scheduled_time'][:10] if appointment.get('scheduled_time') else 'unknown'
-        filename = f"consultation_{patient_name}_{date_str}.pdf"
+    Returns:
+        PDF file response (ETag, X-PDF-Cache: hit|miss)
 
-        print(f"✅ PDF generated successfully: {filename}")
+    Raises:
+        304: If-None-Match matches the current PDF
+        400: Invalid appointment ID format
+        404: Appointment not found or no consultation form found
+        500: PDF generation failed
+    """
+    try:
+        # Validate UUID format
+        try:
+            uuid.UUID(appointment_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid appointment ID format")
 
-        # Return as streaming response
-        return StreamingResponse(
-            pdf_buffer,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
-        )
+        key, render, filename, tags = await _consultation_pdf_spec(appointment_id)
+        return await cached_pdf_response(key, render, filename, tags, if_none_match)
 
     except HTTPException:
         raise
@@ -3722,19 +3743,43 @@ async def download_consultation_pdf(appointment_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to generate PDF: {str(e)}")
 
 
+async def _run_pdf_prerender_job(ctx: JobContext) -> dict:
+    """Job queue handler rendering a consultation PDF into the cache ahead of its download."""
+    appointment_id = ctx.payload['appointment_id']
+    if not pdf_cache.ENABLED:
+        return {"appointment_id": appointment_id, "skipped": "pdf cache disabled"}
+    ctx.set_progress(stage="rendering")
+    key, render, filename, tags = await _consultation_pdf_spec(appointment_id)
+    data, hit = await get_pdf_cache().get_or_render(key, render, tags)
+    return {"appointment_id": appointment_id, "filename": filename, "cached": hit, "bytes": len(data)}
+
+
+def _schedule_pdf_prerender(appointment_id: Optional[str]):
+    """Queue a consultation PDF prerender (best effort: a download renders on a miss anyway)."""
+    if not appointment_id or not pdf_cache.ENABLED:
+        return  # Without the cache a prerender would be thrown away
+    try:
+        get_job_queue().enqueue("pdf_prerender", {"appointment_id": appointment_id}, concurrency_key="pdf")
+    except Exception as e:
+        print(f"⚠️  Could not queue PDF prerender for appointment {appointment_id}: {e}")
+
+
 @app.get("/api/consultations/{consultation_id}/analysis-pdf")
-async def download_analysis_pdf(consultation_id: str):
+async def download_analysis_pdf(consultation_id: str, if_none_match: Optional[str] = Header(None)):
     """
     Generate and download a PDF of the clinical analysis report using DoctorReportCard styling.
     Uses headless browser (Playwright) to render React components as PDF.
 
+    Served from the rendered-PDF cache, with ETag / If-None-Match (304) support.
+
     Args:
         consultation_id: UUID of the consultation
 
     Returns:
-        StreamingResponse with PDF file
+        PDF file response (ETag, X-PDF-Cache: hit|miss)
 
     Raises:
+        304: If-None-Match matches the current PDF
         400: Invalid consultation ID format
         404: Consultation not found
         500: PDF generation failed
@@ -3752,7 +3797,7 @@ async def download_analysis_pdf(consultation_id: str):
         # Fetch consultation with all related data
         print(f"📄 Fetching consultation data for PDF generation: {consultation_id}")
 
-        consultation_result = supabase.table("consultations")\
+        consultation_result = await supabase.table("consultations")\
             .select("*, appointment:appointments(*, patient:patients(*), doctor:doctors(*))")\
             .eq("id", consultation_id)\
             .execute()
@@ -3774,7 +3819,7 @@ async def download_analysis_pdf(consultation_id: str):
             # Try to get clinic_id from doctor record directly
             clinic_id = appointment['doctor'].get('clinic_id')
 
-        clinic_branding = get_clinic_design_tokens(clinic_id, supabase) if clinic_id else None
+        clinic_branding = await get_clinic_design_tokens(clinic_id, supabase) if clinic_id else None
 
         # Prepare patient info
         patient_info = {
@@ -3794,11 +3839,19 @@ async def download_analysis_pdf(consultation_id: str):
             }
         }
 
+        # Label the transcript with the known speaker roles (memo, else the stored summary's mapping)
+        summary_speakers = (consultation.get('summary_data') or {}).get('speakers') or {}
+        speaker_roles = (
+            get_speaker_role_identifier().get(consultation_id)
+            or summary_speakers.get('all_speakers')
+            or {}
+        )
+
         # Prepare consultation data
         consultation_data = {
             "id": consultation['id'],
             "consultation_text": consultation.get('consultation_text', ''),
-            "original_transcript": consultation.get('original_transcript'),
+            "original_transcript": relabel_transcript(consultation.get('original_transcript'), speaker_roles),
             "analysis_result": consultation.get('analysis_result'),
             "diagnoses": consultation.get('diagnoses', []),
             "guidelines_found": consultation.get('guidelines_found', []),
@@ -3806,32 +3859,36 @@ async def download_analysis_pdf(consultation_id: str):
             "created_at": consultation.get('created_at', '')
         }
 
-        # Generate PDF using headless browser
-        from pdf_generator_headless import generate_analysis_pdf
+        # Generate PDF using headless browser (unless this exact PDF is cached)
+        from pdf_generator_headless import generate_analysis_pdf, get_pdf_assets
 
-        print(f"🎨 Generating analysis PDF with React components...")
-        pdf_buffer = await generate_analysis_pdf(
-            consultation_data=consultation_data,
-            patient_info=patient_info,
-            appointment_info=appointment_info,
-            clinic_branding=clinic_branding
-        )
+        async def render() -> bytes:
+            print(f"🎨 Generating analysis PDF with React components...")
+            pdf_buffer = await generate_analysis_pdf(
+                consultation_data=consultation_data,
+                patient_info=patient_info,
+                appointment_info=appointment_info,
+                clinic_branding=clinic_branding
+            )
+            return pdf_buffer.getvalue()
+
+        key = pdf_cache_key("analysis", {
+            "consultation_data": consultation_data,
+            "patient_info": patient_info,
+            "appointment_info": appointment_info,
+            "clinic_branding": clinic_branding,
+        }, get_pdf_assets().version)
 
         # Create safe filename
         patient_name = patient['name'].replace(' ', '_').replace('/', '_')
         date_str = consultation.get('created_at', '')[:10] if consultation.get('created_at') else 'unknown'
         filename = f"analysis_{patient_name}_{date_str}.pdf"
 
-        print(f"✅ Analysis PDF generated successfully: {filename}")
-
-        # Return as streaming response
-        return StreamingResponse(
-            pdf_buffer,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
-        )
+        tags = [
+            f"consultation:{consultation_id}", f"appointment:{appointment.get('id')}",
+            f"doctor:{(appointment.get('doctor') or {}).get('id')}", f"clinic:{clinic_id}",
+        ]
+        return await cached_pdf_response(key, render, filename, tags, if_none_match)
 
     except HTTPException:
         raise
@@ -3842,7 +3899,7 @@ async def download_analysis_pdf(consultation_id: str):
 
 
 @app.get("/api/consultations/{consultation_id}/prescription-pdf")
-async def download_prescription_pdf(consultation_id: str):
+async def download_prescription_pdf(consultation_id: str, if_none_match: Optional[str] = Header(None)):
     """
     Generate and download a prescription PDF for a consultation.
     Uses ReportLab to render a professional prescription document with:
@@ -3852,13 +3909,16 @@ async def download_prescription_pdf(consultation_id: str):
     - Doctor signature watermark
     - QR code for verification
 
+    Served from the rendered-PDF cache, with ETag / If-None-Match (304) support.
+
     Args:
         consultation_id: UUID of the consultation
 
     Returns:
-        StreamingResponse with PDF file
+        PDF file response (ETag, X-PDF-Cache: hit|miss)
 
     Raises:
+        304: If-None-Match matches the current PDF
         400: Invalid consultation ID format
         404: Consultation not found or no prescriptions available
         500: PDF generation failed
@@ -3876,7 +3936,7 @@ async def download_prescription_pdf(consultation_id: str):
         # Fetch consultation with prescriptions and related data
         print(f"📋 Fetching consultation data for prescription PDF: {consultation_id}")
 
-        consultation_result = supabase.table("consultations")\
+        consultation_result = await supabase.table("consultations")\
             .select("*, appointment:appointments(*, patient:patients(*), doctor:doctors(*))")\
             .eq("id", consultation_id)\
             .execute()
@@ -3938,44 +3998,48 @@ async def download_prescription_pdf(consultation_id: str):
             "clinic_phone": doctor.get('clinic_phone')
         }
 
-        # Generate PDF using ReportLab
+        # Generate PDF using ReportLab (unless this exact PDF is cached)
+        import pdf_generator
         from pdf_generator import generate_prescription_pdf
 
-        print(f"💊 Generating prescription PDF...")
-        print(f"   - Patient: {patient_info.get('name')}")
-        print(f"   - Doctor: {doctor_info.get('name')}")
-        print(f"   - Prescriptions: {len(prescriptions)}")
-        print(f"   - Date: {consultation_date}")
+        async def render() -> bytes:
+            print(f"💊 Generating prescription PDF...")
+            print(f"   - Patient: {patient_info.get('name')}")
+            print(f"   - Doctor: {doctor_info.get('name')}")
+            print(f"   - Prescriptions: {len(prescriptions)}")
+            print(f"   - Date: {consultation_date}")
 
-        try:
-            pdf_buffer = generate_prescription_pdf(
-                prescriptions=prescriptions,
-                patient=patient_info,
-                doctor_info=doctor_info,
-                consultation_id=consultation_id,
-                consultation_date=consultation_date
-            )
-        except Exception as pdf_error:
-            print(f"❌ PDF generation error: {pdf_error}")
-            import traceback
-            traceback.print_exc()
-            raise HTTPException(status_code=500, detail=f"PDF generation failed: {str(pdf_error)}")
+            try:
+                pdf_buffer = await asyncio.to_thread(
+                    generate_prescription_pdf,
+                    prescriptions=prescriptions,
+                    patient=patient_info,
+                    doctor_info=doctor_info,
+                    consultation_id=consultation_id,
+                    consultation_date=consultation_date
+                )
+            except Exception as pdf_error:
+                print(f"❌ PDF generation error: {pdf_error}")
+                import traceback
+                traceback.print_exc()
+                raise HTTPException(status_code=500, detail=f"PDF generation failed: {str(pdf_error)}")
+            return pdf_buffer.getvalue()
+
+        key = pdf_cache_key("prescription", {
+            "prescriptions": prescriptions,
+            "patient_info": patient_info,
+            "doctor_info": doctor_info,
+            "consultation_id": consultation_id,
+            "consultation_date": consultation_date,
+        }, source_version(pdf_generator.__file__))
 
         # Create safe filename
         patient_name = patient.get('name', 'patient').replace(' ', '_').replace('/', '_')
         date_str = consultation_date.replace('/', '-')
         filename = f"prescription_{patient_name}_{date_str}.pdf"
 
-        print(f"✅ Prescription PDF generated successfully: {filename}")
-
-        # Return as streaming response
-        return StreamingResponse(
-            pdf_buffer,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
-        )
+        tags = [f"consultation:{consultation_id}", f"doctor:{doctor.get('id')}"]
+        return await cached_pdf_response(key, render, filename, tags, if_none_match)
 
     except HTTPException:
         raise
@@ -4009,6 +4073,8 @@ async def test_doctor_report_card_pdf():
             headers={"Content-Disposition": "attachment; filename=doctor-report-card-test.pdf"}
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error generating DoctorReportCard test PDF: {str(e)}")
         traceback.print_exc()
@@ -4054,6 +4120,8 @@ async def test_doctor_report_card_pdf_with_data(request: dict):
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error generating test PDF with custom data: {str(e)}")
         traceback.print_exc()
@@ -4076,7 +4144,7 @@ async def generate_doctor_report_card_pdf(appointment_id: str):
 
     try:
         # Fetch appointment with patient and consultation form
-        appointment_result = supabase.table("appointments")\
+        appointment_result = await supabase.table("appointments")\
             .select("""
                 *,
                 patient:patients(*),
@@ -4163,9 +4231,6 @@ async def structure_symptom(request: StructureSymptomRequest):
     Use Claude to structure free-form symptom text into structured data,
     then save to Supabase patient_symptoms table.
     """
-    import anthropic
-    from supabase import create_client, Client
-
     # Get Supabase credentials
     supabase_url = os.getenv("SUPABASE_URL")
     supabase_key = os.getenv("SUPABASE_SERVICE_KEY")  # Use service key for backend operations
@@ -4173,12 +4238,10 @@ async def structure_symptom(request: StructureSymptomRequest):
     if not supabase_url or not supabase_key:
         raise HTTPException(status_code=500, detail="Supabase configuration not available")
 
-    # Initialize Supabase client
-    supabase: Client = create_client(supabase_url, supabase_key)
+    # Shared pooled Supabase client
+    supabase = get_db(supabase_url, supabase_key)
 
     # Use Claude to structure the symptom text
-    anthropic_client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-
     prompt = f"""Analyze the following patient symptom description and extract structured information.
 Return a JSON object with these fields (use null if information is not provided):
 
@@ -4196,7 +4259,7 @@ Patient's symptom description:
 Respond with ONLY the JSON object, no other text."""
 
     try:
-        response = anthropic_client.messages.create(
+        response = await get_llm_gateway().create_message(
             model="claude-sonnet-4-20250514",
             max_tokens=1024,
             messages=[
@@ -4242,7 +4305,7 @@ Respond with ONLY the JSON object, no other text."""
             "status": "active"
         }
 
-        result = supabase.table("patient_symptoms").insert(symptom_data).execute()
+        result = await supabase.table("patient_symptoms").insert(symptom_data).execute()
 
         return {
             "success": True,
@@ -4327,16 +4390,14 @@ def validate_obgyn_form_data(form_data: dict) -> tuple[bool, Optional[str]]:
 
 
 def get_supabase_client():
-    """Get Supabase client for database operations"""
-    from supabase import create_client, Client
-
+    """Get the shared pooled Supabase client for database operations"""
     supabase_url = os.getenv("SUPABASE_URL")
     supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
 
     if not supabase_url or not supabase_key:
         raise HTTPException(status_code=500, detail="Supabase configuration not available")
 
-    return create_client(supabase_url, supabase_key)
+    return get_db(supabase_url, supabase_key)
 
 
 @app.post("/api/obgyn-forms", response_model=OBGYNFormResponse)
@@ -4370,7 +4431,7 @@ async def create_obgyn_form(request: OBGYNFormCreateRequest):
         print(f"📋 Creating OB/GYN form for patient {request.patient_id}")
 
         # Insert into database
-        result = supabase.table("obgyn_forms").insert(form_record).execute()
+        result = await supabase.table("obgyn_forms").insert(form_record).execute()
 
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to create form")
@@ -4413,7 +4474,7 @@ async def get_obgyn_form(form_id: str):
 
         print(f"📖 Retrieving OB/GYN form: {form_id}")
 
-        result = supabase.table("obgyn_forms").select("*").eq("id", form_id).execute()
+        result = await supabase.table("obgyn_forms").select("*").eq("id", form_id).execute()
 
         if not result.data:
             raise HTTPException(status_code=404, detail=f"Form with ID {form_id} not found")
@@ -4454,7 +4515,7 @@ async def get_patient_obgyn_forms(patient_id: str):
 
         print(f"📖 Retrieving all OB/GYN forms for patient: {patient_id}")
 
-        result = supabase.table("obgyn_forms").select("*").eq("patient_id", patient_id).order("created_at", desc=True).execute()
+        result = await supabase.table("obgyn_forms").select("*").eq("patient_id", patient_id).order("created_at", desc=True).execute()
 
         forms = []
         for form in result.data:
@@ -4500,7 +4561,7 @@ async def get_appointment_obgyn_form(appointment_id: str):
 
         print(f"📖 Retrieving OB/GYN form for appointment: {appointment_id}")
 
-        result = supabase.table("obgyn_forms").select("*").eq("appointment_id", appointment_id).execute()
+        result = await supabase.table("obgyn_forms").select("*").eq("appointment_id", appointment_id).execute()
 
         if not result.data:
             raise HTTPException(status_code=404, detail=f"No form found for appointment {appointment_id}")
@@ -4541,7 +4602,7 @@ async def update_obgyn_form(form_id: str, request: OBGYNFormUpdateRequest):
         supabase = get_supabase_client()
 
         # First, verify the form exists
-        get_result = supabase.table("obgyn_forms").select("*").eq("id", form_id).execute()
+        get_result = await supabase.table("obgyn_forms").select("*").eq("id", form_id).execute()
         if not get_result.data:
             raise HTTPException(status_code=404, detail=f"Form with ID {form_id} not found")
 
@@ -4561,7 +4622,7 @@ async def update_obgyn_form(form_id: str, request: OBGYNFormUpdateRequest):
         print(f"✏️  Updating OB/GYN form: {form_id}")
 
         # Update the form
-        result = supabase.table("obgyn_forms").update(update_data).eq("id", form_id).execute()
+        result = await supabase.table("obgyn_forms").update(update_data).eq("id", form_id).execute()
 
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to update form")
@@ -4603,14 +4664,14 @@ async def delete_obgyn_form(form_id: str):
         supabase = get_supabase_client()
 
         # Verify the form exists before deleting
-        get_result = supabase.table("obgyn_forms").select("id").eq("id", form_id).execute()
+        get_result = await supabase.table("obgyn_forms").select("id").eq("id", form_id).execute()
         if not get_result.data:
             raise HTTPException(status_code=404, detail=f"Form with ID {form_id} not found")
 
         print(f"🗑️  Deleting OB/GYN form: {form_id}")
 
         # Delete the form
-        supabase.table("obgyn_forms").delete().eq("id", form_id).execute()
+        await supabase.table("obgyn_forms").delete().eq("id", form_id).execute()
 
         print(f"✅ OB/GYN form deleted: {form_id}")
 
@@ -4915,7 +4976,7 @@ async def create_patient_vitals(vitals: PatientVitalsCreate):
 
         print(f"📝 Creating vitals record for patient: {vitals.patient_id}")
 
-        result = supabase.table("patient_vitals").insert(vitals_data).execute()
+        result = await supabase.table("patient_vitals").insert(vitals_data).execute()
 
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to create vitals record")
@@ -4934,7 +4995,7 @@ async def get_patient_vitals(patient_id: str, limit: int = 10):
     try:
         supabase = get_supabase_client()
 
-        result = supabase.table("patient_vitals")\
+        result = await supabase.table("patient_vitals")\
             .select("*")\
             .eq("patient_id", patient_id)\
             .order("recorded_at", desc=True)\
@@ -4955,7 +5016,7 @@ async def get_vitals_by_id(vitals_id: str):
     try:
         supabase = get_supabase_client()
 
-        result = supabase.table("patient_vitals")\
+        result = await supabase.table("patient_vitals")\
             .select("*")\
             .eq("id", vitals_id)\
             .execute()
@@ -4984,7 +5045,7 @@ async def create_patient_medication(medication: PatientMedicationCreate):
 
         print(f"📝 Creating medication record for patient: {medication.patient_id}")
 
-        result = supabase.table("patient_medications").insert(medication_data).execute()
+        result = await supabase.table("patient_medications").insert(medication_data).execute()
 
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to create medication record")
@@ -5011,7 +5072,7 @@ async def get_patient_medications(patient_id: str, status: Optional[str] = None)
         if status:
             query = query.eq("status", status)
 
-        result = query.execute()
+        result = await query.execute()
 
         print(f"✅ Retrieved {len(result.data)} medication records for patient {patient_id}")
         return result.data
@@ -5029,7 +5090,7 @@ async def update_patient_medication(medication_id: str, updates: dict):
 
         print(f"📝 Updating medication record: {medication_id}")
 
-        result = supabase.table("patient_medications")\
+        result = await supabase.table("patient_medications")\
             .update(updates)\
             .eq("id", medication_id)\
             .execute()
@@ -5059,7 +5120,7 @@ async def create_patient_allergy(allergy: PatientAllergyCreate):
 
         print(f"📝 Creating allergy record for patient: {allergy.patient_id}")
 
-        result = supabase.table("patient_allergies").insert(allergy_data).execute()
+        result = await supabase.table("patient_allergies").insert(allergy_data).execute()
 
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to create allergy record")
@@ -5086,7 +5147,7 @@ async def get_patient_allergies(patient_id: str, status: Optional[str] = "active
         if status:
             query = query.eq("status", status)
 
-        result = query.execute()
+        result = await query.execute()
 
         print(f"✅ Retrieved {len(result.data)} allergy records for patient {patient_id}")
         return result.data
@@ -5104,7 +5165,7 @@ async def update_patient_allergy(allergy_id: str, updates: dict):
 
         print(f"📝 Updating allergy record: {allergy_id}")
 
-        result = supabase.table("patient_allergies")\
+        result = await supabase.table("patient_allergies")\
             .update(updates)\
             .eq("id", allergy_id)\
             .execute()
@@ -5134,7 +5195,7 @@ async def create_patient_condition(condition: PatientConditionCreate):
 
         print(f"📝 Creating condition record for patient: {condition.patient_id}")
 
-        result = supabase.table("patient_conditions").insert(condition_data).execute()
+        result = await supabase.table("patient_conditions").insert(condition_data).execute()
 
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to create condition record")
@@ -5161,7 +5222,7 @@ async def get_patient_conditions(patient_id: str, status: Optional[str] = None):
         if status:
             query = query.eq("status", status)
 
-        result = query.execute()
+        result = await query.execute()
 
         print(f"✅ Retrieved {len(result.data)} condition records for patient {patient_id}")
         return result.data
@@ -5179,7 +5240,7 @@ async def update_patient_condition(condition_id: str, updates: dict):
 
         print(f"📝 Updating condition record: {condition_id}")
 
-        result = supabase.table("patient_conditions")\
+        result = await supabase.table("patient_conditions")\
             .update(updates)\
             .eq("id", condition_id)\
             .execute()
@@ -5209,7 +5270,7 @@ async def create_patient_lab_result(lab_result: PatientLabResultCreate):
 
         print(f"📝 Creating lab result record for patient: {lab_result.patient_id}")
 
-        result = supabase.table("patient_lab_results").insert(lab_result_data).execute()
+        result = await supabase.table("patient_lab_results").insert(lab_result_data).execute()
 
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to create lab result record")
@@ -5237,7 +5298,7 @@ async def get_patient_lab_results(patient_id: str, test_type: Optional[str] = No
         if test_type:
             query = query.eq("test_type", test_type)
 
-        result = query.execute()
+        result = await query.execute()
 
         print(f"✅ Retrieved {len(result.data)} lab result records for patient {patient_id}")
         return result.data
@@ -5253,7 +5314,7 @@ async def get_lab_result_by_id(result_id: str):
     try:
         supabase = get_supabase_client()
 
-        result = supabase.table("patient_lab_results")\
+        result = await supabase.table("patient_lab_results")\
             .select("*")\
             .eq("id", result_id)\
             .execute()
@@ -5288,7 +5349,7 @@ async def get_patient_health_summary(patient_id: str):
         print(f"📊 Fetching health summary for patient: {patient_id}")
 
         # Fetch latest vitals
-        vitals = supabase.table("patient_vitals")\
+        vitals = await supabase.table("patient_vitals")\
             .select("*")\
             .eq("patient_id", patient_id)\
             .order("recorded_at", desc=True)\
@@ -5296,7 +5357,7 @@ async def get_patient_health_summary(patient_id: str):
             .execute()
 
         # Fetch active medications
-        medications = supabase.table("patient_medications")\
+        medications = await supabase.table("patient_medications")\
             .select("*")\
             .eq("patient_id", patient_id)\
             .eq("status", "active")\
@@ -5304,7 +5365,7 @@ async def get_patient_health_summary(patient_id: str):
             .execute()
 
         # Fetch active allergies
-        allergies = supabase.table("patient_allergies")\
+        allergies = await supabase.table("patient_allergies")\
             .select("*")\
             .eq("patient_id", patient_id)\
             .eq("status", "active")\
@@ -5312,7 +5373,7 @@ async def get_patient_health_summary(patient_id: str):
             .execute()
 
         # Fetch active conditions
-        conditions = supabase.table("patient_conditions")\
+        conditions = await supabase.table("patient_conditions")\
             .select("*")\
             .eq("patient_id", patient_id)\
             .in_("status", ["active", "chronic"])\
@@ -5320,7 +5381,7 @@ async def get_patient_health_summary(patient_id: str):
             .execute()
 
         # Fetch recent lab results
-        lab_results = supabase.table("patient_lab_results")\
+        lab_results = await supabase.table("patient_lab_results")\
             .select("*")\
             .eq("patient_id", patient_id)\
             .order("test_date", desc=True)\
@@ -5380,6 +5441,33 @@ class ExtractFormFieldsResponse(BaseModel):
     extraction_metadata: dict
 
 
+class CreateExtractionSessionRequest(BaseModel):
+    """Request model for opening a real-time extraction session for an appointment"""
+    appointment_id: str
+    form_type: str
+    patient_context: dict
+    current_form_state: dict = {}  # Form data already saved (e.g. when resuming after a page reload)
+    user_id: Optional[str] = None  # Must match the Bearer token's user if given
+
+
+class ExtractionSessionChunkRequest(BaseModel):
+    """Request model for one chunk of an extraction session (new segments only)"""
+    diarized_segments: list
+    chunk_index: int
+    form_state_updates: dict = {}  # {nested_path: value} edits the doctor made since the last chunk
+
+
+class ExtractionSessionResponse(BaseModel):
+    """Response model describing an extraction session"""
+    appointment_id: str
+    form_type: str
+    resumed: bool
+    processed_chunks: list
+    fields_filled: int
+    expires_in_seconds: int
+    form_state: Optional[dict] = None
+
+
 class AutoFillConsultationFormRequest(BaseModel):
     """Request model for auto-filling consultation forms from past consultations"""
     consultation_id: str
@@ -5438,7 +5526,7 @@ async def determine_consultation_type(request: DetermineConsultationTypeRequest)
                 # Get doctor's UUID from user_id (Firebase UID)
                 doctor_id = None
                 try:
-                    doctor_result = supabase.table("doctors").select("id").eq("user_id", request.user_id).single().execute()
+                    doctor_result = await supabase.table("doctors").select("id").eq("user_id", request.user_id).single().execute()
                     doctor_id = doctor_result.data.get('id') if doctor_result.data else None
                 except Exception:
                     pass
@@ -5448,12 +5536,12 @@ async def determine_consultation_type(request: DetermineConsultationTypeRequest)
                     .eq('status', 'active').eq('created_by', request.user_id)
                 if db_specialty:
                     owned_query = owned_query.eq('specialty', db_specialty)
-                owned_forms = owned_query.execute().data or []
+                owned_forms = (await owned_query.execute()).data or []
 
                 # Get adopted forms
                 adopted_forms = []
                 if doctor_id:
-                    adopted_result = supabase.table("doctor_adopted_forms")\
+                    adopted_result = await supabase.table("doctor_adopted_forms")\
                         .select("form_id, custom_forms(form_name, description, specialty)")\
                         .eq("doctor_id", doctor_id).execute()
                     for record in (adopted_result.data or []):
@@ -5466,15 +5554,15 @@ async def determine_consultation_type(request: DetermineConsultationTypeRequest)
             else:
                 # Fallback: all active forms for specialty (original behavior)
                 if db_specialty:
-                    forms_response = supabase.table('custom_forms').select('form_name, description').eq('status', 'active').eq('specialty', db_specialty).execute()
+                    forms_response = await supabase.table('custom_forms').select('form_name, description').eq('status', 'active').eq('specialty', db_specialty).execute()
                 else:
-                    forms_response = supabase.table('custom_forms').select('form_name, description').eq('status', 'active').execute()
+                    forms_response = await supabase.table('custom_forms').select('form_name, description').eq('status', 'active').execute()
                 available_forms = forms_response.data if forms_response.data else []
 
             if not available_forms and not request.user_id:
                 # Only fall back to global when no user context is available
                 print(f"⚠️  No forms found for specialty {db_specialty}, fetching all active forms (no user_id)")
-                forms_response = supabase.table('custom_forms').select('form_name, description').eq('status', 'active').execute()
+                forms_response = await supabase.table('custom_forms').select('form_name, description').eq('status', 'active').execute()
                 available_forms = forms_response.data if forms_response.data else []
             elif not available_forms:
                 print(f"⚠️  No forms found for user {request.user_id[:8]}... in specialty {db_specialty}")
@@ -5555,16 +5643,13 @@ Conversation:
 
 Classify this consultation into one of: {valid_types}"""
 
-        # Create local Anthropic client for Claude API calls
-        import anthropic
-        anthropic_client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-
         # Use Claude Haiku for fast classification
-        message = anthropic_client.messages.create(
+        message = await get_llm_gateway().create_message(
             model="claude-haiku-4-5-20251001",
             max_tokens=512,
             system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}]
+            messages=[{"role": "user", "content": user_prompt}],
+            timeout=30.0
         )
 
         response_text = message.content[0].text.strip()
@@ -5633,6 +5718,515 @@ Classify this consultation into one of: {valid_types}"""
         )
 
 
+async def check_form_in_library(supabase, form_type: str, user_id: Optional[str] = None):
+    """
+    Validate that a form type can be used for extraction.
+
+    With a user_id the form must be in that user's library (owned or adopted);
+    otherwise any active form with that name is accepted.
+
+    Raises:
+        HTTPException 400 if the form is not available.
+    """
+    if user_id:
+        # Validate form belongs to user (owned or adopted)
+        doctor_id = None
+        try:
+            doctor_result = await supabase.table("doctors").select("id").eq("user_id", user_id).single().execute()
+            doctor_id = doctor_result.data.get('id') if doctor_result.data else None
+        except Exception:
+            pass
+
+        owned = await supabase.table('custom_forms').select('form_name')\
+            .eq('form_name', form_type).eq('status', 'active')\
+            .eq('created_by', user_id).execute()
+
+        adopted = []
+        if doctor_id:
+            adopted_result = await supabase.table("doctor_adopted_forms")\
+                .select("custom_forms(form_name)")\
+                .eq("doctor_id", doctor_id).execute()
+            adopted = [r['custom_forms']['form_name'] for r in (adopted_result.data or [])
+                       if r.get('custom_forms', {}).get('form_name') == form_type]
+
+        if not (owned.data or adopted):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Form '{form_type}' not in your library"
+            )
+    else:
+        # Fallback: global validation (existing behavior)
+        form_check = await supabase.table('custom_forms').select('form_name').eq('form_name', form_type).eq('status', 'active').execute()
+        if not form_check.data:
+            valid_forms = await supabase.table('custom_forms').select('form_name').eq('status', 'active').execute()
+            valid_names = [f['form_name'] for f in (valid_forms.data or [])]
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid form type: {form_type}. Expected one of: {', '.join(valid_names)}"
+            )
+
+
+@dataclass
+class FieldExtractionPrompt:
+    """Schema artefacts and Claude prompt for one field extraction call."""
+    schema: dict
+    table_metadata: dict
+    profile: ExtractionProfile
+    system: list
+    user_prompt: str
+    conversation_text: str
+
+
+# Output formats for the extraction prompt. The streaming variant keeps each field's
+# confidence next to its value so a field can be filtered as soon as it is complete.
+FIELD_EXTRACTION_OUTPUT_FORMAT = """{
+  "field_updates": {
+    "field.path": value,
+    ...
+  },
+  "confidence_scores": {
+    "field.path": 0.0-1.0,
+    ...
+  }
+}"""
+
+STREAMING_FIELD_EXTRACTION_OUTPUT_FORMAT = """{
+  "field_updates": {
+    "field.path": {"value": value, "confidence": 0.0-1.0},
+    ...
+  }
+}"""
+
+
+async def build_field_extraction_prompt(
+    form_type: str,
+    segments: list,
+    patient_context: dict,
+    current_form_state: dict,
+    chunk_index: int,
+    streaming: bool = False
+) -> FieldExtractionPrompt:
+    """
+    Build the Claude prompt for extracting form fields from diarized segments.
+
+    Args:
+        form_type: Form name to extract into
+        segments: Diarized segments (start_time, text, speaker_role/speaker_id)
+        patient_context: Patient demographics, medications, conditions, allergies
+        current_form_state: Nested form data already filled (excluded from extraction)
+        chunk_index: Chunk number (for the prompt)
+        streaming: Ask for per-field {"value", "confidence"} entries (see STREAMING_FIELD_EXTRACTION_OUTPUT_FORMAT)
+
+    Returns:
+        FieldExtractionPrompt with the schema, extraction profile and prompt
+    """
+    # Build conversation text with speaker labels
+    conversation_lines = []
+    for seg in segments:
+        timestamp = seg.get('start_time', 0)
+        text = seg.get('text', '').strip()
+        speaker_role = seg.get('speaker_role', seg.get('speaker_id', 'Unknown')).title()
+        if text:
+            conversation_lines.append(f"[{timestamp:.1f}s] {speaker_role}: {text}")
+
+    conversation_text = "\n".join(conversation_lines)
+
+    # ✨ NEW: Fetch schema and table_metadata from database
+    schema_data = await get_form_schema_from_db(form_type, full_metadata=True)
+    schema = schema_data.get('schema', schema_data)  # Handle both formats
+    table_metadata = schema_data.get('table_metadata', {})
+    print(f"📊 Using schema from database for {form_type}")
+    print(f"📊 Table metadata: {len(table_metadata.get('tables', {}) if isinstance(table_metadata, dict) else 0)} tables classified")
+
+    # Flattened fields, prompt hints, field mapping and aggregation plan (cached per schema version)
+    profile = get_extraction_profile(schema_data)
+    flattened_schema, field_mapping = profile.flattened_schema, profile.field_mapping
+    schema_hints = profile.schema_hints
+
+    print(f"📊 Flattened {len(flattened_schema)} fields for extraction")
+    print(f"   Field mapping has {len(field_mapping)} entries")
+
+    # Build patient context section for the prompt
+    patient_context_text = ""
+    if patient_context:
+        demographics = patient_context.get('demographics', {})
+        medications = patient_context.get('medications', [])
+        conditions = patient_context.get('conditions', [])
+        allergies = patient_context.get('allergies', [])
+
+        # Build patient profile summary
+        patient_parts = []
+        if demographics.get('name'):
+            patient_parts.append(f"Name: {demographics['name']}")
+        if demographics.get('age_years'):
+            patient_parts.append(f"Age: {demographics['age_years']} years")
+        if demographics.get('sex'):
+            patient_parts.append(f"Sex: {demographics['sex']}")
+
+        if patient_parts:
+            patient_context_text = f"\n\nPatient Profile:\n{', '.join(patient_parts)}"
+
+        # Add medications if any
+        if medications:
+            meds_text = "\n".join([
+                f"- {med['name']}" + (f" ({med['dosage']})" if med.get('dosage') else "")
+                for med in medications[:5]  # Limit to 5 most relevant
+            ])
+            patient_context_text += f"\n\nCurrent Medications:\n{meds_text}"
+
+        # Add conditions if any
+        if conditions:
+            conds_text = "\n".join([
+                f"- {cond['name']}" + (f" ({cond['status']})" if cond.get('status') else "")
+                for cond in conditions[:5]  # Limit to 5 most relevant
+            ])
+            patient_context_text += f"\n\nMedical History:\n{conds_text}"
+
+        # Add allergies if any (critical for safety)
+        if allergies:
+            allergies_text = "\n".join([
+                f"- {allergy['allergen']}" + (f" ({allergy.get('severity', 'unknown')} severity)" if allergy.get('severity') else "")
+                for allergy in allergies
+            ])
+            patient_context_text += f"\n\nAllergies:\n{allergies_text}"
+
+    # Build Claude prompt for extraction.
+    # Stable prefix (rules + form fields + examples) is identical for every chunk of every
+    # consultation on this form and is prompt-cached; patient context and form state follow it.
+    system_prefix = f"""You are a medical data extraction specialist. Your task is to extract structured clinical data from a doctor-patient consultation dialogue.
+
+Extract information from BOTH doctor and patient statements. Patient responses often contain critical medical information (e.g., previous pregnancies, symptoms, medical history).
+
+Extract ONLY information explicitly stated in the conversation. Do NOT infer, guess, or make assumptions.
+
+Form Type: {form_type.upper()}
+Available Fields:
+{schema_hints}
+
+Rules:
+1. Extract from BOTH doctor questions AND patient answers
+2. Patient responses are the primary source of medical history data
+3. Extract only NEW information not in current_form_state
+4. Use SIMPLE field names from the Available Fields list above (e.g., "weight", "bp", "fhr" not "vital_signs.systolic_bp")
+5. Convert units where needed (Fahrenheit → Celsius, text → numbers)
+6. Skip extraction if confidence < 0.7
+7. For blood pressure, use "bp" field with format "120/80"
+8. Return JSON in the format requested, with a confidence score for every field
+9. Use patient context (demographics, medications, conditions, allergies) to validate and contextualize extracted information
+10. For TABLE fields (marked [TABLE]): return an ARRAY of row objects with ALL columns filled per row.
+    - Each row must have values for every column in the table.
+    - Create separate rows when data applies to different categories (e.g., Left/Right sides, different dates, different medications).
+    - Use short, specific values per cell — NOT long descriptions that repeat across columns.
+    - If a value applies equally to all rows (e.g., "equal bilaterally"), still create separate rows with the individual value.
+
+Examples:
+- Doctor: "Any previous pregnancies?" → Patient: "Yes, two" → Extract: "gravida": 2
+- Doctor: "Blood pressure is 120 over 80" → Extract: "bp": "120/80"
+- Doctor: "Weight is 61 kilos" → Extract: "weight": 61
+- Doctor: "Fetal heart rate is 170" → Extract: "fhr": 170
+- Patient: "I've been bleeding heavily for 3 days" → Extract relevant symptoms
+- Doctor: "Peripheral pulses 2+ equal bilaterally" → Extract TABLE: "peripheral_pulses": [{{"side": "Left", "carotid": "2+", "radial": "2+", ...}}, {{"side": "Right", "carotid": "2+", "radial": "2+", ...}}]
+- Doctor: "BP supine 155/95, sitting 150/92" → Extract TABLE: "blood_pressure": [{{"supine": "155/95", "sitting": "150/92"}}]"""
+
+    system_suffix = f"""{patient_context_text.lstrip()}
+
+Current Form State (DO NOT extract these fields):
+{json.dumps(current_form_state, separators=(',', ':'))}""".lstrip()
+
+    user_prompt = f"""Doctor-patient conversation from consultation chunk #{chunk_index}:
+
+{conversation_text}
+
+Extract all relevant clinical data as JSON:
+{STREAMING_FIELD_EXTRACTION_OUTPUT_FORMAT if streaming else FIELD_EXTRACTION_OUTPUT_FORMAT}"""
+
+    # Log inputs going into the LLM call
+    print(f"🔎 LLM INPUT — Schema hints ({len(schema_hints)} chars):\n{schema_hints[:1500]}{'...[truncated]' if len(schema_hints) > 1500 else ''}")
+    print(f"🔎 LLM INPUT — Conversation text ({len(conversation_text)} chars, {len(segments)} segments):\n{conversation_text[:2000]}{'...[truncated]' if len(conversation_text) > 2000 else ''}")
+    print(f"🔎 LLM INPUT — Current form state keys: {list(current_form_state.keys()) if current_form_state else '(empty)'}")
+
+    return FieldExtractionPrompt(
+        schema=schema,
+        table_metadata=table_metadata,
+        profile=profile,
+        system=cached_system_prompt(system_prefix, system_suffix),
+        user_prompt=user_prompt,
+        conversation_text=conversation_text
+    )
+
+
+async def finalize_field_updates(
+    form_type: str,
+    field_updates: dict,
+    prompt: FieldExtractionPrompt,
+    patient_context: dict,
+    current_form_state: dict,
+    appointment_id: Optional[str] = None,
+    previous_forms: Optional[list] = None
+) -> tuple[dict, list]:
+    """
+    Aggregate historical data into mapped (nested) field updates, drop fields
+    already in the form and validate the rest.
+
+    Returns:
+        Tuple of (valid_updates, validation_errors)
+    """
+    from mcp_servers.field_validator import validate_multiple_fields
+
+    # ✨ NEW: Apply historical consultation aggregation for fields marked with requires_previous_consultations
+    # Now also uses table_metadata to identify tables needing historical data aggregation
+    patient_id = patient_context.get('demographics', {}).get('patient_id') or patient_context.get('patient_id')
+    field_updates = await apply_historical_aggregation(
+        field_updates=field_updates,
+        schema=prompt.schema,
+        patient_context=patient_context,
+        form_type=form_type,
+        patient_id=patient_id,
+        current_appointment_id=appointment_id,  # Exclude current appointment from aggregation
+        table_metadata=prompt.table_metadata,  # Table classification from form upload
+        aggregation_plan=prompt.profile.aggregation_plan,
+        previous_forms=previous_forms
+    )
+    print(f"📝 After historical aggregation: {len(field_updates)} fields")
+
+    # Exclude fields already in current form state (smart version that keeps aggregated arrays)
+    field_updates = exclude_existing_fields_smart(field_updates, current_form_state)
+    print(f"📝 After smart exclude: {len(field_updates)} fields")
+    print(f"   Remaining: {field_updates}")
+
+    # Validate all extracted fields
+    valid_updates, validation_errors = await validate_multiple_fields(
+        form_type,
+        field_updates
+    )
+
+    if validation_errors:
+        print(f"⚠️  Validation errors: {validation_errors}")
+
+    print(f"📝 After validation: {len(valid_updates)} fields")
+    print(f"   Valid updates: {valid_updates}")
+
+    return valid_updates, validation_errors
+
+
+async def extract_fields_from_segments(
+    form_type: str,
+    segments: list,
+    patient_context: dict,
+    current_form_state: dict,
+    chunk_index: int,
+    appointment_id: Optional[str] = None,
+    previous_forms: Optional[list] = None
+) -> tuple[dict, dict, dict]:
+    """
+    Extract, map, aggregate and validate form fields from diarized segments.
+
+    Shared by /api/extract-form-fields and extraction session chunks.
+
+    Args:
+        form_type: Form name to extract into
+        segments: Diarized segments (start_time, text, speaker_role/speaker_id)
+        patient_context: Patient demographics, medications, conditions, allergies
+        current_form_state: Nested form data already filled (excluded from extraction)
+        chunk_index: Chunk number (for the prompt and logs)
+        appointment_id: Current appointment, excluded from historical aggregation
+        previous_forms: Previous forms for aggregation if already loaded (skips the fetch)
+
+    Returns:
+        Tuple of (valid_updates, confidence_scores, extraction_metadata)
+    """
+    from mcp_servers.field_validator import filter_by_confidence
+
+    start_time = time.time()
+
+    prompt = await build_field_extraction_prompt(
+        form_type, segments, patient_context, current_form_state, chunk_index
+    )
+
+    # Use Claude to extract fields
+    message = await get_llm_gateway().create_message(
+        model="claude-haiku-4-5-20251001",
+        max_tokens=16384,
+        system=prompt.system,
+        messages=[{"role": "user", "content": prompt.user_prompt}],
+        timeout=90.0,
+        prompt_name="form_extraction"
+    )
+    usage = cache_usage(message)
+    print(f"📦 Prompt cache: read {usage['cache_read_input_tokens']}, wrote {usage['cache_creation_input_tokens']}, "
+          f"uncached input {usage['input_tokens']} tokens")
+
+    # Parse Claude response
+    if message.stop_reason == "max_tokens":
+        print(f"⚠️  LLM response was truncated (hit max_tokens limit)")
+    response_text = message.content[0].text.strip()
+    print(f"🔎 LLM OUTPUT — Raw response ({len(response_text)} chars, stop_reason={message.stop_reason}):\n{response_text[:2000]}{'...[truncated]' if len(response_text) > 2000 else ''}")
+
+    # Extract JSON from response (may have markdown code blocks)
+    # Use greedy match to capture full nested JSON including inner braces
+    json_match = re.search(r'```(?:json)?\s*(\{.*\})\s*```', response_text, re.DOTALL)
+    if json_match:
+        json_str = json_match.group(1)
+    else:
+        # Try to find outermost JSON object in response
+        brace_match = re.search(r'(\{.*\})', response_text, re.DOTALL)
+        if brace_match:
+            json_str = brace_match.group(1)
+        else:
+            json_str = response_text
+
+    try:
+        extraction_result = json.loads(json_str)
+    except json.JSONDecodeError as e:
+        print(f"⚠️  Failed to parse Claude response as JSON: {e}")
+        print(f"Response: {response_text[:500]}")
+        return {}, {}, {
+            "segments_analyzed": len(segments),
+            "conversation_segments": len(segments),
+            "processing_time_ms": int((time.time() - start_time) * 1000),
+            "error": "Failed to parse extraction result"
+        }
+
+    field_updates = extraction_result.get("field_updates", {})
+    confidence_scores = extraction_result.get("confidence_scores", {})
+
+    print(f"📝 LLM extracted {len(field_updates)} fields (flat format)")
+    print(f"   Raw extraction: {field_updates}")
+    print(f"   Confidence scores: {confidence_scores}")
+
+    # ✨ IMPORTANT: Filter by confidence BEFORE mapping (while field names still match)
+    field_updates = filter_by_confidence(field_updates, confidence_scores, min_confidence=0.7)
+    print(f"📝 After confidence filter: {len(field_updates)} fields (still flat)")
+    print(f"   Remaining: {field_updates}")
+
+    # ✨ NEW: Map flat field names back to nested structure
+    field_updates = map_flat_fields_to_nested(field_updates, prompt.profile.field_mapping)
+    print(f"📝 Mapped to {len(field_updates)} nested fields")
+    print(f"   After mapping: {field_updates}")
+
+    valid_updates, validation_errors = await finalize_field_updates(
+        form_type, field_updates, prompt, patient_context, current_form_state,
+        appointment_id=appointment_id, previous_forms=previous_forms
+    )
+
+    # Filter confidence scores to only validated fields
+    validated_confidence = {
+        k: confidence_scores.get(k, 0.0)
+        for k in valid_updates.keys()
+    }
+
+    processing_time_ms = int((time.time() - start_time) * 1000)
+
+    print(f"✅ Extracted {len(valid_updates)} fields in {processing_time_ms}ms")
+
+    return valid_updates, validated_confidence, {
+        "segments_analyzed": len(segments),
+        "conversation_segments": len(segments),
+        "processing_time_ms": processing_time_ms,
+        "validation_errors_count": len(validation_errors)
+    }
+
+
+async def stream_fields_from_segments(
+    form_type: str,
+    segments: list,
+    patient_context: dict,
+    current_form_state: dict,
+    chunk_index: int,
+    appointment_id: Optional[str] = None,
+    previous_forms: Optional[list] = None
+) -> AsyncGenerator[tuple[str, dict], None]:
+    """
+    Streaming variant of extract_fields_from_segments.
+
+    Claude's response is streamed and parsed incrementally: every field_updates
+    entry is confidence-filtered, mapped, checked against the form state and
+    validated as soon as it is complete, then yielded as a "field_update"
+    event. A final "complete" event carries the historically aggregated,
+    validated result (the same payload as /api/extract-form-fields).
+
+    Yields:
+        (event_type, data) tuples
+    """
+    from mcp_servers.field_validator import validate_multiple_fields, filter_by_confidence
+
+    start_time = time.time()
+
+    prompt = await build_field_extraction_prompt(
+        form_type, segments, patient_context, current_form_state, chunk_index, streaming=True
+    )
+
+    parser = StreamingObjectParser("field_updates")
+    mapped_updates = {}      # every confident field, mapped to its nested path
+    confidence_scores = {}   # nested path -> confidence
+    streamed_fields = 0
+    first_field_ms = None
+
+    async for text in get_llm_gateway().stream_text(
+        model="claude-haiku-4-5-20251001",
+        max_tokens=16384,
+        system=prompt.system,
+        messages=[{"role": "user", "content": prompt.user_prompt}],
+        timeout=90.0,
+        prompt_name="form_extraction"
+    ):
+        for field_name, entry in parser.feed(text):
+            if isinstance(entry, dict) and 'value' in entry:
+                value, confidence = entry['value'], entry.get('confidence', 0.0)
+            else:
+                value, confidence = entry, 0.0
+
+            confident = filter_by_confidence({field_name: value}, {field_name: confidence}, min_confidence=0.7)
+            if not confident:
+                continue
+
+            nested = map_flat_fields_to_nested(confident, prompt.profile.field_mapping)
+            mapped_updates.update(nested)
+            for field_path in nested:
+                confidence_scores[field_path] = confidence
+
+            valid, _ = await validate_multiple_fields(
+                form_type,
+                exclude_existing_fields_smart(nested, current_form_state)
+            )
+            for field_path, field_value in valid.items():
+                if first_field_ms is None:
+                    first_field_ms = int((time.time() - start_time) * 1000)
+                streamed_fields += 1
+                yield "field_update", {
+                    "field_path": field_path,
+                    "value": field_value,
+                    "confidence": confidence,
+                    "chunk_index": chunk_index
+                }
+
+    print(f"📝 Streamed {streamed_fields} fields ({len(mapped_updates)} above confidence threshold, "
+          f"{parser.errors} unparseable entries)")
+
+    valid_updates, validation_errors = await finalize_field_updates(
+        form_type, mapped_updates, prompt, patient_context, current_form_state,
+        appointment_id=appointment_id, previous_forms=previous_forms
+    )
+
+    processing_time_ms = int((time.time() - start_time) * 1000)
+    print(f"✅ Extracted {len(valid_updates)} fields in {processing_time_ms}ms (first field after {first_field_ms}ms)")
+
+    yield "complete", ExtractFormFieldsResponse(
+        field_updates=valid_updates,
+        confidence_scores={k: confidence_scores.get(k, 0.0) for k in valid_updates},
+        chunk_index=chunk_index,
+        extraction_metadata={
+            "segments_analyzed": len(segments),
+            "conversation_segments": len(segments),
+            "processing_time_ms": processing_time_ms,
+            "first_field_ms": first_field_ms,
+            "streamed_fields": streamed_fields,
+            "parse_errors": parser.errors,
+            "validation_errors_count": len(validation_errors)
+        }
+    ).model_dump()
+
+
 @app.post("/api/extract-form-fields", response_model=ExtractFormFieldsResponse)
 async def extract_form_fields(request: ExtractFormFieldsRequest):
     """
@@ -5640,61 +6234,24 @@ async def extract_form_fields(request: ExtractFormFieldsRequest):
 
     This endpoint processes doctor-patient conversation segments from real-time
     diarization and extracts relevant clinical data to auto-populate form fields.
+
+    For real-time form filling prefer /api/extraction-sessions: the session keeps
+    the form state and patient context server-side so each chunk only sends new
+    segments and receives a delta. /api/extract-form-fields/stream returns
+    fields over SSE as soon as each one is extracted.
     """
     try:
-        # ✨ NEW: Fetch schema from database instead of Python file
-        from mcp_servers.field_validator import validate_multiple_fields, filter_by_confidence, exclude_existing_fields
-        import time
-
         supabase = get_supabase_client()
 
         start_time = time.time()
 
         print(f"📋 Extracting fields for {request.form_type} form (chunk #{request.chunk_index})")
 
-        # Validate form type against database - check if form exists
-        if request.user_id:
-            # Validate form belongs to user (owned or adopted)
-            doctor_id = None
-            try:
-                doctor_result = supabase.table("doctors").select("id").eq("user_id", request.user_id).single().execute()
-                doctor_id = doctor_result.data.get('id') if doctor_result.data else None
-            except Exception:
-                pass
-
-            owned = supabase.table('custom_forms').select('form_name')\
-                .eq('form_name', request.form_type).eq('status', 'active')\
-                .eq('created_by', request.user_id).execute()
-
-            adopted = []
-            if doctor_id:
-                adopted_result = supabase.table("doctor_adopted_forms")\
-                    .select("custom_forms(form_name)")\
-                    .eq("doctor_id", doctor_id).execute()
-                adopted = [r['custom_forms']['form_name'] for r in (adopted_result.data or [])
-                           if r.get('custom_forms', {}).get('form_name') == request.form_type]
-
-            if not (owned.data or adopted):
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Form '{request.form_type}' not in your library"
-                )
-        else:
-            # Fallback: global validation (existing behavior)
-            form_check = supabase.table('custom_forms').select('form_name').eq('form_name', request.form_type).eq('status', 'active').execute()
-            if not form_check.data:
-                valid_forms = supabase.table('custom_forms').select('form_name').eq('status', 'active').execute()
-                valid_names = [f['form_name'] for f in (valid_forms.data or [])]
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Invalid form type: {request.form_type}. Expected one of: {', '.join(valid_names)}"
-                )
+        await check_form_in_library(supabase, request.form_type, request.user_id)
 
         # Process ALL segments (both doctor and patient)
         # Patient responses often contain the critical medical information
-        all_segments = request.diarized_segments
-
-        if not all_segments:
+        if not request.diarized_segments:
             print("⚠️  No conversation segments found in chunk")
             return ExtractFormFieldsResponse(
                 field_updates={},
@@ -5707,263 +6264,286 @@ async def extract_form_fields(request: ExtractFormFieldsRequest):
                 }
             )
 
-        # Build conversation text with speaker labels
-        conversation_lines = []
-        for seg in all_segments:
-            timestamp = seg.get('start_time', 0)
-            text = seg.get('text', '').strip()
-            speaker_role = seg.get('speaker_role', seg.get('speaker_id', 'Unknown')).title()
-            if text:
-                conversation_lines.append(f"[{timestamp:.1f}s] {speaker_role}: {text}")
+        valid_updates, confidence_scores, extraction_metadata = await extract_fields_from_segments(
+            form_type=request.form_type,
+            segments=request.diarized_segments,
+            patient_context=request.patient_context,
+            current_form_state=request.current_form_state,
+            chunk_index=request.chunk_index,
+            appointment_id=request.appointment_id
+        )
+
+        return ExtractFormFieldsResponse(
+            field_updates=valid_updates,
+            confidence_scores=confidence_scores,
+            chunk_index=request.chunk_index,
+            extraction_metadata=extraction_metadata
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error extracting form fields: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Failed to extract form fields: {str(e)}")
+
 
-        conversation_text = "\n".join(conversation_lines)
+@app.post("/api/extract-form-fields/stream")
+async def extract_form_fields_stream(request: ExtractFormFieldsRequest):
+    """
+    Streaming version of /api/extract-form-fields (Server-Sent Events).
 
-        # ✨ NEW: Fetch schema and table_metadata from database
-        schema_data = get_form_schema_from_db(request.form_type, full_metadata=True)
-        schema = schema_data.get('schema', schema_data)  # Handle both formats
-        table_metadata = schema_data.get('table_metadata', {})
-        print(f"📊 Using schema from database for {request.form_type}")
-        print(f"📊 Table metadata: {len(table_metadata.get('tables', {}) if isinstance(table_metadata, dict) else 0)} tables classified")
-
-        # ✨ NEW: Flatten schema for LLM extraction
-        flattened_schema, field_mapping = flatten_schema_for_extraction(schema)
-        schema_hints = build_extraction_prompt_hints_from_flattened_schema(flattened_schema)
-
-        print(f"📊 Flattened {len(flattened_schema)} fields for extraction")
-        print(f"   Field mapping has {len(field_mapping)} entries")
-
-        # Build patient context section for the prompt
-        patient_context_text = ""
-        if request.patient_context:
-            demographics = request.patient_context.get('demographics', {})
-            medications = request.patient_context.get('medications', [])
-            conditions = request.patient_context.get('conditions', [])
-            allergies = request.patient_context.get('allergies', [])
-
-            # Build patient profile summary
-            patient_parts = []
-            if demographics.get('name'):
-                patient_parts.append(f"Name: {demographics['name']}")
-            if demographics.get('age_years'):
-                patient_parts.append(f"Age: {demographics['age_years']} years")
-            if demographics.get('sex'):
-                patient_parts.append(f"Sex: {demographics['sex']}")
-
-            if patient_parts:
-                patient_context_text = f"\n\nPatient Profile:\n{', '.join(patient_parts)}"
-
-            # Add medications if any
-            if medications:
-                meds_text = "\n".join([
-                    f"- {med['name']}" + (f" ({med['dosage']})" if med.get('dosage') else "")
-                    for med in medications[:5]  # Limit to 5 most relevant
-                ])
-                patient_context_text += f"\n\nCurrent Medications:\n{meds_text}"
-
-            # Add conditions if any
-            if conditions:
-                conds_text = "\n".join([
-                    f"- {cond['name']}" + (f" ({cond['status']})" if cond.get('status') else "")
-                    for cond in conditions[:5]  # Limit to 5 most relevant
-                ])
-                patient_context_text += f"\n\nMedical History:\n{conds_text}"
-
-            # Add allergies if any (critical for safety)
-            if allergies:
-                allergies_text = "\n".join([
-                    f"- {allergy['allergen']}" + (f" ({allergy.get('severity', 'unknown')} severity)" if allergy.get('severity') else "")
-                    for allergy in allergies
-                ])
-                patient_context_text += f"\n\nAllergies:\n{allergies_text}"
-
-        # Build Claude prompt for extraction
-        system_prompt = f"""You are a medical data extraction specialist. Your task is to extract structured clinical data from a doctor-patient consultation dialogue.
+    Events:
+    - field_update: {field_path, value, confidence, chunk_index} as soon as a
+      field is complete in Claude's response and passes confidence filtering
+      and validation
+    - complete: final ExtractFormFieldsResponse payload, including historically
+      aggregated fields (authoritative; supersedes earlier field_update events)
+    - error: {message, status_code}
+    """
+    supabase = get_supabase_client()
+    print(f"📋 Streaming field extraction for {request.form_type} form (chunk #{request.chunk_index})")
 
-Extract information from BOTH doctor and patient statements. Patient responses often contain critical medical information (e.g., previous pregnancies, symptoms, medical history).
+    # Ownership errors are returned as a normal HTTP error before the stream starts
+    await check_form_in_library(supabase, request.form_type, request.user_id)
 
-Extract ONLY information explicitly stated in the conversation. Do NOT infer, guess, or make assumptions.
-{patient_context_text}
+    async def event_generator():
+        def send_event(event_type: str, data: dict) -> dict:
+            return {"event": event_type, "data": json.dumps(data)}
 
-Form Type: {request.form_type.upper()}
-Available Fields:
-{schema_hints}
+        try:
+            if not request.diarized_segments:
+                print("⚠️  No conversation segments found in chunk")
+                yield send_event("complete", ExtractFormFieldsResponse(
+                    field_updates={},
+                    confidence_scores={},
+                    chunk_index=request.chunk_index,
+                    extraction_metadata={
+                        "segments_analyzed": 0,
+                        "conversation_segments": 0,
+                        "processing_time_ms": 0
+                    }
+                ).model_dump())
+                return
 
-Rules:
-1. Extract from BOTH doctor questions AND patient answers
-2. Patient responses are the primary source of medical history data
-3. Extract only NEW information not in current_form_state
-4. Use SIMPLE field names from the Available Fields list above (e.g., "weight", "bp", "fhr" not "vital_signs.systolic_bp")
-5. Convert units where needed (Fahrenheit → Celsius, text → numbers)
-6. Skip extraction if confidence < 0.7
-7. For blood pressure, use "bp" field with format "120/80"
-8. Return JSON with field_updates and confidence_scores
-9. Use patient context (demographics, medications, conditions, allergies) to validate and contextualize extracted information
-10. For TABLE fields (marked [TABLE]): return an ARRAY of row objects with ALL columns filled per row.
-    - Each row must have values for every column in the table.
-    - Create separate rows when data applies to different categories (e.g., Left/Right sides, different dates, different medications).
-    - Use short, specific values per cell — NOT long descriptions that repeat across columns.
-    - If a value applies equally to all rows (e.g., "equal bilaterally"), still create separate rows with the individual value.
+            async for event_type, data in stream_fields_from_segments(
+                form_type=request.form_type,
+                segments=request.diarized_segments,
+                patient_context=request.patient_context,
+                current_form_state=request.current_form_state,
+                chunk_index=request.chunk_index,
+                appointment_id=request.appointment_id
+            ):
+                yield send_event(event_type, data)
+                await asyncio.sleep(0)  # Force event loop to flush
 
-Examples:
-- Doctor: "Any previous pregnancies?" → Patient: "Yes, two" → Extract: "gravida": 2
-- Doctor: "Blood pressure is 120 over 80" → Extract: "bp": "120/80"
-- Doctor: "Weight is 61 kilos" → Extract: "weight": 61
-- Doctor: "Fetal heart rate is 170" → Extract: "fhr": 170
-- Patient: "I've been bleeding heavily for 3 days" → Extract relevant symptoms
-- Doctor: "Peripheral pulses 2+ equal bilaterally" → Extract TABLE: "peripheral_pulses": [{{"side": "Left", "carotid": "2+", "radial": "2+", ...}}, {{"side": "Right", "carotid": "2+", "radial": "2+", ...}}]
-- Doctor: "BP supine 155/95, sitting 150/92" → Extract TABLE: "blood_pressure": [{{"supine": "155/95", "sitting": "150/92"}}]
+        except HTTPException as e:
+            yield send_event("error", {"message": e.detail, "status_code": e.status_code})
+        except Exception as e:
+            print(f"❌ Error streaming form fields: {str(e)}")
+            traceback.print_exc()
+            yield send_event("error", {"message": f"Failed to extract form fields: {str(e)}", "status_code": 500})
 
-Current Form State (DO NOT extract these fields):
-{json.dumps(request.current_form_state, indent=2)}"""
+    return EventSourceResponse(
+        event_generator(),
+        ping=15,
+        send_timeout=0.1,
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable nginx buffering
+        }
+    )
 
-        user_prompt = f"""Doctor-patient conversation from consultation chunk #{request.chunk_index}:
 
-{conversation_text}
+def _extraction_session_response(session, resumed: bool = False, include_state: bool = False) -> ExtractionSessionResponse:
+    store = get_extraction_session_store()
+    return ExtractionSessionResponse(
+        appointment_id=session.appointment_id,
+        form_type=session.form_type,
+        resumed=resumed,
+        processed_chunks=session.processed_chunks,
+        fields_filled=session.count_filled_fields(),
+        expires_in_seconds=int(store.ttl_seconds),
+        form_state=session.form_state if include_state else None
+    )
 
-Extract all relevant clinical data as JSON:
-{{
-  "field_updates": {{
-    "field.path": value,
-    ...
-  }},
-  "confidence_scores": {{
-    "field.path": 0.0-1.0,
-    ...
-  }}
-}}"""
 
-        # Log inputs going into the LLM call
-        print(f"🔎 LLM INPUT — Schema hints ({len(schema_hints)} chars):\n{schema_hints[:1500]}{'...[truncated]' if len(schema_hints) > 1500 else ''}")
-        print(f"🔎 LLM INPUT — Conversation text ({len(conversation_text)} chars, {len(all_segments)} segments):\n{conversation_text[:2000]}{'...[truncated]' if len(conversation_text) > 2000 else ''}")
-        print(f"🔎 LLM INPUT — Current form state keys: {list(request.current_form_state.keys()) if request.current_form_state else '(empty)'}")
+def _require_session_owner(session, user_id: str):
+    """Reject access to an extraction session opened by another user (it holds patient data)."""
+    if session.user_id != user_id:
+        raise HTTPException(status_code=403, detail="Access denied to this extraction session")
 
-        # Create local Anthropic client for Claude API calls
-        import anthropic
-        anthropic_client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
 
-        # Use Claude to extract fields
-        message = anthropic_client.messages.create(
-            model="claude-haiku-4-5-20251001",
-            max_tokens=16384,
-            system=system_prompt,
-            messages=[{"role": "user", "content": user_prompt}]
-        )
+@app.post("/api/extraction-sessions", response_model=ExtractionSessionResponse)
+async def create_extraction_session(
+    request: CreateExtractionSessionRequest,
+    authorization: str = Header(..., description="Bearer token")
+):
+    """
+    Open (or resume) a real-time extraction session for an appointment.
 
-        # Parse Claude response
-        if message.stop_reason == "max_tokens":
-            print(f"⚠️  LLM response was truncated (hit max_tokens limit)")
-        response_text = message.content[0].text.strip()
-        print(f"🔎 LLM OUTPUT — Raw response ({len(response_text)} chars, stop_reason={message.stop_reason}):\n{response_text[:2000]}{'...[truncated]' if len(response_text) > 2000 else ''}")
+    Checks form ownership once and keeps the patient context and form state
+    server-side. Chunks are then posted to
+    /api/extraction-sessions/{appointment_id}/chunks with only the new segments.
+    The session belongs to the user of the Bearer token; only they can use,
+    read or close it.
 
-        # Extract JSON from response (may have markdown code blocks)
-        # Use greedy match to capture full nested JSON including inner braces
-        json_match = re.search(r'```(?:json)?\s*(\{.*\})\s*```', response_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            # Try to find outermost JSON object in response
-            brace_match = re.search(r'(\{.*\})', response_text, re.DOTALL)
-            if brace_match:
-                json_str = brace_match.group(1)
-            else:
-                json_str = response_text
+    An existing session for the same appointment and form is resumed;
+    a non-empty current_form_state replaces its form state.
+    """
+    user_id = verify_firebase_token_and_get_user_id(authorization)
+    if request.user_id and request.user_id != user_id:
+        raise HTTPException(status_code=403, detail="user_id does not match the authenticated user")
 
-        try:
-            extraction_result = json.loads(json_str)
-        except json.JSONDecodeError as e:
-            print(f"⚠️  Failed to parse Claude response as JSON: {e}")
-            print(f"Response: {response_text[:500]}")
-            return ExtractFormFieldsResponse(
-                field_updates={},
-                confidence_scores={},
-                chunk_index=request.chunk_index,
-                extraction_metadata={
-                    "segments_analyzed": len(request.diarized_segments),
-                    "conversation_segments": len(all_segments),
-                    "processing_time_ms": int((time.time() - start_time) * 1000),
-                    "error": "Failed to parse extraction result"
-                }
-            )
+    try:
+        store = get_extraction_session_store()
+
+        async with store.lock(request.appointment_id):
+            session = store.get(request.appointment_id)
+            if session is not None:
+                _require_session_owner(session, user_id)
+            if session is not None and session.form_type == request.form_type:
+                if request.current_form_state:
+                    # The client's saved form (deltas applied plus manual edits) wins
+                    session.form_state = request.current_form_state
+                store.save(session)
+                print(f"♻️  Resumed extraction session for appointment {request.appointment_id} "
+                      f"({len(session.processed_chunks)} chunks processed)")
+                return _extraction_session_response(session, resumed=True, include_state=True)
+
+            await check_form_in_library(get_supabase_client(), request.form_type, user_id)
+
+            # Load previous forms once if this form aggregates historical data
+            previous_forms = request.patient_context.get('previous_forms') or None
+            patient_id = request.patient_context.get('demographics', {}).get('patient_id') or request.patient_context.get('patient_id')
+            if previous_forms is None and patient_id:
+                schema_data = await get_form_schema_from_db(request.form_type, full_metadata=True)
+                if get_extraction_profile(schema_data).aggregation_plan:
+                    enhanced_context = await fetch_patient_context(patient_id, form_type=request.form_type)
+                    previous_forms = enhanced_context.get('previous_forms', [])
+
+            session = store.create(ExtractionSession(
+                appointment_id=request.appointment_id,
+                form_type=request.form_type,
+                user_id=user_id,
+                patient_context=request.patient_context,
+                form_state=request.current_form_state,
+                previous_forms=previous_forms
+            ))
 
-        field_updates = extraction_result.get("field_updates", {})
-        confidence_scores = extraction_result.get("confidence_scores", {})
-
-        print(f"📝 LLM extracted {len(field_updates)} fields (flat format)")
-        print(f"   Raw extraction: {field_updates}")
-        print(f"   Confidence scores: {confidence_scores}")
-
-        # ✨ IMPORTANT: Filter by confidence BEFORE mapping (while field names still match)
-        field_updates = filter_by_confidence(field_updates, confidence_scores, min_confidence=0.7)
-        print(f"📝 After confidence filter: {len(field_updates)} fields (still flat)")
-        print(f"   Remaining: {field_updates}")
-
-        # ✨ NEW: Map flat field names back to nested structure
-        field_updates = map_flat_fields_to_nested(field_updates, field_mapping)
-        print(f"📝 Mapped to {len(field_updates)} nested fields")
-        print(f"   After mapping: {field_updates}")
-
-        # ✨ NEW: Apply historical consultation aggregation for fields marked with requires_previous_consultations
-        # Now also uses table_metadata to identify tables needing historical data aggregation
-        patient_id = request.patient_context.get('demographics', {}).get('patient_id') or request.patient_context.get('patient_id')
-        field_updates = await apply_historical_aggregation(
-            field_updates=field_updates,
-            schema=schema,
-            patient_context=request.patient_context,
-            form_type=request.form_type,
-            patient_id=patient_id,
-            current_appointment_id=request.appointment_id,  # Exclude current appointment from aggregation
-            table_metadata=table_metadata  # Table classification from form upload
-        )
-        print(f"📝 After historical aggregation: {len(field_updates)} fields")
+        print(f"📋 Opened extraction session for appointment {request.appointment_id} ({request.form_type})")
+        return _extraction_session_response(session, include_state=True)
 
-        # Exclude fields already in current form state (smart version that keeps aggregated arrays)
-        field_updates = exclude_existing_fields_smart(field_updates, request.current_form_state)
-        print(f"📝 After smart exclude: {len(field_updates)} fields")
-        print(f"   Remaining: {field_updates}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Error opening extraction session: {str(e)}")
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Failed to open extraction session: {str(e)}")
 
-        # Validate all extracted fields
-        valid_updates, validation_errors = validate_multiple_fields(
-            request.form_type,
-            field_updates
-        )
 
-        if validation_errors:
-            print(f"⚠️  Validation errors: {validation_errors}")
+@app.post("/api/extraction-sessions/{appointment_id}/chunks", response_model=ExtractFormFieldsResponse)
+async def extract_extraction_session_chunk(
+    appointment_id: str,
+    request: ExtractionSessionChunkRequest,
+    authorization: str = Header(..., description="Bearer token")
+):
+    """
+    Extract form fields from one chunk of an extraction session.
 
-        print(f"📝 After validation: {len(valid_updates)} fields")
-        print(f"   Valid updates: {valid_updates}")
+    Only the new diarized segments are sent; the response holds only the
+    field updates from this chunk (a delta), which are also merged into the
+    session's form state. A chunk index that was already processed returns an
+    empty delta, so retries are safe.
 
-        # Filter confidence scores to only validated fields
-        validated_confidence = {
-            k: confidence_scores.get(k, 0.0)
-            for k in valid_updates.keys()
-        }
+    Returns 404 if the session doesn't exist or has expired - open a new one.
+    """
+    user_id = verify_firebase_token_and_get_user_id(authorization)
+    try:
+        store = get_extraction_session_store()
+
+        async with store.lock(appointment_id):
+            session = store.get(appointment_id)
+            if session is None:
+                raise HTTPException(status_code=404, detail=f"No active extraction session for appointment {appointment_id}")
+            _require_session_owner(session, user_id)
+
+            if request.form_state_updates:
+                session.apply_updates(request.form_state_updates)
+
+            if session.has_processed(request.chunk_index) or not request.diarized_segments:
+                store.save(session)
+                return ExtractFormFieldsResponse(
+                    field_updates={},
+                    confidence_scores={},
+                    chunk_index=request.chunk_index,
+                    extraction_metadata={
+                        "segments_analyzed": 0,
+                        "conversation_segments": 0,
+                        "processing_time_ms": 0,
+                        "duplicate_chunk": session.has_processed(request.chunk_index)
+                    }
+                )
 
-        processing_time_ms = int((time.time() - start_time) * 1000)
+            print(f"📋 Extracting fields for {session.form_type} session {appointment_id} (chunk #{request.chunk_index})")
 
-        print(f"✅ Extracted {len(valid_updates)} fields in {processing_time_ms}ms")
+            valid_updates, confidence_scores, extraction_metadata = await extract_fields_from_segments(
+                form_type=session.form_type,
+                segments=request.diarized_segments,
+                patient_context=session.patient_context,
+                current_form_state=session.form_state,
+                chunk_index=request.chunk_index,
+                appointment_id=appointment_id,
+                previous_forms=session.previous_forms
+            )
+
+            session.apply_updates(valid_updates)
+            session.mark_processed(request.chunk_index)
+            store.save(session)
 
         return ExtractFormFieldsResponse(
             field_updates=valid_updates,
-            confidence_scores=validated_confidence,
+            confidence_scores=confidence_scores,
             chunk_index=request.chunk_index,
-            extraction_metadata={
-                "segments_analyzed": len(request.diarized_segments),
-                "conversation_segments": len(all_segments),
-                "processing_time_ms": processing_time_ms,
-                "validation_errors_count": len(validation_errors)
-            }
+            extraction_metadata=extraction_metadata
         )
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error extracting form fields: {str(e)}")
-        import traceback
+        print(f"❌ Error extracting session chunk: {str(e)}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Failed to extract form fields: {str(e)}")
 
 
+@app.get("/api/extraction-sessions/{appointment_id}", response_model=ExtractionSessionResponse)
+async def get_extraction_session(appointment_id: str, authorization: str = Header(..., description="Bearer token")):
+    """Get an extraction session including its accumulated form state (e.g. to resume after a page reload)."""
+    user_id = verify_firebase_token_and_get_user_id(authorization)
+    session = get_extraction_session_store().get(appointment_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"No active extraction session for appointment {appointment_id}")
+    _require_session_owner(session, user_id)
+    return _extraction_session_response(session, resumed=True, include_state=True)
+
+
+@app.delete("/api/extraction-sessions/{appointment_id}", response_model=ExtractionSessionResponse)
+async def close_extraction_session(appointment_id: str, authorization: str = Header(..., description="Bearer token")):
+    """Close an extraction session at the end of the consultation, returning the final form state."""
+    user_id = verify_firebase_token_and_get_user_id(authorization)
+    store = get_extraction_session_store()
+    async with store.lock(appointment_id):
+        session = store.get(appointment_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail=f"No active extraction session for appointment {appointment_id}")
+        _require_session_owner(session, user_id)
+        store.delete(appointment_id)
+
+    print(f"✅ Closed extraction session for appointment {appointment_id}")
+    return _extraction_session_response(session, include_state=True)
+
+
 @app.post("/api/auto-fill-consultation-form", response_model=AutoFillConsultationFormResponse)
 async def auto_fill_consultation_form(request: AutoFillConsultationFormRequest):
     """
@@ -5985,13 +6565,19 @@ async def auto_fill_consultation_form(request: AutoFillConsultationFormRequest):
         # Initialize Supabase client
         supabase = get_supabase_client()
 
-        # Step 1: Parse diarized segments
+        # Step 1: Parse diarized segments (labelled with the recording's memoised speaker roles, if known)
         diarized_segments = parse_diarized_transcript(request.original_transcript)
+        identifier = get_speaker_role_identifier()
+        memo_roles = identifier.get(
+            identifier.resolve_key(request.consultation_id, request.appointment_id), diarized_segments
+        )
+        if memo_roles:
+            diarized_segments = apply_roles(diarized_segments, memo_roles)
 
         # Step 1b: Fetch doctor specialty from appointment
         doctor_specialty = 'general'  # Default fallback
         try:
-            appointment_result = supabase.table('appointments').select('specialty').eq('id', request.appointment_id).single().execute()
+            appointment_result = await supabase.table('appointments').select('specialty').eq('id', request.appointment_id).single().execute()
             if appointment_result.data and appointment_result.data.get('specialty'):
                 doctor_specialty = appointment_result.data['specialty']
                 print(f"📋 Doctor specialty from appointment: {doctor_specialty}")
@@ -6003,7 +6589,7 @@ async def auto_fill_consultation_form(request: AutoFillConsultationFormRequest):
         # Step 1c: Resolve user_id for user-scoped form filtering
         user_id = None
         try:
-            consultation = supabase.table('consultations')\
+            consultation = await supabase.table('consultations')\
                 .select('performed_by')\
                 .eq('id', request.consultation_id)\
                 .single()\
@@ -6044,7 +6630,7 @@ async def auto_fill_consultation_form(request: AutoFillConsultationFormRequest):
 
         # Step 2b: Check if consultation type changed (important for re-summarise debugging)
         try:
-            existing_consultation = supabase.table('consultations').select('detected_consultation_type').eq('id', request.consultation_id).single().execute()
+            existing_consultation = await supabase.table('consultations').select('detected_consultation_type').eq('id', request.consultation_id).single().execute()
             existing_type = existing_consultation.data.get('detected_consultation_type') if existing_consultation.data else None
             if existing_type and existing_type != consultation_type:
                 print(f"⚠️  CONSULTATION TYPE CHANGED: {existing_type} -> {consultation_type} (force_type={request.force_consultation_type})")
@@ -6054,7 +6640,7 @@ async def auto_fill_consultation_form(request: AutoFillConsultationFormRequest):
         # Save detected_consultation_type to consultation record
         # This ensures the type is saved even if form creation fails
         try:
-            supabase.table('consultations').update({
+            await supabase.table('consultations').update({
                 'detected_consultation_type': consultation_type
             }).eq('id', request.consultation_id).execute()
             print(f"✅ Saved detected_consultation_type: {consultation_type}")
@@ -6064,7 +6650,7 @@ async def auto_fill_consultation_form(request: AutoFillConsultationFormRequest):
 
         # Step 3: Check if form exists in unified consultation_forms table
         # ✨ NEW: Using unified table with JSONB storage
-        existing_form = supabase.table('consultation_forms').select('id, form_data').eq(
+        existing_form = await supabase.table('consultation_forms').select('id, form_data').eq(
             'appointment_id', request.appointment_id
         ).eq(
             'form_type', consultation_type
@@ -6092,7 +6678,7 @@ async def auto_fill_consultation_form(request: AutoFillConsultationFormRequest):
             # Fetch appointment to get scheduled date for auto-fill
             initial_form_data = {}
             try:
-                appointment_result = supabase.table("appointments")\
+                appointment_result = await supabase.table("appointments")\
                     .select("scheduled_time")\
                     .eq("id", request.appointment_id)\
                     .single()\
@@ -6131,7 +6717,7 @@ async def auto_fill_consultation_form(request: AutoFillConsultationFormRequest):
                 'filled_by': user_id
             }
 
-            new_form = supabase.table('consultation_forms').insert(new_form_data).execute()
+            new_form = await supabase.table('consultation_forms').insert(new_form_data).execute()
 
             if new_form.data and len(new_form.data) > 0:
                 form_id = new_form.data[0]['id']
@@ -6142,7 +6728,7 @@ async def auto_fill_consultation_form(request: AutoFillConsultationFormRequest):
                 raise Exception("Failed to create form")
 
         # Step 4b: Fetch comprehensive patient context (filtered by form_type for targeted aggregation)
-        patient_context = fetch_patient_context(request.patient_id, form_type=consultation_type)
+        patient_context = await fetch_patient_context(request.patient_id, form_type=consultation_type)
         patient_context['patient_id'] = request.patient_id  # Keep patient_id for backward compatibility
         patient_context['demographics']['patient_id'] = request.patient_id  # Also add to demographics for aggregation
 
@@ -6191,9 +6777,10 @@ async def auto_fill_consultation_form(request: AutoFillConsultationFormRequest):
                 update_payload['updated_by'] = user_id
 
             try:
-                supabase.table('consultation_forms').update(update_payload).eq(
+                await supabase.table('consultation_forms').update(update_payload).eq(
                     'id', form_id
                 ).execute()
+                invalidate_pdfs(f"appointment:{request.appointment_id}")
                 print(f"✅ Form updated successfully (JSONB storage)")
                 print(f"   Total fields in form_data: {len(merged_form_data)}")
             except Exception as e:
@@ -6235,23 +6822,7 @@ async def auto_fill_consultation_form(request: AutoFillConsultationFormRequest):
 
 # ✨ REMOVED: FORM_TABLE_MAP - Now using unified consultation_forms table
 
-def get_supabase_client():
-    """Initialize Supabase client with service key for backend operations."""
-    from supabase import create_client, Client
-
-    supabase_url = os.getenv("SUPABASE_URL")
-    supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
-
-    if not supabase_url or not supabase_key:
-        raise HTTPException(
-            status_code=500,
-            detail="Supabase credentials not configured"
-        )
-
-    return create_client(supabase_url, supabase_key)
-
-
-def fetch_patient_context(patient_id: str, form_type: str = None) -> dict:
+async def fetch_patient_context(patient_id: str, form_type: str = None) -> dict:
     """
     Fetch comprehensive patient context for form filling.
 
@@ -6285,7 +6856,7 @@ def fetch_patient_context(patient_id: str, form_type: str = None) -> dict:
         }
 
         # 1. Fetch basic demographics from patients table
-        patient_result = supabase.table('patients').select(
+        patient_result = await supabase.table('patients').select(
             'name, sex, date_of_birth, age_years, height_cm, weight_kg, current_medications, current_conditions, allergies'
         ).eq('id', patient_id).single().execute()
 
@@ -6318,7 +6889,7 @@ def fetch_patient_context(patient_id: str, form_type: str = None) -> dict:
                 context['allergies_text'] = patient['allergies']
 
         # 2. Fetch active medications from patient_medications table
-        meds_result = supabase.table('patient_medications').select(
+        meds_result = await supabase.table('patient_medications').select(
             'medication_name, dosage, frequency, indication, started_date'
         ).eq('patient_id', patient_id).eq('status', 'active').execute()
 
@@ -6335,7 +6906,7 @@ def fetch_patient_context(patient_id: str, form_type: str = None) -> dict:
             ]
 
         # 3. Fetch active medical conditions
-        conditions_result = supabase.table('patient_conditions').select(
+        conditions_result = await supabase.table('patient_conditions').select(
             'condition_name, icd10_code, diagnosed_date, status'
         ).eq('patient_id', patient_id).in_('status', ['active', 'chronic']).execute()
 
@@ -6351,7 +6922,7 @@ def fetch_patient_context(patient_id: str, form_type: str = None) -> dict:
             ]
 
         # 4. Fetch active allergies
-        allergies_result = supabase.table('patient_allergies').select(
+        allergies_result = await supabase.table('patient_allergies').select(
             'allergen, allergen_category, reaction, severity'
         ).eq('patient_id', patient_id).eq('status', 'active').execute()
 
@@ -6377,7 +6948,7 @@ def fetch_patient_context(patient_id: str, form_type: str = None) -> dict:
             query = query.eq('form_type', form_type)
             print(f"📋 Filtering previous forms by form_type: {form_type}")
 
-        forms_result = query.order('created_at', desc=True).limit(10).execute()
+        forms_result = await query.order('created_at', desc=True).limit(10).execute()
 
         if forms_result.data:
             context['previous_forms'] = [
@@ -6610,6 +7181,60 @@ def aggregate_field_data(
         return current_data
 
 
+# data_source_types indicating a table needs data from previous consultations
+HISTORICAL_DATA_SOURCE_TYPES = {
+    'visit_history', 'lab_results', 'scan_results',
+    'medication_history', 'vitals_history', 'vaccination_records'
+}
+
+
+def build_aggregation_plan(schema: dict, table_metadata: dict = None) -> list:
+    """
+    Find the fields that need historical consultation aggregation.
+
+    A field is aggregated if it is marked requires_previous_consultations or
+    table_metadata classifies it as historical data.
+
+    Returns:
+        List of (field_path, field_schema, aggregation_strategy) tuples
+    """
+    # table_metadata structure: {"tables": {"field_name": {"data_source_type": "...", ...}}}
+    tables_info = table_metadata.get('tables', {}) if isinstance(table_metadata, dict) else {}
+    plan = []
+
+    for section_name, section_def in schema.items():
+        if not isinstance(section_def, dict):
+            continue
+
+        fields = section_def.get('fields', [])
+        if not isinstance(fields, list):
+            continue
+
+        for field in fields:
+            if not isinstance(field, dict):
+                continue
+
+            field_name = field.get('name')
+            if not field_name:
+                continue
+
+            # Check if this field requires historical aggregation
+            requires_aggregation = field.get('requires_previous_consultations')
+
+            # ALSO check table_metadata for tables classified as needing historical data
+            if not requires_aggregation and tables_info:
+                table_info = tables_info.get(field_name, {})
+                data_source_type = table_info.get('data_source_type')
+                if data_source_type in HISTORICAL_DATA_SOURCE_TYPES or table_info.get('references_previous_consultation'):
+                    requires_aggregation = True
+                    print(f"📊 Table '{field_name}' needs aggregation (data_source_type: {data_source_type})")
+
+            if requires_aggregation:
+                plan.append((f"{section_name}.{field_name}", field, field.get('aggregation_strategy', 'append')))
+
+    return plan
+
+
 async def apply_historical_aggregation(
     field_updates: dict,
     schema: dict,
@@ -6617,7 +7242,9 @@ async def apply_historical_aggregation(
     form_type: str,
     patient_id: str = None,
     current_appointment_id: str = None,
-    table_metadata: dict = None
+    table_metadata: dict = None,
+    aggregation_plan: list = None,
+    previous_forms: list = None
 ) -> dict:
     """
     Apply historical consultation aggregation to fields marked with
@@ -6631,12 +7258,24 @@ async def apply_historical_aggregation(
         patient_id: Optional patient ID to fetch previous forms if not in context
         current_appointment_id: Appointment ID to EXCLUDE from aggregation (avoid duplicates)
         table_metadata: Table classification metadata from TableClassifier (includes data_source_type)
+        aggregation_plan: Precomputed build_aggregation_plan(schema, table_metadata), e.g. from
+                          the extraction profile. Built from schema/table_metadata if None.
+        previous_forms: Previous forms already loaded by the caller (e.g. an extraction
+                        session). Takes precedence over patient_context and skips the fetch.
 
     Returns:
         Enhanced field_updates with historical data aggregated
     """
-    # Fetch previous forms if not already in context
-    previous_forms = patient_context.get('previous_forms', [])
+    if aggregation_plan is None:
+        aggregation_plan = build_aggregation_plan(schema, table_metadata)
+
+    if not aggregation_plan:
+        print(f"📋 No fields need historical aggregation")
+        return field_updates
+
+    # Fetch previous forms if not already provided or in context
+    if previous_forms is None:
+        previous_forms = patient_context.get('previous_forms', [])
 
     if not previous_forms:
         # Try to get patient_id from context if not provided
@@ -6645,7 +7284,7 @@ async def apply_historical_aggregation(
 
         if patient_id:
             print(f"📋 Fetching previous {form_type} forms for aggregation")
-            enhanced_context = fetch_patient_context(patient_id, form_type=form_type)
+            enhanced_context = await fetch_patient_context(patient_id, form_type=form_type)
             previous_forms = enhanced_context.get('previous_forms', [])
 
     if not previous_forms:
@@ -6668,70 +7307,30 @@ async def apply_historical_aggregation(
 
     aggregated_updates = {}
 
-    # Iterate through schema to find fields with requires_previous_consultations
-    for section_name, section_def in schema.items():
-        if not isinstance(section_def, dict):
-            continue
-
-        fields = section_def.get('fields', [])
-        if not isinstance(fields, list):
-            continue
-
-        for field in fields:
-            if not isinstance(field, dict):
-                continue
-
-            field_name = field.get('name')
-            if not field_name:
-                continue
-
-            # Check if this field requires historical aggregation
-            requires_aggregation = field.get('requires_previous_consultations')
-
-            # ALSO check table_metadata for tables classified as needing historical data
-            if not requires_aggregation and table_metadata:
-                # table_metadata structure: {"tables": {"field_name": {"data_source_type": "...", ...}}}
-                tables_info = table_metadata.get('tables', {}) if isinstance(table_metadata, dict) else {}
-                table_info = tables_info.get(field_name, {})
-                data_source_type = table_info.get('data_source_type')
-
-                # These data_source_types indicate historical data is needed
-                historical_types = [
-                    'visit_history', 'lab_results', 'scan_results',
-                    'medication_history', 'vitals_history', 'vaccination_records'
-                ]
-                if data_source_type in historical_types or table_info.get('references_previous_consultation'):
-                    requires_aggregation = True
-                    print(f"📊 Table '{field_name}' needs aggregation (data_source_type: {data_source_type})")
-
-            if not requires_aggregation:
-                continue
-
-            field_path = f"{section_name}.{field_name}"
-            print(f"📊 Processing aggregation for: {field_path}")
+    for field_path, field, aggregation_strategy in aggregation_plan:
+        print(f"📊 Processing aggregation for: {field_path}")
 
-            # Extract historical data
-            historical_data = extract_historical_field_data(
-                field_schema=field,
-                previous_forms=previous_forms,
-                field_path=field_path
-            )
+        # Extract historical data
+        historical_data = extract_historical_field_data(
+            field_schema=field,
+            previous_forms=previous_forms,
+            field_path=field_path
+        )
 
-            # Get current data (if any) from field_updates
-            current_data = field_updates.get(field_path)
+        # Get current data (if any) from field_updates
+        current_data = field_updates.get(field_path)
 
-            # Aggregate using specified strategy
-            aggregation_strategy = field.get('aggregation_strategy', 'append')
-            aggregated_value = aggregate_field_data(
-                current_data=current_data,
-                historical_data=historical_data,
-                aggregation_strategy=aggregation_strategy
-            )
+        # Aggregate using specified strategy
+        aggregated_value = aggregate_field_data(
+            current_data=current_data,
+            historical_data=historical_data,
+            aggregation_strategy=aggregation_strategy
+        )
 
-            # Store aggregated result
-            if aggregated_value is not None:
-                aggregated_updates[field_path] = aggregated_value
-                print(f"✅ Aggregated {field_path}: {len(aggregated_value) if isinstance(aggregated_value, list) else 'single value'}")
+        # Store aggregated result
+        if aggregated_value is not None:
+            aggregated_updates[field_path] = aggregated_value
+            print(f"✅ Aggregated {field_path}: {len(aggregated_value) if isinstance(aggregated_value, list) else 'single value'}")
 
     # Merge aggregated updates back into field_updates
     final_updates = {**field_updates, **aggregated_updates}
@@ -6786,53 +7385,36 @@ def exclude_existing_fields_smart(field_updates: dict, current_form_state: dict)
     return filtered
 
 
-# @lru_cache(maxsize=32)  # DISABLED: Need fresh data from custom_forms table
-def _get_form_schema_from_db_cached(form_type: str, full_metadata: bool = False) -> dict:
-    """
-    Internal cached function for fetching form schemas from database.
-
-    DO NOT CALL DIRECTLY - use get_form_schema_from_db() instead.
-    This function is cached and returns the same object instance.
+async def get_form_schema_from_db(form_type: str, full_metadata: bool = False) -> dict:
     """
-    try:
-        supabase = get_supabase_client()
-
-        # Query custom_forms table (unified source of truth)
-        # Match by either specialty OR form_name (form_type could be either)
-        print(f"🔍 Querying custom_forms for form_type: {form_type}")
+    Fetch form schema from database through the versioned form schema cache.
 
-        # Query ALL forms (active and draft) and filter manually
-        result = supabase.table('custom_forms')\
-            .select('form_schema, table_metadata, version, description, specialty, form_name, updated_at, status')\
-            .in_('status', ['active', 'draft'])\
-            .execute()
-
-        print(f"📦 Found {len(result.data) if result.data else 0} forms total")
-
-        # Debug: Show what forms we have
-        if result.data:
-            for i, form in enumerate(result.data):
-                print(f"   Form {i+1}: form_name='{form.get('form_name')}', specialty='{form.get('specialty')}', status='{form.get('status')}'")
+    Each call runs a cheap probe (form name/specialty/version/updated_at only,
+    skipped for FORM_SCHEMA_PROBE_SECONDS after a check) and refetches the full
+    row only when the form has changed. The custom forms endpoints invalidate
+    entries on save/update/activate/delete.
 
-        # Try exact form_name match first
-        matching_forms = [f for f in (result.data or []) if f.get('form_name') == form_type]
+    Single source of truth for all form schemas.
 
-        # Only fall back to specialty match if no exact name match found
-        if not matching_forms:
-            matching_forms = [f for f in (result.data or []) if f.get('specialty') == form_type]
+    Args:
+        form_type: The form type to fetch (e.g., 'antenatal', 'obgyn')
+        full_metadata: If True, returns full metadata (title, description, version)
+                      If False, returns only schema_definition (default for backwards compatibility)
 
-        print(f"📊 Found {len(matching_forms)} forms matching form_type '{form_type}'")
+    Returns:
+        dict: Read-only shared view of the schema definition (or a metadata dict
+              holding read-only views). Use copy.deepcopy() for a mutable copy.
+    """
+    try:
+        print(f"🔍 Loading schema for form_type: {form_type}")
+        form_data = await get_form_schema_cache().get(get_supabase_client(), form_type)
 
-        if not matching_forms:
+        if form_data is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"No active forms found for form_type: {form_type}"
             )
 
-        # Sort by updated_at DESC and take the first (most recent)
-        form_data = sorted(matching_forms, key=lambda x: x.get('updated_at', ''), reverse=True)[0]
-        print(f"✅ Using form: {form_data.get('form_name')} (specialty: {form_data.get('specialty')})")
-
         # ✅ VALIDATE SCHEMA IS NOT EMPTY
         form_schema = form_data.get('form_schema')
         if not form_schema or not isinstance(form_schema, dict):
@@ -6842,20 +7424,13 @@ def _get_form_schema_from_db_cached(form_type: str, full_metadata: bool = False)
                 detail=f"Form schema is invalid or empty for {form_type}. Please re-upload the form."
             )
 
-        schema_keys = list(form_schema.keys()) if isinstance(form_schema, dict) else []
-        if len(schema_keys) == 0:
-            print(f"⚠️  WARNING: Form {form_data.get('form_name')} has empty schema")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Form schema contains no fields for {form_type}. Please re-upload the form."
-            )
-
-        print(f"📊 Schema loaded with {len(schema_keys)} sections/fields")
+        print(f"✅ Using form: {form_data.get('form_name')} v{form_data.get('version')} "
+              f"(specialty: {form_data.get('specialty')}, {len(form_schema)} sections/fields)")
 
         if full_metadata:
             # Return all metadata for frontend
             return {
-                'schema': form_data['form_schema'],
+                'schema': form_schema,
                 'table_metadata': form_data.get('table_metadata', {}),  # Table classification data
                 'name': form_data.get('form_name', ''),  # Form name for display
                 'title': form_data.get('description', ''),
@@ -6866,7 +7441,7 @@ def _get_form_schema_from_db_cached(form_type: str, full_metadata: bool = False)
             }
         else:
             # Return only schema definition (for extraction)
-            return form_data['form_schema']
+            return form_schema
 
     except Exception as e:
         print(f"❌ Error fetching schema for {form_type}: {e}")
@@ -6876,32 +7451,6 @@ def _get_form_schema_from_db_cached(form_type: str, full_metadata: bool = False)
         )
 
 
-def get_form_schema_from_db(form_type: str, full_metadata: bool = False) -> dict:
-    """
-    Fetch form schema from database with LRU caching.
-
-    Schemas are cached in memory (max 32 entries) and automatically evicted
-    when the cache is full. Returns a deep copy to prevent cache pollution.
-
-    Single source of truth for all form schemas.
-
-    Args:
-        form_type: The form type to fetch (e.g., 'antenatal', 'obgyn')
-        full_metadata: If True, returns full metadata (title, description, version)
-                      If False, returns only schema_definition (default for backwards compatibility)
-
-    Returns:
-        dict: Deep copy of schema definition or full metadata depending on full_metadata flag
-
-    Cache Info:
-        - Cache size: 32 entries max
-        - Cache lifetime: Until backend restart
-        - Invalidation: Automatic on backend restart or manual via _get_form_schema_from_db_cached.cache_clear()
-    """
-    # Return deep copy to prevent callers from mutating the cached object
-    return copy.deepcopy(_get_form_schema_from_db_cached(form_type, full_metadata))
-
-
 def flatten_schema_for_extraction(schema: dict) -> tuple[dict, dict]:
     """
     Flatten nested schema into simple fields for LLM extraction.
@@ -7044,6 +7593,25 @@ def map_flat_fields_to_nested(flat_updates: dict, field_mapping: dict) -> dict:
     return nested_updates
 
 
+def _build_extraction_profile_parts(schema: dict, table_metadata: dict) -> dict:
+    """Derive the per-form-version extraction inputs (see servers.utils.extraction_profiles)."""
+    flattened_schema, field_mapping = flatten_schema_for_extraction(schema)
+    return {
+        "flattened_schema": flattened_schema,
+        "field_mapping": field_mapping,
+        "schema_hints": build_extraction_prompt_hints_from_flattened_schema(flattened_schema),
+        "aggregation_plan": build_aggregation_plan(schema, table_metadata),
+    }
+
+
+def get_extraction_profile(schema_data: dict) -> ExtractionProfile:
+    """
+    Get the cached extraction profile for a schema returned by
+    get_form_schema_from_db(full_metadata=True).
+    """
+    return get_extraction_profile_cache().get(schema_data, _build_extraction_profile_parts)
+
+
 def build_extraction_prompt_hints_from_schema(schema: dict) -> str:
     """
     Build extraction hints from schema definition.
@@ -7263,8 +7831,7 @@ async def submit_ai_feedback(request: FeedbackSubmitRequest):
         if not supabase_url or not supabase_key:
             raise HTTPException(status_code=500, detail="Supabase configuration missing")
 
-        from supabase import create_client
-        supabase = create_client(supabase_url, supabase_key)
+        supabase = get_db(supabase_url, supabase_key)
 
         # Validate feedback_type
         valid_types = ['transcription', 'summary', 'diagnosis', 'drug_recommendation']
@@ -7291,7 +7858,7 @@ async def submit_ai_feedback(request: FeedbackSubmitRequest):
         fingerprint = request.generate_fingerprint()
 
         # Check for existing feedback with same fingerprint
-        existing = supabase.table('ai_feedback').select('id').eq('fingerprint', fingerprint).execute()
+        existing = await supabase.table('ai_feedback').select('id').eq('fingerprint', fingerprint).execute()
 
         if existing.data and len(existing.data) > 0:
             # Update existing feedback instead of creating duplicate
@@ -7306,7 +7873,7 @@ async def submit_ai_feedback(request: FeedbackSubmitRequest):
                 'updated_at': datetime.utcnow().isoformat()
             }
 
-            result = supabase.table('ai_feedback').update(update_data).eq('id', feedback_id).execute()
+            result = await supabase.table('ai_feedback').update(update_data).eq('id', feedback_id).execute()
 
             return FeedbackResponse(
                 id=feedback_id,
@@ -7336,7 +7903,7 @@ async def submit_ai_feedback(request: FeedbackSubmitRequest):
             'fingerprint': fingerprint
         }
 
-        result = supabase.table('ai_feedback').insert(insert_data).execute()
+        result = await supabase.table('ai_feedback').insert(insert_data).execute()
 
         if not result.data or len(result.data) == 0:
             raise HTTPException(status_code=500, detail="Failed to insert feedback")
@@ -7376,10 +7943,9 @@ async def get_consultation_feedback(consultation_id: str):
         if not supabase_url or not supabase_key:
             raise HTTPException(status_code=500, detail="Supabase configuration missing")
 
-        from supabase import create_client
-        supabase = create_client(supabase_url, supabase_key)
+        supabase = get_db(supabase_url, supabase_key)
 
-        result = supabase.table('ai_feedback')\
+        result = await supabase.table('ai_feedback')\
             .select('*')\
             .eq('consultation_id', consultation_id)\
             .order('created_at', desc=True)\
@@ -7414,9 +7980,8 @@ async def get_feedback_stats(days: int = 30, feedback_type: Optional[str] = None
         if not supabase_url or not supabase_key:
             raise HTTPException(status_code=500, detail="Supabase configuration missing")
 
-        from supabase import create_client
         from datetime import datetime, timedelta
-        supabase = create_client(supabase_url, supabase_key)
+        supabase = get_db(supabase_url, supabase_key)
 
         # Calculate date threshold
         date_threshold = (datetime.utcnow() - timedelta(days=days)).isoformat()
@@ -7427,7 +7992,7 @@ async def get_feedback_stats(days: int = 30, feedback_type: Optional[str] = None
         if feedback_type:
             query = query.eq('feedback_type', feedback_type)
 
-        result = query.execute()
+        result = await query.execute()
         feedback_data = result.data if result.data else []
 
         # Aggregate statistics
@@ -7551,7 +8116,7 @@ async def get_form_schema(form_type: str):
         print(f"📊 Fetching schema for form_type: {form_type}")
 
         # Fetch from database with full metadata for frontend
-        schema_data = get_form_schema_from_db(form_type, full_metadata=True)
+        schema_data = await get_form_schema_from_db(form_type, full_metadata=True)
 
         return {
             **schema_data,
@@ -7577,7 +8142,7 @@ async def list_form_schemas():
     try:
         supabase = get_supabase_client()
 
-        result = supabase.table('custom_forms')\
+        result = await supabase.table('custom_forms')\
             .select('id, form_name, specialty, version, description, status, updated_at, is_public')\
             .eq('status', 'active')\
             .execute()
@@ -7610,19 +8175,60 @@ async def get_cache_stats():
 
     Returns hit/miss ratios and cache size information.
     """
-    cache_info = _get_form_schema_from_db_cached.cache_info()
-    total_requests = cache_info.hits + cache_info.misses
-    hit_rate = cache_info.hits / total_requests if total_requests > 0 else 0
+    from mcp_servers.field_validator import get_validator_stats
+
+    stats = get_form_schema_cache().get_stats()
 
     return {
         "schema_cache": {
-            "hits": cache_info.hits,
-            "misses": cache_info.misses,
-            "maxsize": cache_info.maxsize,
-            "currsize": cache_info.currsize,
-            "hit_rate": round(hit_rate * 100, 2),
-            "hit_rate_percentage": f"{round(hit_rate * 100, 2)}%"
-        }
+            **stats,
+            "hit_rate": round(stats["hit_rate"] * 100, 2),
+            "hit_rate_percentage": f"{round(stats['hit_rate'] * 100, 2)}%"
+        },
+        "field_validators": get_validator_stats()
+    }
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """
+    Get connection pool and latency metrics for shared backend clients.
+
+    - supabase: PostgREST/Storage requests, latency, connection reuse and HTTP version
+    - llm: Claude calls, in-flight peak, errors and token usage
+    - mcp_pool: warm MCP sessions per region, checkouts, waits and evictions
+    - bnf_cache: local BNF monograph cache entries, hit rate and background refreshes
+    - bnf_snapshot: offline BNF snapshot coverage (when BNF_DATA_MODE is snapshot/hybrid)
+    - extraction_profiles: cached per-form extraction profiles, build time and reuse counts
+    - extraction_sessions: open real-time extraction sessions, resumes from disk and expiries
+    - sarvam_jobs: outstanding Sarvam batch jobs, polls and completion times
+    - audio_transcoder: ffmpeg pool usage, queueing and transcode latency
+    - elevenlabs: speech-to-text requests, retries, rate limiting and connection reuse
+    - job_queue: durable background jobs by status, running per provider, retries
+    - speaker_stitching: recordings being stitched across chunks, out-of-order chunks
+    - speaker_roles: role identification memo hits vs LLM calls, and sample size sent
+    - pdf_browser_pool: leased Chromium pages, queued/rejected renders, relaunches and recycles
+    - pdf_cache: rendered PDFs on disk, hits, 304s, evictions and invalidations
+    """
+    from servers.drug_lookup.bnf_server import cache as bnf_cache, get_snapshot, BNF_DATA_MODE, LIVE
+
+    return {
+        "supabase": get_db_stats() or {"requests": 0, "status": "not_initialized"},
+        "llm": get_llm_gateway().get_stats(),
+        "mcp_pool": mcp_pool.get_stats() if mcp_pool else None,
+        "bnf_cache": bnf_cache.get_stats(),
+        "bnf_snapshot": get_snapshot().get_stats() if BNF_DATA_MODE != LIVE else {"mode": BNF_DATA_MODE},
+        "extraction_profiles": get_extraction_profile_stats() or {"profiles": 0, "status": "not_initialized"},
+        "extraction_sessions": get_extraction_session_store().get_stats(),
+        "sarvam_jobs": get_sarvam_job_stats() or {"submitted": 0, "status": "not_initialized"},
+        "audio_transcoder": get_audio_transcoder_stats() or {"transcodes": 0, "status": "not_initialized"},
+        "elevenlabs": get_elevenlabs_stt_stats() or {"requests": 0, "status": "not_initialized"},
+        "job_queue": get_job_queue_stats() or {"enqueued": 0, "status": "not_initialized"},
+        "speaker_stitching": get_speaker_stitch_store().get_stats(),
+        "speaker_roles": get_speaker_role_identifier().get_stats(),
+        "pdf_browser_pool": get_browser_pool_stats() or {"renders": 0, "status": "not_initialized"},
+        "pdf_cache": get_pdf_cache_stats() or {"entries": 0, "status": "not_initialized"},
+        "timestamp": time.time()
     }
 
 
@@ -7638,7 +8244,7 @@ async def get_consultation_form(appointment_id: str, form_type: str):
     try:
         supabase = get_supabase_client()
 
-        result = supabase.table('consultation_forms')\
+        result = await supabase.table('consultation_forms')\
             .select('*')\
             .eq('appointment_id', appointment_id)\
             .eq('form_type', form_type)\
@@ -7680,9 +8286,15 @@ async def create_consultation_form(form_data: dict):
     try:
         supabase = get_supabase_client()
 
-        result = supabase.table('consultation_forms').insert(form_data).execute()
+        result = await supabase.table('consultation_forms').insert(form_data).execute()
+
+        # The appointment's PDF is rendered from its newest form
+        form = result.data[0]
+        invalidate_pdfs(f"appointment:{form.get('appointment_id')}")
+        if form.get('status') == 'completed':
+            _schedule_pdf_prerender(form.get('appointment_id'))
 
-        return {"form": result.data[0]}
+        return {"form": form}
 
     except Exception as e:
         print(f"❌ Error creating form: {str(e)}")
@@ -7702,12 +8314,17 @@ async def update_consultation_form(form_id: str, form_data: dict):
         # Add updated_at timestamp
         form_data['updated_at'] = datetime.now(timezone.utc).isoformat()
 
-        result = supabase.table('consultation_forms')\
+        result = await supabase.table('consultation_forms')\
             .update(form_data)\
             .eq('id', form_id)\
             .execute()
 
-        return {"form": result.data[0]}
+        form = result.data[0]
+        invalidate_pdfs(f"appointment:{form.get('appointment_id')}")
+        if form.get('status') == 'completed':
+            _schedule_pdf_prerender(form.get('appointment_id'))
+
+        return {"form": form}
 
     except Exception as e:
         print(f"❌ Error updating form: {str(e)}")
@@ -7730,7 +8347,7 @@ async def get_clinic_color_scheme(doctor_id: str):
     try:
         supabase = get_supabase_client()
 
-        result = supabase.table("clinic_color_schemes")\
+        result = await supabase.table("clinic_color_schemes")\
             .select("*")\
             .eq("doctor_id", doctor_id)\
             .single()\
@@ -7790,10 +8407,13 @@ async def create_or_update_clinic_color_scheme(
         }
 
         # Try to update existing, or insert if not exists
-        result = supabase.table("clinic_color_schemes")\
+        result = await supabase.table("clinic_color_schemes")\
             .upsert(color_scheme_data, on_conflict="doctor_id")\
             .execute()
 
+        # PDFs rendered with the previous colours are superseded
+        invalidate_pdfs(f"doctor:{doctor_id}", f"clinic:{doctor_id}")
+
         print(f"✅ Color scheme saved for clinic: {doctor_id}")
         return {"color_scheme": result.data[0], "message": "Color scheme saved successfully"}
 
@@ -7816,11 +8436,13 @@ async def delete_clinic_color_scheme(doctor_id: str):
     try:
         supabase = get_supabase_client()
 
-        result = supabase.table("clinic_color_schemes")\
+        result = await supabase.table("clinic_color_schemes")\
             .delete()\
             .eq("doctor_id", doctor_id)\
             .execute()
 
+        invalidate_pdfs(f"doctor:{doctor_id}", f"clinic:{doctor_id}")
+
         print(f"✅ Color scheme deleted for clinic: {doctor_id}")
         return {"message": "Color scheme deleted, will use Aneya defaults"}
 
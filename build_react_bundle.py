@@ -2,7 +2,8 @@
 Build React PDF Templates Bundle
 
 Compiles React PDF template components into a standalone JavaScript bundle
-for embedding in headless browser PDF generation.
+for embedding in headless browser PDF generation, plus the precompiled
+Tailwind CSS those bundles use (so PDF pages need no CDN at render time).
 """
 
 import subprocess
@@ -139,6 +140,64 @@ def build_doctor_report_card_bundle():
     return True
 
 
+def build_pdf_css():
+    """
+    Precompile purged Tailwind CSS for the PDF bundles.
+
+    The PDF pages used to load Tailwind from its CDN at render time. This
+    compiles only the classes used by the PDF components (using the frontend's
+    tailwind.config) so the backend can inline the CSS and render offline:
+    - static/pdf-templates.css: utilities for src/components/pdf-templates
+    - static/doctor-report-card.css: src/index.css for src/components/doctor-report-card
+    - static/pdf-print.css: copied from src/styles/pdf-print.css
+    """
+    backend_dir = Path(__file__).parent
+    frontend_dir = backend_dir.parent / "aneya-frontend"
+
+    if not frontend_dir.exists():
+        print(f"❌ Frontend directory not found at: {frontend_dir}")
+        return False
+
+    os.chdir(frontend_dir)
+    backend_static_dir = backend_dir / "static"
+    backend_static_dir.mkdir(exist_ok=True)
+    (frontend_dir / "dist").mkdir(exist_ok=True)
+
+    templates_input = frontend_dir / "dist" / "pdf-templates-input.css"
+    templates_input.write_text("@tailwind base;\n@tailwind components;\n@tailwind utilities;\n")
+
+    builds = [
+        (templates_input, "src/components/pdf-templates/**/*.{ts,tsx}", "pdf-templates.css"),
+        (frontend_dir / "src" / "index.css", "src/components/doctor-report-card/**/*.{ts,tsx}", "doctor-report-card.css"),
+    ]
+
+    print("🔨 Building PDF CSS...")
+    for input_css, content, output_name in builds:
+        output = backend_static_dir / output_name
+        try:
+            result = subprocess.run([
+                "npx", "tailwindcss",
+                "-i", str(input_css),
+                "-o", str(output),
+                "--content", content,
+                "--minify"
+            ], check=True, capture_output=True, text=True)
+            if result.stderr:
+                print(result.stderr.strip())
+        except subprocess.CalledProcessError as e:
+            print(f"❌ CSS build failed for {output_name}: {e}")
+            print(f"   stderr: {e.stderr}")
+            return False
+        print(f"✅ {output_name} created: {output.stat().st_size / 1024:.2f} KB")
+
+    pdf_print_source = frontend_dir / "src" / "styles" / "pdf-print.css"
+    if pdf_print_source.exists():
+        shutil.copy2(pdf_print_source, backend_static_dir / "pdf-print.css")
+        print("✅ pdf-print.css copied")
+
+    return True
+
+
 def verify_bundle():
     """
     Verify the bundle was created correctly.
@@ -194,13 +253,24 @@ if __name__ == '__main__':
         success = build_doctor_report_card_bundle()
         print()
 
+        if not success:
+            print("=" * 60)
+            print("❌ DoctorReportCard build failed")
+            print("=" * 60)
+            sys.exit(1)
+
+        # Precompile the Tailwind CSS inlined into PDF pages (no CDN at render time)
+        print("3. Building PDF CSS...")
+        success = build_pdf_css()
+        print()
+
         if success:
             print("=" * 60)
             print("✅ All bundles built successfully!")
             print("=" * 60)
         else:
             print("=" * 60)
-            print("❌ DoctorReportCard build failed")
+            print("❌ PDF CSS build failed")
             print("=" * 60)
             sys.exit(1)
 
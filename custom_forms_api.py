@@ -15,6 +15,9 @@ import requests
 from reportlab.lib.colors import HexColor
 
 from tools.form_converter.api import FormConverterAPI
+from servers.utils.supabase_db import get_db
+from servers.utils.form_schema_cache import get_form_schema_cache
+from servers.utils.pdf_cache import cached_pdf_response, pdf_cache_key
 
 # Aneya brand colors for professional PDF styling
 ANEYA_NAVY = HexColor('#0c3555')
@@ -28,16 +31,14 @@ router = APIRouter(prefix="/api/custom-forms", tags=["custom-forms"])
 
 # Helper function to get Supabase client
 def get_supabase_client():
-    """Get Supabase client for database operations"""
-    from supabase import create_client, Client
-
+    """Get the shared pooled Supabase client for database operations"""
     supabase_url = os.getenv("SUPABASE_URL")
     supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
 
     if not supabase_url or not supabase_key:
         raise HTTPException(status_code=500, detail="Supabase configuration not available")
 
-    return create_client(supabase_url, supabase_key)
+    return get_db(supabase_url, supabase_key)
 
 
 # ============================================
@@ -415,13 +416,16 @@ async def save_custom_form(
             "table_metadata": table_metadata  # NEW: Store table classifications
         }
 
-        response = supabase.table("custom_forms").insert(form_data).execute()
+        response = await supabase.table("custom_forms").insert(form_data).execute()
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to save form to database")
 
         form_record = response.data[0]
 
+        # A new form can take over its name/specialty from a cached one
+        get_form_schema_cache().invalidate(form_record['form_name'], form_record['specialty'])
+
         # DISABLED: Logo update temporarily disabled - can be fixed later
         # Update doctor's profile with extracted logo if available
         # logo_info = request.metadata.get('logo_info', {}) if request.metadata else {}
@@ -580,6 +584,8 @@ async def preview_pdf(request: PreviewPDFRequest):
             }
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error generating PDF preview: {str(e)}")
         import traceback
@@ -611,7 +617,7 @@ async def preview_saved_form_pdf(
         # Fetch form from database
         supabase = get_supabase_client()
 
-        response = supabase.table("custom_forms").select("*").eq("id", form_id).execute()
+        response = await supabase.table("custom_forms").select("*").eq("id", form_id).execute()
 
         if not response.data or len(response.data) == 0:
             raise HTTPException(status_code=404, detail="Form not found")
@@ -623,12 +629,12 @@ async def preview_saved_form_pdf(
 
         if not has_permission:
             # Get doctor's UUID from Firebase user_id
-            doctor_result = supabase.table("doctors").select("id").eq("user_id", user_id).single().execute()
+            doctor_result = await supabase.table("doctors").select("id").eq("user_id", user_id).single().execute()
 
             if doctor_result.data:
                 doctor_id = doctor_result.data.get('id')
                 # Check if user has adopted this form
-                adoption_check = supabase.table("doctor_adopted_forms").select("id").eq(
+                adoption_check = await supabase.table("doctor_adopted_forms").select("id").eq(
                     "doctor_id", doctor_id
                 ).eq("form_id", form_id).execute()
 
@@ -695,23 +701,23 @@ async def browse_forms_to_add(
         if specialty:
             query = query.eq("specialty", specialty)
 
-        all_public = query.execute()
+        all_public = await query.execute()
         all_public_forms = all_public.data or []
 
         # Get doctor's UUID
-        doctor_result = supabase.table("doctors").select("id").eq("user_id", user_id).single().execute()
+        doctor_result = await supabase.table("doctors").select("id").eq("user_id", user_id).single().execute()
         if not doctor_result.data:
             raise HTTPException(status_code=404, detail="Doctor profile not found")
 
         doctor_id = doctor_result.data.get('id')
 
         # Get forms already in doctor's library (owned + adopted)
-        owned = supabase.table("custom_forms")\
+        owned = await supabase.table("custom_forms")\
             .select("id")\
             .eq("created_by", user_id)\
             .execute()
 
-        adopted = supabase.table("doctor_adopted_forms")\
+        adopted = await supabase.table("doctor_adopted_forms")\
             .select("form_id")\
             .eq("doctor_id", doctor_id)\
             .execute()
@@ -772,7 +778,7 @@ async def get_custom_form(
         supabase = get_supabase_client()
 
         # Fetch form
-        response = supabase.table("custom_forms").select("*").eq("id", form_id).execute()
+        response = await supabase.table("custom_forms").select("*").eq("id", form_id).execute()
 
         if not response.data or len(response.data) == 0:
             raise HTTPException(status_code=404, detail="Form not found")
@@ -829,7 +835,7 @@ async def delete_custom_form(
         supabase = get_supabase_client()
 
         # Check if form exists and user owns it
-        form_response = supabase.table("custom_forms").select("*").eq("id", form_id).execute()
+        form_response = await supabase.table("custom_forms").select("*").eq("id", form_id).execute()
 
         if not form_response.data or len(form_response.data) == 0:
             raise HTTPException(status_code=404, detail="Form not found")
@@ -840,7 +846,8 @@ async def delete_custom_form(
             raise HTTPException(status_code=403, detail="You don't have permission to delete this form")
 
         # Delete the form
-        supabase.table("custom_forms").delete().eq("id", form_id).execute()
+        await supabase.table("custom_forms").delete().eq("id", form_id).execute()
+        get_form_schema_cache().invalidate(form['form_name'], form['specialty'])
 
         return {"success": True, "message": "Form deleted successfully"}
 
@@ -876,7 +883,7 @@ async def update_custom_form(
         supabase = get_supabase_client()
 
         # Check if form exists and user owns it
-        form_response = supabase.table("custom_forms").select("*").eq("id", form_id).execute()
+        form_response = await supabase.table("custom_forms").select("*").eq("id", form_id).execute()
 
         if not form_response.data or len(form_response.data) == 0:
             raise HTTPException(status_code=404, detail="Form not found")
@@ -913,13 +920,18 @@ async def update_custom_form(
             "is_public": request.is_public
         }
 
-        response = supabase.table("custom_forms").update(update_data).eq("id", form_id).execute()
+        response = await supabase.table("custom_forms").update(update_data).eq("id", form_id).execute()
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to update form")
 
         updated_form = response.data[0]
 
+        # Drop cached schemas under both the old and the new name/specialty
+        get_form_schema_cache().invalidate(
+            form['form_name'], form['specialty'], updated_form['form_name'], updated_form['specialty']
+        )
+
         return CustomFormResponse(
             id=updated_form['id'],
             form_name=updated_form['form_name'],
@@ -966,7 +978,7 @@ async def share_custom_form(
         supabase = get_supabase_client()
 
         # Check if form exists and user owns it
-        form_response = supabase.table("custom_forms").select("*").eq("id", form_id).execute()
+        form_response = await supabase.table("custom_forms").select("*").eq("id", form_id).execute()
 
         if not form_response.data or len(form_response.data) == 0:
             raise HTTPException(status_code=404, detail="Form not found")
@@ -977,7 +989,7 @@ async def share_custom_form(
             raise HTTPException(status_code=403, detail="You don't have permission to share this form")
 
         # Update is_public to true
-        response = supabase.table("custom_forms").update({"is_public": True}).eq("id", form_id).execute()
+        response = await supabase.table("custom_forms").update({"is_public": True}).eq("id", form_id).execute()
 
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to update form")
@@ -1034,7 +1046,7 @@ async def get_my_forms_library(
         supabase = get_supabase_client()
 
         # Get doctor's UUID and specialty for auto-adoption
-        doctor_result = supabase.table("doctors").select("id, specialty").eq("user_id", user_id).single().execute()
+        doctor_result = await supabase.table("doctors").select("id, specialty").eq("user_id", user_id).single().execute()
         if not doctor_result.data:
             raise HTTPException(status_code=404, detail="Doctor profile not found")
 
@@ -1044,7 +1056,7 @@ async def get_my_forms_library(
         # Auto-adopt public forms in doctor's specialty (idempotent - won't duplicate)
         if doctor_specialty:
             try:
-                result = supabase.rpc('auto_adopt_forms_for_doctor', {
+                result = await supabase.rpc('auto_adopt_forms_for_doctor', {
                     'p_firebase_user_id': user_id,
                     'p_specialty': doctor_specialty
                 }).execute()
@@ -1063,7 +1075,7 @@ async def get_my_forms_library(
         if status:
             owned_query = owned_query.eq("status", status)
 
-        owned_forms_response = owned_query.order("created_at", desc=True).execute()
+        owned_forms_response = await owned_query.order("created_at", desc=True).execute()
         owned_forms = owned_forms_response.data or []
 
         # Add ownership metadata to owned forms
@@ -1076,7 +1088,7 @@ async def get_my_forms_library(
             .select("form_id, adopted_at, auto_adopted, custom_forms(*)")\
             .eq("doctor_id", doctor_id)
 
-        adopted_result = adopted_query.execute()
+        adopted_result = await adopted_query.execute()
 
         # Flatten adopted forms and add ownership metadata
         adopted_forms = []
@@ -1133,7 +1145,7 @@ async def get_public_custom_forms(specialty: Optional[str] = None):
         if specialty:
             query = query.eq("specialty", specialty)
 
-        response = query.order("created_at", desc=True).execute()
+        response = await query.order("created_at", desc=True).execute()
 
         return [
             CustomFormResponse(
@@ -1180,14 +1192,14 @@ async def adopt_form_to_library(
         supabase = get_supabase_client()
 
         # Get doctor's UUID
-        doctor_result = supabase.table("doctors").select("id").eq("user_id", user_id).single().execute()
+        doctor_result = await supabase.table("doctors").select("id").eq("user_id", user_id).single().execute()
         if not doctor_result.data:
             raise HTTPException(status_code=404, detail="Doctor profile not found")
 
         doctor_id = doctor_result.data.get('id')
 
         # Verify form exists and is public
-        form_result = supabase.table("custom_forms")\
+        form_result = await supabase.table("custom_forms")\
             .select("id, form_name, is_public, created_by, status")\
             .eq("id", form_id)\
             .single()\
@@ -1208,7 +1220,7 @@ async def adopt_form_to_library(
             raise HTTPException(status_code=400, detail="Can only adopt active forms")
 
         # Check if already adopted
-        existing = supabase.table("doctor_adopted_forms")\
+        existing = await supabase.table("doctor_adopted_forms")\
             .select("id")\
             .eq("doctor_id", doctor_id)\
             .eq("form_id", form_id)\
@@ -1223,7 +1235,7 @@ async def adopt_form_to_library(
             }
 
         # Adopt the form
-        supabase.table("doctor_adopted_forms").insert({
+        await supabase.table("doctor_adopted_forms").insert({
             "doctor_id": doctor_id,
             "form_id": form_id,
             "auto_adopted": False
@@ -1270,14 +1282,14 @@ async def remove_form_from_library(
         supabase = get_supabase_client()
 
         # Get doctor's UUID
-        doctor_result = supabase.table("doctors").select("id").eq("user_id", user_id).single().execute()
+        doctor_result = await supabase.table("doctors").select("id").eq("user_id", user_id).single().execute()
         if not doctor_result.data:
             raise HTTPException(status_code=404, detail="Doctor profile not found")
 
         doctor_id = doctor_result.data.get('id')
 
         # Check if this is an owned form
-        owned_result = supabase.table("custom_forms")\
+        owned_result = await supabase.table("custom_forms")\
             .select("id, form_name")\
             .eq("id", form_id)\
             .eq("created_by", user_id)\
@@ -1290,7 +1302,7 @@ async def remove_form_from_library(
             )
 
         # Remove adoption record
-        delete_result = supabase.table("doctor_adopted_forms")\
+        delete_result = await supabase.table("doctor_adopted_forms")\
             .delete()\
             .eq("doctor_id", doctor_id)\
             .eq("form_id", form_id)\
@@ -1304,7 +1316,7 @@ async def remove_form_from_library(
 
         # Record dismissal so auto-adopt won't re-add this form
         try:
-            supabase.table("doctor_dismissed_forms").upsert({
+            await supabase.table("doctor_dismissed_forms").upsert({
                 "doctor_id": doctor_id,
                 "form_id": form_id
             }).execute()
@@ -1341,7 +1353,7 @@ async def activate_custom_form(form_id: str):
         supabase = get_supabase_client()
 
         # Verify ownership
-        form_response = supabase.table("custom_forms").select("*").eq("id", form_id).execute()
+        form_response = await supabase.table("custom_forms").select("*").eq("id", form_id).execute()
 
         if not form_response.data:
             raise HTTPException(status_code=404, detail="Form not found")
@@ -1352,7 +1364,8 @@ async def activate_custom_form(form_id: str):
             raise HTTPException(status_code=403, detail="Access denied")
 
         # Update status to active
-        response = supabase.table("custom_forms").update({"status": "active"}).eq("id", form_id).execute()
+        response = await supabase.table("custom_forms").update({"status": "active"}).eq("id", form_id).execute()
+        get_form_schema_cache().invalidate(form['form_name'], form['specialty'])
 
         return {"message": "Form activated successfully", "form_id": form_id}
 
@@ -1372,7 +1385,7 @@ async def delete_custom_form(form_id: str):
         supabase = get_supabase_client()
 
         # Verify ownership and draft status
-        form_response = supabase.table("custom_forms").select("*").eq("id", form_id).execute()
+        form_response = await supabase.table("custom_forms").select("*").eq("id", form_id).execute()
 
         if not form_response.data:
             raise HTTPException(status_code=404, detail="Form not found")
@@ -1386,7 +1399,8 @@ async def delete_custom_form(form_id: str):
             raise HTTPException(status_code=400, detail="Only draft forms can be deleted")
 
         # Delete form
-        supabase.table("custom_forms").delete().eq("id", form_id).execute()
+        await supabase.table("custom_forms").delete().eq("id", form_id).execute()
+        get_form_schema_cache().invalidate(form['form_name'], form['specialty'])
 
         return {"message": "Form deleted successfully"}
 
@@ -1421,7 +1435,7 @@ async def get_default_forms_for_specialty(specialty: str):
 
         # Query database for form schemas by specialty
         supabase = get_supabase_client()
-        result = supabase.table('custom_forms')\
+        result = await supabase.table('custom_forms')\
             .select('form_name, specialty, description, form_schema, version')\
             .eq('specialty', backend_specialty)\
             .eq('status', 'active')\
@@ -1470,27 +1484,29 @@ async def get_default_forms_for_specialty(specialty: str):
 
 
 @router.get("/filled-forms/{filled_form_id}/pdf")
-async def download_filled_form_pdf(filled_form_id: str):
+async def download_filled_form_pdf(filled_form_id: str, if_none_match: Optional[str] = Header(None)):
     """
     Generate and download PDF for a filled custom form using headless React renderer.
 
+    Served from the rendered-PDF cache, with ETag / If-None-Match (304) support.
+
     Args:
         filled_form_id: ID of the filled form record
 
     Returns:
-        StreamingResponse with PDF file
+        PDF file response (ETag, X-PDF-Cache: hit|miss), or 304 Not Modified
     """
     try:
         user_id = get_current_user_id()
 
         # Import headless PDF generator
-        from pdf_generator_headless import generate_custom_form_pdf_headless
+        from pdf_generator_headless import generate_custom_form_pdf_headless, get_pdf_assets
 
         # Connect to Supabase
         supabase = get_supabase_client()
 
         # Fetch filled form
-        filled_form_response = supabase.table("filled_forms")\
+        filled_form_response = await supabase.table("filled_forms")\
             .select("*, custom_forms!inner(*)")\
             .eq("id", filled_form_id)\
             .execute()
@@ -1519,7 +1535,7 @@ async def download_filled_form_pdf(filled_form_id: str):
         patient_info = None
         patient_id = filled_form.get('patient_id')
         if patient_id:
-            patient_response = supabase.table("patients")\
+            patient_response = await supabase.table("patients")\
                 .select("*")\
                 .eq("id", patient_id)\
                 .execute()
@@ -1535,13 +1551,15 @@ async def download_filled_form_pdf(filled_form_id: str):
 
         # Fetch doctor info for branding
         clinic_branding = None
-        doctor_response = supabase.table("doctors")\
-            .select("clinic_name, clinic_logo_url, primary_color, accent_color")\
+        doctor_response = await supabase.table("doctors")\
+            .select("id, clinic_name, clinic_logo_url, primary_color, accent_color")\
             .eq("user_id", user_id)\
             .execute()
 
+        doctor_id = None
         if doctor_response.data:
             doctor_info = doctor_response.data[0]
+            doctor_id = doctor_info.get('id')
             clinic_branding = {
                 "clinic_name": doctor_info.get('clinic_name', 'Healthcare Medical Center'),
                 "logo_url": doctor_info.get('clinic_logo_url'),
@@ -1550,32 +1568,41 @@ async def download_filled_form_pdf(filled_form_id: str):
                 "background_color": "#f6f5ee"
             }
 
-        # Generate PDF using headless renderer
-        print(f"📄 Generating PDF for filled form: {filled_form_id}")
-        pdf_buffer = await generate_custom_form_pdf_headless(
-            form_schema=form_schema,
-            form_data=form_data,
-            form_name=custom_form['form_name'],
-            patient_info=patient_info,
-            clinic_branding=clinic_branding
-        )
+        # Stamp the form with when it was filled, not when it was rendered, so a
+        # cached PDF never carries a stale render time
+        filled_at = filled_form.get('updated_at') or filled_form.get('created_at')
+        form_date = datetime.fromisoformat(filled_at.replace('Z', '+00:00')).astimezone() if filled_at else None
+
+        # Generate PDF using headless renderer (unless this exact PDF is cached)
+        async def render() -> bytes:
+            print(f"📄 Generating PDF for filled form: {filled_form_id}")
+            pdf_buffer = await generate_custom_form_pdf_headless(
+                form_schema=form_schema,
+                form_data=form_data,
+                form_name=custom_form['form_name'],
+                patient_info=patient_info,
+                clinic_branding=clinic_branding,
+                form_date=form_date
+            )
+            return pdf_buffer.getvalue()
+
+        key = pdf_cache_key("filled_form", {
+            "form_schema": form_schema,
+            "schema_version": custom_form.get('version'),
+            "form_data": form_data,
+            "form_name": custom_form['form_name'],
+            "patient_info": patient_info,
+            "clinic_branding": clinic_branding,
+            "filled_at": filled_at,
+        }, get_pdf_assets().version)
 
         # Create filename
         form_name_safe = custom_form['form_name'].replace(' ', '_').replace('/', '_')
         patient_name = patient_info['name'].replace(' ', '_').replace('/', '_') if patient_info else 'patient'
         filename = f"{form_name_safe}_{patient_name}_{filled_form_id[:8]}.pdf"
 
-        print(f"✅ PDF generated successfully: {filename}")
-
-        # Return as streaming response
-        from fastapi.responses import StreamingResponse
-        return StreamingResponse(
-            pdf_buffer,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
-        )
+        tags = [f"filled_form:{filled_form_id}", f"custom_form:{custom_form.get('id')}", f"doctor:{doctor_id}"]
+        return await cached_pdf_response(key, render, filename, tags, if_none_match)
 
     except HTTPException:
         raise
@@ -1618,7 +1645,7 @@ async def select_form_for_consultation(
         print(f"👤 Patient context: {patient_context[:100]}...")
 
         # Get doctor's UUID
-        doctor_result = supabase.table("doctors").select("id").eq("user_id", user_id).single().execute()
+        doctor_result = await supabase.table("doctors").select("id").eq("user_id", user_id).single().execute()
         if not doctor_result.data:
             raise HTTPException(status_code=404, detail="Doctor profile not found")
 
@@ -1634,7 +1661,7 @@ async def select_form_for_consultation(
             .eq("specialty", specialty)\
             .eq("status", "active")
 
-        owned_forms_response = owned_forms_query.execute()
+        owned_forms_response = await owned_forms_query.execute()
         owned_forms = owned_forms_response.data or []
 
         # Get adopted forms with join to custom_forms
@@ -1642,7 +1669,7 @@ async def select_form_for_consultation(
             .select("form_id, custom_forms(*)")\
             .eq("doctor_id", doctor_id)
 
-        adopted_result = adopted_forms_query.execute()
+        adopted_result = await adopted_forms_query.execute()
 
         # Flatten adopted forms and filter by specialty
         adopted_forms = []
@@ -1687,8 +1714,7 @@ async def select_form_for_consultation(
             })
 
         # Call LLM to decide which form to use
-        from anthropic import Anthropic
-        client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+        from servers.utils.llm_gateway import get_llm_gateway
 
         prompt = f"""You are a medical form selector. Given a patient context and multiple form options, select the most appropriate form.
 
@@ -1708,13 +1734,14 @@ async def select_form_for_consultation(
 Return just the form_id (UUID string), no additional text.
 """
 
-        response = client.messages.create(
+        response = await get_llm_gateway().create_message(
             model="claude-sonnet-4-20250514",
             max_tokens=100,
             messages=[{
                 "role": "user",
                 "content": prompt
-            }]
+            }],
+            timeout=30.0
         )
 
         selected_form_id = response.content[0].text.strip()
@@ -14,6 +14,8 @@ from PIL import Image
 import os
 import uuid
 
+from servers.utils.pdf_cache import invalidate_pdfs
+
 router = APIRouter()
 
 # GCS configuration
@@ -187,14 +189,14 @@ async def upload_logo_to_supabase(supabase, doctor_id: str, image_bytes: bytes,
         # Upload to Supabase Storage
         content_type = "image/png" if ext == '.png' else "image/jpeg"
 
-        result = supabase.storage.from_('clinic-logos').upload(
+        result = await supabase.storage.from_('clinic-logos').upload(
             filename,
             image_bytes,
             file_options={"content-type": content_type}
         )
 
         # Get public URL
-        public_url = supabase.storage.from_('clinic-logos').get_public_url(filename)
+        public_url = await supabase.storage.from_('clinic-logos').get_public_url(filename)
 
         print(f"✅ Logo uploaded: {public_url}")
 
@@ -222,7 +224,7 @@ async def delete_logo_from_supabase(supabase, logo_url: str):
             print(f"🗑️  Deleting logo from Supabase Storage: {filename}")
 
             # Delete from Supabase Storage
-            result = supabase.storage.from_('clinic-logos').remove([filename])
+            result = await supabase.storage.from_('clinic-logos').remove([filename])
 
             print(f"✅ Logo deleted: {filename}")
         else:
@@ -262,7 +264,7 @@ async def upload_clinic_logo(
         supabase, user_id = verify_firebase_token_and_get_client(authorization)
 
         # Check if doctor exists and verify ownership
-        doctor_result = supabase.table("doctors").select("clinic_logo_url, user_id").eq("id", doctor_id).execute()
+        doctor_result = await supabase.table("doctors").select("clinic_logo_url, user_id").eq("id", doctor_id).execute()
 
         if not doctor_result.data:
             raise HTTPException(status_code=404, detail="Doctor not found")
@@ -283,7 +285,7 @@ async def upload_clinic_logo(
         public_url = await upload_logo_to_supabase(supabase, doctor_id, processed_bytes, ext)
 
         # Update doctor record
-        update_result = supabase.table("doctors").update({
+        update_result = await supabase.table("doctors").update({
             "clinic_logo_url": public_url,
             "updated_at": datetime.now().isoformat()
         }).eq("id", doctor_id).execute()
@@ -295,6 +297,9 @@ async def upload_clinic_logo(
         if old_logo_url:
             await delete_logo_from_supabase(supabase, old_logo_url)
 
+        # Cached PDFs embed the previous logo
+        invalidate_pdfs(f"doctor:{doctor_id}")
+
         return LogoUploadResponse(
             success=True,
             clinic_logo_url=public_url,
@@ -329,7 +334,7 @@ async def delete_clinic_logo(
         supabase, user_id = verify_firebase_token_and_get_client(authorization)
 
         # Get doctor and verify ownership
-        doctor_result = supabase.table("doctors").select("clinic_logo_url, user_id").eq("id", doctor_id).execute()
+        doctor_result = await supabase.table("doctors").select("clinic_logo_url, user_id").eq("id", doctor_id).execute()
 
         if not doctor_result.data:
             raise HTTPException(status_code=404, detail="Doctor not found")
@@ -352,7 +357,7 @@ async def delete_clinic_logo(
         await delete_logo_from_supabase(supabase, logo_url)
 
         # Update doctor record
-        update_result = supabase.table("doctors").update({
+        update_result = await supabase.table("doctors").update({
             "clinic_logo_url": None,
             "updated_at": datetime.now().isoformat()
         }).eq("id", doctor_id).execute()
@@ -360,6 +365,8 @@ async def delete_clinic_logo(
         if not update_result.data:
             raise HTTPException(status_code=500, detail="Failed to update doctor record")
 
+        invalidate_pdfs(f"doctor:{doctor_id}")
+
         return LogoDeleteResponse(
             success=True,
             message="Logo deleted successfully"
@@ -388,7 +395,7 @@ async def get_current_logo(
         supabase, user_id = verify_firebase_token_and_get_client(authorization)
 
         # Get doctor and verify ownership
-        doctor_result = supabase.table("doctors").select("clinic_logo_url, user_id").eq("id", doctor_id).execute()
+        doctor_result = await supabase.table("doctors").select("clinic_logo_url, user_id").eq("id", doctor_id).execute()
 
         if not doctor_result.data:
             raise HTTPException(status_code=404, detail="Doctor not found")
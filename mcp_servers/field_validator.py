@@ -3,20 +3,158 @@ Field validation and sanitization for form auto-fill.
 
 Validates extracted field values against schemas, performs type checking,
 range validation, unit conversions, and sanitization.
+
+Each form schema is compiled once into a CompiledFormValidator: a
+field_path -> metadata dict plus one validator closure per field with its
+type-specific settings (range, unit conversion, date format, BP parsing,
+options) already resolved. Compiled validators are reused across extraction
+chunks and recompiled when the cached schema changes (new version).
 """
 
-from typing import Any, Tuple, Optional, Dict
+from typing import Any, Tuple, Optional, Dict, Callable
 import re
 from datetime import datetime
 
 from api import get_form_schema_from_db
 
 
+FieldValidator = Callable[[Any], Tuple[bool, Any, Optional[str]]]
+
+# Field names treated as blood pressure readings ("120 over 80" -> "120/80")
+BP_FIELD_NAMES = {'bp', 'blood_pressure'}
+
+
+# ============================================
+# COMPILED FORM VALIDATOR
+# ============================================
+
+class CompiledFormValidator:
+    """
+    Validator for one form schema version.
+
+    Field metadata is indexed by nested path ("section.field") and by bare
+    field name (first section wins, as the per-field lookup always did), so
+    each field is validated with a dict lookup instead of a schema scan.
+    """
+
+    def __init__(self, schema: Dict[str, Any], form_type: str = ''):
+        self.schema = schema
+        self.form_type = form_type
+        self.fields: Dict[str, Dict[str, Any]] = {}
+        self.validators: Dict[str, FieldValidator] = {}
+
+        for section_name, section_data in schema.items():
+            if not isinstance(section_data, dict):
+                continue
+            fields_data = section_data.get('fields', [])
+            if isinstance(fields_data, list):
+                # Database schema has fields as ARRAY
+                named = [(f.get('name'), f) for f in fields_data if isinstance(f, dict)]
+                top_level = True
+            elif isinstance(fields_data, dict):
+                # Old format (dict) - only reachable by nested path
+                named = list(fields_data.items())
+                top_level = False
+            else:
+                continue
+
+            for field_name, metadata in named:
+                if not field_name or not isinstance(metadata, dict):
+                    continue
+                self._add(f"{section_name}.{field_name}", metadata)
+                if top_level and field_name not in self.fields:
+                    self._add(field_name, metadata)
+
+    def _add(self, field_path: str, metadata: Dict[str, Any]):
+        if field_path in self.fields:
+            return
+        self.fields[field_path] = metadata
+        self.validators[field_path] = compile_field_validator(metadata)
+
+    def get_field_metadata(self, field_path: str) -> Optional[Dict[str, Any]]:
+        """Metadata for a field path, or None if the field is not in the schema."""
+        return self.fields.get(field_path)
+
+    def validate_field(self, field_path: str, value: Any) -> Tuple[bool, Any, Optional[str]]:
+        """
+        Validate and sanitize a single field value.
+
+        Returns:
+            Tuple of (is_valid, sanitized_value, error_message)
+        """
+        validator = self.validators.get(field_path)
+        if validator is None:
+            return False, None, f"Field '{field_path}' not found in schema for form type '{self.form_type}'"
+
+        # Handle None/null values
+        if value is None or value == '':
+            return True, None, None
+
+        try:
+            return validator(value)
+        except Exception as e:
+            return False, None, f"Validation error: {str(e)}"
+
+    def validate(self, field_updates: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """
+        Validate a whole update dict in one pass.
+
+        Returns:
+            Tuple of (valid_updates, errors)
+        """
+        valid_updates = {}
+        errors = {}
+
+        for field_path, value in field_updates.items():
+            is_valid, sanitized_value, error_msg = self.validate_field(field_path, value)
+
+            if is_valid:
+                valid_updates[field_path] = sanitized_value
+            else:
+                errors[field_path] = error_msg or "Validation failed"
+
+        return valid_updates, errors
+
+
+# Compiled validators by form type (recompiled when the cached schema changes)
+_validators: Dict[str, CompiledFormValidator] = {}
+_validator_stats = {'compiles': 0, 'reuses': 0}
+
+
+async def get_form_validator(form_type: str) -> CompiledFormValidator:
+    """
+    Get the compiled validator for a form type's current schema.
+
+    The form schema cache returns the same read-only schema object until the
+    form changes, so a validator compiled for that object is reused as-is.
+    """
+    schema = await get_form_schema_from_db(form_type, full_metadata=False)
+
+    validator = _validators.get(form_type)
+    if validator is not None and validator.schema is schema:
+        _validator_stats['reuses'] += 1
+        return validator
+
+    validator = CompiledFormValidator(schema, form_type)
+    _validators[form_type] = validator
+    _validator_stats['compiles'] += 1
+    return validator
+
+
+def get_validator_stats() -> Dict[str, Any]:
+    """Compiled validator cache statistics for /api/cache-stats."""
+    return {
+        **_validator_stats,
+        'forms': len(_validators),
+        'fields': sum(len(v.fields) for v in _validators.values()),
+    }
+
+
 # ============================================
 # FIELD METADATA LOOKUP
 # ============================================
 
-def get_field_metadata(form_type: str, field_path: str) -> Optional[Dict[str, Any]]:
+async def get_field_metadata(form_type: str, field_path: str) -> Optional[Dict[str, Any]]:
     """
     Get metadata for a specific field path.
 
@@ -27,40 +165,14 @@ def get_field_metadata(form_type: str, field_path: str) -> Optional[Dict[str, An
     Returns:
         Dictionary containing field metadata, or None if field not found
     """
-    schema = get_form_schema_from_db(form_type, full_metadata=False)
-
-    if '.' in field_path:
-        # Nested field (section.field_name)
-        parent, child = field_path.split('.', 1)
-        if parent in schema and isinstance(schema[parent], dict):
-            # Database schema has fields as ARRAY, not dict
-            fields_data = schema[parent].get('fields', [])
-            if isinstance(fields_data, list):
-                # Search through fields array for matching name
-                for field in fields_data:
-                    if isinstance(field, dict) and field.get('name') == child:
-                        return field
-            else:
-                # Old format (dict) for backwards compatibility
-                return fields_data.get(child)
-    else:
-        # Top-level field - search all sections
-        for section_name, section_data in schema.items():
-            if isinstance(section_data, dict):
-                fields_data = section_data.get('fields', [])
-                if isinstance(fields_data, list):
-                    for field in fields_data:
-                        if isinstance(field, dict) and field.get('name') == field_path:
-                            return field
-
-    return None
+    return (await get_form_validator(form_type)).get_field_metadata(field_path)
 
 
 # ============================================
 # VALIDATION FUNCTIONS
 # ============================================
 
-def validate_field_update(
+async def validate_field_update(
     form_type: str,
     field_path: str,
     value: Any,
@@ -79,100 +191,108 @@ def validate_field_update(
         - sanitized_value: The validated and sanitized value (may be converted)
         - error_message: Description of validation error if is_valid is False, else None
     """
-    # Get field metadata from schema
-    metadata = get_field_metadata(form_type, field_path)
-    if metadata is None:
-        return False, None, f"Field '{field_path}' not found in schema for form type '{form_type}'"
+    return (await get_form_validator(form_type)).validate_field(field_path, value)
 
-    field_type = metadata.get('type')
 
-    # Handle None/null values
-    if value is None or value == '':
-        return True, None, None
+def compile_field_validator(metadata: Dict[str, Any]) -> FieldValidator:
+    """Build the validator closure for a field from its schema metadata."""
+    field_type = metadata.get('type')
 
-    try:
-        # Validate based on field type
-        if field_type == 'number':
-            return _validate_number(value, metadata)
-        elif field_type == 'string':
-            return _validate_string(value, metadata)
-        elif field_type == 'boolean':
-            return _validate_boolean(value, metadata)
-        elif field_type == 'object':
-            return _validate_object(value, metadata)
-        elif field_type == 'array':
-            # Array fields (tables) - accept list or skip validation for now
-            if isinstance(value, list):
-                return True, value, None
-            else:
-                # Try to convert single value to array
-                return True, [value], None
-        else:
+    if field_type == 'number':
+        return _number_validator(metadata)
+    elif field_type == 'string':
+        return _string_validator(metadata)
+    elif field_type == 'date':
+        return _string_validator({**metadata, 'format': 'YYYY-MM-DD'})
+    elif field_type == 'boolean':
+        return _validate_boolean
+    elif field_type == 'object':
+        return _validate_object
+    elif field_type == 'array':
+        return _validate_array
+    else:
+        def unknown(value):
             return False, None, f"Unknown field type: {field_type}"
+        return unknown
 
-    except Exception as e:
-        return False, None, f"Validation error: {str(e)}"
 
-
-def _validate_number(value: Any, metadata: Dict[str, Any]) -> Tuple[bool, Any, Optional[str]]:
+def _number_validator(metadata: Dict[str, Any]) -> FieldValidator:
     """Validate and convert numeric values."""
-    # Try to convert to float
-    try:
-        if isinstance(value, str):
-            # Remove common text like "approximately", "about", etc.
-            value = value.replace('approximately', '').replace('about', '').strip()
-            numeric_value = float(value)
-        elif isinstance(value, (int, float)):
-            numeric_value = float(value)
-        else:
-            return False, None, f"Cannot convert {type(value).__name__} to number"
-    except ValueError:
-        return False, None, f"Invalid number format: '{value}'"
+    # Check if value might be in Fahrenheit (>50 is likely F, not C)
+    celsius = metadata.get('unit', '') == 'celsius'
+    value_range = metadata.get('range')
+
+    def validate(value):
+        # Try to convert to float
+        try:
+            if isinstance(value, str):
+                # Remove common text like "approximately", "about", etc.
+                value = value.replace('approximately', '').replace('about', '').strip()
+                numeric_value = float(value)
+            elif isinstance(value, (int, float)):
+                numeric_value = float(value)
+            else:
+                return False, None, f"Cannot convert {type(value).__name__} to number"
+        except ValueError:
+            return False, None, f"Invalid number format: '{value}'"
 
-    # Apply unit conversions if needed
-    unit = metadata.get('unit', '')
-    if unit == 'celsius':
-        # Check if value might be in Fahrenheit (>50 is likely F, not C)
-        if numeric_value > 50:
+        # Apply unit conversions if needed
+        if celsius and numeric_value > 50:
             numeric_value = fahrenheit_to_celsius(numeric_value)
 
-    # Validate range
-    value_range = metadata.get('range')
-    if value_range:
-        min_val, max_val = value_range
-        if not (min_val <= numeric_value <= max_val):
-            return False, None, f"Value {numeric_value} outside valid range [{min_val}, {max_val}]"
+        # Validate range
+        if value_range:
+            min_val, max_val = value_range
+            if not (min_val <= numeric_value <= max_val):
+                return False, None, f"Value {numeric_value} outside valid range [{min_val}, {max_val}]"
 
-    return True, numeric_value, None
+        return True, numeric_value, None
 
+    return validate
 
-def _validate_string(value: Any, metadata: Dict[str, Any]) -> Tuple[bool, Any, Optional[str]]:
-    """Validate and sanitize string values."""
-    # Convert to string
-    str_value = str(value).strip()
 
-    # Check max length
+def _string_validator(metadata: Dict[str, Any]) -> FieldValidator:
+    """Validate and sanitize string values (dates, blood pressure and options included)."""
     max_length = metadata.get('max_length')
-    if max_length and len(str_value) > max_length:
-        # Truncate with warning
-        str_value = str_value[:max_length]
-        # Note: Still valid, just truncated
+    is_date = metadata.get('format') == 'YYYY-MM-DD'
+    is_bp = metadata.get('name') in BP_FIELD_NAMES
+    options = metadata.get('options')
+    options = {str(o).strip().lower(): o for o in options if not isinstance(o, dict)} if isinstance(options, list) else {}
+
+    def validate(value):
+        # Convert to string
+        str_value = str(value).strip()
+
+        # Check max length - truncate, still valid
+        if max_length and len(str_value) > max_length:
+            str_value = str_value[:max_length]
+
+        # Sanitize for XSS prevention (basic)
+        str_value = sanitize_string(str_value)
+
+        if is_date:
+            normalized = _normalize_date(str_value)
+            if normalized is None:
+                return False, None, f"Invalid date format: '{str_value}'. Expected a recognizable date"
+            return True, normalized, None
+
+        if is_bp:
+            systolic, diastolic = parse_blood_pressure(str_value)
+            if systolic is not None:
+                return True, f"{systolic}/{diastolic}", None
 
-    # Sanitize for XSS prevention (basic)
-    str_value = sanitize_string(str_value)
+        if options:
+            option = options.get(str_value.lower())
+            if option is None:
+                return False, None, f"'{str_value}' is not one of the allowed options"
+            return True, option, None
 
-    # Validate format if specified
-    format_type = metadata.get('format')
-    if format_type == 'YYYY-MM-DD':
-        normalized = _normalize_date(str_value)
-        if normalized is None:
-            return False, None, f"Invalid date format: '{str_value}'. Expected a recognizable date"
-        return True, normalized, None
+        return True, str_value, None
 
-    return True, str_value, None
+    return validate
 
 
-def _validate_boolean(value: Any, metadata: Dict[str, Any]) -> Tuple[bool, Any, Optional[str]]:
+def _validate_boolean(value: Any) -> Tuple[bool, Any, Optional[str]]:
     """Validate and convert boolean values."""
     if isinstance(value, bool):
         return True, value, None
@@ -187,7 +307,7 @@ def _validate_boolean(value: Any, metadata: Dict[str, Any]) -> Tuple[bool, Any,
     return False, None, f"Cannot convert '{value}' to boolean"
 
 
-def _validate_object(value: Any, metadata: Dict[str, Any]) -> Tuple[bool, Any, Optional[str]]:
+def _validate_object(value: Any) -> Tuple[bool, Any, Optional[str]]:
     """Validate object/dict values."""
     if not isinstance(value, dict):
         return False, None, f"Expected object/dict, got {type(value).__name__}"
@@ -196,6 +316,13 @@ def _validate_object(value: Any, metadata: Dict[str, Any]) -> Tuple[bool, Any, O
     return True, value, None
 
 
+def _validate_array(value: Any) -> Tuple[bool, Any, Optional[str]]:
+    """Array fields (tables) - accept list, wrap a single value."""
+    if isinstance(value, list):
+        return True, value, None
+    return True, [value], None
+
+
 # ============================================
 # UNIT CONVERSION FUNCTIONS
 # ============================================
@@ -323,13 +450,15 @@ def _is_valid_date(date_str: str) -> bool:
 # BATCH VALIDATION
 # ============================================
 
-def validate_multiple_fields(
+async def validate_multiple_fields(
     form_type: str,
     field_updates: Dict[str, Any]
 ) -> Tuple[Dict[str, Any], Dict[str, str]]:
     """
     Validate multiple field updates at once.
 
+    Loads the schema (and compiled validator) once for the whole batch.
+
     Args:
         form_type: One of 'obgyn', 'infertility', 'antenatal'
         field_updates: Dictionary mapping field paths to values
@@ -339,20 +468,7 @@ def validate_multiple_fields(
         - valid_updates: Dictionary of field paths that passed validation with sanitized values
         - errors: Dictionary mapping field paths to error messages
     """
-    valid_updates = {}
-    errors = {}
-
-    for field_path, value in field_updates.items():
-        is_valid, sanitized_value, error_msg = validate_field_update(
-            form_type, field_path, value
-        )
-
-        if is_valid:
-            valid_updates[field_path] = sanitized_value
-        else:
-            errors[field_path] = error_msg or "Validation failed"
-
-    return valid_updates, errors
+    return (await get_form_validator(form_type)).validate(field_updates)
 
 
 # ============================================
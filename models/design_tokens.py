@@ -136,7 +136,7 @@ class DesignTokens(BaseModel):
             DesignTokens with clinic colors and optional Figma layout
         """
         # Load colors from database
-        from supabase import create_client
+        from servers.utils.supabase_db import get_db
 
         supabase_url = os.getenv("SUPABASE_URL")
         supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
@@ -145,10 +145,10 @@ class DesignTokens(BaseModel):
             print("⚠️  Supabase credentials not found, using default colors")
             colors = ColorTokens()
         else:
-            supabase = create_client(supabase_url, supabase_key)
+            supabase = get_db(supabase_url, supabase_key)
 
             # Query clinic color scheme
-            response = supabase.table("clinic_color_schemes").select("*").eq("doctor_id", doctor_id).single().execute()
+            response = await supabase.table("clinic_color_schemes").select("*").eq("doctor_id", doctor_id).single().execute()
 
             if response.data:
                 # Use clinic-specific colors
@@ -212,7 +212,7 @@ class DesignTokens(BaseModel):
             print(f"⚠️  Failed to save tokens to cache: {e}")
 
 
-def get_clinic_design_tokens(clinic_id: str, supabase_client=None) -> dict:
+async def get_clinic_design_tokens(clinic_id: str, supabase_client=None) -> dict:
     """
     Fetch clinic design tokens (logos, colors, contact info) from database.
     Returns a simple dict suitable for React component props.
@@ -246,7 +246,7 @@ def get_clinic_design_tokens(clinic_id: str, supabase_client=None) -> dict:
 
     try:
         # Query clinic information
-        clinic_response = supabase_client.table("clinics").select("*").eq("id", clinic_id).single().execute()
+        clinic_response = await supabase_client.table("clinics").select("*").eq("id", clinic_id).single().execute()
 
         if not clinic_response.data:
             print(f"ℹ️  Clinic {clinic_id} not found, using default branding")
@@ -255,7 +255,7 @@ def get_clinic_design_tokens(clinic_id: str, supabase_client=None) -> dict:
         clinic_data = clinic_response.data
 
         # Try to get clinic-specific design tokens/color scheme
-        design_tokens_response = supabase_client.table("clinic_design_tokens").select("*").eq(
+        design_tokens_response = await supabase_client.table("clinic_design_tokens").select("*").eq(
             "clinic_id", clinic_id
         ).execute()
 
@@ -3,14 +3,155 @@ Headless Browser PDF Generator
 
 Uses Playwright to render React components as PDFs with clinic branding.
 Replaces the old ReportLab-based PDF generator.
+
+The HTML is self-contained: the React bundles and the precompiled, purged
+Tailwind CSS (built by build_react_bundle.py into static/) are read once and
+held in memory (PdfAssets), and the page sets `window.__pdfRendered` once
+React has mounted and fonts/images have loaded, so rendering needs no
+network access and no fixed sleep. The compiled CSS is committed to static/
+(the Docker build refuses to build without it); only local development may
+fall back to the Tailwind CDN (PDF_ALLOW_CDN_CSS=true), which needs the
+network and waits for network idle. Otherwise PDF requests fail with a 503.
 """
 
-from playwright.async_api import async_playwright
-import asyncio
+from dataclasses import dataclass
 from io import BytesIO
+import hashlib
 import json
 import os
 from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from servers.utils.browser_pool import BrowserPoolBusy, get_browser_pool
+
+
+STATIC_DIR = Path(__file__).parent / "static"
+FRONTEND_SRC_DIR = Path(__file__).parent.parent / "aneya-frontend" / "src"
+TAILWIND_CDN = "https://cdn.tailwindcss.com"
+
+# Development only: allow the Tailwind CDN when the compiled CSS hasn't been built
+ALLOW_CDN_CSS = os.getenv("PDF_ALLOW_CDN_CSS", "false").lower() in ("1", "true", "yes")
+
+# Longest wait for the page's rendered signal before printing anyway (ms)
+RENDER_TIMEOUT_MS = int(os.getenv("PDF_RENDER_TIMEOUT_MS", "15000"))
+
+# Sets window.__pdfRendered once React has mounted into #root and fonts and
+# images have finished loading (the renderer waits on it instead of sleeping)
+RENDERED_SIGNAL_SCRIPT = """
+        <script>
+            (function () {
+                const root = document.getElementById('root');
+                function settle() {
+                    const images = Array.from(document.images)
+                        .filter(img => !img.complete)
+                        .map(img => new Promise(resolve => { img.onload = img.onerror = resolve; }));
+                    Promise.all([document.fonts.ready, ...images]).then(() => {
+                        // Two frames: let React effects and late style injection paint first
+                        requestAnimationFrame(() => requestAnimationFrame(() => { window.__pdfRendered = true; }));
+                    });
+                }
+                if (root.childElementCount) {
+                    settle();
+                } else {
+                    new MutationObserver((_, observer) => {
+                        observer.disconnect();
+                        settle();
+                    }).observe(root, { childList: true });
+                }
+            })();
+        </script>
+"""
+
+
+@dataclass(frozen=True)
+class PdfAssets:
+    """Bundles and stylesheets inlined into every PDF page."""
+    templates_js: str
+    report_card_js: str
+    templates_css: Optional[str]  # Compiled Tailwind; None = CDN fallback
+    report_card_css: Optional[str]
+    pdf_print_css: str
+    index_css: str  # Raw index.css, only used with the CDN fallback
+    version: str  # Content hash of everything above and this module's templates
+
+    @property
+    def self_contained(self) -> bool:
+        return self.templates_css is not None and self.report_card_css is not None
+
+
+def _read_first(*paths: Path) -> Optional[str]:
+    for path in paths:
+        if path.exists():
+            return path.read_text()
+    return None
+
+
+def load_pdf_assets(static_dir: Path = STATIC_DIR, frontend_src_dir: Path = FRONTEND_SRC_DIR) -> PdfAssets:
+    """Read the bundles and stylesheets from disk (see build_react_bundle.py)."""
+    templates_js = _read_first(static_dir / "pdf-templates-bundle.js")
+    report_card_js = _read_first(static_dir / "doctor-report-card-bundle.js")
+    parts = {
+        "templates_js": templates_js or "console.warn('PDF templates bundle not found');",
+        "report_card_js": report_card_js or "console.error('DoctorReportCard bundle not found');",
+        "templates_css": _read_first(static_dir / "pdf-templates.css"),
+        "report_card_css": _read_first(static_dir / "doctor-report-card.css"),
+        "pdf_print_css": _read_first(static_dir / "pdf-print.css", frontend_src_dir / "styles" / "pdf-print.css") or "",
+        "index_css": _read_first(frontend_src_dir / "index.css") or "",
+    }
+    digest = hashlib.sha256(Path(__file__).read_bytes())  # The HTML templates below
+    for name, content in parts.items():
+        digest.update(f"{name}:{len(content or '')}:".encode())
+        digest.update((content or "").encode())
+    assets = PdfAssets(**parts, version=digest.hexdigest()[:16])
+
+    for name, content in (("pdf-templates-bundle.js", templates_js), ("doctor-report-card-bundle.js", report_card_js)):
+        if content is None:
+            print(f"⚠️  PDF bundle {name} not found in {static_dir} - run build_react_bundle.py")
+    if not assets.self_contained and ALLOW_CDN_CSS:
+        print(f"⚠️  Compiled PDF CSS not found in {static_dir} - falling back to the Tailwind CDN "
+              f"(development only: PDFs need network access until build_react_bundle.py has been run)")
+    elif not assets.self_contained:
+        print(f"❌ Compiled PDF CSS not found in {static_dir} - PDF generation will fail until "
+              f"build_react_bundle.py has been run (PDF_ALLOW_CDN_CSS=true allows the CDN in development)")
+    print(f"✅ PDF assets loaded (version {assets.version}, "
+          f"{sum(len(c or '') for c in parts.values()) / 1024:.0f} KB)")
+    return assets
+
+
+# Process-wide assets, read once
+_assets: Optional[PdfAssets] = None
+
+
+def get_pdf_assets() -> PdfAssets:
+    """Get the in-memory PDF assets, loading them on first call."""
+    global _assets
+    if _assets is None:
+        _assets = load_pdf_assets()
+    return _assets
+
+
+def _style_tags(compiled_css: Optional[str], fallback_css: str) -> str:
+    """Inline compiled CSS, or (development only) the Tailwind CDN plus raw CSS when it has not been built."""
+    if compiled_css is not None:
+        return f"<style>{compiled_css}</style>"
+    if not ALLOW_CDN_CSS:
+        raise HTTPException(
+            status_code=503,
+            detail="PDF stylesheets have not been built (run build_react_bundle.py and deploy static/*.css)"
+        )
+    return f'<script src="{TAILWIND_CDN}"></script>\n        <style>{fallback_css}</style>'
+
+
+# The Tailwind CDN injects its generated styles after the DOM scan, so the
+# compact PDF overrides are appended again afterwards
+_CDN_PRINT_OVERRIDE = """requestAnimationFrame(() => {{
+                const style = document.createElement('style');
+                style.textContent = {};
+                document.head.appendChild(style);
+            }});"""
 
 
 async def generate_pdf_from_react(
@@ -20,53 +161,55 @@ async def generate_pdf_from_react(
     """
     Render React component HTML as PDF using Playwright.
 
+    Pages are leased from the shared headless Chromium pool (see
+    servers/utils/browser_pool.py) instead of launching a browser per PDF.
+
     Args:
         html_content: Full HTML with embedded React component
         pdf_options: PDF settings (format, margins, landscape)
 
     Returns:
         BytesIO containing PDF bytes
+
+    Raises:
+        HTTPException: 503 if every renderer is busy and the wait queue is full
     """
     if pdf_options is None:
         pdf_options = {}
 
-    async with async_playwright() as p:
-        # Launch headless Chromium
-        browser = await p.chromium.launch(
-            headless=True,
-            args=['--no-sandbox', '--disable-setuid-sandbox']  # Required for Docker
-        )
-
-        page = await browser.new_page()
-
-        # Log console messages for debugging
-        page.on("console", lambda msg: print(f"[Browser {msg.type}] {msg.text}"))
-        page.on("pageerror", lambda exc: print(f"[Browser Error] {exc}"))
-
-        # Set viewport for consistent rendering
-        await page.set_viewport_size({"width": 1200, "height": 1600})
-
-        # Load HTML with React component
-        await page.set_content(html_content, wait_until="networkidle")
-
-        # Wait for fonts and images to load
-        await page.wait_for_timeout(1000)
-
-        # Generate PDF
-        pdf_bytes = await page.pdf(
-            format=pdf_options.get("format", "A4"),
-            print_background=True,
-            margin=pdf_options.get("margin", {
-                "top": "10mm",
-                "right": "10mm",
-                "bottom": "10mm",
-                "left": "10mm"
-            }),
-            landscape=pdf_options.get("landscape", False),
-            prefer_css_page_size=False
-        )
-
-        await browser.close()
+    try:
+        async with get_browser_pool().page(viewport={"width": 1200, "height": 1600}) as page:
+            # Log console messages for debugging
+            page.on("console", lambda msg: print(f"[Browser {msg.type}] {msg.text}"))
+            page.on("pageerror", lambda exc: print(f"[Browser Error] {exc}"))
+
+            # Load HTML with React component (the CDN fallback still needs the network)
+            await page.set_content(
+                html_content, wait_until="networkidle" if TAILWIND_CDN in html_content else "load"
+            )
+
+            # Wait for React to mount and fonts/images to load
+            try:
+                await page.wait_for_function("window.__pdfRendered === true", timeout=RENDER_TIMEOUT_MS)
+            except PlaywrightTimeoutError:
+                print(f"⚠️  PDF page did not signal rendered within {RENDER_TIMEOUT_MS}ms - printing anyway")
+
+            # Generate PDF
+            pdf_bytes = await page.pdf(
+                format=pdf_options.get("format", "A4"),
+                print_background=True,
+                margin=pdf_options.get("margin", {
+                    "top": "10mm",
+                    "right": "10mm",
+                    "bottom": "10mm",
+                    "left": "10mm"
+                }),
+                landscape=pdf_options.get("landscape", False),
+                prefer_css_page_size=False
+            )
+    except BrowserPoolBusy as e:
+        print(f"⚠️  {e}")
+        raise HTTPException(status_code=503, detail="PDF renderer busy, please retry", headers={"Retry-After": "5"})
 
     return BytesIO(pdf_bytes)
 
@@ -87,18 +230,7 @@ def build_html_template(
     Returns:
         HTML string ready for rendering
     """
-    # Load Tailwind CSS from CDN for PDF generation
-    tailwind_cdn = "https://cdn.tailwindcss.com"
-
-    # Load React bundle (pre-built)
-    react_bundle_path = Path(__file__).parent / "static" / "pdf-templates-bundle.js"
-
-    if react_bundle_path.exists():
-        with open(react_bundle_path, 'r') as f:
-            react_bundle = f.read()
-    else:
-        # Fallback: use empty bundle (will need to build)
-        react_bundle = "console.warn('PDF templates bundle not found');"
+    assets = get_pdf_assets()
 
     # Inject clinic colors as CSS variables
     clinic_css = f"""
@@ -150,31 +282,25 @@ def build_html_template(
     }}
     """
 
-    # Load pdf-print.css
-    pdf_print_css_path = Path(__file__).parent.parent / "aneya-frontend" / "src" / "styles" / "pdf-print.css"
-
-    if pdf_print_css_path.exists():
-        with open(pdf_print_css_path, 'r') as f:
-            pdf_print_css = f.read()
-        print(f"   CSS overrides loaded: {len(pdf_print_css)} bytes from {pdf_print_css_path}")
-    else:
-        pdf_print_css = ""
-        print(f"   No pdf-print.css found at {pdf_print_css_path}")
+    # Only the CDN fallback needs the compact PDF overrides re-applied after its JIT styles
+    cdn_print_override = ""
+    if assets.templates_css is None:
+        cdn_print_override = _CDN_PRINT_OVERRIDE.format(json.dumps(assets.pdf_print_css))
 
     html = f"""
     <!DOCTYPE html>
     <html>
     <head>
         <meta charset="utf-8">
-        <script src="{tailwind_cdn}"></script>
+        {_style_tags(assets.templates_css, "")}
         <style>{clinic_css}</style>
-        <style>{pdf_print_css}</style>
+        <style>{assets.pdf_print_css}</style>
     </head>
     <body>
         <div id="root"></div>
 
         <!-- PDF Templates bundle (includes React) -->
-        <script>{react_bundle}</script>
+        <script>{assets.templates_js}</script>
 
         <script>
             // Render React component using bundled render function
@@ -189,14 +315,9 @@ def build_html_template(
                     '<h1>Error: PdfTemplates bundle not loaded. Type: ' + typeof PdfTemplates + '</h1>';
             }}
 
-            // Apply compact PDF overrides AFTER React render + Tailwind JIT
-            // Tailwind CDN generates styles after DOM scan, so we must inject last.
-            requestAnimationFrame(() => {{
-                const style = document.createElement('style');
-                style.textContent = `{pdf_print_css}`;
-                document.head.appendChild(style);
-            }});
+            {cdn_print_override}
         </script>
+        {RENDERED_SIGNAL_SCRIPT}
     </body>
     </html>
     """
@@ -272,7 +393,8 @@ async def generate_custom_form_pdf_headless(
     form_data: dict,
     form_name: str,
     patient_info: dict = None,
-    clinic_branding: dict = None
+    clinic_branding: dict = None,
+    form_date=None
 ) -> BytesIO:
     """
     Generate PDF for a custom form using headless React renderer.
@@ -283,6 +405,8 @@ async def generate_custom_form_pdf_headless(
         form_name: Name of the form
         patient_info: Optional patient details
         clinic_branding: Optional clinic design tokens
+        form_date: Date/time stamped on the form (defaults to now; cached
+            renders must pass it so the stamp is part of the cache key)
 
     Returns:
         BytesIO containing PDF bytes
@@ -300,10 +424,13 @@ async def generate_custom_form_pdf_headless(
             "mrn": ""
         }
 
+    if form_date is None:
+        form_date = datetime.now()
+
     # Build appointment info for the form
     appointment_info = {
-        "date": datetime.now().strftime("%Y-%m-%d"),
-        "time": datetime.now().strftime("%H:%M"),
+        "date": form_date.strftime("%Y-%m-%d"),
+        "time": form_date.strftime("%H:%M"),
         "form_name": form_name,
         "specialty": "custom"
     }
@@ -485,31 +612,14 @@ def build_html_for_doctor_report_card() -> str:
     Returns:
         HTML string ready for Playwright rendering
     """
-    # Load React bundle for DoctorReportCard
-    bundle_path = Path(__file__).parent / "static" / "doctor-report-card-bundle.js"
-
-    if bundle_path.exists():
-        with open(bundle_path, 'r') as f:
-            react_bundle = f.read()
-    else:
-        react_bundle = "console.error('DoctorReportCard bundle not found');"
-
-    # Load index.css (contains medical color variables)
-    css_path = Path(__file__).parent.parent / "aneya-frontend" / "src" / "index.css"
-
-    if css_path.exists():
-        with open(css_path, 'r') as f:
-            index_css = f.read()
-    else:
-        index_css = ""
+    assets = get_pdf_assets()
 
     html = f"""
     <!DOCTYPE html>
     <html>
     <head>
         <meta charset="utf-8">
-        <script src="https://cdn.tailwindcss.com"></script>
-        <style>{index_css}</style>
+        {_style_tags(assets.report_card_css, assets.index_css)}
         <style>
             /* Ensure print backgrounds render */
             * {{
@@ -533,7 +643,7 @@ def build_html_for_doctor_report_card() -> str:
         <div id="root"></div>
 
         <!-- DoctorReportCard bundle (includes React) -->
-        <script>{react_bundle}</script>
+        <script>{assets.report_card_js}</script>
 
         <script>
             // Render DoctorReportCard component
@@ -544,6 +654,7 @@ def build_html_for_doctor_report_card() -> str:
                     '<h1>Error: DoctorReportCard component not found. Type: ' + typeof DoctorReportCardBundle + '</h1>';
             }}
         </script>
+        {RENDERED_SIGNAL_SCRIPT}
     </body>
     </html>
     """
@@ -565,23 +676,7 @@ def build_html_for_doctor_report_card_with_data(
     Returns:
         HTML string ready for Playwright rendering
     """
-    # Load React bundle
-    bundle_path = Path(__file__).parent / "static" / "doctor-report-card-bundle.js"
-
-    if bundle_path.exists():
-        with open(bundle_path, 'r') as f:
-            react_bundle = f.read()
-    else:
-        react_bundle = "console.error('DoctorReportCard bundle not found');"
-
-    # Load index.css
-    css_path = Path(__file__).parent.parent / "aneya-frontend" / "src" / "index.css"
-
-    if css_path.exists():
-        with open(css_path, 'r') as f:
-            index_css = f.read()
-    else:
-        index_css = ""
+    assets = get_pdf_assets()
 
     # Serialize data as JSON
     data_json = json.dumps({
@@ -594,8 +689,7 @@ def build_html_for_doctor_report_card_with_data(
     <html>
     <head>
         <meta charset="utf-8">
-        <script src="https://cdn.tailwindcss.com"></script>
-        <style>{index_css}</style>
+        {_style_tags(assets.report_card_css, assets.index_css)}
         <style>
             /* Ensure print backgrounds render */
             * {{
@@ -619,7 +713,7 @@ def build_html_for_doctor_report_card_with_data(
         <div id="root"></div>
 
         <!-- DoctorReportCard bundle (includes React) -->
-        <script>{react_bundle}</script>
+        <script>{assets.report_card_js}</script>
 
         <script>
             // Render DoctorReportCard component with real data
@@ -631,6 +725,7 @@ def build_html_for_doctor_report_card_with_data(
                     '<h1>Error: DoctorReportCard component not found</h1>';
             }}
         </script>
+        {RENDERED_SIGNAL_SCRIPT}
     </body>
     </html>
     """
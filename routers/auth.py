@@ -10,7 +10,6 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from fastapi import APIRouter, HTTPException
-from supabase import create_client, Client
 import resend
 
 from models.auth import (
@@ -19,6 +18,7 @@ from models.auth import (
     ResendOTPRequest, ResendOTPResponse
 )
 from config import RESEND_API_KEY
+from servers.utils.supabase_db import get_db, SupabaseDB
 
 # Initialize router
 router = APIRouter(prefix="/api/auth", tags=["authentication"])
@@ -26,19 +26,16 @@ router = APIRouter(prefix="/api/auth", tags=["authentication"])
 # Supabase client initialization (lazy to avoid breaking tests without env vars)
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-_supabase_client: Optional[Client] = None
 
-def get_supabase() -> Client:
-    """Get or create Supabase client (lazy initialization)"""
-    global _supabase_client
-    if _supabase_client is None:
-        if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
-            raise HTTPException(
-                status_code=503,
-                detail="Supabase not configured. SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY are required."
-            )
-        _supabase_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
-    return _supabase_client
+
+def get_supabase() -> SupabaseDB:
+    """Get the shared pooled Supabase client"""
+    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+        raise HTTPException(
+            status_code=503,
+            detail="Supabase not configured. SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY are required."
+        )
+    return get_db(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
 # Constants
 OTP_LENGTH = 6
@@ -265,11 +262,11 @@ async def send_otp(request: SendOTPRequest):
         expires_at = now + timedelta(minutes=OTP_EXPIRY_MINUTES)
 
         # Check if verification record exists
-        existing = get_supabase().table('email_verifications').select('*').eq('user_id', user_id).execute()
+        existing = await get_supabase().table('email_verifications').select('*').eq('user_id', user_id).execute()
 
         if existing.data and len(existing.data) > 0:
             # Update existing record
-            get_supabase().table('email_verifications').update({
+            await get_supabase().table('email_verifications').update({
                 'otp_hash': otp_hashed,
                 'created_at': now.isoformat(),
                 'expires_at': expires_at.isoformat(),
@@ -281,7 +278,7 @@ async def send_otp(request: SendOTPRequest):
             print(f"✅ Updated existing verification record for {user_id}")
         else:
             # Create new record
-            get_supabase().table('email_verifications').insert({
+            await get_supabase().table('email_verifications').insert({
                 'user_id': user_id,
                 'email': email,
                 'otp_hash': otp_hashed,
@@ -333,7 +330,7 @@ async def verify_otp(request: VerifyOTPRequest):
         print(f"🔐 Verifying OTP for user {user_id}")
 
         # Get verification record
-        result = get_supabase().table('email_verifications').select('*').eq('user_id', user_id).execute()
+        result = await get_supabase().table('email_verifications').select('*').eq('user_id', user_id).execute()
 
         if not result.data or len(result.data) == 0:
             raise HTTPException(status_code=404, detail="No verification request found")
@@ -375,7 +372,7 @@ async def verify_otp(request: VerifyOTPRequest):
             # Check if should lock
             if new_attempts >= MAX_ATTEMPTS:
                 locked_until = now + timedelta(minutes=LOCKOUT_MINUTES)
-                get_supabase().table('email_verifications').update({
+                await get_supabase().table('email_verifications').update({
                     'attempts': new_attempts,
                     'locked_until': locked_until.isoformat()
                 }).eq('user_id', user_id).execute()
@@ -385,7 +382,7 @@ async def verify_otp(request: VerifyOTPRequest):
                     detail=f"Too many failed attempts. Account locked for {LOCKOUT_MINUTES} minutes"
                 )
             else:
-                get_supabase().table('email_verifications').update({
+                await get_supabase().table('email_verifications').update({
                     'attempts': new_attempts
                 }).eq('user_id', user_id).execute()
 
@@ -399,13 +396,13 @@ async def verify_otp(request: VerifyOTPRequest):
         verified_at = now.isoformat()
 
         # Update email_verifications
-        get_supabase().table('email_verifications').update({
+        await get_supabase().table('email_verifications').update({
             'is_verified': True,
             'verified_at': verified_at
         }).eq('user_id', user_id).execute()
 
         # Update user_roles.email_verified
-        get_supabase().table('user_roles').update({
+        await get_supabase().table('user_roles').update({
             'email_verified': True
         }).eq('user_id', user_id).execute()
 
@@ -442,7 +439,7 @@ async def resend_otp(request: ResendOTPRequest):
         print(f"🔄 Resending OTP to {email} for user {user_id}")
 
         # Get verification record
-        result = get_supabase().table('email_verifications').select('*').eq('user_id', user_id).execute()
+        result = await get_supabase().table('email_verifications').select('*').eq('user_id', user_id).execute()
 
         if not result.data or len(result.data) == 0:
             raise HTTPException(status_code=404, detail="No verification request found")
@@ -483,7 +480,7 @@ async def resend_otp(request: ResendOTPRequest):
 
         # Update record
         new_resend_count = record['resend_count'] + 1
-        get_supabase().table('email_verifications').update({
+        await get_supabase().table('email_verifications').update({
             'otp_hash': otp_hashed,
             'created_at': now.isoformat(),
             'expires_at': expires_at.isoformat(),
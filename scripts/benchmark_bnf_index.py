@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+BNF Index Search Benchmark
+
+Compares per-query latency of BNFIndex.search (trigram inverted index + LRU)
+against the previous implementation (linear contains-scan + difflib over
+every drug name) on the shipped data/bnf_drug_index.json.
+
+Query mix (deterministic):
+- exact names from the index
+- typos (one deleted / swapped / substituted character)
+- partial names (first 5 characters)
+- brand names / synonyms from DRUG_SYNONYMS
+
+Reported:
+- cold: every query seen for the first time (LRU cleared)
+- warm: repeated queries served from the LRU
+- top-1 agreement with the old implementation
+
+Usage:
+    python scripts/benchmark_bnf_index.py
+    python scripts/benchmark_bnf_index.py --queries 1000 --repeat 3
+"""
+
+import os
+import sys
+import time
+import random
+import difflib
+import argparse
+import statistics
+
+# Add drug_lookup directory to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "servers", "drug_lookup"))
+
+from bnf_index_utils import BNFIndex, DRUG_SYNONYMS
+
+
+def legacy_search(index: BNFIndex, query: str, limit: int = 5, cutoff: float = 0.6):
+    """The previous BNFIndex.search, kept here as the baseline."""
+    query = query.lower().strip()
+
+    if query in DRUG_SYNONYMS:
+        canonical = DRUG_SYNONYMS[query]
+        if canonical in index.name_map:
+            return [index.name_map[canonical]]
+
+    if query in index.name_map:
+        return [index.name_map[query]]
+
+    contains_matches = [d for d in index.drugs if query in d['name'].lower()]
+    contains_matches.sort(key=lambda x: 0 if x['name'].lower().startswith(query) else 1)
+
+    all_names = [d['name'] for d in index.drugs]
+    matches = difflib.get_close_matches(query, all_names, n=limit, cutoff=cutoff)
+
+    results = []
+    seen_slugs = set()
+    for d in contains_matches:
+        if d['slug'] not in seen_slugs:
+            results.append(d)
+            seen_slugs.add(d['slug'])
+    for name in matches:
+        d = index.name_map.get(name.lower())
+        if d and d['slug'] not in seen_slugs:
+            results.append(d)
+            seen_slugs.add(d['slug'])
+
+    return results[:limit]
+
+
+def make_typo(name: str, rng: random.Random) -> str:
+    """Introduce one deletion, swap or substitution."""
+    if len(name) < 4:
+        return name
+    i = rng.randrange(1, len(name) - 1)
+    kind = rng.choice(("delete", "swap", "substitute"))
+    if kind == "delete":
+        return name[:i] + name[i + 1:]
+    if kind == "swap":
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    return name[:i] + rng.choice("aeiou") + name[i + 1:]
+
+
+def build_queries(index: BNFIndex, n: int, seed: int = 42):
+    """Deterministic mix of exact, typo, partial and synonym queries."""
+    rng = random.Random(seed)
+    names = [d['name'].split(' [')[0] for d in index.drugs]
+    synonyms = list(DRUG_SYNONYMS)
+
+    queries = []
+    for i in range(n):
+        name = rng.choice(names)
+        kind = i % 4
+        if kind == 0:
+            queries.append(name)
+        elif kind == 1:
+            queries.append(make_typo(name.lower(), rng))
+        elif kind == 2:
+            queries.append(name[:5])
+        else:
+            queries.append(rng.choice(synonyms))
+    return queries
+
+
+def time_queries(search, queries):
+    """Per-query latencies in microseconds."""
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        search(q)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BNFIndex.search")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries")
+    parser.add_argument("--repeat", type=int, default=3, help="Warm passes over the same queries")
+    args = parser.parse_args()
+
+    load_start = time.perf_counter()
+    index = BNFIndex()
+    load_ms = (time.perf_counter() - load_start) * 1000
+    queries = build_queries(index, args.queries)
+
+    print(f"Index: {len(index.drugs)} drugs (load + build {load_ms:.0f}ms), queries: {len(queries)}\n")
+
+    legacy = time_queries(lambda q: legacy_search(index, q), queries)
+
+    index.clear_search_cache()
+    cold = time_queries(index.search, queries)
+
+    warm = []
+    for _ in range(args.repeat):
+        warm.extend(time_queries(index.search, queries))
+
+    def row(label, latencies):
+        p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1]
+        print(f"{label:<18} {statistics.mean(latencies):>10.1f}µs {statistics.median(latencies):>10.1f}µs {p95:>10.1f}µs")
+
+    print(f"{'implementation':<18} {'mean':>12} {'median':>12} {'p95':>12}")
+    row("legacy (difflib)", legacy)
+    row("trigram (cold)", cold)
+    row("trigram (warm LRU)", warm)
+
+    print(f"\nSpeedup (cold): {statistics.mean(legacy) / statistics.mean(cold):.1f}x")
+    print(f"Speedup (warm): {statistics.mean(legacy) / statistics.mean(warm):.1f}x")
+
+    index.clear_search_cache()
+    agree = 0
+    for q in queries:
+        old = legacy_search(index, q)
+        new = index.search(q)
+        if (old[0]['slug'] if old else None) == (new[0]['slug'] if new else None):
+            agree += 1
+    print(f"Top-1 agreement with legacy: {agree}/{len(queries)} ({agree / len(queries):.1%})")
+
+
+if __name__ == "__main__":
+    main()
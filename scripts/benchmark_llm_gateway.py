@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+LLM Gateway Concurrency Benchmark
+
+Fires N concurrent /api/analyze-stream requests against the in-process FastAPI
+app and measures wall-clock time to the final "done" event.
+
+Claude is simulated with a fixed latency so the benchmark runs offline and
+isolates the effect of the event loop:
+- async:    latency simulated with `await asyncio.sleep` (AsyncAnthropic via the gateway)
+- blocking: latency simulated with `time.sleep` (the old synchronous Anthropic client)
+
+With the async gateway N requests should finish in roughly the time of one;
+with blocking calls they serialise and take ~N times as long.
+
+Usage:
+    python scripts/benchmark_llm_gateway.py
+    python scripts/benchmark_llm_gateway.py --requests 8 --latency 0.5
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from unittest.mock import MagicMock, PropertyMock, patch
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark-key")
+os.environ.setdefault("SCRAPEOPS_API_KEY", "benchmark-key")
+# Don't let the per-region MCP pool limit serialise requests - we're measuring the LLM path
+os.environ.setdefault("MCP_POOL_MAX_SESSIONS_PER_REGION", "64")
+
+import httpx
+
+
+DIAGNOSES_RESPONSE = json.dumps({
+    "diagnoses": [{"diagnosis": "Community-acquired pneumonia", "confidence": "high"}]
+})
+
+
+def make_fake_client(latency: float, blocking: bool) -> MagicMock:
+    """Build a fake AsyncAnthropic client whose messages.create takes `latency` seconds."""
+    response = MagicMock()
+    response.stop_reason = "end_turn"
+    response.content = [MagicMock(text=DIAGNOSES_RESPONSE)]
+    response.usage = None
+
+    async def create(**kwargs):
+        if blocking:
+            time.sleep(latency)  # Blocks the event loop like the sync SDK did
+        else:
+            await asyncio.sleep(latency)
+        return response
+
+    fake_client = MagicMock()
+    fake_client.messages.create = create
+    return fake_client
+
+
+async def run_requests(app, n: int) -> float:
+    """Run n concurrent analyze-stream requests and return elapsed seconds."""
+    transport = httpx.ASGITransport(app=app)
+
+    async def one_request(i: int):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as http:
+            async with http.stream("POST", "/api/analyze-stream", json={
+                "consultation": f"72-year-old with productive cough and fever (request {i})",
+                "location_override": "GB",
+            }) as response:
+                async for line in response.aiter_lines():
+                    if line.startswith("event: done"):
+                        return
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one_request(i) for i in range(n)])
+    return time.perf_counter() - start
+
+
+async def benchmark(n: int, latency: float):
+    """Benchmark async vs blocking LLM calls."""
+    from api import app, lifespan
+    from clinical_decision_support.client import ClinicalDecisionSupportClient
+
+    async def no_connect(self, country_code=None, verbose=True):
+        return None
+
+    print(f"Simulated Claude latency: {latency:.2f}s, concurrent requests: {n}\n")
+
+    results = {}
+    with patch('google.cloud.storage.Client'), \
+         patch.object(ClinicalDecisionSupportClient, 'connect_to_servers', no_connect):
+        async with lifespan(app):
+            for mode in ("blocking", "async"):
+                fake_client = make_fake_client(latency, blocking=(mode == "blocking"))
+                with patch('servers.utils.llm_gateway.LLMGateway.client',
+                           new_callable=PropertyMock, return_value=fake_client):
+                    single = await run_requests(app, 1)
+                    concurrent = await run_requests(app, n)
+                results[mode] = (single, concurrent)
+
+    print(f"{'mode':<10} {'1 request':>12} {f'{n} requests':>14} {'ratio':>8}")
+    for mode, (single, concurrent) in results.items():
+        print(f"{mode:<10} {single:>11.2f}s {concurrent:>13.2f}s {concurrent / single:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent /api/analyze-stream requests")
+    parser.add_argument("--requests", type=int, default=5, help="Number of concurrent requests")
+    parser.add_argument("--latency", type=float, default=1.0, help="Simulated Claude latency (seconds)")
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.requests, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+MCP Transport Benchmark
+
+Compares the two MCP transports against a real first-party server
+(patient_info, no API keys or network needed):
+- stdio:     `fastmcp run` subprocess + JSON-RPC over pipes
+- inprocess: FastMCP server mounted in this process, tool calls as coroutines
+
+Measures:
+- connect time:      time to get an initialized session (incl. list_tools)
+- per-call overhead: mean latency of a trivial tool call (get_current_season)
+
+Usage:
+    python scripts/benchmark_mcp_transport.py
+    python scripts/benchmark_mcp_transport.py --connects 3 --calls 200
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from contextlib import AsyncExitStack
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "servers"))
+
+os.environ.setdefault("SCRAPEOPS_API_KEY", "benchmark-key")
+
+from servers.clinical_decision_support.config import MCP_SERVERS
+from servers.utils.mcp_transport import connect_mcp_server, STDIO, INPROCESS
+
+
+SERVER_NAME = "patient_info"
+TOOL_NAME = "get_current_season"
+
+
+async def benchmark_transport(transport: str, connects: int, calls: int):
+    """Return (connect times, call times) in seconds for one transport."""
+    server_path = MCP_SERVERS[SERVER_NAME]
+    connect_times = []
+    call_times = []
+
+    for i in range(connects):
+        async with AsyncExitStack() as exit_stack:
+            start = time.perf_counter()
+            session = await connect_mcp_server(
+                exit_stack, SERVER_NAME, server_path, transport=transport, verbose=True
+            )
+            await session.list_tools()
+            connect_times.append(time.perf_counter() - start)
+
+            # Measure calls on the last connection only
+            if i == connects - 1:
+                await session.call_tool(TOOL_NAME, {})  # warm-up
+                for _ in range(calls):
+                    start = time.perf_counter()
+                    result = await session.call_tool(TOOL_NAME, {})
+                    call_times.append(time.perf_counter() - start)
+                assert not result.isError, result.content
+
+    return connect_times, call_times
+
+
+async def benchmark(connects: int, calls: int):
+    """Benchmark stdio vs in-process transports."""
+    print(f"Server: {SERVER_NAME}, tool: {TOOL_NAME}, connects: {connects}, calls: {calls}\n")
+
+    results = {}
+    for transport in (STDIO, INPROCESS):
+        results[transport] = await benchmark_transport(transport, connects, calls)
+
+    print(f"{'transport':<10} {'connect (mean)':>15} {'call (mean)':>13} {'call (p95)':>12} {f'{calls} calls':>12}")
+    for transport, (connect_times, call_times) in results.items():
+        p95 = sorted(call_times)[int(len(call_times) * 0.95) - 1]
+        print(
+            f"{transport:<10} "
+            f"{statistics.mean(connect_times) * 1000:>13.1f}ms "
+            f"{statistics.mean(call_times) * 1000:>11.2f}ms "
+            f"{p95 * 1000:>10.2f}ms "
+            f"{sum(call_times):>11.2f}s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark stdio vs in-process MCP transports")
+    parser.add_argument("--connects", type=int, default=3, help="Number of connects per transport")
+    parser.add_argument("--calls", type=int, default=100, help="Number of tool calls per transport")
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.connects, args.calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+PDF Rendering Benchmark
+
+Measures consultation-PDF latency (HTML in, PDF bytes out) for:
+
+- legacy: the old generate_pdf_from_react path - start Playwright, launch a
+          new Chromium, render, close it, for every PDF
+- pooled: generate_pdf_from_react leasing a page from the warm BrowserPool
+
+PDFs are rendered one at a time and then N at once (as when several doctors
+download at the same moment). The pooled run reports how many browsers were
+launched in total; the legacy path launches one per PDF.
+
+Requires Playwright with Chromium installed (`playwright install chromium`).
+
+Usage:
+    python scripts/benchmark_pdf_rendering.py
+    python scripts/benchmark_pdf_rendering.py --concurrent 8 --rounds 3 --browsers 2
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playwright.async_api import async_playwright
+
+import pdf_generator_headless
+from pdf_generator_headless import build_html_template, generate_pdf_from_react, get_default_clinic_branding
+from servers.utils.browser_pool import BrowserPool
+
+
+SAMPLE_SCHEMA = {
+    "history": {"fields": [{"name": "presenting_complaint", "label": "Presenting complaint", "type": "textarea"}]},
+    "examination": {"fields": [{"name": "blood_pressure", "label": "Blood pressure", "type": "text"}]},
+}
+SAMPLE_DATA = {
+    "history": {"presenting_complaint": "Headache for three days, worse in the mornings."},
+    "examination": {"blood_pressure": "128/84"},
+}
+
+
+def build_sample_html() -> str:
+    branding = get_default_clinic_branding()
+    return build_html_template(
+        component_name="PdfConsultationForm",
+        props_data={
+            "formSchema": SAMPLE_SCHEMA,
+            "formData": SAMPLE_DATA,
+            "patientInfo": {"name": "Test Patient", "age": 42, "sex": "F"},
+            "appointmentInfo": {"scheduled_time": "2026-01-01T09:00:00"},
+        },
+        clinic_branding=branding,
+    )
+
+
+async def legacy_render(html: str) -> bytes:
+    """The previous launch-a-browser-per-PDF path."""
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=['--no-sandbox', '--disable-setuid-sandbox'])
+        page = await browser.new_page()
+        await page.set_viewport_size({"width": 1200, "height": 1600})
+        await page.set_content(html, wait_until="networkidle")
+        await page.wait_for_timeout(1000)
+        pdf_bytes = await page.pdf(format="A4", print_background=True)
+        await browser.close()
+    return pdf_bytes
+
+
+async def pooled_render(html: str) -> bytes:
+    return (await generate_pdf_from_react(html, {"format": "A4"})).getvalue()
+
+
+async def run_batch(render, html: str, n: int):
+    """Render n PDFs concurrently; return (wall seconds, per-PDF latencies)."""
+    async def one():
+        start = time.perf_counter()
+        await render(html)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*[one() for _ in range(n)])
+    return time.perf_counter() - start, latencies
+
+
+async def benchmark(n: int, rounds: int, browsers: int, pages: int):
+    pool = BrowserPool(size=browsers, pages_per_browser=pages, queue_size=max(16, n))
+    pdf_generator_headless.get_browser_pool = lambda: pool
+    await pool.start()
+    html = build_sample_html()
+    modes = {"legacy": legacy_render, "pooled": pooled_render}
+
+    print(f"HTML: {len(html) / 1024:.1f} KB, pool: {browsers} browser(s) x {pages} pages, "
+          f"concurrent PDFs: {n}, rounds: {rounds}\n")
+    print(f"{'mode':<8} {'batch':>6} {'p50':>9} {'p95':>9} {'wall':>9}")
+
+    for batch in (1, n):
+        for mode, render in modes.items():
+            await render(html)  # warm up
+            latencies, walls = [], []
+            for _ in range(rounds):
+                wall, lat = await run_batch(render, html, batch)
+                latencies.extend(lat)
+                walls.append(wall)
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(f"{mode:<8} {batch:>6} {statistics.median(latencies) * 1000:>7.0f}ms {p95 * 1000:>7.0f}ms "
+                  f"{statistics.median(walls) * 1000:>7.0f}ms")
+
+    stats = pool.get_stats()
+    print(f"\nPooled: {stats['renders']} renders on {stats['launches']} browser launch(es), "
+          f"avg launch {stats['avg_launch_ms']:.0f}ms, avg queue wait {stats['avg_wait_ms']:.0f}ms")
+    await pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF rendering latency (per-PDF browser vs pool)")
+    parser.add_argument("--concurrent", type=int, default=4, help="Concurrent PDFs per batch")
+    parser.add_argument("--rounds", type=int, default=5, help="Batches per mode")
+    parser.add_argument("--browsers", type=int, default=1, help="Browsers in the pool")
+    parser.add_argument("--pages", type=int, default=2, help="Concurrent pages per pooled browser")
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.concurrent, args.rounds, args.browsers, args.pages))
+
+
+if __name__ == "__main__":
+    main()
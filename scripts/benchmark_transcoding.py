@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Audio Chunk Transcoding Benchmark
+
+Measures chunk-to-provider-ready latency: the time from receiving an uploaded
+WebM chunk to holding 16 kHz mono MP3 bytes ready to upload to Sarvam.
+
+- legacy: the old handler path - write the chunk to a temp file, blocking
+          `subprocess.run(['ffprobe', ...])` for logging, blocking
+          `subprocess.run(['ffmpeg', ...])` to an MP3 file, read it back
+- piped:  AudioTranscoder - bytes piped through ffmpeg stdin/stdout by
+          asyncio.create_subprocess_exec, no ffprobe, bounded worker pool
+
+Chunks are processed one at a time and then N at once (as when several
+recordings upload simultaneously). The legacy path blocks the event loop, so
+concurrent chunks serialise; the event-loop "stall" column shows the longest
+time a 10 ms ticker was starved while the batch ran.
+
+A test chunk (speech-like tone, Opus in WebM) is generated with ffmpeg unless
+--input is given.
+
+Usage:
+    python scripts/benchmark_transcoding.py
+    python scripts/benchmark_transcoding.py --chunks 8 --duration 30
+    python scripts/benchmark_transcoding.py --input recording.webm
+"""
+
+import os
+import sys
+import time
+import shutil
+import asyncio
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from servers.utils.audio_transcoder import AudioTranscoder, MP3_16K_MONO
+
+HAVE_FFPROBE = shutil.which('ffprobe') is not None
+
+
+def make_test_chunk(duration: float) -> bytes:
+    """Generate a WebM/Opus chunk like the browser MediaRecorder produces."""
+    with tempfile.NamedTemporaryFile(suffix='.webm') as f:
+        subprocess.run(
+            ['ffmpeg', '-loglevel', 'error', '-y', '-f', 'lavfi',
+             '-i', f'sine=frequency=220:duration={duration}:sample_rate=48000',
+             '-af', 'tremolo=f=4:d=0.8', '-ac', '2', '-c:a', 'libopus', '-b:a', '48k', f.name],
+            check=True
+        )
+        return open(f.name, 'rb').read()
+
+
+async def legacy_transcode(data: bytes) -> bytes:
+    """The previous blocking temp-file + ffprobe + ffmpeg path."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as temp_file:
+        temp_file.write(data)
+        webm_path = temp_file.name
+    mp3_path = webm_path.replace('.webm', '.mp3')
+    try:
+        if HAVE_FFPROBE:
+            subprocess.run(
+                ['ffprobe', '-v', 'error', '-show_format', '-show_streams', webm_path],
+                capture_output=True, text=True, timeout=10
+            )
+        subprocess.run(
+            ['ffmpeg', '-i', webm_path, '-ar', '16000', '-ac', '1', '-vn', '-acodec', 'libmp3lame',
+             '-b:a', '64k', '-nostdin', '-y', mp3_path],
+            capture_output=True, text=True, timeout=30, check=True
+        )
+        with open(mp3_path, 'rb') as f:
+            return f.read()
+    finally:
+        for path in (webm_path, mp3_path):
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+async def run_batch(transcode, data: bytes, n: int):
+    """Transcode n copies concurrently; return (wall seconds, per-chunk latencies, max loop stall)."""
+    stall = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal stall
+        while running:
+            before = time.perf_counter()
+            await asyncio.sleep(0.01)
+            stall = max(stall, time.perf_counter() - before - 0.01)
+
+    async def one():
+        start = time.perf_counter()
+        await transcode(data)
+        return time.perf_counter() - start
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*[one() for _ in range(n)])
+    elapsed = time.perf_counter() - start
+    running = False
+    await tick
+    return elapsed, latencies, stall
+
+
+async def benchmark(data: bytes, n: int, rounds: int, workers: int):
+    transcoder = AudioTranscoder(max_workers=workers)
+    modes = {"legacy": legacy_transcode, "piped": lambda d: transcoder.transcode(d, MP3_16K_MONO)}
+    if not HAVE_FFPROBE:
+        print("⚠️  ffprobe not found - legacy path will skip the probe step (understates its cost)\n")
+
+    print(f"Chunk: {len(data) / 1024:.1f} KB, workers: {workers}, concurrent chunks: {n}, rounds: {rounds}\n")
+    print(f"{'mode':<8} {'batch':>6} {'p50':>9} {'p95':>9} {'wall':>9} {'loop stall':>11}")
+
+    for batch in (1, n):
+        for mode, transcode in modes.items():
+            await transcode(data)  # warm up (page cache, ffmpeg binary)
+            latencies, walls, stalls = [], [], []
+            for _ in range(rounds):
+                wall, lat, stall = await run_batch(transcode, data, batch)
+                latencies.extend(lat)
+                walls.append(wall)
+                stalls.append(stall)
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            print(f"{mode:<8} {batch:>6} {statistics.median(latencies) * 1000:>7.0f}ms {p95 * 1000:>7.0f}ms "
+                  f"{statistics.median(walls) * 1000:>7.0f}ms {max(stalls) * 1000:>9.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunk-to-provider-ready transcoding latency")
+    parser.add_argument("--chunks", type=int, default=4, help="Concurrent chunks per batch")
+    parser.add_argument("--rounds", type=int, default=5, help="Batches per mode")
+    parser.add_argument("--duration", type=float, default=30.0, help="Generated chunk length (seconds)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Transcoder worker pool size")
+    parser.add_argument("--input", help="Use this audio file instead of a generated chunk")
+    args = parser.parse_args()
+
+    if shutil.which('ffmpeg') is None:
+        sys.exit("ffmpeg is required for this benchmark")
+
+    if args.input:
+        with open(args.input, 'rb') as f:
+            data = f.read()
+    else:
+        data = make_test_chunk(args.duration)
+
+    asyncio.run(benchmark(data, args.chunks, args.rounds, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,7 @@ Features:
 import os
 import sys
 import json
+import asyncio
 import argparse
 from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Any, Optional
@@ -35,8 +36,8 @@ load_dotenv()
 
 
 def get_supabase_client():
-    """Initialize and return Supabase client."""
-    from supabase import create_client
+    """Return the shared pooled Supabase client."""
+    from servers.utils.supabase_db import get_db
 
     supabase_url = os.getenv("SUPABASE_URL")
     supabase_key = os.getenv("SUPABASE_SERVICE_KEY")
@@ -44,10 +45,10 @@ def get_supabase_client():
     if not supabase_url or not supabase_key:
         raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in .env")
 
-    return create_client(supabase_url, supabase_key)
+    return get_db(supabase_url, supabase_key)
 
 
-def fetch_feedback_data(
+async def fetch_feedback_data(
     supabase,
     days: Optional[int] = None,
     feedback_type: Optional[str] = None
@@ -90,7 +91,7 @@ def fetch_feedback_data(
         query = query.eq('feedback_type', feedback_type)
 
     # Execute query
-    result = query.order('created_at', desc=False).execute()
+    result = await query.order('created_at', desc=False).execute()
 
     print(f"✅ Fetched {len(result.data)} feedback records")
     return result.data
@@ -339,11 +340,11 @@ Examples:
         supabase = get_supabase_client()
 
         # Fetch data
-        feedback_records = fetch_feedback_data(
+        feedback_records = asyncio.run(fetch_feedback_data(
             supabase,
             days=args.days,
             feedback_type=args.type
-        )
+        ))
 
         if not feedback_records:
             print("⚠️  No feedback data found matching the criteria")
@@ -7,6 +7,7 @@ Claude AI analysis, and MCP server orchestration.
 Main exports:
     - ClinicalDecisionSupportClient: Main client class for clinical decision support
     - ConsultationSummary: Standalone consultation summarization with diarization support
+    - MCPSessionPool: Per-region pool of warm MCP sessions checked out per request
     - RegionalSearchService: Service for region-specific guideline searches
     - ResourceType, REGION_CONFIGS: Configuration classes and constants
 """
@@ -23,6 +24,7 @@ from .config import (
 )
 from .regional_search import RegionalSearchService
 from .client import ClinicalDecisionSupportClient
+from .session_pool import MCPSessionPool
 from .summary import ConsultationSummary
 
 __version__ = "1.0.0"
@@ -40,5 +42,6 @@ __all__ = [
     # Classes
     'RegionalSearchService',
     'ClinicalDecisionSupportClient',
+    'MCPSessionPool',
     'ConsultationSummary',
 ]
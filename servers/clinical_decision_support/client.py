@@ -9,6 +9,7 @@ DrugInfoRetriever classes.
 import json
 import os
 import httpx
+from contextlib import aclosing
 from typing import Dict, List, Any, Optional, Callable
 
 from .diagnosis_engine import DiagnosisEngine
@@ -426,8 +427,8 @@ class ClinicalDecisionSupportClient:
         """
         Phase 2: Stream drug lookups as an async generator.
 
-        Yields drug_update events as each drug lookup completes,
-        allowing the API to stream them to the client in real-time.
+        Yields drug_update events in completion order as each drug lookup
+        finishes, allowing the API to stream them to the client in real-time.
         """
         if not drugs_to_lookup:
             return
@@ -435,76 +436,26 @@ class ClinicalDecisionSupportClient:
         if verbose:
             print(f"\n[DrugLookup] Streaming {len(drugs_to_lookup)} drug lookups...")
 
-        from .drug_info_retriever import get_bnf_index, fetch_bnf_drug_info
-        index = get_bnf_index()
-
-        for drug_obj in drugs_to_lookup:
-            drug_name = drug_obj.get('drug_name', '')
-            if not drug_name:
-                continue
-
-            try:
-                # Step 1: Search local index for slug
-                matches = index.search(drug_name, limit=1)
-
-                if not matches:
-                    if verbose:
-                        print(f"   [DrugLookup] {drug_name}: Not in BNF index")
+        # Lookups run concurrently; each event is yielded as its drug completes.
+        # Closing this generator (client disconnect) cancels the rest.
+        lookups = self.drug_retriever.stream_drugs_with_context(
+            drugs_to_lookup, patient_context, verbose=verbose
+        )
+        async with aclosing(lookups):
+            async for result in lookups:
+                if result.get('status') == 'success':
                     yield {
-                        'drug_name': drug_name,
-                        'status': 'failed',
-                        'error': f'Drug "{drug_name}" not found in BNF index'
+                        'drug_name': result['drug_name'],
+                        'status': 'complete',
+                        'source': result.get('source', 'bnf'),
+                        'details': result.get('details')
                     }
-                    continue
-
-                slug = matches[0]['slug']
-                matched_name = matches[0]['name']
-
-                if verbose:
-                    print(f"   [DrugLookup] {drug_name} -> {matched_name}")
-
-                # Step 2: Fetch raw BNF data directly
-                drug_url = f"https://bnf.nice.org.uk/drugs/{slug}/"
-                if verbose:
-                    print(f"   [DrugLookup] Fetching BNF data for {slug}...")
-
-                bnf_data = fetch_bnf_drug_info(drug_url)
-
-                if not bnf_data.get('success'):
+                else:
                     yield {
-                        'drug_name': drug_name,
+                        'drug_name': result['drug_name'],
                         'status': 'failed',
-                        'error': bnf_data.get('error', 'Failed to fetch BNF data')
-                    }
-                    continue
-
-                # Step 3: Personalize with Claude
-                if verbose:
-                    print(f"   [DrugLookup] Personalizing {matched_name} for patient...")
-
-                personalized_data = await self.drug_retriever._personalize_drug_for_patient(
-                    bnf_data, patient_context, verbose
-                )
-
-                yield {
-                    'drug_name': drug_name,
-                    'status': 'complete',
-                    'source': 'bnf',
-                    'details': {
-                        'drug_name': personalized_data.get('drug_name', matched_name),
-                        'url': bnf_data.get('url'),
-                        'bnf_data': personalized_data
+                        'error': result.get('error', 'Unknown error')
                     }
-                }
-
-            except Exception as e:
-                if verbose:
-                    print(f"   [DrugLookup] Error for {drug_name}: {e}")
-                yield {
-                    'drug_name': drug_name,
-                    'status': 'failed',
-                    'error': str(e)
-                }
 
     def _extract_drugs_from_diagnoses(self, diagnoses: List[dict]) -> List[dict]:
         """
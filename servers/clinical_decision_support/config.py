@@ -5,11 +5,14 @@ Contains all configuration constants, enums, and region-specific settings
 for the clinical decision support workflow.
 """
 
+import os
 from pathlib import Path
 from typing import Dict, List, Any
 from dataclasses import dataclass
 from enum import Enum
 
+from servers.utils.mcp_transport import transport_for
+
 
 # ============================================================================
 # Configuration-Driven Regional Search System
@@ -166,6 +169,20 @@ MCP_SERVERS = {
     "scopus": str(SERVERS_DIR / "medical_literature" / "scopus_server.py")  # Scopus with quartile filtering
 }
 
+# MCP transport per server:
+# - "inprocess": mount the FastMCP server object in the API process (tool calls are coroutine calls)
+# - "stdio": spawn a `fastmcp run --transport stdio` subprocess per session
+# Default via MCP_TRANSPORT, override per server via MCP_TRANSPORT_<NAME> (e.g. MCP_TRANSPORT_BNF=stdio)
+MCP_TRANSPORTS = {name: transport_for(name) for name in MCP_SERVERS}
+
+# Parallel tool_use execution: max tool calls dispatched at once per Claude turn,
+# and how long a single tool call may take before it is reported back as an error
+TOOL_CALL_CONCURRENCY = int(os.getenv("TOOL_CALL_CONCURRENCY", "4"))
+TOOL_CALL_TIMEOUT = float(os.getenv("TOOL_CALL_TIMEOUT_SECONDS", "30"))
+
+# Maximum drugs looked up (BNF fetch + personalization) at once per analysis
+DRUG_LOOKUP_CONCURRENCY = int(os.getenv("DRUG_LOOKUP_CONCURRENCY", "4"))
+
 # Region-specific server mapping (generated from REGION_CONFIGS)
 REGION_SERVERS = {}
 for region_key, config in REGION_CONFIGS.items():
@@ -195,6 +212,10 @@ __all__ = [
     'COUNTRY_TO_REGION',
     'SERVERS_DIR',
     'MCP_SERVERS',
+    'MCP_TRANSPORTS',
+    'TOOL_CALL_CONCURRENCY',
+    'TOOL_CALL_TIMEOUT',
+    'DRUG_LOOKUP_CONCURRENCY',
     'REGION_SERVERS',
     'GUIDELINE_SERVERS',
     'RESEARCH_SERVERS',
@@ -11,14 +11,16 @@ import json
 import os
 from pathlib import Path
 from contextlib import AsyncExitStack
-from anthropic import Anthropic
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from servers.utils.llm_gateway import get_llm_gateway, cached_system_prompt
+from servers.utils.mcp_transport import connect_mcp_server, STDIO
+from mcp import ClientSession
 from typing import Dict, List, Any, Optional, Tuple
 
-from .config import MCP_SERVERS, REGION_SERVERS, GUIDELINE_SERVERS
+from .config import MCP_SERVERS, MCP_TRANSPORTS, REGION_SERVERS, GUIDELINE_SERVERS
+from .utils import execute_tool_uses
 from .prompts import (
     get_clinical_validation_prompt,
+    DIAGNOSIS_ANALYSIS_INSTRUCTIONS,
     get_diagnosis_analysis_prompt,
     get_pubmed_fallback_prompt,
     get_literature_fallback_prompt,
@@ -57,7 +59,7 @@ class DiagnosisEngine:
         self.current_region: Optional[str] = None
 
         api_key = anthropic_api_key or os.getenv("ANTHROPIC_API_KEY")
-        self.anthropic = Anthropic(api_key=api_key) if api_key else None
+        self.llm = get_llm_gateway(api_key) if api_key else None
 
     async def connect_guideline_servers(self, country_code: Optional[str] = None, verbose: bool = True):
         """
@@ -112,23 +114,15 @@ class DiagnosisEngine:
         self.current_region = normalized_code
 
     async def _connect_single_server(self, server_name: str, server_path: str, verbose: bool = True):
-        """Connect to a single MCP server."""
+        """Connect to a single MCP server (in-process or stdio, per MCP_TRANSPORTS)."""
         try:
-            server_params = StdioServerParameters(
-                command="fastmcp",
-                args=["run", server_path, "--transport", "stdio", "--no-banner"],
-                env=os.environ.copy()
+            session = await connect_mcp_server(
+                self.exit_stack,
+                server_name,
+                server_path,
+                transport=MCP_TRANSPORTS.get(server_name, STDIO),
+                verbose=verbose
             )
-
-            stdio_transport = await self.exit_stack.enter_async_context(
-                stdio_client(server_params)
-            )
-            stdio, write = stdio_transport
-            session = await self.exit_stack.enter_async_context(
-                ClientSession(stdio, write)
-            )
-
-            await session.initialize()
             self.sessions[server_name] = session
 
         except Exception as e:
@@ -248,13 +242,13 @@ class DiagnosisEngine:
             print(f"   [DiagnosisEngine] Input validation: DISABLED - All inputs accepted")
         return (True, None)
 
-        if not self.anthropic:
+        if not self.llm:
             return (True, None)
 
         try:
             validation_prompt = get_clinical_validation_prompt(clinical_scenario)
 
-            message = self.anthropic.messages.create(
+            message = await self.llm.create_message(
                 model="claude-haiku-4-5",
                 max_tokens=200,
                 messages=[{"role": "user", "content": validation_prompt}]
@@ -324,28 +318,33 @@ class DiagnosisEngine:
             - diagnoses: List of diagnosis dictionaries
             - tool_calls: List of tool calls made (for progress reporting)
         """
-        if not self.anthropic:
+        if not self.llm:
             if verbose:
-                print(f"   [DiagnosisEngine] ERROR: No Anthropic client!")
+                print("   [DiagnosisEngine] ERROR: No Anthropic client!")
             return [], []
 
         tools = await self.get_guideline_tools()
 
         if verbose:
             print(f"   [DiagnosisEngine] Available tools: {len(tools)}")
-            print(f"   [DiagnosisEngine] Anthropic client initialized: {self.anthropic is not None}")
+            print(f"   [DiagnosisEngine] LLM gateway available: {self.llm is not None}")
 
+        # Static instructions are a cached system prefix (after the tool definitions);
+        # only the consultation changes between calls and tool-loop turns
+        system = cached_system_prompt(DIAGNOSIS_ANALYSIS_INSTRUCTIONS)
         prompt = get_diagnosis_analysis_prompt(clinical_scenario)
         messages = [{"role": "user", "content": prompt}]
         diagnoses = []
         tool_calls = []
 
         try:
-            response = self.anthropic.messages.create(
+            response = await self.llm.create_message(
                 model="claude-haiku-4-5",
                 max_tokens=8192,
+                system=system,
                 tools=tools,
-                messages=messages
+                messages=messages,
+                prompt_name="guideline_analysis"
             )
 
             if verbose:
@@ -353,38 +352,33 @@ class DiagnosisEngine:
 
             # Tool use loop
             while response.stop_reason == "tool_use":
-                tool_results = []
-                for content_block in response.content:
-                    if content_block.type == "tool_use":
-                        tool_name = content_block.name
-                        tool_input = content_block.input
-
-                        if verbose:
-                            print(f"   [DiagnosisEngine] Calling tool: {tool_name}")
-
-                        # Track tool call for progress reporting
-                        tool_calls.append({
-                            "tool_name": tool_name,
-                            "tool_input": tool_input
-                        })
-
-                        result = await self.call_tool(tool_name, tool_input)
-                        result_text = result.content[0].text
-
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": content_block.id,
-                            "content": result_text
-                        })
+                tool_use_blocks = [b for b in response.content if b.type == "tool_use"]
+                for content_block in tool_use_blocks:
+                    tool_name = content_block.name
+                    tool_input = content_block.input
+
+                    if verbose:
+                        print(f"   [DiagnosisEngine] Calling tool: {tool_name}")
+
+                    # Track tool call for progress reporting
+                    tool_calls.append({
+                        "tool_name": tool_name,
+                        "tool_input": tool_input
+                    })
+
+                # Run this turn's tool calls concurrently (results keep tool_use order)
+                tool_results = await execute_tool_uses(self.call_tool, tool_use_blocks)
 
                 messages.append({"role": "assistant", "content": response.content})
                 messages.append({"role": "user", "content": tool_results})
 
-                response = self.anthropic.messages.create(
+                response = await self.llm.create_message(
                     model="claude-haiku-4-5",
                     max_tokens=8192,
+                    system=system,
                     tools=tools,
-                    messages=messages
+                    messages=messages,
+                    prompt_name="guideline_analysis"
                 )
 
             # Extract final JSON response
@@ -434,7 +428,7 @@ class DiagnosisEngine:
         Returns:
             Tuple of (diagnoses, tool_calls).
         """
-        if not self.anthropic:
+        if not self.llm:
             return existing_diagnoses, []
 
         pubmed_tools = await self.get_pubmed_tools()
@@ -449,7 +443,7 @@ class DiagnosisEngine:
         tool_calls = []
 
         try:
-            response = self.anthropic.messages.create(
+            response = await self.llm.create_message(
                 model="claude-haiku-4-5",
                 max_tokens=8192,
                 tools=pubmed_tools,
@@ -458,33 +452,26 @@ class DiagnosisEngine:
 
             # Tool use loop
             while response.stop_reason == "tool_use":
-                tool_results = []
-                for content_block in response.content:
-                    if content_block.type == "tool_use":
-                        tool_name = content_block.name
-                        tool_input = content_block.input
-
-                        if verbose:
-                            print(f"   [DiagnosisEngine] PubMed tool: {tool_name}")
+                tool_use_blocks = [b for b in response.content if b.type == "tool_use"]
+                for content_block in tool_use_blocks:
+                    tool_name = content_block.name
+                    tool_input = content_block.input
 
-                        tool_calls.append({
-                            "tool_name": tool_name,
-                            "tool_input": tool_input
-                        })
+                    if verbose:
+                        print(f"   [DiagnosisEngine] PubMed tool: {tool_name}")
 
-                        result = await self.call_tool(tool_name, tool_input)
-                        result_text = result.content[0].text
+                    tool_calls.append({
+                        "tool_name": tool_name,
+                        "tool_input": tool_input
+                    })
 
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": content_block.id,
-                            "content": result_text
-                        })
+                # Run this turn's tool calls concurrently (results keep tool_use order)
+                tool_results = await execute_tool_uses(self.call_tool, tool_use_blocks)
 
                 messages.append({"role": "assistant", "content": response.content})
                 messages.append({"role": "user", "content": tool_results})
 
-                response = self.anthropic.messages.create(
+                response = await self.llm.create_message(
                     model="claude-haiku-4-5",
                     max_tokens=8192,
                     tools=pubmed_tools,
@@ -550,7 +537,7 @@ class DiagnosisEngine:
         Returns:
             Tuple of (diagnoses, tool_calls).
         """
-        if not self.anthropic:
+        if not self.llm:
             return existing_diagnoses, []
 
         all_tool_calls = []
@@ -667,7 +654,7 @@ class DiagnosisEngine:
         diagnoses = []
 
         try:
-            response = self.anthropic.messages.create(
+            response = await self.llm.create_message(
                 model="claude-haiku-4-5",
                 max_tokens=8192,
                 tools=tools,
@@ -676,33 +663,26 @@ class DiagnosisEngine:
 
             # Tool use loop
             while response.stop_reason == "tool_use":
-                tool_results = []
-                for content_block in response.content:
-                    if content_block.type == "tool_use":
-                        tool_name = content_block.name
-                        tool_input = content_block.input
-
-                        if verbose:
-                            print(f"   [DiagnosisEngine] {source_name} calling: {tool_name}")
+                tool_use_blocks = [b for b in response.content if b.type == "tool_use"]
+                for content_block in tool_use_blocks:
+                    tool_name = content_block.name
+                    tool_input = content_block.input
 
-                        tool_calls.append({
-                            "tool_name": tool_name,
-                            "tool_input": tool_input
-                        })
+                    if verbose:
+                        print(f"   [DiagnosisEngine] {source_name} calling: {tool_name}")
 
-                        result = await self.call_tool(tool_name, tool_input)
-                        result_text = result.content[0].text
+                    tool_calls.append({
+                        "tool_name": tool_name,
+                        "tool_input": tool_input
+                    })
 
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": content_block.id,
-                            "content": result_text
-                        })
+                # Run this turn's tool calls concurrently (results keep tool_use order)
+                tool_results = await execute_tool_uses(self.call_tool, tool_use_blocks)
 
                 messages.append({"role": "assistant", "content": response.content})
                 messages.append({"role": "user", "content": tool_results})
 
-                response = self.anthropic.messages.create(
+                response = await self.llm.create_message(
                     model="claude-haiku-4-5",
                     max_tokens=8192,
                     tools=tools,
@@ -14,16 +14,19 @@ import os
 import re
 from pathlib import Path
 from contextlib import AsyncExitStack
-from anthropic import Anthropic
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from servers.utils.llm_gateway import get_llm_gateway, cached_system_prompt
+from servers.utils.mcp_transport import connect_mcp_server, STDIO
+from mcp import ClientSession
 from typing import Dict, List, Any, Optional
 
-from .config import MCP_SERVERS, REGION_SERVERS, DRUG_SERVERS
+from .config import MCP_SERVERS, MCP_TRANSPORTS, REGION_SERVERS, DRUG_SERVERS, DRUG_LOOKUP_CONCURRENCY
 from .prompts import (
     get_drug_validation_prompt,
     get_drug_info_generation_prompt,
+    PATIENT_TAILORED_DRUG_INSTRUCTIONS,
     get_patient_tailored_drug_prompt,
+    DRUG_PERSONALIZATION_INSTRUCTIONS,
+    get_drug_personalization_prompt,
 )
 
 # Import BNF functions directly for local fuzzy search and drug fetch (no MCP call needed)
@@ -53,7 +56,7 @@ class DrugInfoRetriever:
         self.current_region: Optional[str] = None
 
         api_key = anthropic_api_key or os.getenv("ANTHROPIC_API_KEY")
-        self.anthropic = Anthropic(api_key=api_key) if api_key else None
+        self.llm = get_llm_gateway(api_key) if api_key else None
 
     async def connect_drug_servers(self, country_code: Optional[str] = None, verbose: bool = True):
         """
@@ -113,23 +116,15 @@ class DrugInfoRetriever:
         self.current_region = normalized_code
 
     async def _connect_single_server(self, server_name: str, server_path: str, verbose: bool = True):
-        """Connect to a single MCP server."""
+        """Connect to a single MCP server (in-process or stdio, per MCP_TRANSPORTS)."""
         try:
-            server_params = StdioServerParameters(
-                command="fastmcp",
-                args=["run", server_path, "--transport", "stdio", "--no-banner"],
-                env=os.environ.copy()
+            session = await connect_mcp_server(
+                self.exit_stack,
+                server_name,
+                server_path,
+                transport=MCP_TRANSPORTS.get(server_name, STDIO),
+                verbose=verbose
             )
-
-            stdio_transport = await self.exit_stack.enter_async_context(
-                stdio_client(server_params)
-            )
-            stdio, write = stdio_transport
-            session = await self.exit_stack.enter_async_context(
-                ClientSession(stdio, write)
-            )
-
-            await session.initialize()
             self.sessions[server_name] = session
 
         except Exception as e:
@@ -373,7 +368,7 @@ class DrugInfoRetriever:
         Returns:
             Drug result dictionary.
         """
-        if not self.anthropic:
+        if not self.llm:
             return {
                 'drug_name': drug_name,
                 'status': 'failed',
@@ -440,13 +435,13 @@ class DrugInfoRetriever:
         Returns:
             {'is_real': bool, 'reasoning': str, 'generic_name': str}
         """
-        if not self.anthropic:
+        if not self.llm:
             return {'is_real': False, 'reasoning': 'No Anthropic client', 'generic_name': ''}
 
         prompt = get_drug_validation_prompt(drug_name)
 
         try:
-            response = self.anthropic.messages.create(
+            response = await self.llm.create_message(
                 model="claude-haiku-4-5",
                 max_tokens=200,
                 messages=[{"role": "user", "content": prompt}]
@@ -480,7 +475,7 @@ class DrugInfoRetriever:
         Returns:
             BNF-compatible structure with 'source': 'llm'.
         """
-        if not self.anthropic:
+        if not self.llm:
             return {
                 'drug_name': drug_name,
                 'success': False,
@@ -492,7 +487,7 @@ class DrugInfoRetriever:
         prompt = get_drug_info_generation_prompt(drug_name, generic_name)
 
         try:
-            response = self.anthropic.messages.create(
+            response = await self.llm.create_message(
                 model="claude-haiku-4-5",
                 max_tokens=2048,
                 messages=[{"role": "user", "content": prompt}]
@@ -555,7 +550,7 @@ class DrugInfoRetriever:
         Returns:
             Dictionary with personalized prescribing guidance.
         """
-        if not self.anthropic:
+        if not self.llm:
             if verbose:
                 print(f"   [DrugInfoRetriever] No Anthropic client for tailoring {drug_name}")
             return {
@@ -571,10 +566,12 @@ class DrugInfoRetriever:
             if verbose:
                 print(f"   [DrugInfoRetriever] Tailoring {drug_name} to patient context...")
 
-            response = self.anthropic.messages.create(
+            response = await self.llm.create_message(
                 model="claude-haiku-4-5",
                 max_tokens=2048,
-                messages=[{"role": "user", "content": prompt}]
+                system=cached_system_prompt(PATIENT_TAILORED_DRUG_INSTRUCTIONS),
+                messages=[{"role": "user", "content": prompt}],
+                prompt_name="drug_tailoring"
             )
 
             response_text = response.content[0].text
@@ -627,10 +624,10 @@ class DrugInfoRetriever:
         Returns:
             Dictionary with personalized drug data in BNF format fields
         """
-        if not self.anthropic:
+        if not self.llm:
             # No API key - return raw data
             if verbose:
-                print(f"   [DrugInfoRetriever] No Anthropic API key - returning raw BNF data")
+                print("   [DrugInfoRetriever] No Anthropic API key - returning raw BNF data")
             return bnf_data
 
         # Format BNF sections for prompt
@@ -645,44 +642,18 @@ class DrugInfoRetriever:
 
         drug_name = bnf_data.get('drug_name', 'Unknown')
 
-        prompt = f"""You are a clinical pharmacist. Extract PERSONALIZED drug information for this specific patient.
-
-PATIENT:
-- Clinical Presentation: {patient_context.get('clinical_scenario', '')[:1500]}
-- Age: {patient_context.get('patient_age', 'Not specified')}
-- Allergies: {patient_context.get('allergies', 'None known')}
-- Diagnosis: {patient_context.get('diagnosis', 'Not specified')}
-
-DRUG: {drug_name}
-
-BNF DATA:
-{bnf_text[:3000]}
-
-Based on the patient's specific details, provide PERSONALIZED drug information. Consider:
-1. Age-appropriate dosing (select the correct dose for this patient's age)
-2. Route of administration appropriate for the condition
-3. Any relevant adjustments for comorbidities
-4. Drug interactions with any mentioned current medications
-5. Warnings specific to this patient's situation
-
-Return ONLY valid JSON with these exact fields:
-{{
-  "drug_name": "{drug_name}",
-  "dosage": "The specific dose for THIS patient - include dose amount, route (oral/IV/etc), frequency, and duration. Be specific, e.g., '1g orally every 6 hours for 5-7 days'",
-  "side_effects": "Key side effects this patient should watch for, considering their conditions",
-  "interactions": "Any drug interactions relevant to medications mentioned in the presentation, or 'None identified' if no other medications mentioned",
-  "cautions": "Patient-specific warnings based on their age, conditions, and allergies",
-  "success": true
-}}"""
+        prompt = get_drug_personalization_prompt(drug_name, bnf_text, patient_context)
 
         try:
             if verbose:
-                print(f"   [DrugInfoRetriever] Calling Claude Haiku for personalization...")
+                print("   [DrugInfoRetriever] Calling Claude Haiku for personalization...")
 
-            response = self.anthropic.messages.create(
+            response = await self.llm.create_message(
                 model="claude-haiku-4-5",
                 max_tokens=1500,
-                messages=[{"role": "user", "content": prompt}]
+                system=cached_system_prompt(DRUG_PERSONALIZATION_INSTRUCTIONS),
+                messages=[{"role": "user", "content": prompt}],
+                prompt_name="drug_personalization"
             )
 
             response_text = response.content[0].text
@@ -710,6 +681,132 @@ Return ONLY valid JSON with these exact fields:
             # Return raw BNF data as fallback
             return bnf_data
 
+    async def lookup_drug_with_context(
+        self,
+        drug_name: str,
+        patient_context: dict,
+        index: Optional[BNFIndex] = None,
+        verbose: bool = True
+    ) -> dict:
+        """
+        Look up and personalize a single drug (index search → BNF fetch → Claude).
+
+        The BNF fetch is blocking (requests + HTML parsing), so it runs in a
+        worker thread to keep the event loop free for the other lookups.
+
+        Returns:
+            Result dictionary with status 'success', 'not_found' or 'failed'.
+        """
+        index = index or get_bnf_index()
+
+        try:
+            # Step 1: Search local index for slug
+            matches = index.search(drug_name, limit=1)
+
+            if not matches:
+                if verbose:
+                    print(f"   [DrugInfoRetriever] {drug_name}: Not in BNF index")
+                return {
+                    'drug_name': drug_name,
+                    'status': 'not_found',
+                    'source': 'bnf',
+                    'error': f'Drug "{drug_name}" not found in BNF index'
+                }
+
+            slug = matches[0]['slug']
+            matched_name = matches[0]['name']
+
+            if verbose:
+                print(f"   [DrugInfoRetriever] {drug_name} -> {matched_name}")
+
+            # Step 2: Fetch raw BNF data directly (no MCP), off the event loop
+            drug_url = f"https://bnf.nice.org.uk/drugs/{slug}/"
+            if verbose:
+                print(f"   [DrugInfoRetriever] Fetching BNF data for {slug}...")
+
+            bnf_data = await asyncio.to_thread(fetch_bnf_drug_info, drug_url)
+
+            if not bnf_data.get('success'):
+                return {
+                    'drug_name': drug_name,
+                    'status': 'failed',
+                    'source': 'bnf',
+                    'error': bnf_data.get('error', 'Failed to fetch BNF data')
+                }
+
+            # Step 3: Personalize with Claude
+            if verbose:
+                print(f"   [DrugInfoRetriever] Personalizing {matched_name} for patient...")
+
+            personalized_data = await self._personalize_drug_for_patient(
+                bnf_data, patient_context, verbose
+            )
+
+            return {
+                'drug_name': drug_name,
+                'status': 'success',
+                'source': 'bnf',
+                'details': {
+                    'drug_name': personalized_data.get('drug_name', matched_name),
+                    'url': bnf_data.get('url'),
+                    'bnf_data': personalized_data  # Personalized data in BNF format
+                }
+            }
+
+        except Exception as e:
+            if verbose:
+                print(f"   [DrugInfoRetriever] Error with {drug_name}: {e}")
+            return {
+                'drug_name': drug_name,
+                'status': 'failed',
+                'source': 'bnf',
+                'error': str(e)
+            }
+
+    async def stream_drugs_with_context(
+        self,
+        drugs: List[dict],
+        patient_context: dict,
+        max_concurrency: int = DRUG_LOOKUP_CONCURRENCY,
+        verbose: bool = True
+    ):
+        """
+        Look up drugs concurrently and yield each result as soon as it completes.
+
+        At most max_concurrency lookups run at once. If the consumer stops
+        iterating (e.g. the SSE client disconnects), lookups still in flight
+        are cancelled.
+
+        Args:
+            drugs: List of drug objects with 'drug_name'.
+            patient_context: Patient context for personalization (see
+                             lookup_drugs_batch_with_context).
+            max_concurrency: Maximum drugs looked up at once.
+            verbose: Whether to print progress.
+
+        Yields:
+            Result dictionaries (as lookup_drug_with_context), in completion order.
+        """
+        drug_names = [d.get('drug_name', '') for d in drugs if d.get('drug_name')]
+        if not drug_names:
+            return
+
+        index = get_bnf_index()
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def bounded_lookup(drug_name: str) -> dict:
+            async with semaphore:
+                return await self.lookup_drug_with_context(drug_name, patient_context, index, verbose)
+
+        tasks = [asyncio.create_task(bounded_lookup(name)) for name in drug_names]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
     async def lookup_drugs_batch_with_context(
         self,
         drugs: List[dict],
@@ -724,6 +821,8 @@ Return ONLY valid JSON with these exact fields:
         2. Fetches raw BNF data directly (no MCP)
         3. Personalizes data for patient using Claude
 
+        Drugs are looked up concurrently (see stream_drugs_with_context).
+
         Args:
             drugs: List of drug objects with 'drug_name'.
             patient_context: Dictionary with:
@@ -733,7 +832,7 @@ Return ONLY valid JSON with these exact fields:
                 - diagnosis: The diagnosis
 
         Returns:
-            List of personalized drug result dictionaries.
+            List of personalized drug result dictionaries, in input order.
         """
         if not drugs:
             return []
@@ -741,79 +840,13 @@ Return ONLY valid JSON with these exact fields:
         if verbose:
             print(f"   [DrugInfoRetriever] Looking up {len(drugs)} drugs with patient context...")
 
-        results = []
-        index = get_bnf_index()
-
-        for drug_obj in drugs:
-            drug_name = drug_obj.get('drug_name', '')
-            if not drug_name:
-                continue
-
-            try:
-                # Step 1: Search local index for slug
-                matches = index.search(drug_name, limit=1)
-
-                if not matches:
-                    if verbose:
-                        print(f"   [DrugInfoRetriever] {drug_name}: Not in BNF index")
-                    results.append({
-                        'drug_name': drug_name,
-                        'status': 'not_found',
-                        'source': 'bnf',
-                        'error': f'Drug "{drug_name}" not found in BNF index'
-                    })
-                    continue
-
-                slug = matches[0]['slug']
-                matched_name = matches[0]['name']
-
-                if verbose:
-                    print(f"   [DrugInfoRetriever] {drug_name} -> {matched_name}")
-
-                # Step 2: Fetch raw BNF data directly (no MCP)
-                drug_url = f"https://bnf.nice.org.uk/drugs/{slug}/"
-                if verbose:
-                    print(f"   [DrugInfoRetriever] Fetching BNF data for {slug}...")
-
-                bnf_data = fetch_bnf_drug_info(drug_url)
-
-                if not bnf_data.get('success'):
-                    results.append({
-                        'drug_name': drug_name,
-                        'status': 'failed',
-                        'source': 'bnf',
-                        'error': bnf_data.get('error', 'Failed to fetch BNF data')
-                    })
-                    continue
-
-                # Step 3: Personalize with Claude
-                if verbose:
-                    print(f"   [DrugInfoRetriever] Personalizing {matched_name} for patient...")
-
-                personalized_data = await self._personalize_drug_for_patient(
-                    bnf_data, patient_context, verbose
-                )
-
-                results.append({
-                    'drug_name': drug_name,
-                    'status': 'success',
-                    'source': 'bnf',
-                    'details': {
-                        'drug_name': personalized_data.get('drug_name', matched_name),
-                        'url': bnf_data.get('url'),
-                        'bnf_data': personalized_data  # Personalized data in BNF format
-                    }
-                })
+        results = [
+            result async for result in self.stream_drugs_with_context(drugs, patient_context, verbose=verbose)
+        ]
 
-            except Exception as e:
-                if verbose:
-                    print(f"   [DrugInfoRetriever] Error with {drug_name}: {e}")
-                results.append({
-                    'drug_name': drug_name,
-                    'status': 'failed',
-                    'source': 'bnf',
-                    'error': str(e)
-                })
+        # Restore input order (results arrive in completion order)
+        order = {d.get('drug_name'): i for i, d in reversed(list(enumerate(drugs)))}
+        results.sort(key=lambda r: order.get(r['drug_name'], len(drugs)))
 
         if verbose:
             successful = sum(1 for r in results if r.get('status') == 'success')
@@ -11,6 +11,7 @@ from .validation_prompts import (
 )
 
 from .diagnosis_prompts import (
+    DIAGNOSIS_ANALYSIS_INSTRUCTIONS,
     get_diagnosis_analysis_prompt,
     get_pubmed_fallback_prompt,
     get_literature_fallback_prompt,
@@ -21,7 +22,10 @@ from .drug_prompts import (
     get_drug_info_generation_prompt,
     get_dosing_extraction_prompt,
     get_special_considerations_prompt,
+    PATIENT_TAILORED_DRUG_INSTRUCTIONS,
     get_patient_tailored_drug_prompt,
+    DRUG_PERSONALIZATION_INSTRUCTIONS,
+    get_drug_personalization_prompt,
 )
 
 from .analysis_prompts import (
@@ -34,6 +38,7 @@ __all__ = [
     'get_clinical_validation_prompt',
     'get_search_term_extraction_prompt',
     # Diagnosis
+    'DIAGNOSIS_ANALYSIS_INSTRUCTIONS',
     'get_diagnosis_analysis_prompt',
     'get_pubmed_fallback_prompt',
     'get_literature_fallback_prompt',
@@ -42,7 +47,10 @@ __all__ = [
     'get_drug_info_generation_prompt',
     'get_dosing_extraction_prompt',
     'get_special_considerations_prompt',
+    'PATIENT_TAILORED_DRUG_INSTRUCTIONS',
     'get_patient_tailored_drug_prompt',
+    'DRUG_PERSONALIZATION_INSTRUCTIONS',
+    'get_drug_personalization_prompt',
     # Analysis
     'get_guideline_analysis_prompt',
     'get_bnf_analysis_prompt',
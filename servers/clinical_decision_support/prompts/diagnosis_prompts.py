@@ -5,19 +5,10 @@ Contains prompts for analyzing clinical consultations and generating diagnoses.
 """
 
 
-def get_diagnosis_analysis_prompt(clinical_scenario: str) -> str:
-    """
-    Generate the main diagnosis analysis prompt for Claude with guideline tools.
-
-    Args:
-        clinical_scenario: The clinical consultation text
-
-    Returns:
-        Formatted prompt string for diagnosis analysis
-    """
-    return f"""Analyze this clinical consultation and provide structured diagnosis and treatment information.
-
-CONSULTATION: {clinical_scenario}
+# Static instructions for guideline-based diagnosis analysis. Identical for every
+# consultation, so they are sent as a prompt-cached system block and only the
+# consultation itself changes per call.
+DIAGNOSIS_ANALYSIS_INSTRUCTIONS = """Analyze the clinical consultation in the user message and provide structured diagnosis and treatment information.
 
 TASK:
 1. Use the available GUIDELINE tools to search for relevant clinical guidelines (NICE, AIIMS, NHM, etc.)
@@ -35,58 +26,58 @@ IMPORTANT: Return your answer QUICKLY. Drug details will be looked up separately
 
 Return your final answer as JSON ONLY (no other text):
 
-{{
+{
   "diagnoses": [
-    {{
+    {
       "diagnosis": "medical condition name",
       "confidence": "high|medium|low",
       "source": "guideline name (e.g., NICE NG138)",
       "url": "full guideline URL if available from tools, otherwise empty string",
 
-      "primary_care": {{
+      "primary_care": {
         "medications": ["Paracetamol", "Ibuprofen", "Amoxicillin"],
         "supportive_care": ["Ice", "Elevation", "Rest", "Physiotherapy"],
         "clinical_guidance": "Dosing and administration guidance from guidelines",
         "when_to_escalate": ["Red flag 1", "Warning sign 2", "When to seek urgent care"]
-      }},
+      },
 
-      "surgery": {{
+      "surgery": {
         "indicated": true,
         "procedure": "Surgical procedure name (e.g., Open Reduction Internal Fixation)",
-        "phases": {{
-          "preoperative": {{
+        "phases": {
+          "preoperative": {
             "investigations": ["X-ray AP/lateral", "Blood work", "ECG if indicated"],
             "medications": ["Prophylactic antibiotics", "Tetanus prophylaxis"],
             "preparation": ["NPO 8 hours", "Informed consent", "Mark surgical site"]
-          }},
-          "operative": {{
+          },
+          "operative": {
             "technique": "Detailed surgical approach and technique",
             "anesthesia": "Type and method of anesthesia (e.g., general, regional)",
             "duration": "Estimated duration if known"
-          }},
-          "postoperative": {{
+          },
+          "postoperative": {
             "immediate_care": ["Neurovascular checks q2h", "Elevate limb", "Monitor vitals"],
             "medications": ["Antibiotic course 5-7 days", "DVT prophylaxis", "Pain management"],
             "mobilization": "Weight-bearing status and mobilization timeline",
             "complications": ["Complications to watch for"]
-          }}
-        }}
-      }},
+          }
+        }
+      },
 
-      "diagnostics": {{
+      "diagnostics": {
         "required": ["Investigation 1", "Investigation 2"],
         "monitoring": ["Follow-up test 1", "Follow-up test 2"],
         "referral_criteria": ["When to refer to specialist"]
-      }},
+      },
 
-      "follow_up": {{
+      "follow_up": {
         "timeframe": "When patient should be reviewed (e.g., 48-72 hours, 1 week, 2 weeks)",
         "monitoring": ["What to monitor (e.g., symptom resolution, vital signs, wound healing)"],
         "referral_criteria": ["When to refer or escalate care (e.g., worsening symptoms, no improvement after X days)"]
-      }}
-    }}
+      }
+    }
   ]
-}}
+}
 
 STRUCTURE GUIDELINES:
 
@@ -101,9 +92,9 @@ STRUCTURE GUIDELINES:
     - Alternative names: INN vs USAN (e.g., "Paracetamol" vs "Acetaminophen")
   * CORRECT FORMAT:
     [
-      {{"drug_name": "Cetirizine", "variations": ["Cetirizine", "Cetirizine hydrochloride", "Cetirizine dihydrochloride"]}},
-      {{"drug_name": "Loratadine", "variations": ["Loratadine"]}},
-      {{"drug_name": "Paracetamol", "variations": ["Paracetamol", "Acetaminophen"]}}
+      {"drug_name": "Cetirizine", "variations": ["Cetirizine", "Cetirizine hydrochloride", "Cetirizine dihydrochloride"]},
+      {"drug_name": "Loratadine", "variations": ["Loratadine"]},
+      {"drug_name": "Paracetamol", "variations": ["Paracetamol", "Acetaminophen"]}
     ]
   * WRONG: Simple string arrays like ["Cetirizine", "Loratadine"]
   * Use GENERIC NAMES only (e.g., "Paracetamol" not "Tylenol")
@@ -145,6 +136,24 @@ DRUGBANK OPTIMIZATION:
 - This parallelizes lookups and automatically respects rate limits"""
 
 
+def get_diagnosis_analysis_prompt(clinical_scenario: str) -> str:
+    """
+    Generate the per-consultation user message for diagnosis analysis.
+
+    The task, output format and structure guidelines are in
+    DIAGNOSIS_ANALYSIS_INSTRUCTIONS (sent as the cached system prompt).
+
+    Args:
+        clinical_scenario: The clinical consultation text
+
+    Returns:
+        Formatted user message for diagnosis analysis
+    """
+    return f"""CONSULTATION: {clinical_scenario}
+
+Analyze this consultation following the instructions. Return your final answer as JSON ONLY."""
+
+
 def get_pubmed_fallback_prompt(clinical_scenario: str) -> str:
     """
     Generate a prompt for PubMed fallback when guidelines don't provide sufficient info.
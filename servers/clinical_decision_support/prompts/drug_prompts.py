@@ -190,17 +190,76 @@ Return ONLY a JSON object with BRIEF (1-2 sentence) summaries:
 Be extremely concise. Focus on key dose adjustments and safety warnings only."""
 
 
+# Static instructions for patient-tailored prescribing guidance (cached system prompt).
+# The patient, drug and BNF text are in the per-call user message.
+PATIENT_TAILORED_DRUG_INSTRUCTIONS = """You are a clinical pharmacist providing personalized prescribing guidance.
+
+TASK: Generate PERSONALIZED prescribing guidance for the patient and drug in the user message, using the BNF prescribing information provided.
+
+Consider:
+1. PATIENT-SPECIFIC DOSING: Adjust dose based on age, weight indicators, renal/hepatic function mentioned
+2. DRUG INTERACTIONS: Check for interactions with any medications mentioned in the clinical scenario
+3. CONTRAINDICATIONS: Flag any contraindications based on patient's comorbidities
+4. WARNINGS: Highlight relevant cautions for this patient's specific conditions
+5. MONITORING: Suggest monitoring parameters relevant to this patient
+
+CRITICAL INSTRUCTIONS:
+1. Be SPECIFIC to THIS patient - do not give generic advice
+2. Highlight any safety concerns prominently
+3. If information is insufficient for personalization, note what additional information would be needed
+4. Focus on practical, actionable guidance
+5. Respond with ONLY a JSON object
+
+JSON Format:
+{
+  "drug_name": "The drug name from the user message",
+  "recommended_dose": "Specific dose for THIS patient with reasoning",
+  "route": "Route of administration",
+  "frequency": "Dosing frequency",
+  "duration": "Recommended treatment duration",
+  "patient_specific_warnings": ["List of warnings specific to this patient's conditions/medications"],
+  "contraindication_check": {
+    "safe_to_prescribe": true/false,
+    "concerns": ["Any concerns based on patient's conditions"],
+    "absolute_contraindications": ["Any absolute contraindications found"]
+  },
+  "drug_interactions": ["List of potential interactions with patient's current medications"],
+  "monitoring_required": ["Specific monitoring parameters for this patient"],
+  "special_instructions": "Any special administration instructions for this patient",
+  "clinical_pearls": "Brief clinical insight specific to this patient's presentation"
+}
+
+Example for a diabetic patient on metformin receiving Amoxicillin:
+{
+  "drug_name": "Amoxicillin",
+  "recommended_dose": "500mg three times daily - standard dose appropriate as no renal impairment indicated",
+  "route": "Oral",
+  "frequency": "Every 8 hours",
+  "duration": "5-7 days for community-acquired pneumonia",
+  "patient_specific_warnings": ["Monitor blood glucose - antibiotics can affect glycemic control in diabetic patients"],
+  "contraindication_check": {
+    "safe_to_prescribe": true,
+    "concerns": ["No penicillin allergy documented - confirm before prescribing"],
+    "absolute_contraindications": []
+  },
+  "drug_interactions": ["No significant interaction with metformin"],
+  "monitoring_required": ["Clinical response at 48-72 hours", "Blood glucose monitoring"],
+  "special_instructions": "Take with or without food. Complete full course.",
+  "clinical_pearls": "First-line for mild CAP in patient with controlled diabetes. Consider macrolide if atypical pathogens suspected."
+}"""
+
+
 def get_patient_tailored_drug_prompt(
     drug_name: str,
     bnf_data: dict,
     patient_context: dict
 ) -> str:
     """
-    Generate a prompt for tailoring drug prescribing information to a specific patient.
+    Generate the per-call user message for tailoring drug prescribing information to a specific patient.
 
-    This prompt takes raw BNF drug data and patient context to generate personalized
-    prescribing guidance that considers the patient's age, comorbidities, current
-    medications, allergies, and clinical presentation.
+    The task, JSON format and example are in PATIENT_TAILORED_DRUG_INSTRUCTIONS
+    (sent as the cached system prompt). This message carries the patient
+    context and raw BNF drug data.
 
     Args:
         drug_name: The name of the drug
@@ -212,7 +271,7 @@ def get_patient_tailored_drug_prompt(
             - diagnosis: The diagnosis this drug is being prescribed for
 
     Returns:
-        A formatted prompt string for patient-tailored drug guidance
+        A formatted user message for patient-tailored drug guidance
 
     Example:
         >>> prompt = get_patient_tailored_drug_prompt(
@@ -234,9 +293,7 @@ def get_patient_tailored_drug_prompt(
             bnf_sections.append(f"{key.upper()}: {value}")
     bnf_text = "\n".join(bnf_sections)
 
-    return f"""You are a clinical pharmacist providing personalized prescribing guidance.
-
-PATIENT CONTEXT:
+    return f"""PATIENT CONTEXT:
 - Clinical Presentation: {clinical_scenario[:1500]}
 - Age: {patient_age}
 - Known Allergies: {allergies}
@@ -247,58 +304,51 @@ DRUG: {drug_name}
 BNF PRESCRIBING INFORMATION:
 {bnf_text[:3000]}
 
-TASK: Generate PERSONALIZED prescribing guidance for this specific patient.
+Now generate personalized guidance for {drug_name} for this patient:"""
 
-Consider:
-1. PATIENT-SPECIFIC DOSING: Adjust dose based on age, weight indicators, renal/hepatic function mentioned
-2. DRUG INTERACTIONS: Check for interactions with any medications mentioned in the clinical scenario
-3. CONTRAINDICATIONS: Flag any contraindications based on patient's comorbidities
-4. WARNINGS: Highlight relevant cautions for this patient's specific conditions
-5. MONITORING: Suggest monitoring parameters relevant to this patient
 
-CRITICAL INSTRUCTIONS:
-1. Be SPECIFIC to THIS patient - do not give generic advice
-2. Highlight any safety concerns prominently
-3. If information is insufficient for personalization, note what additional information would be needed
-4. Focus on practical, actionable guidance
-5. Respond with ONLY a JSON object
+# Static instructions for personalizing BNF drug fields (cached system prompt).
+DRUG_PERSONALIZATION_INSTRUCTIONS = """You are a clinical pharmacist. Extract PERSONALIZED drug information for the specific patient in the user message, from the BNF data provided.
 
-JSON Format:
-{{
-  "drug_name": "{drug_name}",
-  "recommended_dose": "Specific dose for THIS patient with reasoning",
-  "route": "Route of administration",
-  "frequency": "Dosing frequency",
-  "duration": "Recommended treatment duration",
-  "patient_specific_warnings": ["List of warnings specific to this patient's conditions/medications"],
-  "contraindication_check": {{
-    "safe_to_prescribe": true/false,
-    "concerns": ["Any concerns based on patient's conditions"],
-    "absolute_contraindications": ["Any absolute contraindications found"]
-  }},
-  "drug_interactions": ["List of potential interactions with patient's current medications"],
-  "monitoring_required": ["Specific monitoring parameters for this patient"],
-  "special_instructions": "Any special administration instructions for this patient",
-  "clinical_pearls": "Brief clinical insight specific to this patient's presentation"
-}}
+Based on the patient's specific details, provide PERSONALIZED drug information. Consider:
+1. Age-appropriate dosing (select the correct dose for this patient's age)
+2. Route of administration appropriate for the condition
+3. Any relevant adjustments for comorbidities
+4. Drug interactions with any mentioned current medications
+5. Warnings specific to this patient's situation
 
-Example for a diabetic patient on metformin receiving Amoxicillin:
-{{
-  "drug_name": "Amoxicillin",
-  "recommended_dose": "500mg three times daily - standard dose appropriate as no renal impairment indicated",
-  "route": "Oral",
-  "frequency": "Every 8 hours",
-  "duration": "5-7 days for community-acquired pneumonia",
-  "patient_specific_warnings": ["Monitor blood glucose - antibiotics can affect glycemic control in diabetic patients"],
-  "contraindication_check": {{
-    "safe_to_prescribe": true,
-    "concerns": ["No penicillin allergy documented - confirm before prescribing"],
-    "absolute_contraindications": []
-  }},
-  "drug_interactions": ["No significant interaction with metformin"],
-  "monitoring_required": ["Clinical response at 48-72 hours", "Blood glucose monitoring"],
-  "special_instructions": "Take with or without food. Complete full course.",
-  "clinical_pearls": "First-line for mild CAP in patient with controlled diabetes. Consider macrolide if atypical pathogens suspected."
-}}
+Return ONLY valid JSON with these exact fields:
+{
+  "drug_name": "The drug name from the user message",
+  "dosage": "The specific dose for THIS patient - include dose amount, route (oral/IV/etc), frequency, and duration. Be specific, e.g., '1g orally every 6 hours for 5-7 days'",
+  "side_effects": "Key side effects this patient should watch for, considering their conditions",
+  "interactions": "Any drug interactions relevant to medications mentioned in the presentation, or 'None identified' if no other medications mentioned",
+  "cautions": "Patient-specific warnings based on their age, conditions, and allergies",
+  "success": true
+}"""
 
-Now generate personalized guidance for {drug_name} for this patient:"""
+
+def get_drug_personalization_prompt(drug_name: str, bnf_text: str, patient_context: dict) -> str:
+    """
+    Generate the per-call user message for personalizing BNF drug fields.
+
+    Instructions and output format are in DRUG_PERSONALIZATION_INSTRUCTIONS.
+
+    Args:
+        drug_name: The drug name
+        bnf_text: BNF sections formatted as "SECTION: text" lines
+        patient_context: Dictionary with clinical_scenario, patient_age, allergies, diagnosis
+
+    Returns:
+        A formatted user message
+    """
+    return f"""PATIENT:
+- Clinical Presentation: {patient_context.get('clinical_scenario', '')[:1500]}
+- Age: {patient_context.get('patient_age', 'Not specified')}
+- Allergies: {patient_context.get('allergies', 'None known')}
+- Diagnosis: {patient_context.get('diagnosis', 'Not specified')}
+
+DRUG: {drug_name}
+
+BNF DATA:
+{bnf_text[:3000]}"""
@@ -11,12 +11,13 @@ import os
 from datetime import datetime
 from pathlib import Path
 from contextlib import AsyncExitStack
-from anthropic import Anthropic
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from servers.utils.llm_gateway import get_llm_gateway
+from servers.utils.mcp_transport import connect_mcp_server, STDIO
+from mcp import ClientSession
 from typing import Dict, List, Any, Optional, Tuple
 
-from .config import MCP_SERVERS, RESEARCH_SERVERS
+from .config import MCP_SERVERS, MCP_TRANSPORTS, RESEARCH_SERVERS
+from .utils import execute_tool_uses
 
 
 class ResearchAnalysisEngine:
@@ -45,7 +46,7 @@ class ResearchAnalysisEngine:
         self.exit_stack = AsyncExitStack()
 
         api_key = anthropic_api_key or os.getenv("ANTHROPIC_API_KEY")
-        self.anthropic = Anthropic(api_key=api_key) if api_key else None
+        self.llm = get_llm_gateway(api_key) if api_key else None
 
     async def connect_research_servers(self, verbose: bool = True):
         """
@@ -69,24 +70,18 @@ class ResearchAnalysisEngine:
                 continue
 
             server_path = MCP_SERVERS[server_name]
-            server_params = StdioServerParameters(
-                command="python",
-                args=[server_path],
-                env={**os.environ}
-            )
 
             try:
                 if verbose:
                     print(f"   [ResearchEngine] Connecting to {server_name}...")
 
-                stdio_transport = await self.exit_stack.enter_async_context(
-                    stdio_client(server_params)
-                )
-                stdio, write = stdio_transport
-                session = await self.exit_stack.enter_async_context(
-                    ClientSession(stdio, write)
+                session = await connect_mcp_server(
+                    self.exit_stack,
+                    server_name,
+                    server_path,
+                    transport=MCP_TRANSPORTS.get(server_name, STDIO),
+                    verbose=verbose
                 )
-                await session.initialize()
 
                 self.sessions[server_name] = session
 
@@ -199,9 +194,9 @@ class ResearchAnalysisEngine:
             - diagnoses: List of diagnosis dictionaries with research citations
             - tool_calls: List of tool calls made (for progress reporting)
         """
-        if not self.anthropic:
+        if not self.llm:
             if verbose:
-                print(f"   [ResearchEngine] ERROR: No Anthropic client!")
+                print("   [ResearchEngine] ERROR: No Anthropic client!")
             return [], []
 
         tools = await self.get_research_tools()
@@ -221,7 +216,7 @@ class ResearchAnalysisEngine:
         tool_calls = []
 
         try:
-            response = self.anthropic.messages.create(
+            response = await self.llm.create_message(
                 model="claude-haiku-4-5",
                 max_tokens=8192,
                 tools=tools,
@@ -233,34 +228,27 @@ class ResearchAnalysisEngine:
 
             # Tool use loop
             while response.stop_reason == "tool_use":
-                tool_results = []
-                for content_block in response.content:
-                    if content_block.type == "tool_use":
-                        tool_name = content_block.name
-                        tool_input = content_block.input
-
-                        if verbose:
-                            print(f"   [ResearchEngine] Calling tool: {tool_name}")
-
-                        # Track tool call for progress reporting
-                        tool_calls.append({
-                            "tool_name": tool_name,
-                            "tool_input": tool_input
-                        })
-
-                        result = await self.call_tool(tool_name, tool_input)
-                        result_text = result.content[0].text
-
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": content_block.id,
-                            "content": result_text
-                        })
+                tool_use_blocks = [b for b in response.content if b.type == "tool_use"]
+                for content_block in tool_use_blocks:
+                    tool_name = content_block.name
+                    tool_input = content_block.input
+
+                    if verbose:
+                        print(f"   [ResearchEngine] Calling tool: {tool_name}")
+
+                    # Track tool call for progress reporting
+                    tool_calls.append({
+                        "tool_name": tool_name,
+                        "tool_input": tool_input
+                    })
+
+                # Run this turn's tool calls concurrently (results keep tool_use order)
+                tool_results = await execute_tool_uses(self.call_tool, tool_use_blocks)
 
                 messages.append({"role": "assistant", "content": response.content})
                 messages.append({"role": "user", "content": tool_results})
 
-                response = self.anthropic.messages.create(
+                response = await self.llm.create_message(
                     model="claude-haiku-4-5",
                     max_tokens=8192,
                     tools=tools,
@@ -0,0 +1,265 @@
+"""
+Warm MCP session pool for Clinical Decision Support.
+
+Keeps connected ClinicalDecisionSupportClient instances keyed by region
+(GB, IN, US, AU, ..., default) and checks one out per request, so a request
+from another region never tears down sessions that an in-flight request is
+still calling tools on.
+
+- Several clients per region so concurrent requests don't share sessions
+- A pooled client is connected once, to a single region, and is never
+  reconnected or disconnected while checked out
+- Clients left idle longer than the idle timeout are evicted
+
+Each pooled client is connected and disconnected from its own owner task:
+the MCP stdio transports are anyio task-group contexts and must be exited
+from the task that entered them, not from whichever request happens to
+trigger the eviction.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+
+# Maximum warm clients (MCP server process sets) per region
+MAX_SESSIONS_PER_REGION = int(os.getenv("MCP_POOL_MAX_SESSIONS_PER_REGION", "2"))
+
+# Seconds a client may sit idle before it is disconnected
+IDLE_TIMEOUT = float(os.getenv("MCP_POOL_IDLE_TIMEOUT_SECONDS", "900"))
+
+# Country codes that share a server set with another code
+REGION_ALIASES = {"UK": "GB"}
+
+
+class PooledClient:
+    """A connected client bound to one region, owned by a dedicated task."""
+
+    def __init__(self, region: str, client: Any):
+        self.region = region
+        self.client = client
+        self.in_use = False
+        self.last_used = time.monotonic()
+        self.uses = 0
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+
+    async def start(self, verbose: bool = True):
+        """Connect the client from its owner task and wait until it is ready."""
+        self._task = asyncio.create_task(self._run(verbose))
+        await self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    async def _run(self, verbose: bool):
+        """Owner task: connect, hold the sessions open until closed, then disconnect."""
+        country_code = None if self.region == "default" else self.region
+        try:
+            await self.client.connect_to_servers(country_code=country_code, verbose=verbose)
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        except BaseException:
+            # Cancelled mid-connect: close whatever sessions did open
+            await self._cleanup(verbose)
+            raise
+
+        self._ready.set()
+        try:
+            await self._closing.wait()
+        finally:
+            await self._cleanup(verbose)
+
+    async def _cleanup(self, verbose: bool):
+        try:
+            await self.client.cleanup()
+        except Exception as e:
+            if verbose:
+                print(f"[MCPPool] Cleanup error for {self.region}: {e}")
+
+    async def close(self):
+        """Signal the owner task to disconnect and wait for it to finish."""
+        self._closing.set()
+        if self._task is not None:
+            if not self._ready.is_set():
+                self._task.cancel()  # Still connecting: abandon the connect
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+class MCPSessionPool:
+    """
+    Pool of warm, region-bound ClinicalDecisionSupportClient instances.
+
+    Usage:
+        pool = MCPSessionPool(lambda: ClinicalDecisionSupportClient(api_key))
+
+        async with pool.checkout("GB") as region_client:
+            result = await region_client.get_diagnoses(...)
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        max_sessions_per_region: int = MAX_SESSIONS_PER_REGION,
+        idle_timeout: float = IDLE_TIMEOUT,
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            client_factory: Returns a new, unconnected client. The client must
+                            provide connect_to_servers(country_code, verbose)
+                            and cleanup().
+            max_sessions_per_region: Maximum concurrent clients per region.
+                                     Further requests wait for a free client.
+            idle_timeout: Seconds before an idle client is disconnected.
+        """
+        self._factory = client_factory
+        self.max_sessions_per_region = max(1, max_sessions_per_region)
+        self.idle_timeout = idle_timeout
+        self._entries: Dict[str, List[PooledClient]] = {}
+        self._condition = asyncio.Condition()
+
+        # Pool statistics
+        self._checkouts = 0
+        self._warm_hits = 0
+        self._connects = 0
+        self._waits = 0
+        self._evictions = 0
+
+    @staticmethod
+    def region_key(country_code: Optional[str]) -> str:
+        """Normalize a country code to a pool key ('default' when unknown)."""
+        if not country_code:
+            return "default"
+        code = country_code.upper()
+        return REGION_ALIASES.get(code, code)
+
+    @asynccontextmanager
+    async def checkout(self, country_code: Optional[str] = None, verbose: bool = True):
+        """Check out a connected client for a region for the duration of a request."""
+        entry = await self.acquire(country_code, verbose)
+        try:
+            yield entry.client
+        finally:
+            await self.release(entry)
+
+    async def acquire(self, country_code: Optional[str] = None, verbose: bool = True) -> PooledClient:
+        """
+        Acquire a pooled client for a region (pair with release()).
+
+        Reuses an idle warm client when available, connects a new one if the
+        region is below its limit, and otherwise waits for a client to free up.
+        """
+        region = self.region_key(country_code)
+        await self.evict_idle(verbose)
+
+        async with self._condition:
+            while True:
+                entries = self._entries.setdefault(region, [])
+                idle = next((e for e in entries if not e.in_use), None)
+                if idle is not None:
+                    idle.in_use = True
+                    idle.uses += 1
+                    self._checkouts += 1
+                    self._warm_hits += 1
+                    if verbose:
+                        print(f"[MCPPool] Reusing warm sessions for {region} ({len(entries)} in pool)")
+                    return idle
+
+                if len(entries) < self.max_sessions_per_region:
+                    entry = PooledClient(region, self._factory())
+                    entry.in_use = True
+                    entry.uses += 1
+                    entries.append(entry)
+                    self._checkouts += 1
+                    self._connects += 1
+                    break
+
+                self._waits += 1
+                if verbose:
+                    print(f"[MCPPool] All {len(entries)} sessions for {region} busy, waiting...")
+                await self._condition.wait()
+
+        # Connect outside the lock so other regions aren't blocked
+        if verbose:
+            print(f"[MCPPool] Connecting new sessions for {region}")
+        try:
+            await entry.start(verbose)
+        except BaseException:
+            # Failed or cancelled (e.g. the client disconnected): free the slot
+            await asyncio.shield(self._discard(entry))
+            raise
+        return entry
+
+    async def _discard(self, entry: PooledClient):
+        """Remove a client that never became usable and stop its owner task."""
+        async with self._condition:
+            entries = self._entries.get(entry.region, [])
+            if entry in entries:
+                entries.remove(entry)
+            self._condition.notify_all()
+        await entry.close()
+
+    async def release(self, entry: PooledClient):
+        """Return a client to the pool."""
+        async with self._condition:
+            entry.in_use = False
+            entry.last_used = time.monotonic()
+            self._condition.notify_all()
+
+    async def evict_idle(self, verbose: bool = True):
+        """Disconnect clients that have been idle longer than the idle timeout."""
+        now = time.monotonic()
+        evicted: List[PooledClient] = []
+
+        async with self._condition:
+            for region, entries in self._entries.items():
+                for entry in list(entries):
+                    if not entry.in_use and now - entry.last_used > self.idle_timeout:
+                        entries.remove(entry)
+                        evicted.append(entry)
+
+        for entry in evicted:
+            if verbose:
+                print(f"[MCPPool] Evicting idle sessions for {entry.region}")
+            await entry.close()
+        self._evictions += len(evicted)
+
+    async def close(self):
+        """Disconnect every pooled client (called on API shutdown)."""
+        async with self._condition:
+            entries = [e for region_entries in self._entries.values() for e in region_entries]
+            self._entries = {}
+            self._condition.notify_all()
+
+        await asyncio.gather(*[e.close() for e in entries], return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return pool statistics for the metrics endpoint."""
+        return {
+            "regions": {
+                region: {
+                    "sessions": len(entries),
+                    "in_use": sum(1 for e in entries if e.in_use),
+                    "idle": sum(1 for e in entries if not e.in_use),
+                }
+                for region, entries in self._entries.items()
+                if entries
+            },
+            "checkouts": self._checkouts,
+            "warm_hits": self._warm_hits,
+            "connects": self._connects,
+            "waits": self._waits,
+            "evictions": self._evictions,
+            "max_sessions_per_region": self.max_sessions_per_region,
+            "idle_timeout_seconds": self.idle_timeout,
+        }
+
+
+__all__ = ['MCPSessionPool', 'PooledClient']
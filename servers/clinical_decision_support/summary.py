@@ -8,9 +8,9 @@ Extracts speaker roles, timeline, and generates comprehensive clinical summaries
 import re
 import json
 from typing import Dict, List, Optional, Any, Tuple
-from anthropic import Anthropic
+from servers.utils.llm_gateway import get_llm_gateway
+from servers.utils.speaker_roles import get_speaker_role_identifier
 import os
-import httpx  # For calling the identify-speaker-roles endpoint
 
 
 class ConsultationSummary:
@@ -35,7 +35,7 @@ class ConsultationSummary:
         if not api_key:
             raise ValueError("ANTHROPIC_API_KEY is required for ConsultationSummary")
 
-        self.anthropic = Anthropic(api_key=api_key)
+        self.llm = get_llm_gateway(api_key)
 
     async def summarize(
         self,
@@ -43,7 +43,8 @@ class ConsultationSummary:
         patient_info: Optional[dict] = None,
         output_in_english: bool = False,
         is_from_transcription: bool = True,
-        transcription_language: Optional[str] = None
+        transcription_language: Optional[str] = None,
+        roles_key: Optional[str] = None
     ) -> dict:
         """
         Generate a comprehensive summary of a consultation transcript.
@@ -56,6 +57,7 @@ class ConsultationSummary:
             is_from_transcription: If True, indicates this text came from speech-to-text
                                    and may contain transcription errors
             transcription_language: Original language of the transcription (e.g., 'hi-IN', 'en-US')
+            roles_key: Recording/consultation ID whose memoised speaker roles to reuse
 
         Returns:
             Dictionary containing:
@@ -70,13 +72,13 @@ class ConsultationSummary:
         parsed = self._parse_diarized_transcript(transcript)
 
         # Step 2: Identify speaker roles (doctor vs patient)
-        # Try LLM-based identification first (uses full conversation for better accuracy)
+        # Try LLM-based identification first (memoised per recording, so usually already known)
         segments = [
             {"speaker_id": turn["speaker"], "text": turn["text"], "start_time": 0, "end_time": 0}
             for turn in parsed['conversation']
         ]
 
-        speaker_role_mapping = await self._identify_speakers_llm(segments)
+        speaker_role_mapping = await self._identify_speakers_llm(segments, roles_key, transcription_language)
 
         if speaker_role_mapping:
             # Convert API format to internal format (support multi-speaker)
@@ -219,34 +221,32 @@ class ConsultationSummary:
             'speakers': sorted(list(speakers))
         }
 
-    async def _identify_speakers_llm(self, segments: list) -> Optional[dict]:
+    async def _identify_speakers_llm(
+        self,
+        segments: list,
+        roles_key: Optional[str] = None,
+        language: Optional[str] = None
+    ) -> Optional[dict]:
         """
-        Call the LLM-based speaker identification endpoint with full context.
+        Identify speaker roles with the shared LLM role identifier.
 
         Args:
             segments: All conversation segments with speaker_id and text
+            roles_key: Recording/consultation ID; a memoised mapping is reused
+                       unless the transcript has a speaker it does not cover
+            language: Conversation language (for context)
 
         Returns:
             Speaker role mapping (e.g., {"speaker_0": "Doctor", "speaker_1": "Patient"})
             or None if identification fails
         """
+        if not segments:
+            return None
         try:
-            # Determine API URL (use environment variable or default to localhost)
-            api_url = os.getenv("API_URL", "http://localhost:8000")
-
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{api_url}/api/identify-speaker-roles",
-                    json={"segments": segments, "language": "en-IN"},
-                    timeout=30.0
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get("success") and data.get("role_mapping"):
-                        print(f"✅ LLM speaker identification: {data['role_mapping']} ({data.get('segments_analyzed', 0)} segments)")
-                        return data["role_mapping"]
-                else:
-                    print(f"⚠️  LLM speaker identification returned status {response.status_code}")
+            result = await get_speaker_role_identifier().identify(segments, key=roles_key, language=language)
+            source = "memo" if result.cached else f"{result.segments_analyzed} segments"
+            print(f"✅ LLM speaker identification: {result.roles} ({source})")
+            return result.roles or None
         except Exception as e:
             print(f"⚠️  LLM speaker identification failed: {e}")
         return None
@@ -373,7 +373,7 @@ class ConsultationSummary:
 
         # Call Claude with JSON mode for structured output
         try:
-            message = self.anthropic.messages.create(
+            message = await self.llm.create_message(
                 model="claude-sonnet-4-20250514",  # Latest Sonnet model
                 max_tokens=8192,
                 temperature=0.3,  # Lower temperature for more consistent medical summaries
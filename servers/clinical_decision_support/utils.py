@@ -5,7 +5,10 @@ Contains helper functions for data enrichment, special considerations,
 and other utility operations.
 """
 
-from typing import Dict, List, Optional, Any
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Any
+
+from .config import TOOL_CALL_CONCURRENCY, TOOL_CALL_TIMEOUT
 
 
 def needs_enrichment(treatment: dict) -> bool:
@@ -56,7 +59,57 @@ def needs_special_considerations_enrichment(special_considerations: dict) -> boo
     return empty_count > len(special_considerations) / 2
 
 
+async def execute_tool_uses(
+    call_tool: Callable[[str, dict], Awaitable[Any]],
+    tool_use_blocks: List[Any],
+    max_concurrency: int = TOOL_CALL_CONCURRENCY,
+    timeout: float = TOOL_CALL_TIMEOUT
+) -> List[dict]:
+    """
+    Run the tool_use blocks from one Claude turn concurrently.
+
+    Claude often asks for several tools in one turn (e.g. NICE search + CKS
+    search + BNF summary). Running them together makes the turn take as long
+    as the slowest tool rather than the sum of all of them.
+
+    Args:
+        call_tool: Engine coroutine that routes a tool call to its MCP session
+        tool_use_blocks: tool_use content blocks from the Claude response
+        max_concurrency: Maximum tool calls in flight at once
+        timeout: Seconds before a single tool call is abandoned
+
+    Returns:
+        tool_result blocks in the same order as tool_use_blocks. Failed or
+        timed-out calls are returned as is_error results so Claude can carry on.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run_one(block) -> dict:
+        async with semaphore:
+            try:
+                result = await asyncio.wait_for(call_tool(block.name, block.input), timeout=timeout)
+                return {
+                    "type": "tool_result",
+                    "tool_use_id": block.id,
+                    "content": result.content[0].text
+                }
+            except asyncio.TimeoutError:
+                error = f"Tool {block.name} timed out after {timeout:.0f}s"
+            except Exception as e:
+                error = f"Tool {block.name} failed: {e}"
+
+            return {
+                "type": "tool_result",
+                "tool_use_id": block.id,
+                "content": error,
+                "is_error": True
+            }
+
+    return list(await asyncio.gather(*[run_one(block) for block in tool_use_blocks]))
+
+
 __all__ = [
     'needs_enrichment',
-    'needs_special_considerations_enrichment'
+    'needs_special_considerations_enrichment',
+    'execute_tool_uses'
 ]
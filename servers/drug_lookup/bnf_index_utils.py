@@ -1,9 +1,13 @@
 
 import json
 import os
+import re
+import heapq
 import difflib
 import logging
-from typing import List, Dict, Optional, Any
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import List, Dict, Optional, Any, Set
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -44,7 +48,36 @@ DRUG_SYNONYMS = {
 }
 
 
+# Size of the per-index LRU of recent search results
+SEARCH_CACHE_SIZE = int(os.getenv("BNF_INDEX_SEARCH_CACHE_SIZE", "2048"))
+
+# Fuzzy matching only scores this many of the best trigram candidates
+MAX_FUZZY_CANDIDATES = 64
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_name(name: str) -> str:
+    """Normalise a drug name or query: lowercase, trimmed, single spaces."""
+    return _WHITESPACE_RE.sub(" ", name.lower().strip())
+
+
+def trigrams(text: str) -> Set[str]:
+    """Character trigrams of a normalised string, padded so short names still index."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
 class BNFIndex:
+    """
+    BNF drug index with fast fuzzy search.
+
+    Names are normalised once at load time and put into a character-trigram
+    inverted index, so a query only looks at drugs that share trigrams with
+    it instead of scanning (and difflib-scoring) all 1700+ names. Synonyms
+    from DRUG_SYNONYMS are indexed as aliases of their canonical drug.
+    """
+
     def __init__(self, index_path: str = None):
         if index_path is None:
             # Default to data/bnf_drug_index.json relative to this file
@@ -56,7 +89,11 @@ class BNFIndex:
         
         # Create map for O(1) exact lookups
         self.name_map = {d['name'].lower(): d for d in self.drugs}
-        
+        self._build_search_index()
+
+        # LRU of recent queries (per index instance)
+        self._search_cached = lru_cache(maxsize=SEARCH_CACHE_SIZE)(self._search)
+
     def _load_index(self) -> Dict[str, Any]:
         try:
             with open(self.index_path, 'r') as f:
@@ -64,59 +101,105 @@ class BNFIndex:
         except FileNotFoundError:
             logger.warning(f"BNF Index file not found at {self.index_path}")
             return {"drugs": []}
-            
+
+    def _build_search_index(self):
+        """Precompute normalised names, synonym aliases and the trigram inverted index."""
+        # Searchable entries: (normalised name, drug). Drug names first (in index
+        # order), then synonym aliases pointing at their canonical drug.
+        self._entries: List[tuple] = [(normalize_name(d['name']), d) for d in self.drugs]
+
+        normalized_map = {name: d for name, d in self._entries}
+        self._synonyms: Dict[str, Dict[str, str]] = {}
+        for alias, canonical in DRUG_SYNONYMS.items():
+            drug = normalized_map.get(normalize_name(canonical))
+            if drug:
+                self._synonyms[normalize_name(alias)] = drug
+                if normalize_name(alias) not in normalized_map:
+                    self._entries.append((normalize_name(alias), drug))
+
+        self._num_names = len(self.drugs)
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        for i, (name, _) in enumerate(self._entries):
+            for gram in trigrams(name):
+                self._postings[gram].append(i)
+
     def get_exact(self, name: str) -> Optional[Dict[str, str]]:
         """
         Get exact match for drug name (case-insensitive).
         """
         return self.name_map.get(name.lower().strip())
-        
-    def search(self, query: str, limit: int = 5, cutoff: float = 0.6) -> List[Dict[str, str]]:
+
+    def search(self, query: str, limit: Optional[int] = 5, cutoff: float = 0.6) -> List[Dict[str, str]]:
         """
         Fuzzy search for drugs.
+
+        Order of results: synonym or exact match; then names containing the
+        query (names starting with it first); then fuzzy matches ranked by
+        similarity, at most `limit` of them (None: no limit). Recent queries
+        are served from an LRU.
         """
-        query = query.lower().strip()
+        return list(self._search_cached(normalize_name(query), limit, cutoff))
 
+    def clear_search_cache(self):
+        """Drop cached search results."""
+        self._search_cached.cache_clear()
+
+    def _search(self, query: str, limit: Optional[int], cutoff: float) -> tuple:
+        """Uncached search on a normalised query (see search)."""
         # 0. Check synonyms first (maps brand names / variations to BNF canonical names)
-        if query in DRUG_SYNONYMS:
-            canonical = DRUG_SYNONYMS[query]
-            if canonical in self.name_map:
-                logger.info(f"Synonym match: '{query}' -> '{canonical}'")
-                return [self.name_map[canonical]]
+        if query in self._synonyms:
+            logger.info(f"Synonym match: '{query}' -> '{self._synonyms[query]['name']}'")
+            return (self._synonyms[query],)
 
         # 1. Exact match check first
         if query in self.name_map:
-            return [self.name_map[query]]
-            
-        # 2. Contains match (very simple priority to starts_with)
-        contains_matches = [d for d in self.drugs if query in d['name'].lower()]
-        # Sort by starts_with query first
-        contains_matches.sort(key=lambda x: 0 if x['name'].lower().startswith(query) else 1)
-        
-        # 3. Fuzzy match using difflib
-        all_names = [d['name'] for d in self.drugs]
-        matches = difflib.get_close_matches(query, all_names, n=limit, cutoff=cutoff)
-        
+            return (self.name_map[query],)
+
+        if not query:
+            return ()
+
+        query_grams = trigrams(query)
+
+        # 2. Contains match (names starting with the query first). Every name
+        # containing the query contains all of the query's inner trigrams.
+        inner_grams = {g for g in query_grams if not g.startswith(" ") and not g.endswith(" ")}
+        if inner_grams:
+            candidate_ids = set.intersection(*(set(self._postings.get(g, ())) for g in inner_grams))
+            candidate_ids = sorted(i for i in candidate_ids if i < self._num_names)
+        else:
+            candidate_ids = range(self._num_names)  # 1-2 character query
+        contains_matches = [self._entries[i] for i in candidate_ids if query in self._entries[i][0]]
+        contains_matches.sort(key=lambda entry: 0 if entry[0].startswith(query) else 1)
+
+        # 3. Fuzzy match: score only the entries sharing the most trigrams with the query
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self._postings.get(gram, ()))
+        candidates = [i for i, _ in shared.most_common(MAX_FUZZY_CANDIDATES)]
+
+        matcher = difflib.SequenceMatcher()
+        matcher.set_seq2(query)
+        scored = []
+        for i in candidates:
+            name = self._entries[i][0]
+            matcher.set_seq1(name)
+            if matcher.real_quick_ratio() >= cutoff and matcher.quick_ratio() >= cutoff:
+                score = matcher.ratio()
+                if score >= cutoff:
+                    scored.append((score, name, i))
+        best = heapq.nlargest(limit, scored) if limit is not None else sorted(scored, reverse=True)
+        fuzzy_matches = [self._entries[i] for _, _, i in best]
+
         results = []
         seen_slugs = set()
-        
-        # Helper to add unique results
-        def add_result(d):
+        for _, d in contains_matches + fuzzy_matches:
+            if limit is not None and len(results) >= limit:
+                break
             if d['slug'] not in seen_slugs:
                 results.append(d)
                 seen_slugs.add(d['slug'])
 
-        # Add contains matches first
-        for d in contains_matches:
-             add_result(d)
-        
-        # Add fuzzy matches
-        for name in matches:
-            d = self.name_map.get(name.lower())
-            if d:
-                add_result(d)
-                
-        return results[:limit]
+        return tuple(results)
 
 # Singleton instance
 _index_instance = None
@@ -0,0 +1,358 @@
+#!/usr/bin/env python
+"""
+Local persistent cache for parsed BNF drug monographs (SQLite).
+
+Stores the dictionaries produced by `_get_bnf_drug_info_impl`, keyed by
+drug slug, so repeat lookups of common drugs (amoxicillin, paracetamol, ...)
+don't go through the ScrapeOps proxy and re-parse the BNF page.
+
+- Fresh entries (younger than the TTL) are served directly
+- Stale entries (past the TTL but within the stale window) are served
+  immediately and refreshed in a background thread (stale-while-revalidate)
+- Entries past the stale window are treated as misses
+- Hit/stale/miss/refresh counts are recorded for the metrics endpoint
+
+The database uses WAL mode so several BNF server processes (stdio mode)
+and the API process can share one cache file.
+
+CLI:
+    python servers/drug_lookup/bnf_local_cache.py prewarm --top 200
+    python servers/drug_lookup/bnf_local_cache.py stats
+    python servers/drug_lookup/bnf_local_cache.py clear-expired
+"""
+
+import json
+import os
+import re
+import sys
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+DEFAULT_CACHE_PATH = str(Path(__file__).parent / "data" / "bnf_cache.sqlite3")
+
+# Cache location and freshness (days)
+CACHE_PATH = os.getenv("BNF_CACHE_PATH", DEFAULT_CACHE_PATH)
+CACHE_ENABLED = os.getenv("BNF_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+TTL_DAYS = float(os.getenv("BNF_CACHE_TTL_DAYS", "30"))
+STALE_DAYS = float(os.getenv("BNF_CACHE_STALE_DAYS", "60"))
+
+# Matches https://bnf.nice.org.uk/drugs/<slug>/
+_DRUG_URL_RE = re.compile(r"/drugs/([a-z0-9-]+)/?$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bnf_drugs (
+    slug TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_accessed REAL NOT NULL,
+    hit_count INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def slug_from_url(drug_url: str) -> Optional[str]:
+    """Extract the drug slug from a BNF drug page URL (None for other pages)."""
+    match = _DRUG_URL_RE.search(drug_url.split("?")[0].split("#")[0])
+    return match.group(1) if match else None
+
+
+class BNFLocalCache:
+    """
+    SQLite cache of parsed BNF drug pages with TTL and stale-while-revalidate.
+
+    Usage:
+        cache = BNFLocalCache()
+        drug_info = cache.get_or_fetch("amoxicillin", lambda: fetch(url))
+    """
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        ttl_days: float = TTL_DAYS,
+        stale_days: float = STALE_DAYS,
+        enabled: bool = CACHE_ENABLED,
+        refresh_workers: int = 2,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite database file (created if missing). ":memory:" for tests.
+            ttl_days: Age after which an entry is stale and refreshed in the background.
+            stale_days: Extra time a stale entry may still be served.
+            enabled: If False, every call goes straight to the fetch function.
+            refresh_workers: Background threads used for stale refreshes.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_days * 86400
+        self.stale_seconds = stale_days * 86400
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._refreshing: set = set()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="bnf-cache-refresh")
+        self._conn: Optional[sqlite3.Connection] = None
+
+        # Cache statistics (this process)
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._refreshes = 0
+        self._refresh_errors = 0
+
+        if self.enabled:
+            try:
+                if path != ":memory:":
+                    Path(path).parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(_SCHEMA)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️  BNF local cache disabled: {e}", file=sys.stderr)
+                self.enabled = False
+
+    def get(self, slug: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """
+        Look up a slug.
+
+        Returns:
+            (drug_info, is_stale), or None if missing or past the stale window.
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, fetched_at FROM bnf_drugs WHERE slug = ?", (slug,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            age = time.time() - row[1]
+            if age > self.ttl_seconds + self.stale_seconds:
+                return None
+
+            self._conn.execute(
+                "UPDATE bnf_drugs SET hit_count = hit_count + 1, last_accessed = ? WHERE slug = ?",
+                (time.time(), slug)
+            )
+            self._conn.commit()
+
+        return json.loads(row[0]), age > self.ttl_seconds
+
+    def set(self, slug: str, drug_info: Dict[str, Any]):
+        """Store a successful parse result (failed lookups are never cached)."""
+        if not self.enabled or not drug_info.get('success'):
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO bnf_drugs (slug, data, fetched_at, last_accessed, hit_count)
+                VALUES (?, ?, ?, ?, 0)
+                ON CONFLICT(slug) DO UPDATE SET data = excluded.data, fetched_at = excluded.fetched_at
+                """,
+                (slug, json.dumps(drug_info), now, now)
+            )
+            self._conn.commit()
+
+    def get_or_fetch(self, slug: str, fetch: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Return cached drug info for a slug, fetching on a miss.
+
+        Stale entries are returned immediately while `fetch` runs in the
+        background to replace them.
+        """
+        if not self.enabled:
+            return fetch()
+
+        cached = self.get(slug)
+        if cached is not None:
+            drug_info, is_stale = cached
+            if is_stale:
+                self._stale_hits += 1
+                self._schedule_refresh(slug, fetch)
+                print(f"💾 BNF cache stale hit: {slug} (refreshing in background)", file=sys.stderr)
+            else:
+                self._hits += 1
+                print(f"💾 BNF cache hit: {slug}", file=sys.stderr)
+            return drug_info
+
+        self._misses += 1
+        drug_info = fetch()
+        self.set(slug, drug_info)
+        return drug_info
+
+    def _schedule_refresh(self, slug: str, fetch: Callable[[], Dict[str, Any]]):
+        """Refresh a stale entry in the background (once per slug at a time)."""
+        with self._lock:
+            if slug in self._refreshing:
+                return
+            self._refreshing.add(slug)
+
+        def refresh():
+            try:
+                drug_info = fetch()
+                if drug_info.get('success'):
+                    self.set(slug, drug_info)
+                    self._refreshes += 1
+                else:
+                    self._refresh_errors += 1
+            except Exception as e:
+                self._refresh_errors += 1
+                print(f"⚠️  BNF cache refresh failed for {slug}: {e}", file=sys.stderr)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(slug)
+
+        self._executor.submit(refresh)
+
+    def is_fresh(self, slug: str) -> bool:
+        """Whether a slug has an entry younger than the TTL (doesn't count as a hit)."""
+        if not self.enabled:
+            return False
+        with self._lock:
+            row = self._conn.execute("SELECT fetched_at FROM bnf_drugs WHERE slug = ?", (slug,)).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttl_seconds
+
+    def popular_slugs(self, limit: int) -> List[str]:
+        """Most-requested cached slugs, most hits first."""
+        if not self.enabled:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT slug FROM bnf_drugs ORDER BY hit_count DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def clear_expired(self) -> int:
+        """Delete entries past the stale window. Returns the number deleted."""
+        if not self.enabled:
+            return 0
+        cutoff = time.time() - self.ttl_seconds - self.stale_seconds
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM bnf_drugs WHERE fetched_at < ?", (cutoff,)).rowcount
+            self._conn.commit()
+        return deleted
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return cache statistics for the metrics endpoint."""
+        if not self.enabled:
+            return {'enabled': False}
+
+        now = time.time()
+        with self._lock:
+            total, fresh = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(fetched_at >= ?), 0) FROM bnf_drugs",
+                (now - self.ttl_seconds,)
+            ).fetchone()
+
+        lookups = self._hits + self._stale_hits + self._misses
+        return {
+            'enabled': True,
+            'path': self.path,
+            'entries': total,
+            'fresh_entries': fresh,
+            'hits': self._hits,
+            'stale_hits': self._stale_hits,
+            'misses': self._misses,
+            'hit_rate': round((self._hits + self._stale_hits) / lookups, 3) if lookups else 0.0,
+            'background_refreshes': self._refreshes,
+            'refresh_errors': self._refresh_errors,
+            'refreshing': len(self._refreshing),
+            'ttl_days': self.ttl_seconds / 86400,
+            'stale_days': self.stale_seconds / 86400,
+        }
+
+    def close(self):
+        """Wait for background refreshes and close the database."""
+        self._executor.shutdown(wait=True)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            self.enabled = False
+
+
+# Global cache instance
+_cache: Optional[BNFLocalCache] = None
+
+
+def get_local_cache() -> BNFLocalCache:
+    """Get or create the global BNF local cache instance."""
+    global _cache
+    if _cache is None:
+        _cache = BNFLocalCache()
+    return _cache
+
+
+def prewarm(top: int, workers: int = 1) -> Dict[str, int]:
+    """
+    Fetch and cache the top-N drugs that aren't already fresh.
+
+    Drugs already requested most often (by cached hit count) come first,
+    then the rest of data/bnf_drug_index.json in index order.
+    """
+    # Imported here: the BNF server needs SCRAPEOPS_API_KEY at import time
+    _drug_lookup_dir = str(Path(__file__).parent)
+    if _drug_lookup_dir not in sys.path:
+        sys.path.insert(0, _drug_lookup_dir)
+    from bnf_server import _get_bnf_drug_info_impl, cache, BASE_URL
+    from bnf_index_utils import get_bnf_index
+
+    ordered = cache.popular_slugs(top)
+    seen = set(ordered)
+    for drug in get_bnf_index().drugs:
+        if len(ordered) >= top:
+            break
+        if drug['slug'] not in seen:
+            ordered.append(drug['slug'])
+            seen.add(drug['slug'])
+
+    todo = [slug for slug in ordered[:top] if not cache.is_fresh(slug)]
+    print(f"🔥 Pre-warming {len(todo)} of top {top} BNF drugs ({top - len(todo)} already fresh)", file=sys.stderr)
+
+    counts = {'fetched': 0, 'failed': 0, 'skipped': top - len(todo)}
+
+    def warm(slug: str):
+        drug_info = _get_bnf_drug_info_impl(f"{BASE_URL}/drugs/{slug}/")
+        counts['fetched' if drug_info.get('success') else 'failed'] += 1
+
+    # Sequential by default (proxy tier limitation)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(warm, todo))
+
+    print(f"✅ Pre-warm complete: {counts}", file=sys.stderr)
+    return counts
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the local BNF monograph cache")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    prewarm_parser = subparsers.add_parser("prewarm", help="Fetch and cache the top-N drugs")
+    prewarm_parser.add_argument("--top", type=int, default=200, help="Number of drugs to pre-warm")
+    prewarm_parser.add_argument("--workers", type=int, default=1, help="Concurrent fetches")
+
+    subparsers.add_parser("stats", help="Show cache statistics")
+    subparsers.add_parser("clear-expired", help="Delete entries past the stale window")
+
+    args = parser.parse_args()
+
+    if args.command == "prewarm":
+        prewarm(args.top, args.workers)
+    elif args.command == "stats":
+        print(json.dumps(get_local_cache().get_stats(), indent=2))
+    elif args.command == "clear-expired":
+        print(f"🗑️  Cleared {get_local_cache().clear_expired()} expired entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -37,20 +37,8 @@ load_dotenv()
 # Disable SSL warnings for proxy
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-# CACHE DISABLED - Using dummy cache for testing
-CACHE_AVAILABLE = False
-# Create a dummy cache that does nothing
-class DummyCache:
-    def __init__(self):
-        self.enabled = False
-    def get(self, *args, **kwargs):
-        return None
-    def set(self, *args, **kwargs):
-        pass
-def get_cache():
-    return DummyCache()
-
-print("⚠️  BNF cache DISABLED (using dummy cache)", file=sys.stderr)
+from bnf_local_cache import get_local_cache, slug_from_url
+from bnf_snapshot import get_snapshot, BNF_DATA_MODE, LIVE, SNAPSHOT
 
 # Initialize FastMCP server with proper name and instructions
 mcp = FastMCP(
@@ -81,18 +69,29 @@ SCRAPEOPS_API_KEY = os.getenv('SCRAPEOPS_API_KEY')
 session = requests.Session()
 session.headers.update(HEADERS)
 
-if SCRAPEOPS_API_KEY:
+if BNF_DATA_MODE == SNAPSHOT:
+    # Drug pages come from the offline snapshot - the proxy is only needed for live searches
+    print(f"📦 BNF server serving drug pages from snapshot ({get_snapshot().path})", file=sys.stderr)
+    if not SCRAPEOPS_API_KEY:
+        print("⚠️  SCRAPEOPS_API_KEY not set - condition/treatment-summary searches will fail", file=sys.stderr)
+elif SCRAPEOPS_API_KEY:
     print(f"🔄 BNF server using ScrapeOps Round-Robin Proxy Pool", file=sys.stderr)
     print(f"   Available proxies: {get_proxy_count()}", file=sys.stderr)
     print(f"   Proxy server: residential-proxy.scrapeops.io:8181", file=sys.stderr)
+    if BNF_DATA_MODE != LIVE:
+        print(f"📦 BNF data mode: {BNF_DATA_MODE} (snapshot: {get_snapshot().path})", file=sys.stderr)
 else:
     print("❌ ERROR: SCRAPEOPS_API_KEY not set!", file=sys.stderr)
     print("   BNF lookups require ScrapeOps residential proxy to bypass Cloudflare.", file=sys.stderr)
     print("   Set SCRAPEOPS_API_KEY environment variable and restart.", file=sys.stderr)
     sys.exit(1)
 
-# Initialize cache
-cache = get_cache()
+# Initialize local monograph cache (SQLite, TTL + stale-while-revalidate)
+cache = get_local_cache()
+if cache.enabled:
+    print(f"💾 BNF local cache enabled ({cache.path})", file=sys.stderr)
+else:
+    print("⚠️  BNF local cache DISABLED", file=sys.stderr)
 
 def make_request(url: str, timeout: int = 15, session_id: Optional[str] = None) -> tuple[Optional[requests.Response], Dict[str, Any]]:
     """
@@ -486,6 +485,42 @@ def search_bnf_drug(drug_name: str, variations: list[str] = None) -> Dict[str, A
 
 
 def _get_bnf_drug_info_impl(drug_url: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get parsed drug information for a BNF drug page.
+
+    In "snapshot" and "hybrid" data modes drug pages are served from the
+    offline snapshot (see bnf_snapshot.py). Otherwise, and for drugs missing
+    from the snapshot in hybrid mode, pages are fetched through the local
+    cache: cached by slug, with stale entries served while being refreshed
+    in the background. Non-drug URLs are always fetched.
+
+    Args:
+        drug_url: URL to the drug's BNF page
+        session_id: Optional Bright Data session ID for IP pinning
+
+    Returns:
+        Dictionary of drug information (see _fetch_bnf_drug_info)
+    """
+    slug = slug_from_url(drug_url)
+    if not slug:
+        return _fetch_bnf_drug_info(drug_url, session_id)
+
+    if BNF_DATA_MODE != LIVE:
+        drug_info = get_snapshot().get(slug)
+        if drug_info is not None:
+            return drug_info
+        if BNF_DATA_MODE == SNAPSHOT:
+            return {
+                'drug_name': 'Unknown',
+                'url': drug_url,
+                'success': False,
+                'error': f'Drug "{slug}" is not in the offline BNF snapshot'
+            }
+
+    return cache.get_or_fetch(slug, lambda: _fetch_bnf_drug_info(drug_url, session_id))
+
+
+def _fetch_bnf_drug_info(drug_url: str, session_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Retrieve comprehensive information about a drug from its BNF page.
 
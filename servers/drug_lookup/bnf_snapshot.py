@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+"""
+Offline BNF snapshot: a local store of every drug monograph in the index.
+
+The snapshot builder walks every slug in data/bnf_drug_index.json, scrapes
+each drug page once and stores the parsed fields `_get_bnf_drug_info_impl`
+produces (indications, dosage, contraindications, renal/hepatic impairment,
+...). The BNF server can then answer drug lookups from the snapshot without
+touching the ScrapeOps proxy.
+
+Data modes (BNF_DATA_MODE):
+- "live":     scrape BNF (through the local cache) - default
+- "snapshot": serve only from the snapshot; drugs missing from it fail
+- "hybrid":   serve from the snapshot, fall back to live for missing drugs
+
+The builder is rate-limited, commits after every drug (checkpointing) and
+resumes where it left off: drugs already in the snapshot are skipped and
+failed drugs are retried up to --max-attempts times.
+
+CLI:
+    python servers/drug_lookup/bnf_snapshot.py build --delay 1.0
+    python servers/drug_lookup/bnf_snapshot.py build --limit 50 --refresh-older-than 90
+    python servers/drug_lookup/bnf_snapshot.py stats
+"""
+
+import json
+import os
+import sys
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+DEFAULT_SNAPSHOT_PATH = str(Path(__file__).parent / "data" / "bnf_snapshot.sqlite3")
+
+SNAPSHOT_PATH = os.getenv("BNF_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+
+LIVE = "live"
+SNAPSHOT = "snapshot"
+HYBRID = "hybrid"
+DATA_MODES = (LIVE, SNAPSHOT, HYBRID)
+
+BNF_DATA_MODE = os.getenv("BNF_DATA_MODE", LIVE).lower()
+if BNF_DATA_MODE not in DATA_MODES:
+    print(f"⚠️  Unknown BNF_DATA_MODE '{BNF_DATA_MODE}', using '{LIVE}'", file=sys.stderr)
+    BNF_DATA_MODE = LIVE
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS drugs (
+    slug TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS failures (
+    slug TEXT PRIMARY KEY,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_attempt REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class BNFSnapshot:
+    """
+    SQLite store of parsed BNF drug monographs keyed by slug.
+
+    Reads are single-row primary-key lookups, so serving from the snapshot
+    takes well under a millisecond per drug.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH):
+        """
+        Open (or create) a snapshot.
+
+        Args:
+            path: SQLite database file. ":memory:" for tests.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+        # Read statistics (this process)
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, slug: str) -> Optional[Dict[str, Any]]:
+        """Return the stored drug info for a slug, or None if not in the snapshot."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM drugs WHERE slug = ?", (slug,)).fetchone()
+        if row is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return json.loads(row[0])
+
+    def put(self, slug: str, drug_info: Dict[str, Any]):
+        """Store a successful parse result and clear any recorded failure (checkpoint)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO drugs (slug, data, fetched_at) VALUES (?, ?, ?)",
+                (slug, json.dumps(drug_info), time.time())
+            )
+            self._conn.execute("DELETE FROM failures WHERE slug = ?", (slug,))
+            self._conn.commit()
+
+    def record_failure(self, slug: str, error: str):
+        """Record a failed scrape so resumed builds can retry it."""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO failures (slug, error, attempts, last_attempt) VALUES (?, ?, 1, ?)
+                ON CONFLICT(slug) DO UPDATE SET error = excluded.error,
+                    attempts = attempts + 1, last_attempt = excluded.last_attempt
+                """,
+                (slug, error, time.time())
+            )
+            self._conn.commit()
+
+    def fetched_at(self) -> Dict[str, float]:
+        """Map of slug -> fetch time for every stored drug."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT slug, fetched_at FROM drugs").fetchall())
+
+    def failure_attempts(self) -> Dict[str, int]:
+        """Map of slug -> failed attempts for drugs not yet in the snapshot."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT slug, attempts FROM failures").fetchall())
+
+    def set_meta(self, key: str, value: Any):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+            self._conn.commit()
+
+    def get_meta(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return snapshot coverage and read statistics."""
+        with self._lock:
+            drugs, oldest, newest = self._conn.execute(
+                "SELECT COUNT(*), MIN(fetched_at), MAX(fetched_at) FROM drugs"
+            ).fetchone()
+            failures = self._conn.execute("SELECT COUNT(*) FROM failures").fetchone()[0]
+
+        return {
+            'path': self.path,
+            'mode': BNF_DATA_MODE,
+            'drugs': drugs,
+            'failed_drugs': failures,
+            'index_count': self.get_meta('index_count'),
+            'oldest_fetch': oldest,
+            'newest_fetch': newest,
+            'last_build_completed_at': self.get_meta('completed_at'),
+            'hits': self._hits,
+            'misses': self._misses,
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+# Global snapshot instance
+_snapshot: Optional[BNFSnapshot] = None
+
+
+def get_snapshot() -> BNFSnapshot:
+    """Get or open the global BNF snapshot."""
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = BNFSnapshot()
+    return _snapshot
+
+
+def plan_build(
+    snapshot: BNFSnapshot,
+    slugs: List[str],
+    refresh_older_than_days: Optional[float] = None,
+    max_attempts: int = 3,
+) -> List[str]:
+    """
+    Work out which slugs a (resumed) build still needs to scrape.
+
+    Skips drugs already in the snapshot (unless older than the refresh age)
+    and drugs that have already failed max_attempts times.
+    """
+    stored = snapshot.fetched_at()
+    attempts = snapshot.failure_attempts()
+    cutoff = time.time() - refresh_older_than_days * 86400 if refresh_older_than_days is not None else None
+
+    todo = []
+    for slug in slugs:
+        if slug in stored and (cutoff is None or stored[slug] >= cutoff):
+            continue
+        if attempts.get(slug, 0) >= max_attempts:
+            continue
+        todo.append(slug)
+    return todo
+
+
+def build_snapshot(
+    snapshot: BNFSnapshot,
+    slugs: List[str],
+    fetch,
+    delay: float = 1.0,
+    refresh_older_than_days: Optional[float] = None,
+    max_attempts: int = 3,
+    limit: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Scrape drugs into the snapshot, one at a time.
+
+    Args:
+        snapshot: Snapshot to write to.
+        slugs: Every slug that should be in the snapshot (index order).
+        fetch: Function slug -> parsed drug info dict (live scrape, no cache).
+        delay: Minimum seconds between requests (rate limit).
+        refresh_older_than_days: Re-scrape stored drugs older than this.
+        max_attempts: Stop retrying a drug after this many failures.
+        limit: Scrape at most this many drugs in this run.
+
+    Returns:
+        Counts of fetched, failed and remaining drugs.
+    """
+    todo = plan_build(snapshot, slugs, refresh_older_than_days, max_attempts)
+    if limit is not None:
+        todo = todo[:limit]
+
+    snapshot.set_meta('index_count', len(slugs))
+    snapshot.set_meta('started_at', time.time())
+    print(f"📦 BNF snapshot: {len(todo)} drugs to fetch ({len(slugs)} in index)", file=sys.stderr)
+
+    counts = {'fetched': 0, 'failed': 0}
+    last_request = 0.0
+
+    for i, slug in enumerate(todo, 1):
+        wait = delay - (time.monotonic() - last_request)
+        if wait > 0:
+            time.sleep(wait)
+        last_request = time.monotonic()
+
+        try:
+            drug_info = fetch(slug)
+            error = None if drug_info.get('success') else drug_info.get('error', 'Unknown error')
+        except Exception as e:
+            drug_info, error = None, str(e)
+
+        if error is None:
+            snapshot.put(slug, drug_info)
+            counts['fetched'] += 1
+        else:
+            snapshot.record_failure(slug, error)
+            counts['failed'] += 1
+            print(f"   ❌ {slug}: {error}", file=sys.stderr)
+
+        if i % 25 == 0 or i == len(todo):
+            print(f"   [{i}/{len(todo)}] fetched={counts['fetched']} failed={counts['failed']}", file=sys.stderr)
+
+    counts['remaining'] = len(plan_build(snapshot, slugs, refresh_older_than_days, max_attempts))
+    if counts['remaining'] == 0:
+        snapshot.set_meta('completed_at', time.time())
+    return counts
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build and inspect the offline BNF snapshot")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Scrape index drugs into the snapshot (resumable)")
+    build_parser.add_argument("--delay", type=float, default=1.0, help="Minimum seconds between requests")
+    build_parser.add_argument("--limit", type=int, default=None, help="Maximum drugs to fetch this run")
+    build_parser.add_argument("--max-attempts", type=int, default=3, help="Give up on a drug after N failures")
+    build_parser.add_argument("--refresh-older-than", type=float, default=None,
+                              help="Re-scrape drugs stored more than N days ago")
+
+    subparsers.add_parser("stats", help="Show snapshot coverage")
+
+    args = parser.parse_args()
+    snapshot = get_snapshot()
+
+    if args.command == "build":
+        # Imported here: the BNF server needs SCRAPEOPS_API_KEY for live scraping
+        _drug_lookup_dir = str(Path(__file__).parent)
+        if _drug_lookup_dir not in sys.path:
+            sys.path.insert(0, _drug_lookup_dir)
+        from bnf_server import _fetch_bnf_drug_info, BASE_URL
+        from bnf_index_utils import get_bnf_index
+
+        slugs = [d['slug'] for d in get_bnf_index().drugs]
+        counts = build_snapshot(
+            snapshot,
+            slugs,
+            lambda slug: _fetch_bnf_drug_info(f"{BASE_URL}/drugs/{slug}/"),
+            delay=args.delay,
+            refresh_older_than_days=args.refresh_older_than,
+            max_attempts=args.max_attempts,
+            limit=args.limit,
+        )
+        print(f"✅ Snapshot build finished: {counts}", file=sys.stderr)
+    elif args.command == "stats":
+        print(json.dumps(snapshot.get_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+#!/usr/bin/env python
+"""
+Async Audio Transcoder
+
+Process-wide ffmpeg transcoding service for recorded audio chunks.
+
+The upload handlers used to write each chunk to a temp file, run a
+blocking `subprocess.run(['ffprobe', ...])` (for logging only), a blocking
+`subprocess.run(['ffmpeg', ...])` to MP3 and then reopen the output file.
+AudioTranscoder instead:
+- pipes the uploaded bytes through ffmpeg's stdin/stdout
+  (asyncio.create_subprocess_exec, no blocked event loop). MP4/M4A/MOV
+  recordings, whose index (moov atom) may sit at the end of the file, are
+  read from a temp file instead, as are inputs ffmpeg fails to read from
+  the pipe
+- skips the diagnostic ffprobe unless AUDIO_PROBE_ENABLED is set
+- bounds concurrent ffmpeg processes to the CPU count; further chunks wait
+  for a free worker instead of oversubscribing the CPU
+- outputs 16 kHz mono audio in each provider's preferred format (PROVIDER_FORMATS)
+- decodes long recordings to raw PCM once, so overlapping windows can be cut
+  in memory (window_ranges / pcm_slice) and encoded in parallel
+
+Usage:
+    from servers.utils.audio_transcoder import get_audio_transcoder, TranscodeError
+
+    audio = await get_audio_transcoder().transcode_for_provider(webm_bytes, "sarvam")
+    audio.data, audio.suffix, audio.mime_type
+"""
+
+import asyncio
+import mimetypes
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+FFPROBE_BIN = os.getenv("FFPROBE_BIN", "ffprobe")
+
+# Concurrent ffmpeg processes (defaults to the CPU count)
+MAX_WORKERS = int(os.getenv("AUDIO_TRANSCODE_WORKERS", "0")) or os.cpu_count() or 2
+
+# Per-transcode timeout (seconds)
+TRANSCODE_TIMEOUT = float(os.getenv("AUDIO_TRANSCODE_TIMEOUT_SECONDS", "30"))
+
+# Run ffprobe on every input for diagnostics (slow; off by default)
+PROBE_ENABLED = os.getenv("AUDIO_PROBE_ENABLED", "false").lower() in ("1", "true", "yes")
+
+SAMPLE_RATE = 16000
+
+# Containers ffmpeg must be able to seek in (the index can follow the audio data)
+SEEKABLE_SUFFIXES = {".mp4", ".m4a", ".mov"}
+
+
+class TranscodeError(Exception):
+    """ffmpeg failed, timed out or is not installed."""
+
+
+class DecodeError(TranscodeError):
+    """ffmpeg ran but exited with an error or produced no output."""
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    """ffmpeg output settings for one target format."""
+    name: str
+    codec_args: tuple
+    container: str
+    suffix: str
+    mime_type: str
+
+
+MP3_16K_MONO = AudioFormat(
+    name="mp3_16k_mono",
+    codec_args=("-acodec", "libmp3lame", "-b:a", "64k"),
+    container="mp3",
+    suffix=".mp3",
+    mime_type="audio/mpeg",
+)
+
+WAV_16K_MONO = AudioFormat(
+    name="wav_16k_mono",
+    codec_args=("-acodec", "pcm_s16le"),
+    container="wav",
+    suffix=".wav",
+    mime_type="audio/wav",
+)
+
+# Headerless 16-bit PCM: seekable by byte offset, used to cut recordings into windows
+PCM_16K_MONO = AudioFormat(
+    name="pcm_16k_mono",
+    codec_args=("-acodec", "pcm_s16le"),
+    container="s16le",
+    suffix=".pcm",
+    mime_type="audio/L16",
+)
+PCM_BYTES_PER_SECOND = SAMPLE_RATE * 2
+
+# Preferred upload format per transcription provider. None = upload the original
+# bytes (ElevenLabs accepts WebM/Opus directly, which is smaller than 16 kHz PCM).
+PROVIDER_FORMATS: Dict[str, Optional[AudioFormat]] = {
+    "sarvam": MP3_16K_MONO,
+    "elevenlabs": None,
+}
+
+# MIME types for uploaded recordings, by file suffix (mimetypes maps .webm to video/webm)
+UPLOAD_MIME_TYPES = {
+    ".webm": "audio/webm",
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+    ".m4a": "audio/mp4",
+    ".mp4": "audio/mp4",
+    ".ogg": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".flac": "audio/flac",
+    ".aac": "audio/aac",
+}
+
+
+def mime_type_for(suffix: str) -> str:
+    """MIME type to send with an uploaded recording, from its file suffix."""
+    suffix = suffix.lower()
+    return UPLOAD_MIME_TYPES.get(suffix) or mimetypes.guess_type(f"audio{suffix}")[0] or "application/octet-stream"
+
+
+@dataclass
+class TranscodedAudio:
+    """Provider-ready audio bytes."""
+    data: bytes
+    suffix: str
+    mime_type: str
+    transcoded: bool
+
+    @property
+    def filename(self) -> str:
+        """Upload filename matching the format (providers sniff the extension)."""
+        return f"audio{self.suffix}"
+
+
+def ffmpeg_args(output: AudioFormat, ffmpeg_bin: str = FFMPEG_BIN,
+                input_format: Optional[AudioFormat] = None, input_path: str = "pipe:0") -> List[str]:
+    """
+    ffmpeg command line reading stdin (or `input_path`) and writing `output` to stdout.
+
+    The input container is auto-detected unless `input_format` is given
+    (required for headerless PCM_16K_MONO input).
+    """
+    input_args = ["-f", input_format.container, "-ar", str(SAMPLE_RATE), "-ac", "1"] if input_format else []
+    return [
+        ffmpeg_bin, "-hide_banner", "-loglevel", "error",
+        *input_args,
+        "-i", input_path,
+        "-vn",  # Ignore video streams (WebM might have video metadata)
+        "-ac", "1", "-ar", str(SAMPLE_RATE),
+        *output.codec_args,
+        "-f", output.container,
+        "pipe:1",
+    ]
+
+
+class AudioTranscoder:
+    """
+    Bounded pool of piped ffmpeg processes.
+
+    The semaphore is created lazily so the instance can be constructed at
+    import time, before the event loop is running.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = MAX_WORKERS,
+        timeout: float = TRANSCODE_TIMEOUT,
+        ffmpeg_bin: str = FFMPEG_BIN,
+        probe: bool = PROBE_ENABLED,
+    ):
+        """
+        Initialize the transcoder.
+
+        Args:
+            max_workers: Maximum concurrent ffmpeg processes.
+            timeout: Seconds before a transcode is killed.
+            ffmpeg_bin: ffmpeg executable.
+            probe: Log ffprobe stream info for every input (diagnostics only).
+        """
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.ffmpeg_bin = ffmpeg_bin
+        self.probe_enabled = probe
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        # Statistics
+        self._transcodes = 0
+        self._failures = 0
+        self._timeouts = 0
+        self._file_inputs = 0
+        self._active = 0
+        self._peak_active = 0
+        self._waiting = 0
+        self._total_seconds = 0.0
+        self._total_wait_seconds = 0.0
+        self._bytes_in = 0
+        self._bytes_out = 0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        return self._semaphore
+
+    async def transcode(self, data: bytes, output: AudioFormat = MP3_16K_MONO,
+                        input_format: Optional[AudioFormat] = None, timeout: Optional[float] = None,
+                        input_suffix: Optional[str] = None) -> bytes:
+        """
+        Transcode audio bytes (any ffmpeg-readable container) to `output`.
+
+        Input is piped through stdin, except for SEEKABLE_SUFFIXES, which are
+        written to a temp file first. If ffmpeg can't read piped input, the
+        transcode is retried once from a temp file.
+
+        Args:
+            input_format: Set for headerless input (PCM_16K_MONO); otherwise auto-detected.
+            timeout: Override the default timeout (e.g. for decoding a whole recording).
+            input_suffix: File suffix of the input (e.g. ".m4a"), if known.
+
+        Raises:
+            TranscodeError: If ffmpeg is missing, fails or exceeds the timeout.
+        """
+        if self.probe_enabled and input_format is None:
+            await self.probe(data)
+
+        queued = time.perf_counter()
+        self._waiting += 1
+        async with self.semaphore:
+            self._waiting -= 1
+            started = time.perf_counter()
+            self._total_wait_seconds += started - queued
+            self._active += 1
+            self._peak_active = max(self._peak_active, self._active)
+            try:
+                if input_format is None and (input_suffix or "").lower() in SEEKABLE_SUFFIXES:
+                    result = await self._run_from_file(output, data, input_suffix, timeout)
+                else:
+                    try:
+                        result = await self._run(ffmpeg_args(output, self.ffmpeg_bin, input_format), data, timeout)
+                    except DecodeError as e:
+                        if input_format is not None:
+                            raise
+                        print(f"⚠️  ffmpeg couldn't read piped input, retrying from a temp file: {e}")
+                        result = await self._run_from_file(output, data, input_suffix, timeout)
+            except TranscodeError:
+                self._failures += 1
+                raise
+            finally:
+                self._active -= 1
+
+        self._transcodes += 1
+        self._total_seconds += time.perf_counter() - started
+        self._bytes_in += len(data)
+        self._bytes_out += len(result)
+        return result
+
+    async def transcode_for_provider(self, data: bytes, provider: str, original_suffix: str = ".webm",
+                                     original_mime_type: str = "audio/webm") -> TranscodedAudio:
+        """
+        Convert audio to the provider's preferred format (see PROVIDER_FORMATS).
+
+        Providers without a preferred format get the original bytes back.
+
+        Raises:
+            TranscodeError: If the transcode fails (callers may fall back to the original).
+        """
+        output = PROVIDER_FORMATS.get(provider)
+        if output is None:
+            return TranscodedAudio(data, original_suffix, original_mime_type, transcoded=False)
+        result = await self.transcode(data, output, input_suffix=original_suffix)
+        return TranscodedAudio(result, output.suffix, output.mime_type, transcoded=True)
+
+    async def probe(self, data: bytes) -> str:
+        """Log ffprobe format/stream info for audio bytes (diagnostics)."""
+        try:
+            info = await self._run(
+                [FFPROBE_BIN, "-v", "error", "-show_format", "-show_streams", "pipe:0"], data, timeout=10
+            )
+            text = info.decode(errors="replace")
+            print(f"🔍 Audio probe: {text[:300]}")
+            return text
+        except TranscodeError as e:
+            print(f"⚠️  Audio probe failed: {e}")
+            return ""
+
+    async def _run_from_file(self, output: AudioFormat, data: bytes, suffix: Optional[str],
+                             timeout: Optional[float]) -> bytes:
+        """Transcode `data` from a temp file, so ffmpeg can seek (MP4 index at the end)."""
+        def write() -> str:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix or "") as f:
+                f.write(data)
+                return f.name
+
+        path = await asyncio.to_thread(write)
+        self._file_inputs += 1
+        try:
+            return await self._run(ffmpeg_args(output, self.ffmpeg_bin, input_path=path), None, timeout)
+        finally:
+            os.unlink(path)
+
+    async def _run(self, args: List[str], data: Optional[bytes], timeout: Optional[float] = None) -> bytes:
+        """Run a command, feeding it `data` on stdin (None: no stdin), and return its stdout."""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.PIPE if data is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            raise TranscodeError(f"{args[0]} not found")
+
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(input=data), timeout=timeout or self.timeout
+            )
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            await self._kill(process)
+            raise TranscodeError(f"{os.path.basename(args[0])} timed out after {timeout or self.timeout:.0f}s")
+        except BaseException:
+            # Caller cancelled (client disconnect, job lease lost): don't leave ffmpeg running
+            await asyncio.shield(self._kill(process))
+            raise
+
+        if process.returncode != 0:
+            raise DecodeError(
+                f"{os.path.basename(args[0])} exited with {process.returncode}: "
+                f"{stderr.decode(errors='replace').strip()[-500:]}"
+            )
+        if not stdout:
+            raise DecodeError(f"{os.path.basename(args[0])} produced no output")
+        return stdout
+
+    @staticmethod
+    async def _kill(process: asyncio.subprocess.Process):
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+        await process.wait()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return transcoding statistics for the metrics endpoint."""
+        return {
+            "max_workers": self.max_workers,
+            "active": self._active,
+            "peak_active": self._peak_active,
+            "waiting": self._waiting,
+            "transcodes": self._transcodes,
+            "failures": self._failures,
+            "timeouts": self._timeouts,
+            "file_inputs": self._file_inputs,
+            "avg_transcode_ms": round(self._total_seconds / self._transcodes * 1000, 1) if self._transcodes else 0.0,
+            "avg_wait_ms": round(self._total_wait_seconds / self._transcodes * 1000, 1) if self._transcodes else 0.0,
+            "bytes_in": self._bytes_in,
+            "bytes_out": self._bytes_out,
+            "probe_enabled": self.probe_enabled,
+        }
+
+
+def pcm_duration(pcm: bytes) -> float:
+    """Duration in seconds of PCM_16K_MONO audio."""
+    return len(pcm) / PCM_BYTES_PER_SECOND
+
+
+def pcm_slice(pcm: bytes, start: float, end: float) -> bytes:
+    """The [start, end) seconds of PCM_16K_MONO audio (cut on a sample boundary)."""
+    def offset(seconds: float) -> int:
+        return min(len(pcm), max(0, int(seconds * SAMPLE_RATE)) * 2)
+    return pcm[offset(start):offset(end)]
+
+
+def window_ranges(duration: float, window_seconds: float, overlap_seconds: float) -> List[Tuple[float, float]]:
+    """
+    Overlapping (start, end) windows covering `duration` seconds.
+
+    Consecutive windows share `overlap_seconds`. A final window shorter than a
+    quarter of `window_seconds` is folded into the one before it.
+    """
+    if duration <= window_seconds:
+        return [(0.0, duration)]
+
+    step = window_seconds - overlap_seconds
+    if step <= 0:
+        raise ValueError("window_seconds must be longer than overlap_seconds")
+
+    windows = []
+    start = 0.0
+    while True:
+        end = min(start + window_seconds, duration)
+        windows.append((start, end))
+        if end >= duration:
+            break
+        start += step
+
+    if len(windows) > 1 and windows[-1][1] - windows[-1][0] < window_seconds / 4:
+        windows.pop()
+        windows[-1] = (windows[-1][0], duration)
+    return windows
+
+
+# Process-wide transcoder instance
+_transcoder: Optional[AudioTranscoder] = None
+
+
+def get_audio_transcoder() -> AudioTranscoder:
+    """Get the process-wide audio transcoder, creating it on first call."""
+    global _transcoder
+    if _transcoder is None:
+        _transcoder = AudioTranscoder()
+    return _transcoder
+
+
+def get_audio_transcoder_stats() -> Optional[Dict[str, Any]]:
+    """Stats for the shared transcoder, or None if it has not been created yet."""
+    return _transcoder.get_stats() if _transcoder is not None else None
+
+
+__all__ = [
+    'AudioFormat', 'AudioTranscoder', 'TranscodedAudio', 'TranscodeError', 'DecodeError',
+    'SEEKABLE_SUFFIXES', 'MP3_16K_MONO', 'WAV_16K_MONO', 'PCM_16K_MONO', 'PROVIDER_FORMATS', 'UPLOAD_MIME_TYPES', 'mime_type_for',
+    'ffmpeg_args',
+    'pcm_duration', 'pcm_slice', 'window_ranges', 'get_audio_transcoder', 'get_audio_transcoder_stats',
+]
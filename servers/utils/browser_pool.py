@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+"""
+Headless Chromium Pool
+
+Process-wide pool of long-lived Playwright Chromium browsers for PDF rendering.
+
+generate_pdf_from_react used to start Playwright and launch a new Chromium
+for every consultation, analysis, custom-form and report-card PDF (1-3 s of
+process start and hundreds of MB of RSS per request, so a burst of downloads
+could OOM the container). BrowserPool instead:
+- launches PDF_BROWSER_POOL_SIZE browsers once (at startup, or on first use)
+  and leases a fresh, isolated browser context + page per render
+- caps concurrent renders at PDF_BROWSER_POOL_SIZE * PDF_BROWSER_PAGES_PER_BROWSER;
+  further renders wait in a bounded queue (PDF_BROWSER_QUEUE_SIZE, then
+  BrowserPoolBusy) so memory stays flat under load
+- recycles each browser after PDF_BROWSER_MAX_RENDERS renders (bounding
+  leaked memory); the old browser closes once its in-flight renders finish
+- relaunches browsers that crashed or disconnected on their next lease
+
+Usage:
+    from servers.utils.browser_pool import get_browser_pool
+
+    async with get_browser_pool().page(viewport={"width": 1200, "height": 1600}) as page:
+        await page.set_content(html)
+        pdf_bytes = await page.pdf(format="A4")
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+# Browsers kept running
+POOL_SIZE = int(os.getenv("PDF_BROWSER_POOL_SIZE", "1"))
+
+# Concurrent pages (one context each) per browser
+PAGES_PER_BROWSER = int(os.getenv("PDF_BROWSER_PAGES_PER_BROWSER", "2"))
+
+# Renders before a browser is replaced
+MAX_RENDERS = int(os.getenv("PDF_BROWSER_MAX_RENDERS", "200"))
+
+# Renders allowed to wait for a free page before new ones are rejected
+QUEUE_SIZE = int(os.getenv("PDF_BROWSER_QUEUE_SIZE", "16"))
+
+# Longest a render waits for a free page (seconds)
+QUEUE_TIMEOUT = float(os.getenv("PDF_BROWSER_QUEUE_TIMEOUT_SECONDS", "30"))
+
+LAUNCH_ARGS = ['--no-sandbox', '--disable-setuid-sandbox', '--disable-dev-shm-usage']  # Required for Docker
+
+
+class BrowserPoolBusy(Exception):
+    """Every page is in use and the wait queue is full (or the wait timed out)."""
+
+
+class _PooledBrowser:
+    """One Chromium process and its lease counters."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.browser = None
+        self.renders = 0
+        self.active = 0
+        self.retiring = False
+        self.lock = asyncio.Lock()
+
+
+class BrowserPool:
+    """
+    Fixed set of Chromium browsers leased out one context per render.
+
+    Asyncio primitives and the Playwright driver are created lazily so the
+    instance can be constructed at import time, before the event loop is running.
+    """
+
+    def __init__(
+        self,
+        size: int = POOL_SIZE,
+        pages_per_browser: int = PAGES_PER_BROWSER,
+        max_renders: int = MAX_RENDERS,
+        queue_size: int = QUEUE_SIZE,
+        queue_timeout: float = QUEUE_TIMEOUT,
+        launch: Optional[Callable[[], Awaitable[Any]]] = None,
+    ):
+        """
+        Initialize the pool.
+
+        Args:
+            size: Browsers kept running.
+            pages_per_browser: Concurrent renders per browser.
+            max_renders: Renders before a browser is recycled (0 = never).
+            queue_size: Renders allowed to wait for a free page.
+            queue_timeout: Seconds a render waits before BrowserPoolBusy.
+            launch: Coroutine function returning a Playwright Browser
+                (defaults to headless Chromium via a shared Playwright driver).
+        """
+        self.size = max(1, size)
+        self.pages_per_browser = max(1, pages_per_browser)
+        self.max_renders = max_renders
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._launch = launch or self._launch_chromium
+        self._playwright = None
+        self._slots: List[_PooledBrowser] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._closing: set = set()
+
+        # Statistics
+        self._launches = 0
+        self._recycled = 0
+        self._crashes = 0
+        self._renders = 0
+        self._failures = 0
+        self._rejected = 0
+        self._waiting = 0
+        self._peak_waiting = 0
+        self._total_wait_seconds = 0.0
+        self._total_render_seconds = 0.0
+        self._launch_seconds = 0.0
+
+    @property
+    def capacity(self) -> int:
+        return self.size * self.pages_per_browser
+
+    @property
+    def started(self) -> bool:
+        return bool(self._slots)
+
+    async def _launch_chromium(self):
+        if self._playwright is None:
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+        return await self._playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
+
+    async def start(self):
+        """Launch every browser (idempotent); renders otherwise start the pool on first use."""
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self._slots:
+                return
+            self._semaphore = asyncio.Semaphore(self.capacity)
+            slots = [_PooledBrowser(i) for i in range(self.size)]
+            await asyncio.gather(*[self._ensure_browser(slot) for slot in slots])
+            self._slots = slots
+            print(f"✅ PDF browser pool started ({self.size} browser(s) x {self.pages_per_browser} pages)")
+
+    async def _ensure_browser(self, slot: _PooledBrowser):
+        """Launch the slot's browser if it has none yet or the old one crashed."""
+        async with slot.lock:
+            if slot.browser is not None and slot.browser.is_connected():
+                return slot.browser
+            if slot.browser is not None:
+                self._crashes += 1
+                print(f"⚠️  PDF browser {slot.index} disconnected - relaunching")
+            started = time.perf_counter()
+            slot.browser = await self._launch()
+            self._launch_seconds += time.perf_counter() - started
+            self._launches += 1
+            return slot.browser
+
+    async def _acquire(self) -> _PooledBrowser:
+        if not self._slots:
+            await self.start()
+        if self._waiting >= self.queue_size and self._semaphore.locked():
+            self._rejected += 1
+            raise BrowserPoolBusy(f"PDF renderer busy ({self._waiting} renders queued)")
+
+        queued = time.perf_counter()
+        self._waiting += 1
+        self._peak_waiting = max(self._peak_waiting, self._waiting)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise BrowserPoolBusy(f"No PDF renderer free after {self.queue_timeout:.0f}s")
+        finally:
+            self._waiting -= 1
+        self._total_wait_seconds += time.perf_counter() - queued
+
+        # The semaphore guarantees a live slot with a free page
+        slot = min((s for s in self._slots if s.active < self.pages_per_browser), key=lambda s: s.active)
+        slot.active += 1
+        return slot
+
+    def _release(self, slot: _PooledBrowser):
+        slot.active -= 1
+        slot.renders += 1
+        if not slot.retiring and self.max_renders and slot.renders >= self.max_renders and slot in self._slots:
+            # Swap in a fresh slot now; the old browser closes when its last render ends
+            # (a slot no longer in the pool was dropped by close(), which closes its browser)
+            slot.retiring = True
+            self._slots[self._slots.index(slot)] = _PooledBrowser(slot.index)
+            self._recycled += 1
+        if slot.retiring and slot.active == 0 and slot.browser is not None:
+            task = asyncio.create_task(self._close_browser(slot.browser))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+            slot.browser = None
+        self._semaphore.release()
+
+    async def _close_browser(self, browser):
+        try:
+            await browser.close()
+        except Exception as e:
+            print(f"⚠️  Failed to close PDF browser: {e}")
+
+    @asynccontextmanager
+    async def page(self, viewport: Optional[Dict[str, int]] = None):
+        """
+        Lease a page in a fresh browser context; the context is closed on exit.
+
+        Raises:
+            BrowserPoolBusy: If the wait queue is full or the wait timed out.
+        """
+        slot = await self._acquire()
+        started = time.perf_counter()
+        context = None
+        try:
+            browser = await self._ensure_browser(slot)
+            context = await browser.new_context(viewport=viewport)
+            yield await context.new_page()
+            self._renders += 1
+            self._total_render_seconds += time.perf_counter() - started
+        except BaseException:
+            self._failures += 1
+            raise
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass  # Browser crashed mid-render; relaunched on the next lease
+            self._release(slot)
+
+    async def close(self):
+        """Close every browser and stop the Playwright driver."""
+        browsers = [slot.browser for slot in self._slots if slot.browser is not None]
+        for slot in self._slots:
+            slot.browser = None  # Renders still in flight must not close it again
+        self._slots = []
+        await asyncio.gather(*[self._close_browser(b) for b in browsers], *self._closing)
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return pool statistics for the metrics endpoint."""
+        done = self._renders + self._failures
+        return {
+            "browsers": self.size,
+            "pages_per_browser": self.pages_per_browser,
+            "active": sum(slot.active for slot in self._slots),
+            "waiting": self._waiting,
+            "peak_waiting": self._peak_waiting,
+            "renders": self._renders,
+            "failures": self._failures,
+            "rejected": self._rejected,
+            "launches": self._launches,
+            "recycled": self._recycled,
+            "crashes": self._crashes,
+            "avg_render_ms": round(self._total_render_seconds / self._renders * 1000, 1) if self._renders else 0.0,
+            "avg_wait_ms": round(self._total_wait_seconds / done * 1000, 1) if done else 0.0,
+            "avg_launch_ms": round(self._launch_seconds / self._launches * 1000, 1) if self._launches else 0.0,
+        }
+
+
+# Process-wide pool instance
+_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Get the process-wide browser pool, creating it on first call."""
+    global _pool
+    if _pool is None:
+        _pool = BrowserPool()
+    return _pool
+
+
+def get_browser_pool_stats() -> Optional[Dict[str, Any]]:
+    """Stats for the shared pool, or None if it has not been created yet."""
+    return _pool.get_stats() if _pool is not None else None
+
+
+async def close_browser_pool():
+    """Close the shared pool (call on application shutdown)."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+__all__ = ['BrowserPool', 'BrowserPoolBusy', 'get_browser_pool', 'get_browser_pool_stats', 'close_browser_pool']
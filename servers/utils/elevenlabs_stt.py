@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+"""
+Shared ElevenLabs Speech-to-Text Client
+
+Process-wide async client for the ElevenLabs REST API (Scribe transcription,
+diarization and realtime token minting).
+
+Every diarized chunk used to open its own httpx.AsyncClient (a new TCP + TLS
+handshake per 30 s chunk) and /api/transcribe called the synchronous SDK on
+the event loop. ElevenLabsSTT instead:
+- keeps one pooled keep-alive client (HTTP/2 when the h2 package is installed)
+- sends uploaded bytes straight into the multipart request (no temp files)
+- retries 429/5xx responses and failures to connect with jittered
+  exponential back-off, honouring Retry-After
+- exposes request latency, retries and connection reuse at /api/metrics
+
+Usage:
+    from servers.utils.elevenlabs_stt import get_elevenlabs_stt
+
+    stt = get_elevenlabs_stt()
+    data = await stt.speech_to_text(audio_bytes, "audio.webm", "audio/webm",
+                                    diarize=True, num_speakers=2)
+    data["words"]
+"""
+
+import asyncio
+import os
+import random
+from typing import Any, Dict, Optional
+
+import httpx
+
+from servers.utils.http_stats import HttpClientStats
+
+
+BASE_URL = "https://api.elevenlabs.io"
+
+# Default per-request timeout (seconds); diarizing a long recording can take minutes
+DEFAULT_TIMEOUT = float(os.getenv("ELEVENLABS_TIMEOUT_SECONDS", "120"))
+
+# Connection pool sizing for the shared client
+MAX_CONNECTIONS = int(os.getenv("ELEVENLABS_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("ELEVENLABS_MAX_KEEPALIVE_CONNECTIONS", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("ELEVENLABS_KEEPALIVE_EXPIRY_SECONDS", "60"))
+
+# Retries for 429/5xx and failures to connect (full-jitter exponential back-off)
+MAX_RETRIES = int(os.getenv("ELEVENLABS_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("ELEVENLABS_BACKOFF_BASE_SECONDS", "0.5"))
+BACKOFF_MAX = float(os.getenv("ELEVENLABS_BACKOFF_MAX_SECONDS", "8"))
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Only errors raised before the request was sent are retried. Once the upload
+# is on the wire it may have been accepted and billed, so a read timeout or a
+# dropped connection (RemoteProtocolError) is not retried.
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class ElevenLabsSTT:
+    """
+    Shared async ElevenLabs client with a pooled keep-alive connection.
+
+    The httpx client is created lazily on first request so the instance can
+    be constructed at import time, before the event loop is running.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_connections: int = MAX_CONNECTIONS,
+        max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Initialize the client.
+
+        Args:
+            api_key: ElevenLabs API key. If None, reads ELEVENLABS_API_KEY from env.
+            timeout: Default per-request timeout in seconds.
+            max_connections: Maximum concurrent HTTP connections to ElevenLabs.
+            max_keepalive_connections: Idle connections kept open for reuse.
+            max_retries: Retries after a 429/5xx response or connection failure.
+            backoff_base: First retry delay ceiling (seconds); doubles per attempt.
+            backoff_max: Maximum retry delay (seconds).
+            transport: Optional httpx transport (used by tests).
+        """
+        self._api_key = api_key or os.getenv("ELEVENLABS_API_KEY")
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._max_keepalive_connections = max_keepalive_connections
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+
+        # Request statistics (HTTP attempts, including retries, are counted by _stats)
+        self._stats = HttpClientStats()
+        self._calls = 0             # API calls made by callers
+        self._retries = 0
+        self._rate_limited = 0
+
+    @property
+    def available(self) -> bool:
+        """Whether an API key is configured."""
+        return bool(self._api_key)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """The pooled keep-alive client (created on first access)."""
+        if self._http is None:
+            transport = self._transport or httpx.AsyncHTTPTransport(
+                http2=_http2_available(),
+                limits=httpx.Limits(
+                    max_connections=self._max_connections,
+                    max_keepalive_connections=self._max_keepalive_connections,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+            )
+            self._http = httpx.AsyncClient(
+                base_url=BASE_URL,
+                headers={"xi-api-key": self._api_key or ""},
+                timeout=self._timeout,
+                transport=self._stats.wrap(transport),
+            )
+        return self._http
+
+    async def speech_to_text(
+        self,
+        audio: bytes,
+        filename: str,
+        mime_type: str,
+        model_id: str = "scribe_v1",
+        diarize: bool = False,
+        num_speakers: Optional[int] = None,
+        diarization_threshold: Optional[float] = None,
+        timestamps_granularity: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """
+        Transcribe (and optionally diarize) audio bytes with Scribe.
+
+        Returns:
+            The parsed JSON response ({"text", "language_code", "words": [...], ...}).
+
+        Raises:
+            httpx.HTTPStatusError: If ElevenLabs returns an error after retries.
+        """
+        data = {'model_id': model_id}
+        if diarize:
+            data['diarize'] = 'true'
+        if diarization_threshold is not None:
+            data['diarization_threshold'] = str(diarization_threshold)
+        if timestamps_granularity:
+            data['timestamps_granularity'] = timestamps_granularity
+        if num_speakers:
+            data['num_speakers'] = str(num_speakers)
+
+        response = await self._post(
+            "/v1/speech-to-text",
+            files={'file': (filename, audio, mime_type)},
+            data=data,
+            timeout=timeout or self._timeout,
+        )
+        return response.json()
+
+    async def single_use_token(self, token_type: str = "realtime_scribe") -> Dict[str, Any]:
+        """Mint a single-use token for client-side (WebSocket) access."""
+        response = await self._post(f"/v1/single-use-token/{token_type}", timeout=30.0)
+        return response.json()
+
+    async def _post(self, path: str, **kwargs) -> httpx.Response:
+        """POST with retries on 429/5xx and failures to connect."""
+        self._calls += 1
+        attempt = 0
+        while True:
+            try:
+                response = await self.http.post(path, **kwargs)
+            except RETRY_EXCEPTIONS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"⚠️  ElevenLabs {path} connection error ({type(e).__name__}), retrying in {delay:.1f}s")
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    if not response.is_success:
+                        print(f"❌ ElevenLabs API Error ({response.status_code}): {response.text}")
+                    response.raise_for_status()
+                    return response
+                if response.status_code == 429:
+                    self._rate_limited += 1
+                delay = self._backoff(attempt, response.headers.get("retry-after"))
+                print(f"⚠️  ElevenLabs {path} returned {response.status_code}, retrying in {delay:.1f}s")
+
+            attempt += 1
+            self._retries += 1
+            await asyncio.sleep(delay)
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential delay, or the server's Retry-After if given."""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return request and connection statistics for the metrics endpoint."""
+        return {
+            "calls": self._calls,
+            **self._stats.get_stats(),
+            "retries": self._retries,
+            "rate_limited": self._rate_limited,
+            "max_connections": self._max_connections,
+        }
+
+    async def aclose(self):
+        """Close the shared client and its connection pool."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+# Process-wide client instance
+_stt: Optional[ElevenLabsSTT] = None
+
+
+def get_elevenlabs_stt() -> ElevenLabsSTT:
+    """Get the process-wide ElevenLabs client, creating it on first call."""
+    global _stt
+    if _stt is None:
+        _stt = ElevenLabsSTT()
+    return _stt
+
+
+def get_elevenlabs_stt_stats() -> Optional[Dict[str, Any]]:
+    """Stats for the shared client, or None if it has not been created yet."""
+    return _stt.get_stats() if _stt is not None else None
+
+
+async def close_elevenlabs_stt():
+    """Close the process-wide client (called on API shutdown)."""
+    global _stt
+    if _stt is not None:
+        await _stt.aclose()
+        _stt = None
+
+
+__all__ = ['ElevenLabsSTT', 'get_elevenlabs_stt', 'get_elevenlabs_stt_stats', 'close_elevenlabs_stt']
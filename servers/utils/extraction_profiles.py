@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+Extraction Profile Cache
+
+Process-wide LRU cache of what /api/extract-form-fields derives from a form
+schema version: the flattened fields, prompt hint text, flat -> nested
+field mapping and historical aggregation plan. These are identical for
+every chunk of every consultation using that form, so they are built once
+per (form_name, version) instead of on every extraction call.
+
+Profiles are only reused while the form schema cache returns the same
+schema object, so an edited form that kept its version number is still
+rebuilt. The cache doesn't know how to build a profile: callers pass a
+builder returning the derived parts.
+
+Usage:
+    from servers.utils.extraction_profiles import get_extraction_profile_cache
+
+    profile = get_extraction_profile_cache().get(schema_data, build_parts)
+    profile.flattened_schema, profile.field_mapping, profile.aggregation_plan
+"""
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+
+# Maximum number of form versions kept in memory
+MAX_ENTRIES = int(os.getenv("EXTRACTION_PROFILE_CACHE_SIZE", "32"))
+
+
+@dataclass(frozen=True)
+class ExtractionProfile:
+    """
+    Everything /api/extract-form-fields derives from one form schema version:
+    flattened fields, prompt hint text, flat -> nested field mapping and the
+    historical aggregation plan. Identical for every chunk using that form.
+    """
+    form_name: str
+    version: int
+    schema: dict
+    flattened_schema: dict
+    field_mapping: dict
+    schema_hints: str
+    aggregation_plan: list
+    build_ms: float
+
+
+# builder(schema, table_metadata) -> {flattened_schema, field_mapping, schema_hints, aggregation_plan}
+ProfileBuilder = Callable[[dict, dict], Dict[str, Any]]
+
+
+class ExtractionProfileCache:
+    """
+    LRU cache of ExtractionProfiles keyed by (form_name, version).
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._profiles: "OrderedDict[tuple, ExtractionProfile]" = OrderedDict()
+
+        # Statistics
+        self._builds = 0
+        self._reuses = 0
+        self._evictions = 0
+        self._total_build_ms = 0.0
+
+    def get(self, schema_data: dict, build: ProfileBuilder) -> ExtractionProfile:
+        """
+        Get the profile for a schema returned by get_form_schema_from_db(full_metadata=True).
+
+        Args:
+            schema_data: Dict with 'schema', 'table_metadata', 'name' and 'version'.
+            build: Called with (schema, table_metadata) on a miss.
+        """
+        schema = schema_data.get('schema', schema_data)
+        key = (schema_data.get('name', ''), schema_data.get('version'))
+
+        profile = self._profiles.get(key)
+        if profile is not None and profile.schema is schema:
+            self._profiles.move_to_end(key)
+            self._reuses += 1
+            return profile
+
+        start = time.perf_counter()
+        parts = build(schema, schema_data.get('table_metadata', {}))
+        profile = ExtractionProfile(
+            form_name=key[0],
+            version=key[1],
+            schema=schema,
+            build_ms=(time.perf_counter() - start) * 1000,
+            **parts,
+        )
+
+        self._profiles[key] = profile
+        self._profiles.move_to_end(key)
+        while len(self._profiles) > self.max_entries:
+            self._profiles.popitem(last=False)
+            self._evictions += 1
+
+        self._builds += 1
+        self._total_build_ms += profile.build_ms
+        print(f"🧩 Built extraction profile for {key[0]} v{key[1]}: {len(profile.flattened_schema)} fields, "
+              f"{len(profile.aggregation_plan)} aggregated, {profile.build_ms:.1f}ms")
+        return profile
+
+    def keys(self):
+        """Cached (form_name, version) keys, least recently used first."""
+        return list(self._profiles)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return build/reuse statistics for /api/metrics."""
+        lookups = self._builds + self._reuses
+        return {
+            "profiles": len(self._profiles),
+            "maxsize": self.max_entries,
+            "builds": self._builds,
+            "reuses": self._reuses,
+            "evictions": self._evictions,
+            "reuse_rate": round(self._reuses / lookups, 3) if lookups else 0.0,
+            "avg_build_ms": round(self._total_build_ms / self._builds, 2) if self._builds else 0.0,
+            "forms": {f"{p.form_name} v{p.version}": round(p.build_ms, 2) for p in self._profiles.values()},
+        }
+
+
+# Process-wide cache instance
+_cache: Optional[ExtractionProfileCache] = None
+
+
+def get_extraction_profile_cache() -> ExtractionProfileCache:
+    """Get the process-wide extraction profile cache, creating it on first call."""
+    global _cache
+    if _cache is None:
+        _cache = ExtractionProfileCache()
+    return _cache
+
+
+def get_extraction_profile_stats() -> Optional[Dict[str, Any]]:
+    """Stats for the shared cache, or None if it has not been created yet."""
+    return _cache.get_stats() if _cache is not None else None
+
+
+__all__ = [
+    'ExtractionProfile', 'ExtractionProfileCache',
+    'get_extraction_profile_cache', 'get_extraction_profile_stats',
+]
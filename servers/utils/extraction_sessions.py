@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+"""
+Server-side extraction sessions for real-time form filling.
+
+During a consultation the frontend extracts form fields from every ~30 s
+audio chunk. Without a session each call re-sends the whole form state and
+patient context and the backend re-checks form ownership. A session, keyed
+by appointment_id, holds all of that server-side:
+
+- form type and the user who opened it (form ownership is checked once,
+  when the session is opened; every later call must come from that user)
+- patient context, plus previous forms loaded once for historical aggregation
+- the accumulated form state, updated with every delta returned to the client
+- which chunk indices have been processed (retried chunks are not re-extracted)
+
+Sessions live in memory (LRU). Sessions idle for longer than the TTL are
+evicted on access and purged periodically.
+
+Deployment limits: sessions hold patient data, and by default they are kept
+in memory only, per process. On Cloud Run that means a session is lost when
+the instance restarts or scales in, and a chunk routed to another instance
+gets a 404 (the client then opens a new session with its saved form state).
+Enable session affinity to keep a consultation on one instance. Writing
+sessions through to SQLite (EXTRACTION_SESSION_PERSIST=true) only lets a
+restarted process resume them where the database sits on a persistent
+volume, so it is meant for single-host deployments. Persisted rows are
+encrypted with EXTRACTION_SESSION_ENCRYPTION_KEY (a Fernet key); without a
+key, persistence stays off.
+
+Usage:
+    from servers.utils.extraction_sessions import ExtractionSession, get_extraction_session_store
+
+    store = get_extraction_session_store()
+    store.save(ExtractionSession(appointment_id, form_type, user_id, patient_context, form_state))
+
+    async with store.lock(appointment_id):
+        session = store.get(appointment_id)
+        ...
+        session.apply_updates(field_updates)
+        store.save(session)
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from servers.utils.keyed_locks import KeyedLock, KeyedLocks
+
+DEFAULT_DB_PATH = str(Path(__file__).parent.parent.parent / "data" / "extraction_sessions.sqlite3")
+
+# Session store location and lifetime
+DB_PATH = os.getenv("EXTRACTION_SESSION_DB_PATH", DEFAULT_DB_PATH)
+PERSIST_ENABLED = os.getenv("EXTRACTION_SESSION_PERSIST", "false").lower() in ("1", "true", "yes")
+ENCRYPTION_KEY = os.getenv("EXTRACTION_SESSION_ENCRYPTION_KEY", "")
+TTL_SECONDS = float(os.getenv("EXTRACTION_SESSION_TTL_SECONDS", str(4 * 3600)))
+
+# Maximum number of sessions kept in memory (older ones are reloaded from disk)
+MAX_IN_MEMORY = int(os.getenv("EXTRACTION_SESSION_MEMORY_SIZE", "256"))
+
+# Seconds between purges of expired sessions from disk
+PURGE_INTERVAL_SECONDS = 300
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extraction_sessions (
+    appointment_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def set_nested_value(state: dict, field_path: str, value: Any):
+    """Set a dot-separated field path (e.g. 'vital_signs.systolic_bp') in a nested dict."""
+    parts = field_path.split('.')
+    target = state
+    for part in parts[:-1]:
+        if not isinstance(target.get(part), dict):
+            target[part] = {}
+        target = target[part]
+    target[parts[-1]] = value
+
+
+@dataclass
+class ExtractionSession:
+    """State of one appointment's real-time form extraction."""
+
+    appointment_id: str
+    form_type: str
+    user_id: Optional[str]
+    patient_context: dict
+    form_state: dict = field(default_factory=dict)
+    previous_forms: Optional[list] = None  # None = not loaded; aggregation fetches them itself
+    processed_chunks: List[int] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def has_processed(self, chunk_index: int) -> bool:
+        return chunk_index in self.processed_chunks
+
+    def mark_processed(self, chunk_index: int):
+        if chunk_index not in self.processed_chunks:
+            self.processed_chunks.append(chunk_index)
+
+    def apply_updates(self, field_updates: Dict[str, Any]):
+        """Merge {nested_path: value} updates into the accumulated form state."""
+        for field_path, value in field_updates.items():
+            set_nested_value(self.form_state, field_path, value)
+
+    def count_filled_fields(self) -> int:
+        """Number of leaf values in the form state (tables count as one field)."""
+        def count(value) -> int:
+            if isinstance(value, dict):
+                return sum(count(v) for v in value.values())
+            return 0 if value in (None, '', []) else 1
+        return count(self.form_state)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, data: str) -> "ExtractionSession":
+        return cls(**json.loads(data))
+
+
+class ExtractionSessionStore:
+    """
+    In-memory LRU of extraction sessions, optionally written through
+    (encrypted) to SQLite.
+
+    Sessions expire TTL seconds after their last update. All methods are
+    synchronous (local SQLite, single small row per call); use lock() to
+    serialise chunk processing for the same appointment.
+    """
+
+    def __init__(
+        self,
+        path: str = DB_PATH,
+        ttl_seconds: float = TTL_SECONDS,
+        max_in_memory: int = MAX_IN_MEMORY,
+        persist: bool = PERSIST_ENABLED,
+        encryption_key: str = ENCRYPTION_KEY,
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            path: SQLite database file (created if missing). ":memory:" for tests.
+            ttl_seconds: Idle time after which a session is evicted.
+            max_in_memory: Sessions kept in memory; the rest are reloaded from disk on access.
+            persist: If False, sessions are kept in memory only (lost on restart).
+            encryption_key: Fernet key encrypting persisted sessions (required to persist).
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_in_memory = max_in_memory
+        self.persist = persist
+        self._sessions: "OrderedDict[str, ExtractionSession]" = OrderedDict()
+        self._locks = KeyedLocks()
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._fernet: Optional[Fernet] = None
+        self._last_purge = time.monotonic()
+
+        # Statistics
+        self._created = 0
+        self._memory_hits = 0
+        self._disk_loads = 0       # sessions resumed from disk (e.g. after a restart)
+        self._misses = 0
+        self._expired = 0
+
+        if self.persist:
+            try:
+                self._fernet = Fernet(encryption_key)
+            except (TypeError, ValueError) as e:
+                # Never write patient data to disk unencrypted
+                print(f"⚠️  Extraction session persistence disabled (no valid encryption key: {e})", file=sys.stderr)
+                self.persist = False
+
+        if self.persist:
+            try:
+                if path != ":memory:":
+                    Path(path).parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(_SCHEMA)
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️  Extraction session persistence disabled: {e}", file=sys.stderr)
+                self.persist = False
+
+    def _is_expired(self, session: ExtractionSession) -> bool:
+        return time.time() - session.updated_at > self.ttl_seconds
+
+    def _remember(self, session: ExtractionSession):
+        self._sessions[session.appointment_id] = session
+        self._sessions.move_to_end(session.appointment_id)
+        while len(self._sessions) > self.max_in_memory:
+            self._sessions.popitem(last=False)
+
+    def get(self, appointment_id: str) -> Optional[ExtractionSession]:
+        """Return a live session, loading it from disk if needed (None if missing or expired)."""
+        session = self._sessions.get(appointment_id)
+        if session is not None:
+            self._memory_hits += 1
+        elif self.persist:
+            with self._db_lock:
+                row = self._conn.execute(
+                    "SELECT data FROM extraction_sessions WHERE appointment_id = ?", (appointment_id,)
+                ).fetchone()
+            if row is not None:
+                try:
+                    session = ExtractionSession.from_json(self._fernet.decrypt(row[0].encode()).decode())
+                    self._disk_loads += 1
+                except InvalidToken:
+                    print(f"⚠️  Extraction session {appointment_id} can't be decrypted (key changed?)", file=sys.stderr)
+
+        if session is None:
+            self._misses += 1
+            return None
+
+        if self._is_expired(session):
+            self._expired += 1
+            self.delete(appointment_id)
+            return None
+
+        self._remember(session)
+        return session
+
+    def create(self, session: ExtractionSession) -> ExtractionSession:
+        """Store a new session (replacing any existing one for the appointment)."""
+        self._created += 1
+        self.save(session)
+        self._maybe_purge()
+        return session
+
+    def save(self, session: ExtractionSession):
+        """Record a session update in memory and on disk (refreshes its TTL)."""
+        session.updated_at = time.time()
+        self._remember(session)
+        if self.persist:
+            with self._db_lock:
+                self._conn.execute(
+                    """
+                    INSERT INTO extraction_sessions (appointment_id, data, updated_at)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(appointment_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+                    """,
+                    (session.appointment_id, self._fernet.encrypt(session.to_json().encode()).decode(),
+                     session.updated_at)
+                )
+                self._conn.commit()
+
+    def delete(self, appointment_id: str) -> bool:
+        """Drop a session. Returns True if it existed in memory or on disk."""
+        existed = self._sessions.pop(appointment_id, None) is not None
+        if self.persist:
+            with self._db_lock:
+                deleted = self._conn.execute(
+                    "DELETE FROM extraction_sessions WHERE appointment_id = ?", (appointment_id,)
+                ).rowcount
+                self._conn.commit()
+            existed = existed or deleted > 0
+        return existed
+
+    def lock(self, appointment_id: str) -> KeyedLock:
+        """Per-appointment lock so concurrent chunk calls merge state one at a time."""
+        return self._locks.get(appointment_id)
+
+    def purge_expired(self) -> int:
+        """Delete sessions idle for longer than the TTL. Returns the number deleted."""
+        cutoff = time.time() - self.ttl_seconds
+        stale = [key for key, s in self._sessions.items() if s.updated_at < cutoff]
+        for key in stale:
+            del self._sessions[key]
+        deleted = len(stale)
+
+        if self.persist:
+            with self._db_lock:
+                deleted = max(deleted, self._conn.execute(
+                    "DELETE FROM extraction_sessions WHERE updated_at < ?", (cutoff,)
+                ).rowcount)
+                self._conn.commit()
+
+        self._expired += deleted
+        self._last_purge = time.monotonic()
+        return deleted
+
+    def _maybe_purge(self):
+        if time.monotonic() - self._last_purge >= PURGE_INTERVAL_SECONDS:
+            self.purge_expired()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return session statistics for the metrics endpoint."""
+        stored = len(self._sessions)
+        if self.persist:
+            with self._db_lock:
+                stored = self._conn.execute("SELECT COUNT(*) FROM extraction_sessions").fetchone()[0]
+
+        return {
+            'persist': self.persist,
+            'path': self.path if self.persist else None,
+            'in_memory': len(self._sessions),
+            'stored': stored,
+            'created': self._created,
+            'memory_hits': self._memory_hits,
+            'disk_loads': self._disk_loads,
+            'misses': self._misses,
+            'expired': self._expired,
+            'ttl_seconds': self.ttl_seconds,
+        }
+
+    def close(self):
+        """Close the database (sessions stay on disk for the next process)."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            self.persist = False
+
+
+# Process-wide store instance
+_store: Optional[ExtractionSessionStore] = None
+
+
+def get_extraction_session_store() -> ExtractionSessionStore:
+    """Get or create the process-wide extraction session store."""
+    global _store
+    if _store is None:
+        _store = ExtractionSessionStore()
+    return _store
+
+
+def close_extraction_session_store():
+    """Close the process-wide store (called on API shutdown)."""
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
+
+
+__all__ = [
+    'ExtractionSession', 'ExtractionSessionStore', 'set_nested_value',
+    'get_extraction_session_store', 'close_extraction_session_store',
+]
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+"""
+Versioned Form Schema Cache
+
+In-memory cache of custom_forms schemas keyed by form type (form_name, or
+specialty as a fallback - the same matching get_form_schema_from_db has
+always used).
+
+Instead of selecting every active/draft form including its full
+form_schema JSON on every call, each lookup runs a cheap probe that only
+selects the identifying columns (id, form_name, specialty, version,
+updated_at, status). The full row is fetched only when the matching form's
+(id, version, updated_at) fingerprint differs from the cached entry.
+Probes are skipped entirely for FORM_SCHEMA_PROBE_SECONDS after a
+successful check, and the custom_forms_api save/update/activate/delete
+endpoints invalidate entries explicitly so edits on this instance are seen
+immediately.
+
+Cached schemas are returned as read-only shared views (ReadOnlyDict /
+ReadOnlyList) instead of deep copies. They behave like dict/list for reads
+and JSON serialisation; callers that need to modify a schema take
+copy.deepcopy(), which returns plain mutable containers.
+
+Usage:
+    from servers.utils.form_schema_cache import get_form_schema_cache
+
+    form = await get_form_schema_cache().get(db, 'antenatal')
+    if form is None:
+        ...  # no active/draft form for this form type
+    schema = form['form_schema']
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+# Seconds a validated entry is trusted before the next freshness probe
+PROBE_SECONDS = float(os.getenv("FORM_SCHEMA_PROBE_SECONDS", "5"))
+
+# Maximum number of form types kept in memory
+MAX_ENTRIES = int(os.getenv("FORM_SCHEMA_CACHE_SIZE", "64"))
+
+FORM_STATUSES = ['active', 'draft']
+
+# Columns for the freshness probe (no form_schema / table_metadata JSON)
+PROBE_COLUMNS = 'id, form_name, specialty, version, updated_at, status'
+
+FULL_COLUMNS = 'id, form_schema, table_metadata, version, description, specialty, form_name, updated_at, status'
+
+
+def _read_only(*args, **kwargs):
+    raise TypeError("Cached form schemas are read-only; use copy.deepcopy() to get a mutable copy")
+
+
+class ReadOnlyDict(dict):
+    """dict view of a cached schema that rejects mutation."""
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (dict, (thaw(self),))
+
+
+class ReadOnlyList(list):
+    """list view of a cached schema that rejects mutation."""
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (list, (thaw(self),))
+
+
+def freeze(value: Any) -> Any:
+    """Recursively convert dicts/lists into read-only views."""
+    if isinstance(value, dict):
+        frozen = ReadOnlyDict()
+        for key, item in value.items():
+            dict.__setitem__(frozen, key, freeze(item))
+        return frozen
+    if isinstance(value, list):
+        frozen = ReadOnlyList()
+        list.extend(frozen, (freeze(item) for item in value))
+        return frozen
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Recursively convert read-only views back into plain dicts/lists."""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [thaw(item) for item in value]
+    return value
+
+
+def select_form(rows: list, form_type: str) -> Optional[Dict[str, Any]]:
+    """
+    Pick the form for a form type: exact form_name match first, specialty
+    match only if no name matches, most recently updated wins.
+    """
+    matching = [r for r in rows if r.get('form_name') == form_type]
+    if not matching:
+        matching = [r for r in rows if r.get('specialty') == form_type]
+    if not matching:
+        return None
+    return sorted(matching, key=lambda r: r.get('updated_at') or '', reverse=True)[0]
+
+
+def _fingerprint(row: Dict[str, Any]) -> tuple:
+    return (row.get('id'), row.get('version'), row.get('updated_at'))
+
+
+class _Entry:
+    __slots__ = ('form', 'fingerprint', 'checked_at')
+
+    def __init__(self, form: ReadOnlyDict, fingerprint: tuple):
+        self.form = form
+        self.fingerprint = fingerprint
+        self.checked_at = time.monotonic()
+
+
+class FormSchemaCache:
+    """
+    LRU cache of custom_forms rows keyed by form type, validated by version.
+    """
+
+    def __init__(self, probe_seconds: float = PROBE_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.probe_seconds = probe_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+        # Statistics
+        self._hits = 0            # served without a full fetch
+        self._probe_skips = 0     # hits served without even probing
+        self._misses = 0          # full row fetched
+        self._probes = 0
+        self._refreshes = 0       # misses caused by a changed fingerprint
+        self._invalidations = 0
+
+    async def get(self, db, form_type: str) -> Optional[ReadOnlyDict]:
+        """
+        Return the current custom_forms row for a form type as a read-only view.
+
+        Args:
+            db: Supabase data-access client (servers.utils.supabase_db.get_db()).
+            form_type: form_name, or specialty if no form has that name.
+
+        Returns:
+            Read-only row with form_schema, table_metadata, version, description,
+            specialty, form_name, updated_at and status, or None if no
+            active/draft form matches.
+        """
+        entry = self._entries.get(form_type)
+        if entry is not None and time.monotonic() - entry.checked_at < self.probe_seconds:
+            self._entries.move_to_end(form_type)
+            self._hits += 1
+            self._probe_skips += 1
+            return entry.form
+
+        self._probes += 1
+        probe = await db.table('custom_forms')\
+            .select(PROBE_COLUMNS)\
+            .in_('status', FORM_STATUSES)\
+            .execute()
+
+        current = select_form(probe.data or [], form_type)
+        if current is None:
+            self._entries.pop(form_type, None)
+            return None
+
+        fingerprint = _fingerprint(current)
+        entry = self._entries.get(form_type)
+        if entry is not None and entry.fingerprint == fingerprint:
+            entry.checked_at = time.monotonic()
+            self._entries.move_to_end(form_type)
+            self._hits += 1
+            return entry.form
+
+        if entry is not None:
+            self._refreshes += 1
+        self._misses += 1
+
+        result = await db.table('custom_forms')\
+            .select(FULL_COLUMNS)\
+            .eq('id', current['id'])\
+            .execute()
+        if not result.data:
+            # Deleted between the probe and the fetch
+            self._entries.pop(form_type, None)
+            return None
+
+        row = result.data[0]
+        form = freeze(row)
+        self._entries[form_type] = _Entry(form, _fingerprint(row))
+        self._entries.move_to_end(form_type)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return form
+
+    def invalidate(self, *names: Optional[str]) -> int:
+        """
+        Drop cached entries for forms that were saved, updated, activated or deleted.
+
+        Entries are matched on their key, form_name or specialty so a form cached
+        under its specialty is dropped too. With no names, clears the cache.
+
+        Returns:
+            Number of entries dropped.
+        """
+        names = {n for n in names if n}
+        if not names:
+            dropped = len(self._entries)
+            self._entries.clear()
+        else:
+            stale = [
+                key for key, entry in self._entries.items()
+                if key in names or entry.form.get('form_name') in names or entry.form.get('specialty') in names
+            ]
+            for key in stale:
+                del self._entries[key]
+            dropped = len(stale)
+
+        self._invalidations += dropped
+        return dropped
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss statistics for /api/cache-stats."""
+        total = self._hits + self._misses
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "probes": self._probes,
+            "probe_skips": self._probe_skips,
+            "refreshes": self._refreshes,
+            "invalidations": self._invalidations,
+            "currsize": len(self._entries),
+            "maxsize": self.max_entries,
+            "probe_seconds": self.probe_seconds,
+            "hit_rate": round(self._hits / total, 3) if total else 0.0,
+        }
+
+
+# Process-wide cache instance
+_cache: Optional[FormSchemaCache] = None
+
+
+def get_form_schema_cache() -> FormSchemaCache:
+    """Get the process-wide form schema cache."""
+    global _cache
+    if _cache is None:
+        _cache = FormSchemaCache()
+    return _cache
+
+
+__all__ = [
+    'FormSchemaCache', 'ReadOnlyDict', 'ReadOnlyList',
+    'freeze', 'thaw', 'select_form', 'get_form_schema_cache',
+]
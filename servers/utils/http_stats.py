@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Shared HTTP Client Statistics
+
+Request latency and connection-reuse accounting for the process-wide httpx
+clients (Supabase, ElevenLabs).
+
+HttpClientStats wraps the client's transport, so every request is counted
+around the actual send: in-flight requests are settled in a `finally`, and
+a request that fails before any response (pool timeout, connect error,
+cancellation) can't leave the in-flight count drifting upward. New
+connections are counted from httpcore's trace events - connect events only
+fire when the pool opens a connection, so the rest reused one.
+
+Usage:
+    from servers.utils.http_stats import HttpClientStats
+
+    stats = HttpClientStats()
+    client = httpx.AsyncClient(transport=stats.wrap(httpx.AsyncHTTPTransport(http2=True)))
+    stats.get_stats()["connection_reuse_rate"]
+"""
+
+import time
+from typing import Any, Dict
+
+import httpx
+
+
+class HttpClientStats:
+    """Request and connection statistics for one shared httpx client."""
+
+    def __init__(self):
+        self.requests = 0           # HTTP attempts sent through the transport
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.errors = 0             # 4xx/5xx responses and failed sends
+        self.new_connections = 0
+        self._completed = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+        self._http_versions: Dict[str, int] = {}
+
+    def wrap(self, transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+        """Transport that records every request sent through `transport`."""
+        return _TrackedTransport(transport, self)
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        """httpcore trace callback: count newly opened connections."""
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+
+    def _record_response(self, response: httpx.Response, latency: float):
+        self._completed += 1
+        self._total_latency += latency
+        self._max_latency = max(self._max_latency, latency)
+
+        version = response.http_version or "unknown"
+        self._http_versions[version] = self._http_versions.get(version, 0) + 1
+
+        if response.status_code >= 400:
+            self.errors += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return request and connection statistics for the metrics endpoint."""
+        reused = max(self.requests - self.new_connections, 0)
+        return {
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "errors": self.errors,
+            "avg_latency_ms": round(self._total_latency / self._completed * 1000, 1) if self._completed else 0.0,
+            "max_latency_ms": round(self._max_latency * 1000, 1),
+            "new_connections": self.new_connections,
+            "reused_connection_requests": reused,
+            "connection_reuse_rate": round(reused / self.requests, 3) if self.requests else 0.0,
+            "http_versions": dict(self._http_versions),
+        }
+
+
+class _TrackedTransport(httpx.AsyncBaseTransport):
+    """Delegating transport that feeds HttpClientStats."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, stats: HttpClientStats):
+        self._transport = transport
+        self._stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        stats = self._stats
+        stats.requests += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        request.extensions["trace"] = stats._trace
+
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            stats.errors += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+
+        stats._record_response(response, time.perf_counter() - start)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+__all__ = ['HttpClientStats']
@@ -0,0 +1,731 @@
+#!/usr/bin/env python
+"""
+Durable Local Job Queue
+
+Process-wide queue for background work that must survive an instance
+restart (final-chunk transcription, transcription reruns, PDF pre-renders).
+
+FastAPI BackgroundTasks keep the job (including the whole audio payload)
+in memory only: if the instance is scaled down mid-job the consultation
+stays in transcription_status='processing' forever, and nothing limits
+how many jobs run at once. JobQueue instead:
+- persists every job, with an optional binary payload, through a pluggable
+  JobBackend (SQLiteJobBackend by default, WAL mode)
+- runs jobs on a bounded worker pool, with an extra concurrency cap per
+  key (the transcription provider), so a burst of Sarvam jobs cannot
+  starve ElevenLabs ones; a job that fans out more provider calls takes
+  extra slots under the same cap (`async with queue.slot("sarvam")`)
+- leases a job while it runs and renews the lease; a job whose lease
+  expires (its worker died) becomes visible again and is re-run
+- retries failed jobs with jittered exponential back-off, then marks them
+  failed and calls the kind's on_failure hook
+- records progress/result/error per job for the status endpoint
+
+Usage:
+    from servers.utils.job_queue import get_job_queue
+
+    queue = get_job_queue()
+    queue.register("final_chunk", handle_final_chunk, on_failure=mark_failed)
+    await queue.start()
+
+    job = queue.enqueue("final_chunk", {"consultation_id": ...}, data=audio_bytes,
+                        concurrency_key="sarvam")
+    queue.get(job.id).status              # queued / running / succeeded / failed
+    result = await queue.wait(job.id)     # in-process callers can await the result
+
+Handlers are `async def handler(ctx: JobContext) -> Optional[dict]`.
+"""
+
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+
+
+DEFAULT_DB_PATH = str(Path(__file__).parent.parent.parent / "data" / "job_queue.sqlite3")
+
+# Queue location
+DB_PATH = os.getenv("JOB_QUEUE_DB_PATH", DEFAULT_DB_PATH)
+
+# Concurrent jobs across all kinds
+MAX_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "4"))
+
+# Per-key concurrency caps, e.g. "sarvam=2,elevenlabs=4" (keys not listed are only bound by MAX_WORKERS)
+DEFAULT_CONCURRENCY_LIMITS = os.getenv("JOB_QUEUE_CONCURRENCY_LIMITS", "sarvam=2,elevenlabs=4,pdf=1")
+
+# A running job is re-run if its lease is not renewed for this long (seconds)
+VISIBILITY_TIMEOUT = float(os.getenv("JOB_QUEUE_VISIBILITY_TIMEOUT_SECONDS", "120"))
+
+# Retry back-off: BASE * 2^(attempt-1) seconds, +/-50% jitter, capped at MAX
+MAX_ATTEMPTS = int(os.getenv("JOB_QUEUE_MAX_ATTEMPTS", "3"))
+BACKOFF_BASE = float(os.getenv("JOB_QUEUE_BACKOFF_BASE_SECONDS", "5"))
+BACKOFF_MAX = float(os.getenv("JOB_QUEUE_BACKOFF_MAX_SECONDS", "300"))
+
+# Finished jobs are kept this long for the status endpoint
+RETENTION_SECONDS = float(os.getenv("JOB_QUEUE_RETENTION_SECONDS", str(24 * 3600)))
+
+# Idle dispatcher poll interval (delayed retries and expired leases are picked up on poll)
+POLL_SECONDS = 1.0
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+def parse_concurrency_limits(value: str) -> Dict[str, int]:
+    """Parse "key=n,key=n" into {key: n}."""
+    limits = {}
+    for part in value.split(','):
+        if '=' in part:
+            key, n = part.split('=', 1)
+            limits[key.strip()] = int(n)
+    return limits
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures that retrying cannot fix."""
+
+
+@dataclass
+class Job:
+    """One queued job (the binary payload is loaded separately)."""
+
+    id: str
+    kind: str
+    payload: dict
+    concurrency_key: Optional[str] = None
+    status: str = QUEUED
+    attempts: int = 0
+    max_attempts: int = MAX_ATTEMPTS
+    run_at: float = field(default_factory=time.time)
+    leased_until: Optional[float] = None
+    progress: Optional[dict] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    reclaimed: bool = False  # claimed after its previous worker's lease expired
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public view for the status endpoint."""
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "concurrency_key": self.concurrency_key,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "next_attempt_at": self.run_at if self.status == QUEUED else None,
+        }
+
+
+class JobBackend(ABC):
+    """Storage interface for JobQueue. Implementations must make claim() atomic."""
+
+    @abstractmethod
+    def enqueue(self, job: Job, data: Optional[bytes]):
+        ...
+
+    @abstractmethod
+    def claim(self, now: float, lease_seconds: float, exclude_keys: Set[str]) -> Optional[Job]:
+        """Lease the next due job (queued and due, or running with an expired lease)."""
+
+    @abstractmethod
+    def load_data(self, job_id: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def renew(self, job_id: str, leased_until: float):
+        ...
+
+    @abstractmethod
+    def set_progress(self, job_id: str, progress: dict):
+        ...
+
+    @abstractmethod
+    def complete(self, job_id: str, result: Optional[dict]):
+        ...
+
+    @abstractmethod
+    def retry(self, job_id: str, run_at: float, error: str):
+        ...
+
+    @abstractmethod
+    def release(self, job_id: str):
+        """Return a running job to the queue without counting the attempt (shutdown)."""
+
+    @abstractmethod
+    def fail(self, job_id: str, error: str):
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    def counts(self) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def purge(self, finished_before: float) -> int:
+        ...
+
+    def close(self):
+        pass
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    concurrency_key TEXT,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    data BLOB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_at REAL NOT NULL,
+    leased_until REAL,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, run_at);
+"""
+
+_JOB_COLUMNS = (
+    "id, kind, concurrency_key, status, payload, attempts, max_attempts, run_at, "
+    "leased_until, progress, result, error, created_at, updated_at"
+)
+
+
+class SQLiteJobBackend(JobBackend):
+    """Jobs in a local SQLite database (WAL mode, safe across processes on one host)."""
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _row_to_job(row) -> Job:
+        (job_id, kind, key, status, payload, attempts, max_attempts, run_at,
+         leased_until, progress, result, error, created_at, updated_at) = row
+        return Job(
+            id=job_id, kind=kind, payload=json.loads(payload), concurrency_key=key, status=status,
+            attempts=attempts, max_attempts=max_attempts, run_at=run_at, leased_until=leased_until,
+            progress=json.loads(progress) if progress else None,
+            result=json.loads(result) if result else None,
+            error=error, created_at=created_at, updated_at=updated_at,
+        )
+
+    def _update(self, job_id: str, **values):
+        values["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in values)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*values.values(), job_id))
+
+    def enqueue(self, job: Job, data: Optional[bytes]):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO jobs ({_JOB_COLUMNS}, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.kind, job.concurrency_key, job.status, json.dumps(job.payload), job.attempts,
+                 job.max_attempts, job.run_at, job.leased_until, None, None, None,
+                 job.created_at, job.updated_at, data)
+            )
+
+    def claim(self, now: float, lease_seconds: float, exclude_keys: Set[str]) -> Optional[Job]:
+        excluded = sorted(exclude_keys)
+        key_filter = f"AND IFNULL(concurrency_key, '') NOT IN ({', '.join('?' * len(excluded))})" if excluded else ""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"""
+                    SELECT {_JOB_COLUMNS} FROM jobs
+                    WHERE ((status = '{QUEUED}' AND run_at <= ?) OR (status = '{RUNNING}' AND leased_until < ?))
+                    {key_filter}
+                    ORDER BY run_at LIMIT 1
+                    """,
+                    (now, now, *excluded)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                job = self._row_to_job(row)
+                job.reclaimed = job.status == RUNNING
+                job.status = RUNNING
+                job.attempts += 1
+                job.leased_until = now + lease_seconds
+                job.updated_at = now
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = ?, leased_until = ?, updated_at = ? WHERE id = ?",
+                    (job.status, job.attempts, job.leased_until, job.updated_at, job.id)
+                )
+                self._conn.execute("COMMIT")
+                return job
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def load_data(self, job_id: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def renew(self, job_id: str, leased_until: float):
+        self._update(job_id, leased_until=leased_until)
+
+    def set_progress(self, job_id: str, progress: dict):
+        self._update(job_id, progress=json.dumps(progress))
+
+    def complete(self, job_id: str, result: Optional[dict]):
+        # The payload blob (e.g. audio) is no longer needed once the job succeeds
+        self._update(job_id, status=SUCCEEDED, result=json.dumps(result) if result is not None else None,
+                     error=None, leased_until=None, data=None)
+
+    def retry(self, job_id: str, run_at: float, error: str):
+        self._update(job_id, status=QUEUED, run_at=run_at, error=error, leased_until=None)
+
+    def release(self, job_id: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = MAX(attempts - 1, 0), run_at = ?, leased_until = NULL, "
+                "updated_at = ? WHERE id = ? AND status = ?",
+                (QUEUED, time.time(), time.time(), job_id, RUNNING)
+            )
+
+    def fail(self, job_id: str, error: str):
+        self._update(job_id, status=FAILED, error=error, leased_until=None)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: n for status, n in rows}
+
+    def purge(self, finished_before: float) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (SUCCEEDED, FAILED, finished_before)
+            ).rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+@dataclass
+class JobContext:
+    """What a handler gets: the job, its binary payload and a progress reporter."""
+
+    job: Job
+    data: Optional[bytes]
+    _backend: JobBackend
+
+    @property
+    def payload(self) -> dict:
+        return self.job.payload
+
+    @property
+    def attempt(self) -> int:
+        return self.job.attempts
+
+    def set_progress(self, **progress):
+        """Record progress (visible in the job status) while the job runs."""
+        self.job.progress = progress
+        self._backend.set_progress(self.job.id, progress)
+
+
+Handler = Callable[[JobContext], Awaitable[Optional[dict]]]
+FailureHook = Callable[[JobContext, BaseException], Awaitable[None]]
+
+
+@dataclass
+class _Kind:
+    handler: Handler
+    on_failure: Optional[FailureHook]
+    max_attempts: int
+    retryable: Callable[[BaseException], bool]
+
+
+class JobQueue:
+    """
+    Durable job queue with a bounded worker pool and per-key concurrency caps.
+
+    Jobs are dispatched by one task that claims due jobs from the backend
+    while worker slots (and the job's concurrency key) have capacity.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[JobBackend] = None,
+        max_workers: int = MAX_WORKERS,
+        concurrency_limits: Optional[Dict[str, int]] = None,
+        visibility_timeout: float = VISIBILITY_TIMEOUT,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX,
+        poll_seconds: float = POLL_SECONDS,
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            backend: Job storage. Defaults to SQLiteJobBackend at JOB_QUEUE_DB_PATH.
+            max_workers: Maximum concurrent jobs.
+            concurrency_limits: {concurrency_key: max concurrent jobs}.
+            visibility_timeout: Lease length; renewed at a third of it while a job runs.
+            backoff_base: Delay before the first retry (seconds), doubling per attempt.
+            backoff_max: Maximum retry delay (seconds).
+            poll_seconds: Idle poll interval for delayed retries and expired leases.
+        """
+        self._backend = backend
+        self.max_workers = max_workers
+        self.concurrency_limits = (
+            concurrency_limits if concurrency_limits is not None
+            else parse_concurrency_limits(DEFAULT_CONCURRENCY_LIMITS)
+        )
+        self.visibility_timeout = visibility_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_seconds = poll_seconds
+        self._kinds: Dict[str, _Kind] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._running_by_key: Dict[str, int] = {}
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+        self._slot_waiters: List[asyncio.Future] = []
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_purge = 0.0
+
+        # Statistics
+        self._enqueued = 0
+        self._succeeded = 0
+        self._failed = 0
+        self._retried = 0
+        self._lease_expired = 0
+        self._dispatch_errors = 0
+        self._extra_slots = 0
+        self._peak_running = 0
+        self._total_seconds = 0.0
+
+    @property
+    def backend(self) -> JobBackend:
+        if self._backend is None:
+            self._backend = SQLiteJobBackend()
+        return self._backend
+
+    def register(
+        self,
+        kind: str,
+        handler: Handler,
+        on_failure: Optional[FailureHook] = None,
+        max_attempts: int = MAX_ATTEMPTS,
+        retryable: Optional[Callable[[BaseException], bool]] = None,
+    ):
+        """
+        Register the handler for a job kind.
+
+        Args:
+            kind: Job kind name.
+            handler: async handler(ctx) returning an optional JSON-able result.
+            on_failure: Called once when the job finally fails (after the last attempt).
+            max_attempts: Attempts before the job is marked failed.
+            retryable: Predicate deciding whether an exception is worth retrying
+                (PermanentJobError never is).
+        """
+        self._kinds[kind] = _Kind(handler, on_failure, max_attempts, retryable or (lambda e: True))
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: dict,
+        data: Optional[bytes] = None,
+        concurrency_key: Optional[str] = None,
+    ) -> Job:
+        """Persist a job and wake the dispatcher. Returns the queued Job."""
+        if kind not in self._kinds:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        job = Job(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            payload=payload,
+            concurrency_key=concurrency_key,
+            max_attempts=self._kinds[kind].max_attempts,
+        )
+        self.backend.enqueue(job, data)
+        self._enqueued += 1
+        print(f"📥 Queued {kind} job {job.id}" + (f" ({concurrency_key})" if concurrency_key else ""))
+        self._wake()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.backend.get(job_id)
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Wait for a job to finish in this process and return its result.
+
+        Raises:
+            The handler's exception if the job failed, or KeyError for an unknown job.
+        """
+        job = self.backend.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job.status == SUCCEEDED:
+            return job.result
+        if job.status == FAILED:
+            raise PermanentJobError(job.error)
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(job_id, []).append(future)
+        return await asyncio.wait_for(future, timeout)
+
+    async def start(self):
+        """Start dispatching (jobs left over from a previous process are picked up)."""
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+            counts = self.backend.counts()
+            print(f"✅ Job queue started ({self.max_workers} workers, "
+                  f"{counts.get(QUEUED, 0)} queued, {counts.get(RUNNING, 0)} leased)")
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @asynccontextmanager
+    async def slot(self, key: str) -> AsyncIterator[None]:
+        """
+        Hold one extra concurrency slot for `key`, waiting while it is saturated.
+
+        For handlers that make several concurrent calls to the key's provider:
+        each call beyond the one covered by the job's own slot takes a slot, so
+        running jobs plus their fan-out stay within concurrency_limits[key].
+        """
+        limit = self.concurrency_limits.get(key)
+        while limit is not None and self._running_by_key.get(key, 0) >= limit:
+            future = asyncio.get_running_loop().create_future()
+            self._slot_waiters.append(future)
+            try:
+                await future
+            finally:
+                if future in self._slot_waiters:
+                    self._slot_waiters.remove(future)
+        self._running_by_key[key] = self._running_by_key.get(key, 0) + 1
+        self._extra_slots += 1
+        try:
+            yield
+        finally:
+            self._release_slot(key)
+
+    def _release_slot(self, key: str):
+        self._running_by_key[key] -= 1
+        # Waiters re-check their key; the dispatcher may also claim a job for it
+        for future in self._slot_waiters:
+            if not future.done():
+                future.set_result(None)
+        self._slot_waiters.clear()
+        self._wake()
+
+    def _saturated_keys(self) -> Set[str]:
+        return {key for key, limit in self.concurrency_limits.items() if self._running_by_key.get(key, 0) >= limit}
+
+    async def _dispatch(self):
+        errors = 0
+        while True:
+            try:
+                while len(self._running) < self.max_workers:
+                    job = self.backend.claim(time.time(), self.visibility_timeout, self._saturated_keys())
+                    if job is None:
+                        break
+                    self._start_job(job)
+
+                if time.monotonic() - self._last_purge > 3600:
+                    self._last_purge = time.monotonic()
+                    self.backend.purge(time.time() - RETENTION_SECONDS)
+                errors = 0
+            except Exception as e:
+                # e.g. "database is locked": keep dispatching once the backend recovers
+                errors += 1
+                self._dispatch_errors += 1
+                delay = min(self.backoff_max, self.poll_seconds * 2 ** errors)
+                print(f"⚠️  Job dispatcher error ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def _start_job(self, job: Job):
+        if job.reclaimed:
+            self._lease_expired += 1  # re-run after its worker died
+        key = job.concurrency_key or ''
+        self._running_by_key[key] = self._running_by_key.get(key, 0) + 1
+        self._running[job.id] = asyncio.create_task(self._run(job))
+        self._peak_running = max(self._peak_running, len(self._running))
+
+    async def _run(self, job: Job):
+        kind = self._kinds.get(job.kind)
+        ctx = JobContext(job, None, self.backend)
+        started = time.monotonic()
+        renewer: Optional[asyncio.Task] = None
+        try:
+            ctx.data = self.backend.load_data(job.id)
+            renewer = asyncio.create_task(self._keep_leased(job))
+            if kind is None:
+                raise PermanentJobError(f"No handler registered for job kind '{job.kind}'")
+            if job.attempts > job.max_attempts:
+                raise PermanentJobError(f"Gave up after {job.max_attempts} attempts (lease expired)")
+
+            print(f"▶️  Running {job.kind} job {job.id} (attempt {job.attempts}/{job.max_attempts})")
+            result = await kind.handler(ctx)
+            self.backend.complete(job.id, result)
+            self._succeeded += 1
+            self._total_seconds += time.monotonic() - started
+            print(f"✅ {job.kind} job {job.id} succeeded in {time.monotonic() - started:.1f}s")
+            self._resolve(job.id, result=result)
+        except asyncio.CancelledError:
+            # Shutting down: hand the job back so the next process runs it straight away
+            self.backend.release(job.id)
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            permanent = isinstance(e, PermanentJobError) or (kind is not None and not kind.retryable(e))
+            if not permanent and job.attempts < job.max_attempts:
+                delay = self._backoff(job.attempts)
+                self.backend.retry(job.id, time.time() + delay, error)
+                self._retried += 1
+                print(f"⚠️  {job.kind} job {job.id} failed ({error}), retrying in {delay:.0f}s")
+            else:
+                self.backend.fail(job.id, error)
+                self._failed += 1
+                print(f"❌ {job.kind} job {job.id} failed after {job.attempts} attempt(s): {error}")
+                if kind is not None and kind.on_failure is not None:
+                    try:
+                        await kind.on_failure(ctx, e)
+                    except Exception as hook_error:
+                        print(f"❌ on_failure hook for job {job.id} failed: {hook_error}")
+                self._resolve(job.id, error=e)
+        finally:
+            if renewer is not None:
+                renewer.cancel()
+            self._running.pop(job.id, None)
+            self._release_slot(job.concurrency_key or '')
+
+    async def _keep_leased(self, job: Job):
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            self.backend.renew(job.id, time.time() + self.visibility_timeout)
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.5)
+
+    def _resolve(self, job_id: str, result: Optional[dict] = None, error: Optional[BaseException] = None):
+        for future in self._waiters.pop(job_id, []):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return queue statistics for the metrics endpoint."""
+        return {
+            "jobs": self.backend.counts(),
+            "running": len(self._running),
+            "running_by_key": {key or "default": n for key, n in self._running_by_key.items() if n},
+            "peak_running": self._peak_running,
+            "max_workers": self.max_workers,
+            "concurrency_limits": self.concurrency_limits,
+            "enqueued": self._enqueued,
+            "succeeded": self._succeeded,
+            "failed": self._failed,
+            "retried": self._retried,
+            "lease_expired": self._lease_expired,
+            "dispatch_errors": self._dispatch_errors,
+            "extra_slots": self._extra_slots,
+            "avg_job_seconds": round(self._total_seconds / self._succeeded, 2) if self._succeeded else 0.0,
+        }
+
+    async def aclose(self):
+        """Stop dispatching and hand running jobs back to the queue."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        running = list(self._running.values())
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
+
+
+# Process-wide queue instance
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """Get the process-wide job queue, creating it on first call."""
+    global _queue
+    if _queue is None:
+        try:
+            _queue = JobQueue()
+            _queue.backend
+        except sqlite3.Error as e:
+            print(f"⚠️  Job queue database unavailable ({e}), using an in-memory queue", file=sys.stderr)
+            _queue = JobQueue(backend=SQLiteJobBackend(":memory:"))
+    return _queue
+
+
+def get_job_queue_stats() -> Optional[Dict[str, Any]]:
+    """Stats for the shared queue, or None if it has not been created yet."""
+    return _queue.get_stats() if _queue is not None else None
+
+
+async def close_job_queue():
+    """Close the process-wide queue (called on API shutdown)."""
+    global _queue
+    if _queue is not None:
+        await _queue.aclose()
+        _queue = None
+
+
+__all__ = [
+    'Job', 'JobBackend', 'JobContext', 'JobQueue', 'PermanentJobError', 'SQLiteJobBackend',
+    'QUEUED', 'RUNNING', 'SUCCEEDED', 'FAILED',
+    'get_job_queue', 'get_job_queue_stats', 'close_job_queue',
+]
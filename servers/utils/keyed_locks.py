@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Per-Key Async Locks
+
+Serialise work per key (appointment, recording, speaker-role memo) without
+the lock map growing with every key ever seen.
+
+A key's lock stays mapped only while some task holds or waits for it: each
+lock counts the tasks inside `async with`, and the last one out removes it.
+Stores can therefore evict or delete their entries freely - a lock that is
+held is never dropped, so the next caller can't create a second lock for
+the same key.
+
+Usage:
+    from servers.utils.keyed_locks import KeyedLocks
+
+    locks = KeyedLocks()
+    async with locks.get(appointment_id):
+        ...
+"""
+
+import asyncio
+from typing import Dict, Hashable
+
+
+class KeyedLock:
+    """An asyncio.Lock that knows how many tasks hold or await it."""
+
+    def __init__(self, owner: "KeyedLocks", key: Hashable):
+        self._owner = owner
+        self._key = key
+        self._lock = asyncio.Lock()
+        self.users = 0  # Tasks holding or waiting for the lock
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    async def __aenter__(self):
+        self.users += 1
+        try:
+            await self._lock.acquire()
+        except BaseException:
+            self._leave()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._lock.release()
+        self._leave()
+
+    def _leave(self):
+        self.users -= 1
+        if self.users == 0:
+            self._owner._discard(self._key, self)
+
+
+class KeyedLocks:
+    """Map of key -> KeyedLock holding only locks that are in use."""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, KeyedLock] = {}
+
+    def get(self, key: Hashable) -> KeyedLock:
+        """Return the key's lock (use it straight away with `async with`)."""
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = KeyedLock(self, key)
+        return lock
+
+    def _discard(self, key: Hashable, lock: KeyedLock):
+        if self._locks.get(key) is lock:
+            del self._locks[key]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._locks
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+__all__ = ['KeyedLock', 'KeyedLocks']
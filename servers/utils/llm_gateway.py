@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+"""
+Async LLM Gateway
+
+Process-wide gateway to the Anthropic Messages API.
+
+Every module that talks to Claude (API handlers, DiagnosisEngine,
+DrugInfoRetriever, ConsultationSummary, ...) goes through one shared
+AsyncAnthropic client so that:
+- LLM calls never block the uvicorn event loop
+- HTTPS connections are kept alive and reused across requests
+- Every call has a timeout (per-call override supported)
+- Prompt-cache reads/writes are recorded per prompt (see cached_system_prompt)
+
+Usage:
+    from servers.utils.llm_gateway import get_llm_gateway
+
+    llm = get_llm_gateway()
+    response = await llm.create_message(
+        model="claude-haiku-4-5",
+        max_tokens=1024,
+        messages=[{"role": "user", "content": prompt}],
+        timeout=30.0,
+    )
+
+Prompt caching:
+    Large static instructions go in a cacheable system block; per-call data
+    (patient context, transcript, ...) goes after it:
+
+    response = await llm.create_message(
+        model="claude-haiku-4-5",
+        max_tokens=4096,
+        system=cached_system_prompt(STATIC_RULES, per_call_context),
+        messages=[{"role": "user", "content": transcript}],
+        prompt_name="form_extraction",
+    )
+
+    Prefixes shorter than the model's minimum cacheable length are simply
+    not cached by the API; get_stats()["prompts"] shows reads/writes per
+    prompt_name so that is visible.
+"""
+
+import os
+import time
+import asyncio
+from typing import Optional, Any, AsyncIterator, Dict, List
+
+import httpx
+import anthropic
+
+
+# Default per-call timeout (seconds). Guideline tool-use turns can take ~60s.
+DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT_SECONDS", "120"))
+
+# Connection pool sizing for the shared client
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "60"))
+
+# SDK-level retries (429/5xx/connection errors)
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+
+class LLMGateway:
+    """
+    Shared async Anthropic client with a keep-alive connection pool.
+
+    The underlying AsyncAnthropic client is created lazily on first use so
+    the gateway can be constructed at import time (before the event loop
+    or the API key are available).
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_connections: int = MAX_CONNECTIONS,
+        max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+        max_retries: int = MAX_RETRIES,
+    ):
+        """
+        Initialize the gateway.
+
+        Args:
+            api_key: Anthropic API key. If None, reads ANTHROPIC_API_KEY from env.
+            timeout: Default per-call timeout in seconds.
+            max_connections: Maximum concurrent HTTP connections to the API.
+            max_keepalive_connections: Idle connections kept open for reuse.
+            max_retries: SDK retries for transient errors.
+        """
+        self._api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._max_keepalive_connections = max_keepalive_connections
+        self._max_retries = max_retries
+        self._client: Optional[anthropic.AsyncAnthropic] = None
+
+        # Call statistics
+        self._calls = 0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._errors = 0
+        self._timeouts = 0
+        self._total_latency = 0.0
+        self._input_tokens = 0
+        self._output_tokens = 0
+        self._cache_read_tokens = 0
+        self._cache_write_tokens = 0
+
+        # Per-prompt prompt-cache statistics (keyed by create_message prompt_name)
+        self._prompt_stats: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def available(self) -> bool:
+        """Whether an API key is configured."""
+        return bool(self._api_key)
+
+    @property
+    def client(self) -> anthropic.AsyncAnthropic:
+        """The shared AsyncAnthropic client (created on first access)."""
+        if self._client is None:
+            http_client = anthropic.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=self._max_connections,
+                    max_keepalive_connections=self._max_keepalive_connections,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                timeout=self._timeout,
+            )
+            self._client = anthropic.AsyncAnthropic(
+                api_key=self._api_key,
+                http_client=http_client,
+                timeout=self._timeout,
+                max_retries=self._max_retries,
+            )
+        return self._client
+
+    async def create_message(
+        self,
+        *,
+        timeout: Optional[float] = None,
+        prompt_name: Optional[str] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Call the Messages API without blocking the event loop.
+
+        Args:
+            timeout: Per-call timeout in seconds (defaults to the gateway timeout).
+            prompt_name: Label for per-prompt cache statistics (not sent to the API).
+            **kwargs: Passed straight through to `messages.create`
+                      (model, max_tokens, system, messages, tools, ...).
+
+        Returns:
+            The Anthropic Message response.
+
+        Raises:
+            anthropic.APITimeoutError: If the call exceeds its timeout.
+            anthropic.APIError: For other API failures.
+        """
+        self._calls += 1
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        start = time.perf_counter()
+
+        try:
+            response = await self.client.messages.create(
+                timeout=timeout if timeout is not None else self._timeout,
+                **kwargs
+            )
+            self._record_usage(response, prompt_name, time.perf_counter() - start)
+            return response
+        except (anthropic.APITimeoutError, asyncio.TimeoutError):
+            self._timeouts += 1
+            self._errors += 1
+            raise
+        except Exception:
+            self._errors += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._total_latency += time.perf_counter() - start
+
+    async def stream_text(
+        self,
+        *,
+        timeout: Optional[float] = None,
+        prompt_name: Optional[str] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        Stream a Messages API response as text deltas.
+
+        Usage and latency are recorded from the final message, as for create_message.
+
+        Args:
+            timeout: Per-call timeout in seconds (defaults to the gateway timeout).
+            prompt_name: Label for per-prompt cache statistics (not sent to the API).
+            **kwargs: Passed straight through to `messages.stream`.
+
+        Yields:
+            Text deltas in arrival order.
+        """
+        self._calls += 1
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        start = time.perf_counter()
+
+        try:
+            async with self.client.messages.stream(
+                timeout=timeout if timeout is not None else self._timeout,
+                **kwargs
+            ) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                response = await stream.get_final_message()
+            self._record_usage(response, prompt_name, time.perf_counter() - start)
+            if response.stop_reason == "max_tokens":
+                print("⚠️  Streamed LLM response was truncated (hit max_tokens limit)")
+        except (anthropic.APITimeoutError, asyncio.TimeoutError):
+            self._timeouts += 1
+            self._errors += 1
+            raise
+        except Exception:
+            self._errors += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._total_latency += time.perf_counter() - start
+
+    def _record_usage(self, response: Any, prompt_name: Optional[str] = None, latency: float = 0.0):
+        """Accumulate token usage (including prompt-cache reads/writes) from a response."""
+        usage = cache_usage(response)
+        self._input_tokens += usage["input_tokens"]
+        self._output_tokens += usage["output_tokens"]
+        self._cache_read_tokens += usage["cache_read_input_tokens"]
+        self._cache_write_tokens += usage["cache_creation_input_tokens"]
+
+        if prompt_name is None:
+            return
+
+        stats = self._prompt_stats.setdefault(prompt_name, {
+            "calls": 0, "cache_hits": 0, "input_tokens": 0,
+            "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0,
+            "_hit_latency": 0.0, "_miss_latency": 0.0,
+        })
+        stats["calls"] += 1
+        stats["input_tokens"] += usage["input_tokens"]
+        stats["cache_read_input_tokens"] += usage["cache_read_input_tokens"]
+        stats["cache_creation_input_tokens"] += usage["cache_creation_input_tokens"]
+        if usage["cache_read_input_tokens"]:
+            stats["cache_hits"] += 1
+            stats["_hit_latency"] += latency
+        else:
+            stats["_miss_latency"] += latency
+
+    def _prompt_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-prompt cache reads/writes with latency split by cache hit/miss."""
+        result = {}
+        for name, stats in self._prompt_stats.items():
+            hits = stats["cache_hits"]
+            misses = stats["calls"] - hits
+            result[name] = {
+                **{k: v for k, v in stats.items() if not k.startswith("_")},
+                "avg_latency_cache_hit_seconds": round(stats["_hit_latency"] / hits, 3) if hits else None,
+                "avg_latency_cache_miss_seconds": round(stats["_miss_latency"] / misses, 3) if misses else None,
+            }
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return call statistics for the metrics endpoint."""
+        completed = self._calls - self._in_flight
+        return {
+            "calls": self._calls,
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "errors": self._errors,
+            "timeouts": self._timeouts,
+            "avg_latency_seconds": round(self._total_latency / completed, 3) if completed else 0.0,
+            "input_tokens": self._input_tokens,
+            "output_tokens": self._output_tokens,
+            "cache_read_input_tokens": self._cache_read_tokens,
+            "cache_creation_input_tokens": self._cache_write_tokens,
+            "prompts": self._prompt_cache_stats(),
+            "max_connections": self._max_connections,
+            "max_keepalive_connections": self._max_keepalive_connections,
+        }
+
+    async def aclose(self):
+        """Close the shared client and its connection pool."""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+def cached_system_prompt(stable: str, dynamic: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Build a system prompt whose stable prefix is marked as a prompt-cache breakpoint.
+
+    Args:
+        stable: Instructions identical across calls (rules, schemas, examples).
+        dynamic: Optional per-call text appended after the cached prefix.
+
+    Returns:
+        List of system text blocks for `messages.create(system=...)`.
+    """
+    blocks = [{"type": "text", "text": stable, "cache_control": {"type": "ephemeral"}}]
+    if dynamic:
+        blocks.append({"type": "text", "text": dynamic})
+    return blocks
+
+
+def cache_usage(response: Any) -> Dict[str, int]:
+    """Token usage of a response, including prompt-cache reads and writes (0 if not reported)."""
+    usage = getattr(response, "usage", None)
+    result = {}
+    for field in ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"):
+        value = getattr(usage, field, None)
+        result[field] = value if isinstance(value, int) else 0
+    return result
+
+
+# Process-wide gateway instance
+_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway(api_key: Optional[str] = None) -> LLMGateway:
+    """
+    Get the process-wide LLM gateway, creating it on first call.
+
+    Args:
+        api_key: Optional API key used only when the gateway is first created.
+
+    Returns:
+        The shared LLMGateway instance.
+    """
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway(api_key=api_key)
+    return _gateway
+
+
+async def close_llm_gateway():
+    """Close the process-wide gateway (called on API shutdown)."""
+    global _gateway
+    if _gateway is not None:
+        await _gateway.aclose()
+        _gateway = None
+
+
+__all__ = ['LLMGateway', 'get_llm_gateway', 'close_llm_gateway', 'cached_system_prompt', 'cache_usage']
@@ -13,7 +13,7 @@ import asyncio
 from typing import Optional, Any, Dict, List
 from contextlib import AsyncExitStack
 from mcp import ClientSession, StdioServerParameters, types
-from mcp.client.stdio import stdio_client
+from mcp_transport import connect_mcp_server, transport_for
 from pathlib import Path
 import json
 from pydantic import AnyUrl
@@ -21,10 +21,11 @@ from pydantic import AnyUrl
 
 class MCPClient:
     """
-    Base MCP client that connects to multiple MCP servers via stdio.
+    Base MCP client that connects to multiple MCP servers.
 
-    Each server runs as a separate process and this client manages the connections,
-    routing tool calls to the appropriate server.
+    Each server is mounted in-process or run as a separate stdio process (see
+    mcp_transport) and this client manages the connections, routing tool calls
+    to the appropriate server.
     """
 
     def __init__(
@@ -38,6 +39,9 @@ class MCPClient:
         Args:
             servers: Dict mapping server names to their configurations
                     Each config should have 'command', 'args', and optional 'env'
+                    and 'transport' ("inprocess"/"stdio"; default from
+                    MCP_TRANSPORT_<NAME> / MCP_TRANSPORT). The server script is
+                    the last of 'args'.
             verbose: Whether to print connection progress
         """
         self._servers = servers
@@ -78,7 +82,7 @@ class MCPClient:
 
         Args:
             server_name: Name identifier for the server
-            config: Server configuration with command, args, env
+            config: Server configuration with command, args, env, transport
         """
         try:
             server_params = StdioServerParameters(
@@ -87,16 +91,14 @@ class MCPClient:
                 env=config.get('env')
             )
 
-            stdio_transport = await self._exit_stack.enter_async_context(
-                stdio_client(server_params)
+            session = await connect_mcp_server(
+                self._exit_stack,
+                server_name,
+                config['args'][-1],
+                transport=config.get('transport') or transport_for(server_name),
+                verbose=self._verbose,
+                stdio_params=server_params
             )
-
-            _stdio, _write = stdio_transport
-            session = await self._exit_stack.enter_async_context(
-                ClientSession(_stdio, _write)
-            )
-
-            await session.initialize()
             self._sessions[server_name] = session
 
             if self._verbose:
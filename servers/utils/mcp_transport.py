@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+"""
+MCP Transports
+
+Connects to our first-party FastMCP servers using one of two transports:
+
+- "stdio":     spawn `fastmcp run <server.py> --transport stdio` as a subprocess
+               and talk JSON-RPC over its pipes (isolated, but every connect
+               starts a Python process and every tool call is serialised)
+- "inprocess": import the server module, mount its FastMCP object directly in
+               the API process and dispatch tool calls as coroutine calls
+
+Both return an object with the ClientSession methods the engines use
+(initialize, list_tools, call_tool), so callers don't care which one is used.
+
+Usage:
+    from servers.utils.mcp_transport import connect_mcp_server
+
+    session = await connect_mcp_server(exit_stack, "nice", server_path, transport="inprocess")
+    result = await session.call_tool("search_nice_guidelines", {"keyword": "asthma"})
+"""
+
+import os
+import sys
+import asyncio
+import inspect
+import importlib.util
+from pathlib import Path
+from contextlib import AsyncExitStack
+from typing import Any, Dict, Optional
+
+from mcp import ClientSession, StdioServerParameters, types
+from mcp.client.stdio import stdio_client
+from fastmcp.server.context import Context
+from fastmcp.utilities.types import find_kwarg_by_type
+
+
+STDIO = "stdio"
+INPROCESS = "inprocess"
+TRANSPORTS = (STDIO, INPROCESS)
+
+
+def transport_for(server_name: str) -> str:
+    """Transport for a server: MCP_TRANSPORT_<NAME>, else MCP_TRANSPORT, else in-process."""
+    return os.getenv(f"MCP_TRANSPORT_{server_name.upper()}", os.getenv("MCP_TRANSPORT", INPROCESS))
+
+
+# Loaded FastMCP server objects, keyed by resolved server path
+_servers: Dict[str, Any] = {}
+
+
+def load_fastmcp_server(server_path: str) -> Any:
+    """
+    Import a FastMCP server module by path and return its `mcp` object.
+
+    Modules are imported once per process and shared by every session.
+
+    Raises:
+        ImportError: If the module can't be imported or has no FastMCP `mcp` object.
+    """
+    resolved = str(Path(server_path).resolve())
+    if resolved in _servers:
+        return _servers[resolved]
+
+    # Reuse the module if the API already imported it (e.g. bnf_server via DrugInfoRetriever)
+    for module in list(sys.modules.values()):
+        module_file = getattr(module, "__file__", None)
+        if module_file and str(Path(module_file).resolve()) == resolved and hasattr(module, "mcp"):
+            _servers[resolved] = module.mcp
+            return module.mcp
+
+    module_name = f"_mcp_inprocess_{Path(resolved).stem}"
+    spec = importlib.util.spec_from_file_location(module_name, resolved)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Cannot load MCP server module from {server_path}")
+
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException as e:
+        # Servers exit on missing config (e.g. API keys) - surface that as an import failure
+        sys.modules.pop(module_name, None)
+        raise ImportError(f"Failed to import {server_path}: {e!r}") from e
+
+    server = getattr(module, "mcp", None)
+    if server is None or not hasattr(server, "_call_tool_mcp"):
+        sys.modules.pop(module_name, None)
+        raise ImportError(f"{server_path} does not define a FastMCP server named 'mcp'")
+
+    _servers[resolved] = server
+    return server
+
+
+class InProcessSession:
+    """
+    ClientSession-compatible wrapper around a FastMCP server in this process.
+
+    Tool calls go through the same FastMCP handlers the stdio server uses
+    (argument validation, middleware, result serialisation), minus the
+    subprocess and JSON-RPC pipes. Synchronous tools (e.g. BNF scraping with
+    `requests`) that take no Context run the tool's own `run()` - argument
+    validation, the function and result serialisation - in a worker thread so
+    they can't block the event loop.
+    """
+
+    def __init__(self, server: Any, server_name: str = ""):
+        self.server = server
+        self.server_name = server_name or getattr(server, "name", "")
+        self._tools: Optional[types.ListToolsResult] = None
+        self._sync_tools: Dict[str, Any] = {}
+
+    async def initialize(self):
+        """Load the tool list (mirrors the MCP initialize handshake)."""
+        await self.list_tools()
+
+    async def list_tools(self) -> types.ListToolsResult:
+        """List the server's tools (cached - tools are registered at import time)."""
+        if self._tools is None:
+            tools = await self.server._list_tools_mcp()
+            self._tools = types.ListToolsResult(tools=tools)
+
+            registered = await self.server.get_tools()
+            self._sync_tools = {
+                name: tool for name, tool in registered.items()
+                if getattr(tool, "fn", None) is not None
+                and not inspect.iscoroutinefunction(tool.fn)
+                and find_kwarg_by_type(tool.fn, kwarg_type=Context) is None
+            }
+        return self._tools
+
+    async def call_tool(self, name: str, arguments: Optional[dict] = None) -> types.CallToolResult:
+        """Call a tool and return an MCP CallToolResult, like ClientSession.call_tool."""
+        if self._tools is None:
+            await self.list_tools()
+
+        try:
+            if name in self._sync_tools:
+                tool_result = await asyncio.to_thread(self._run_sync_tool, self._sync_tools[name], arguments or {})
+                result = tool_result.to_mcp_result()
+            else:
+                result = await self.server._call_tool_mcp(name, arguments or {})
+        except Exception as e:
+            # Same shape the low-level MCP server sends back for tool errors
+            return types.CallToolResult(
+                content=[types.TextContent(type="text", text=str(e))],
+                isError=True,
+            )
+
+        if isinstance(result, tuple):
+            content, structured = result
+        else:
+            content, structured = result, None
+
+        return types.CallToolResult(content=list(content), structuredContent=structured, isError=False)
+
+    @staticmethod
+    def _run_sync_tool(tool: Any, arguments: dict) -> Any:
+        # tool.run() never awaits for a sync function; it just needs a loop to run on
+        return asyncio.run(tool.run(arguments))
+
+
+async def connect_mcp_server(
+    exit_stack: AsyncExitStack,
+    server_name: str,
+    server_path: str,
+    transport: str = STDIO,
+    verbose: bool = True,
+    stdio_params: Optional[StdioServerParameters] = None,
+) -> Any:
+    """
+    Connect to a first-party MCP server with the requested transport.
+
+    In-process mode falls back to stdio if the server module can't be
+    imported in the API process.
+
+    Args:
+        exit_stack: Exit stack that owns the stdio subprocess/session contexts.
+        server_name: Server name (for logging).
+        server_path: Path to the FastMCP server module.
+        transport: "inprocess" or "stdio".
+        verbose: Whether to print fallback warnings.
+        stdio_params: Subprocess to spawn for stdio (default: `fastmcp run <server_path>`).
+
+    Returns:
+        An initialized ClientSession or InProcessSession.
+    """
+    if transport == INPROCESS:
+        try:
+            session = InProcessSession(load_fastmcp_server(server_path), server_name)
+            await session.initialize()
+            return session
+        except ImportError as e:
+            if verbose:
+                print(f"      ⚠️  In-process load failed for {server_name}, falling back to stdio: {e}")
+
+    server_params = stdio_params or StdioServerParameters(
+        command="fastmcp",
+        args=["run", server_path, "--transport", "stdio", "--no-banner"],
+        env=os.environ.copy()
+    )
+
+    stdio_transport = await exit_stack.enter_async_context(
+        stdio_client(server_params)
+    )
+    stdio, write = stdio_transport
+    session = await exit_stack.enter_async_context(
+        ClientSession(stdio, write)
+    )
+
+    await session.initialize()
+    return session
+
+
+__all__ = [
+    'STDIO',
+    'INPROCESS',
+    'TRANSPORTS',
+    'transport_for',
+    'load_fastmcp_server',
+    'InProcessSession',
+    'connect_mcp_server',
+]
@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+"""
+Rendered PDF Cache
+
+Content-addressed, size-bounded disk cache for generated PDFs.
+
+The consultation, analysis, prescription and filled-form download endpoints
+used to render the PDF from scratch on every click (a headless Chromium
+render, seconds of work), even when nothing had changed. They now hash
+everything that shapes the PDF - the form data, schema, clinic branding and
+logo URL, plus the renderer/bundle version - into a key (pdf_cache_key), and:
+- serve the stored PDF when the key has been rendered before
+- answer `If-None-Match` with 304 when the client already holds it (the key
+  is the ETag, so an unchanged PDF costs only the database reads)
+- render a key once when several requests for it arrive together
+- evict least-recently-used PDFs once PDF_CACHE_MAX_MB is exceeded
+
+Because the key covers the content, an edit produces a new key by itself.
+Entries also carry tags (e.g. "appointment:<id>", "doctor:<id>") so writes to a
+consultation form, colour scheme or logo drop the superseded PDFs straight away
+(invalidate), and changes the key cannot see (a logo replaced at the same URL)
+are not served.
+
+Usage:
+    from servers.utils.pdf_cache import get_pdf_cache, pdf_cache_key
+
+    key = pdf_cache_key("consultation", {"form_data": ..., "branding": ...}, renderer_version)
+    pdf_bytes, hit = await get_pdf_cache().get_or_render(key, render, tags=["appointment:123"])
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi.responses import Response
+
+
+CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "data", "pdf_cache"))
+
+# Total size of cached PDFs before least-recently-used ones are evicted
+MAX_BYTES = int(float(os.getenv("PDF_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+ENABLED = os.getenv("PDF_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Bump when the meaning of the key inputs changes (invalidates every entry)
+SCHEMA_VERSION = 1
+
+
+def _canonical_json(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def pdf_cache_key(kind: str, inputs: Dict[str, Any], renderer_version: str) -> str:
+    """
+    Content hash identifying one rendered PDF.
+
+    Args:
+        kind: PDF type ("consultation", "analysis", "prescription", "filled_form").
+        inputs: Everything passed to the renderer (form data, schema, branding, ...).
+        renderer_version: Template bundle / generator code version.
+    """
+    payload = _canonical_json({
+        "kind": kind,
+        "schema_version": SCHEMA_VERSION,
+        "renderer": renderer_version,
+        "inputs": inputs,
+    })
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def source_version(path: str) -> str:
+    """Hash of a generator module's source, for renderer_version."""
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()[:16]
+
+
+def etag_for(key: str) -> str:
+    return f'"{key[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value matches `etag` (weak comparison)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class _Entry:
+    __slots__ = ("size", "tags")
+
+    def __init__(self, size: int, tags: Tuple[str, ...]):
+        self.size = size
+        self.tags = tags
+
+
+class RenderedPdfCache:
+    """
+    PDFs stored as <dir>/<key[:2]>/<key>.pdf with a <key>.json sidecar of tags.
+
+    The LRU index lives in memory and is rebuilt from the directory (ordered
+    by file mtime, which is touched on every hit) when the cache is created.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding the PDFs (created if missing).
+            max_bytes: Total PDF size kept before LRU eviction.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._total_bytes = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        # Statistics
+        self._hits = 0
+        self._misses = 0
+        self._not_modified = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._invalidated = 0
+        self._render_seconds = 0.0
+
+        self._load_index()
+
+    def _pdf_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.pdf"
+
+    def _load_index(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        found = []
+        for pdf_path in self.cache_dir.glob("*/*.pdf"):
+            try:
+                stat = pdf_path.stat()
+                tags = json.loads(pdf_path.with_suffix(".json").read_text()).get("tags", [])
+            except (OSError, ValueError):
+                continue
+            found.append((stat.st_mtime, pdf_path.stem, _Entry(stat.st_size, tuple(tags))))
+        for _, key, entry in sorted(found):
+            self._entries[key] = entry
+            self._total_bytes += entry.size
+        if found:
+            print(f"✅ PDF cache loaded: {len(found)} PDFs ({self._total_bytes / 1024 / 1024:.1f} MB)")
+
+    def contains(self, key: str) -> bool:
+        return key in self._entries
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Stored PDF bytes for `key`, or None."""
+        if key not in self._entries:
+            return None
+        path = self._pdf_path(key)
+        try:
+            data = await asyncio.to_thread(self._read_and_touch, path)
+        except OSError:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return data
+
+    @staticmethod
+    def _read_and_touch(path: Path) -> bytes:
+        data = path.read_bytes()
+        os.utime(path)  # Recency survives a restart
+        return data
+
+    async def put(self, key: str, data: bytes, tags: Iterable[str] = ()):
+        """Store a PDF under `key`, evicting least-recently-used PDFs beyond max_bytes."""
+        tags = tuple(sorted(set(tags)))
+        await asyncio.to_thread(self._write, key, data, tags)
+        if key in self._entries:
+            self._total_bytes -= self._entries.pop(key).size
+        self._entries[key] = _Entry(len(data), tags)
+        self._total_bytes += len(data)
+
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self._evictions += 1
+
+    def _write(self, key: str, data: bytes, tags: Tuple[str, ...]):
+        path = self._pdf_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        path.with_suffix(".json").write_text(json.dumps({"tags": list(tags), "created_at": time.time()}))
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry.size
+        path = self._pdf_path(key)
+        for stale in (path, path.with_suffix(".json")):
+            try:
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self, *tags: str) -> int:
+        """Drop every PDF carrying any of `tags`; returns how many were removed."""
+        wanted = {tag for tag in tags if tag and not tag.endswith(":None")}
+        if not wanted:
+            return 0
+        stale = [key for key, entry in self._entries.items() if wanted.intersection(entry.tags)]
+        for key in stale:
+            self._drop(key)
+        self._invalidated += len(stale)
+        if stale:
+            print(f"🗑️  PDF cache: invalidated {len(stale)} PDF(s) for {', '.join(sorted(wanted))}")
+        return len(stale)
+
+    async def get_or_render(self, key: str, render: Callable[[], Awaitable[bytes]],
+                            tags: Iterable[str] = ()) -> Tuple[bytes, bool]:
+        """
+        Return (pdf_bytes, cache_hit), rendering and storing on a miss.
+
+        Concurrent misses for the same key share one render. The render runs
+        in its own task, so a caller that disconnects doesn't cancel it for
+        the others; it finishes and fills the cache even if every caller left.
+        """
+        data = await self.get(key)
+        if data is not None:
+            self._hits += 1
+            return data, True
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._coalesced += 1
+        else:
+            self._misses += 1
+            task = asyncio.create_task(self._render_and_store(key, render, tags))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._render_done(key, done))
+        return await asyncio.shield(task), False
+
+    async def _render_and_store(self, key: str, render: Callable[[], Awaitable[bytes]],
+                                tags: Iterable[str]) -> bytes:
+        started = time.perf_counter()
+        try:
+            data = await render()
+            await self.put(key, data, tags)
+            return data
+        finally:
+            self._render_seconds += time.perf_counter() - started
+
+    def _render_done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark retrieved when every caller has gone
+
+    def note_not_modified(self):
+        self._not_modified += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return cache statistics for the metrics endpoint."""
+        lookups = self._hits + self._misses + self._coalesced
+        return {
+            "enabled": ENABLED,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "not_modified": self._not_modified,
+            "hit_rate": round((self._hits + self._coalesced) / lookups, 3) if lookups else 0.0,
+            "evictions": self._evictions,
+            "invalidated": self._invalidated,
+            "avg_render_ms": round(self._render_seconds / self._misses * 1000, 1) if self._misses else 0.0,
+        }
+
+
+async def cached_pdf_response(
+    key: str,
+    render: Callable[[], Awaitable[bytes]],
+    filename: str,
+    tags: Iterable[str] = (),
+    if_none_match: Optional[str] = None,
+) -> Response:
+    """
+    PDF download response served from the cache, with ETag / If-None-Match support.
+
+    `render` is only awaited on a cache miss. Responses are `private, no-cache`:
+    clients keep the PDF but revalidate, getting 304 while its inputs are unchanged.
+    """
+    etag = etag_for(key)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    cache = get_pdf_cache()
+
+    # The ETag is the content key; entries dropped by invalidate() are re-rendered
+    # even on a match, as their key cannot see every change (a logo at the same URL)
+    if ENABLED and etag_matches(if_none_match, etag) and cache.contains(key):
+        cache.note_not_modified()
+        print(f"✅ PDF not modified: {filename}")
+        return Response(status_code=304, headers=headers)
+
+    if ENABLED:
+        data, hit = await cache.get_or_render(key, render, tags)
+    else:
+        data, hit = await render(), False
+
+    print(f"✅ PDF {'served from cache' if hit else 'rendered'}: {filename}")
+    return Response(
+        content=data,
+        media_type="application/pdf",
+        headers={**headers, "Content-Disposition": f"attachment; filename={filename}",
+                 "X-PDF-Cache": "hit" if hit else "miss"},
+    )
+
+
+# Process-wide cache instance
+_cache: Optional[RenderedPdfCache] = None
+
+
+def get_pdf_cache() -> RenderedPdfCache:
+    """Get the process-wide PDF cache, creating it on first call."""
+    global _cache
+    if _cache is None:
+        _cache = RenderedPdfCache()
+    return _cache
+
+
+def get_pdf_cache_stats() -> Optional[Dict[str, Any]]:
+    """Stats for the shared cache, or None if it has not been created yet."""
+    return _cache.get_stats() if _cache is not None else None
+
+
+def invalidate_pdfs(*tags: str) -> int:
+    """Drop cached PDFs carrying any of `tags`."""
+    return get_pdf_cache().invalidate(*tags)
+
+
+__all__ = [
+    'RenderedPdfCache', 'pdf_cache_key', 'source_version', 'etag_for', 'etag_matches',
+    'cached_pdf_response', 'get_pdf_cache', 'get_pdf_cache_stats', 'invalidate_pdfs',
+]
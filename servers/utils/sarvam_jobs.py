@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+"""
+Async Sarvam Batch Job Manager
+
+Process-wide manager for Sarvam speech-to-text-translate batch jobs
+(Indian-language diarization).
+
+The sarvamai SDK is synchronous: create_job / upload_files / start /
+get_status / get_file_results all block, and wait_until_complete sleeps
+between polls. Called directly from a request handler, one chunk could
+block the uvicorn event loop for up to two minutes. The manager instead:
+- runs every SDK call in a worker thread, so the event loop never blocks
+- tracks outstanding jobs in a single scheduler task that starts each due
+  poll as its own task (a slow result fetch never holds up other jobs),
+  starting fast and backing off per job while it is still running
+- resolves one asyncio future per job; callers just await it
+- downloads output files with a shared keep-alive httpx.AsyncClient
+
+Usage:
+    from servers.utils.sarvam_jobs import get_sarvam_job_manager
+
+    manager = get_sarvam_job_manager()
+    job = await manager.run_job(audio_path, num_speakers=2)   # or raw bytes + suffix
+    results = job.results                 # get_file_results() of the completed job
+    data = await manager.download_output(job, output_filename)
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set, Union
+
+import httpx
+
+
+DEFAULT_MODEL = "saaras:v2.5"
+
+# Adaptive polling: first poll after MIN seconds, then x BACKOFF per poll up to MAX
+POLL_MIN_SECONDS = float(os.getenv("SARVAM_POLL_MIN_SECONDS", "1"))
+POLL_MAX_SECONDS = float(os.getenv("SARVAM_POLL_MAX_SECONDS", "8"))
+POLL_BACKOFF = float(os.getenv("SARVAM_POLL_BACKOFF", "1.5"))
+
+# Per-job deadline from start to completion (seconds)
+JOB_TIMEOUT = float(os.getenv("SARVAM_JOB_TIMEOUT_SECONDS", "120"))
+
+# Completed jobs can briefly report no file results; retry this many times
+RESULTS_RETRIES = 3
+RESULTS_RETRY_SECONDS = 1.0
+
+
+class SarvamJobError(Exception):
+    """A Sarvam batch job failed, timed out or could not be submitted."""
+
+
+@dataclass
+class SarvamJob:
+    """One outstanding (or finished) Sarvam batch job."""
+
+    job_id: str
+    sdk_job: Any
+    future: asyncio.Future
+    deadline: float
+    started_at: float = field(default_factory=time.monotonic)
+    next_poll_at: float = 0.0
+    poll_interval: float = POLL_MIN_SECONDS
+    polls: int = 0
+    state: str = "running"
+    results: Optional[dict] = None
+    polling: bool = False
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+
+def _fail(future: asyncio.Future, error: BaseException):
+    """Fail a job future; marked retrieved, as its caller may have been cancelled."""
+    if not future.done():
+        future.set_exception(error)
+        future.exception()
+
+
+def _job_state(status: Any) -> str:
+    """Normalise an SDK job status (object with job_state, or string) to lower case."""
+    state = getattr(status, 'job_state', None)
+    return str(state if state is not None else status).lower()
+
+
+class SarvamJobManager:
+    """
+    Submits Sarvam batch jobs and polls all outstanding jobs from one task.
+
+    The SDK client, httpx client and scheduler task are created lazily so
+    the manager can be constructed at import time.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        poll_min: float = POLL_MIN_SECONDS,
+        poll_max: float = POLL_MAX_SECONDS,
+        backoff: float = POLL_BACKOFF,
+        job_timeout: float = JOB_TIMEOUT,
+        client: Any = None,
+    ):
+        """
+        Initialize the manager.
+
+        Args:
+            api_key: Sarvam API key. If None, reads SARVAM_API_KEY from env.
+            poll_min: First poll delay after a job starts (seconds).
+            poll_max: Maximum delay between polls of one job (seconds).
+            backoff: Multiplier applied to a job's poll delay after each poll.
+            job_timeout: Seconds from start after which a job is abandoned.
+            client: Optional SarvamAI client (used by tests).
+        """
+        self._api_key = api_key or os.getenv("SARVAM_API_KEY")
+        self.poll_min = poll_min
+        self.poll_max = poll_max
+        self.backoff = backoff
+        self.job_timeout = job_timeout
+        self._client = client
+        self._http: Optional[httpx.AsyncClient] = None
+        self._jobs: Dict[str, SarvamJob] = {}
+        self._scheduler: Optional[asyncio.Task] = None
+        self._poll_tasks: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+
+        # Statistics
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._polls = 0
+        self._total_latency = 0.0
+        self._peak_outstanding = 0
+
+    @property
+    def available(self) -> bool:
+        """Whether an API key is configured."""
+        return bool(self._api_key) or self._client is not None
+
+    @property
+    def client(self) -> Any:
+        """The SarvamAI SDK client (created on first access)."""
+        if self._client is None:
+            from sarvamai import SarvamAI
+            self._client = SarvamAI(api_subscription_key=self._api_key)
+        return self._client
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Shared keep-alive client for output file downloads."""
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=30.0)
+        return self._http
+
+    async def submit(
+        self,
+        audio: Union[str, bytes],
+        num_speakers: Optional[int] = 2,
+        model: str = DEFAULT_MODEL,
+        timeout: Optional[float] = None,
+        suffix: str = ".mp3",
+    ) -> SarvamJob:
+        """
+        Create a diarization job, upload the audio and start it (in worker threads).
+
+        Args:
+            audio: Path of the audio file, or the audio bytes. The SDK only uploads
+                from paths, so bytes are written to a temp file (with `suffix`)
+                that is removed as soon as the upload finishes.
+
+        Returns:
+            The SarvamJob; await job.future (or use run_job) for completion.
+
+        Raises:
+            SarvamJobError: If the upload fails.
+        """
+        def upload(sdk_job):
+            if isinstance(audio, str):
+                return sdk_job.upload_files([audio], timeout=60.0)
+            with tempfile.NamedTemporaryFile(suffix=suffix) as temp_file:
+                temp_file.write(audio)
+                temp_file.flush()
+                return sdk_job.upload_files([temp_file.name], timeout=60.0)
+
+        def create_and_start():
+            sdk_job = self.client.speech_to_text_translate_job.create_job(
+                model=model,
+                with_diarization=True,
+                num_speakers=num_speakers or 2
+            )
+            print(f"📋 Sarvam job created: {sdk_job.job_id}")
+            if not upload(sdk_job):
+                raise SarvamJobError("Failed to upload audio file to Sarvam")
+            sdk_job.start()
+            return sdk_job
+
+        sdk_job = await asyncio.to_thread(create_and_start)
+        now = time.monotonic()
+        job = SarvamJob(
+            job_id=sdk_job.job_id,
+            sdk_job=sdk_job,
+            future=asyncio.get_running_loop().create_future(),
+            deadline=now + (timeout if timeout is not None else self.job_timeout),
+            next_poll_at=now + self.poll_min,
+            poll_interval=self.poll_min,
+        )
+
+        self._jobs[job.job_id] = job
+        self._submitted += 1
+        self._peak_outstanding = max(self._peak_outstanding, len(self._jobs))
+        self._ensure_scheduler()
+        self._wakeup.set()
+        print(f"▶️  Sarvam job {job.job_id} started ({len(self._jobs)} outstanding)")
+        return job
+
+    async def run_job(self, audio: Union[str, bytes], num_speakers: Optional[int] = 2, **kwargs) -> SarvamJob:
+        """
+        Submit a job (see submit) and wait for it to complete.
+
+        Returns:
+            The completed SarvamJob with `results` set.
+
+        Raises:
+            SarvamJobError: If the job fails or times out.
+        """
+        job = await self.submit(audio, num_speakers, **kwargs)
+        await job.future
+        return job
+
+    async def download_output(self, job: SarvamJob, output_filename: str) -> dict:
+        """Download and parse a job output file (JSON)."""
+        links = await asyncio.to_thread(
+            self.client.speech_to_text_translate_job.get_download_links,
+            job_id=job.job_id,
+            files=[output_filename]
+        )
+        if output_filename not in links.download_urls:
+            raise SarvamJobError(f"No download link for {output_filename} in job {job.job_id}")
+
+        url = links.download_urls[output_filename].file_url
+        print(f"⬇️  Downloading Sarvam output from: {url[:50]}...")
+        response = await self.http.get(url)
+        response.raise_for_status()
+        return response.json()
+
+    def _ensure_scheduler(self):
+        if self._scheduler is None or self._scheduler.done():
+            self._scheduler = asyncio.create_task(self._run_scheduler())
+
+    async def _run_scheduler(self):
+        """Start a poll task for every due job, then sleep until the next one is due."""
+        while self._jobs:
+            now = time.monotonic()
+            for job in self._jobs.values():
+                if not job.polling and job.next_poll_at <= now:
+                    job.polling = True
+                    task = asyncio.create_task(self._poll(job))
+                    self._poll_tasks.add(task)
+                    task.add_done_callback(self._poll_tasks.discard)
+
+            # Polls in progress set _wakeup when they finish
+            self._wakeup.clear()
+            waiting = [job.next_poll_at for job in self._jobs.values() if not job.polling]
+            delay = max(min(waiting) - now, 0.0) if waiting else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, job: SarvamJob):
+        job.polls += 1
+        self._polls += 1
+        try:
+            status = await asyncio.to_thread(job.sdk_job.get_status)
+            job.state = _job_state(status)
+
+            if job.state == 'completed':
+                job.results = await self._fetch_results(job)
+                self._finish(job)
+                self._completed += 1
+                self._total_latency += job.elapsed
+                print(f"✅ Sarvam job {job.job_id} completed after {job.elapsed:.1f}s ({job.polls} polls)")
+                if not job.future.done():  # the caller may have been cancelled
+                    job.future.set_result(job.results)
+            elif job.state == 'failed':
+                error_message = getattr(status, 'error_message', 'No error message')
+                job_details = getattr(status, 'job_details', [])
+                raise SarvamJobError(
+                    f"Job did not complete successfully. "
+                    f"State: {job.state}, Error: {error_message}, Details: {job_details}"
+                )
+            elif time.monotonic() >= job.deadline:
+                self._timeouts += 1
+                raise SarvamJobError(f"Sarvam job {job.job_id} timed out after {job.elapsed:.0f}s (state: {job.state})")
+            else:
+                job.poll_interval = min(job.poll_interval * self.backoff, self.poll_max)
+                job.next_poll_at = time.monotonic() + min(job.poll_interval, max(job.deadline - time.monotonic(), 0.0))
+        except Exception as e:
+            self._finish(job)
+            self._failed += 1
+            _fail(job.future, e if isinstance(e, SarvamJobError) else SarvamJobError(str(e)))
+        finally:
+            job.polling = False
+            self._wakeup.set()
+
+    async def _fetch_results(self, job: SarvamJob) -> dict:
+        """get_file_results, retrying briefly while a just-completed job reports no files."""
+        results = None
+        for attempt in range(RESULTS_RETRIES):
+            results = await asyncio.to_thread(job.sdk_job.get_file_results)
+            if results and (results.get('successful') or results.get('failed')):
+                return results
+            await asyncio.sleep(RESULTS_RETRY_SECONDS)
+        return results or {}
+
+    def _finish(self, job: SarvamJob):
+        self._jobs.pop(job.job_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return job statistics for the metrics endpoint."""
+        return {
+            "outstanding": len(self._jobs),
+            "peak_outstanding": self._peak_outstanding,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "timeouts": self._timeouts,
+            "polls": self._polls,
+            "avg_job_seconds": round(self._total_latency / self._completed, 2) if self._completed else 0.0,
+            "poll_min_seconds": self.poll_min,
+            "poll_max_seconds": self.poll_max,
+        }
+
+    async def aclose(self):
+        """Fail outstanding jobs, stop the scheduler and close the download client."""
+        for job in list(self._jobs.values()):
+            _fail(job.future, SarvamJobError("Sarvam job manager shut down"))
+        self._jobs.clear()
+        for task in list(self._poll_tasks):
+            task.cancel()
+        await asyncio.gather(*self._poll_tasks, return_exceptions=True)
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            try:
+                await self._scheduler
+            except asyncio.CancelledError:
+                pass
+            self._scheduler = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+# Process-wide manager instance
+_manager: Optional[SarvamJobManager] = None
+
+
+def get_sarvam_job_manager() -> SarvamJobManager:
+    """Get the process-wide Sarvam job manager, creating it on first call."""
+    global _manager
+    if _manager is None:
+        _manager = SarvamJobManager()
+    return _manager
+
+
+def get_sarvam_job_stats() -> Optional[Dict[str, Any]]:
+    """Stats for the shared manager, or None if it has not been created yet."""
+    return _manager.get_stats() if _manager is not None else None
+
+
+async def close_sarvam_job_manager():
+    """Close the process-wide manager (called on API shutdown)."""
+    global _manager
+    if _manager is not None:
+        await _manager.aclose()
+        _manager = None
+
+
+__all__ = [
+    'SarvamJob', 'SarvamJobError', 'SarvamJobManager',
+    'get_sarvam_job_manager', 'get_sarvam_job_stats', 'close_sarvam_job_manager',
+]
@@ -0,0 +1,438 @@
+#!/usr/bin/env python
+"""
+Speaker role identification (Doctor / Patient / ...) with a per-recording memo.
+
+Role identification used to send every diarized segment of a consultation to
+Claude, and ran again for every caller: the chunk UI, the final transcript,
+/api/summarize and the transcription rerun. SpeakerRoleIdentifier instead:
+
+- sends a bounded, information-dense sample: the opening turns, a few turns
+  from every speaker, then question turns with their replies (doctors ask,
+  patients answer), each truncated, so prompt size stays flat as
+  consultations grow
+- memoises the mapping by recording / consultation ID, so later callers
+  reuse it instead of re-asking the LLM
+- only re-identifies when a speaker appears that the memo has not seen, or
+  when the transcript was labelled by another diarization pass (e.g. a
+  windowed rerun reusing "speaker_0" for someone else): the memo keeps a
+  fingerprint of who said the opening words, and a transcript whose labels
+  disagree with it is identified afresh
+- de-duplicates concurrent calls for the same recording
+
+Memos live in memory (LRU, expired after an idle TTL). A consultation ID can
+be aliased to the recording it came from so either key finds the mapping;
+aliases are dropped with their memo and are LRU-bounded like memos.
+
+Usage:
+    from servers.utils.speaker_roles import get_speaker_role_identifier
+
+    identifier = get_speaker_role_identifier()
+    result = await identifier.identify(segments, key=recording_id, language="en-IN")
+    result.roles   # {"speaker_0": "Doctor", "speaker_1": "Patient"}
+    result.cached  # True when served from the memo
+"""
+
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from servers.utils.keyed_locks import KeyedLocks
+from servers.utils.llm_gateway import get_llm_gateway
+
+
+MODEL = "claude-haiku-4-5-20251001"
+
+# Sample sent to the LLM: opening turns, then question/answer turns, up to a cap
+SAMPLE_FIRST_TURNS = int(os.getenv("SPEAKER_ROLE_SAMPLE_FIRST_TURNS", "12"))
+SAMPLE_MAX_TURNS = int(os.getenv("SPEAKER_ROLE_SAMPLE_MAX_TURNS", "30"))
+SAMPLE_TURNS_PER_SPEAKER = 3
+SAMPLE_TURN_CHARS = 300
+
+# Turns needed before roles are worth identifying during a recording
+MIN_TURNS = 4
+
+# Opening word trigrams fingerprinted per memo, and the share of shared
+# trigrams whose speaker label must agree for the memo to be reused
+FINGERPRINT_SHINGLES = 200
+FINGERPRINT_AGREEMENT = 0.8
+
+# Memo lifetime and size
+TTL_SECONDS = float(os.getenv("SPEAKER_ROLE_TTL_SECONDS", str(24 * 3600)))
+MAX_MEMOS = int(os.getenv("SPEAKER_ROLE_MAX_MEMOS", "1024"))
+
+_QUESTION_START = re.compile(
+    r"^\s*(what|when|where|why|how|which|who|whose|do|does|did|are|is|was|were|have|has|had|can|could|"
+    r"will|would|should|any|kya|kab|kaise|kitne|kitna|kahan|kyun|kaun)\b",
+    re.IGNORECASE
+)
+_SPEAKER_LABEL = re.compile(r"\b(speaker_\d+)(\s*:)")
+
+
+def _question_score(text: str) -> int:
+    """Rough count of questions in a turn."""
+    return text.count('?') + text.count('？') + (1 if _QUESTION_START.match(text) else 0)
+
+
+def select_role_sample(
+    segments: List[dict],
+    first_turns: int = SAMPLE_FIRST_TURNS,
+    max_turns: int = SAMPLE_MAX_TURNS,
+) -> List[dict]:
+    """
+    Pick the turns most informative for telling speakers' roles apart.
+
+    Keeps the first `first_turns` turns, the first few turns of every speaker
+    (so a late joiner is represented), then question turns and the reply that
+    follows each, until `max_turns` turns are selected. Turns keep their
+    original order.
+    """
+    turns = [seg for seg in segments if str(seg.get('text', '')).strip()]
+    if len(turns) <= max_turns:
+        return turns
+
+    chosen = set(range(min(first_turns, max_turns)))
+
+    per_speaker: Dict[str, int] = {}
+    for i in sorted(chosen):
+        per_speaker[turns[i]['speaker_id']] = per_speaker.get(turns[i]['speaker_id'], 0) + 1
+    for i, seg in enumerate(turns):
+        speaker_id = seg['speaker_id']
+        if len(chosen) >= max_turns:
+            break
+        if i not in chosen and per_speaker.get(speaker_id, 0) < SAMPLE_TURNS_PER_SPEAKER:
+            chosen.add(i)
+            per_speaker[speaker_id] = per_speaker.get(speaker_id, 0) + 1
+
+    questions = sorted(
+        (i for i in range(len(turns)) if i not in chosen and _question_score(turns[i]['text']) > 0),
+        key=lambda i: (-_question_score(turns[i]['text']), i)
+    )
+    for i in questions:
+        for j in (i, i + 1):
+            if len(chosen) < max_turns and j < len(turns):
+                chosen.add(j)
+        if len(chosen) >= max_turns:
+            break
+
+    return [turns[i] for i in sorted(chosen)]
+
+
+def parse_role_mapping(response_text: str) -> Dict[str, str]:
+    """
+    Parse the LLM's JSON role mapping.
+
+    Accepts {"speaker_0": "Doctor"} and {"speaker_0": {"role": "Doctor", ...}},
+    with or without a markdown code fence.
+
+    Raises:
+        json.JSONDecodeError: If the response is not a JSON object.
+    """
+    text = response_text.strip()
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0].strip()
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0].strip()
+
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise json.JSONDecodeError("Role mapping is not a JSON object", text, 0)
+    return {
+        speaker_id: value.get('role', 'Unknown') if isinstance(value, dict) else str(value)
+        for speaker_id, value in data.items()
+    }
+
+
+def apply_roles(segments: List[dict], roles: Dict[str, str]) -> List[dict]:
+    """Copy of segments with speaker_role set from a role mapping."""
+    return [{**seg, 'speaker_role': roles.get(seg.get('speaker_id'), seg.get('speaker_role', seg.get('speaker_id')))}
+            for seg in segments]
+
+
+def relabel_transcript(transcript: str, roles: Dict[str, str]) -> str:
+    """Replace "speaker_N:" labels in a formatted transcript with their roles."""
+    if not transcript or not roles:
+        return transcript
+    return _SPEAKER_LABEL.sub(lambda m: f"{roles.get(m.group(1), m.group(1))}{m.group(2)}", transcript)
+
+
+def label_fingerprint(segments: List[dict], limit: int = FINGERPRINT_SHINGLES) -> Dict[str, str]:
+    """Speaker label of each word trigram in the opening of a transcript (first occurrence wins)."""
+    shingles: Dict[str, str] = {}
+    for seg in segments:
+        words = re.findall(r"\w+", str(seg.get('text', '')).lower())
+        for i in range(len(words) - 2):
+            shingles.setdefault(' '.join(words[i:i + 3]), seg.get('speaker_id'))
+            if len(shingles) >= limit:
+                return shingles
+    return shingles
+
+
+def same_labelling(fingerprint: Dict[str, str], segments: List[dict]) -> bool:
+    """Whether segments label the fingerprinted words with the same speaker IDs."""
+    current = label_fingerprint(segments, len(fingerprint) * 2)
+    shared = [shingle for shingle in current if shingle in fingerprint]
+    if not shared:
+        return False  # Nothing to compare: don't trust labels we can't tie to the memo
+    agreeing = sum(fingerprint[shingle] == current[shingle] for shingle in shared)
+    return agreeing >= FINGERPRINT_AGREEMENT * len(shared)
+
+
+def _build_prompt(sample: List[dict], speakers: List[str], total_turns: int) -> str:
+    conversation_text = ""
+    for seg in sample:
+        text = ' '.join(str(seg['text']).split())
+        if len(text) > SAMPLE_TURN_CHARS:
+            text = text[:SAMPLE_TURN_CHARS] + "..."
+        conversation_text += f"{seg['speaker_id']}: {text}\n"
+
+    speaker_list = ', '.join(f'"{s}"' for s in speakers)
+    example = ', '.join(f'"{s}": "{role}"' for s, role in zip(speakers, ["Doctor", "Patient", "Family Member"]))
+    excerpt_note = (
+        f"\n(Excerpt: {len(sample)} of {total_turns} turns - the opening, each speaker's first turns, "
+        f"and question/answer exchanges.)\n" if len(sample) < total_turns else ""
+    )
+
+    return f"""You are analyzing a medical consultation conversation between a doctor and a patient.
+The conversation has been transcribed with speaker diarization, identifying speakers as {speaker_list}.
+
+Your task: Determine which speaker is the DOCTOR and which is the PATIENT. Any other speaker is
+another participant (e.g. "Family Member", "Nurse").
+
+Conversation transcript:{excerpt_note}
+{conversation_text}
+Analysis guidelines:
+- Doctors typically: ask diagnostic questions, use medical terminology, lead the consultation, give advice
+- Patients typically: describe symptoms, answer questions about their health, express concerns
+- Look at speech patterns, question types, and conversational dynamics
+
+Respond with ONLY a JSON object mapping every speaker to a role (no other text), e.g.:
+{{{example}}}
+
+Your response:"""
+
+
+@dataclass
+class RoleIdentification:
+    """Result of a role identification call."""
+
+    roles: Dict[str, str]
+    cached: bool
+    segments_analyzed: int
+    latency_seconds: float = 0.0
+    model: str = MODEL
+
+
+@dataclass
+class _RoleMemo:
+    roles: Dict[str, str]
+    speakers: List[str]
+    fingerprint: Optional[Dict[str, str]] = None  # None: not tied to a labelling (e.g. set by hand)
+    updated_at: float = field(default_factory=time.time)
+
+
+class SpeakerRoleIdentifier:
+    """
+    LLM speaker-role identification with a bounded sample and a memo per recording.
+
+    Calls without a key are never memoised.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = TTL_SECONDS,
+        max_memos: int = MAX_MEMOS,
+        first_turns: int = SAMPLE_FIRST_TURNS,
+        max_turns: int = SAMPLE_MAX_TURNS,
+    ):
+        """
+        Initialize the identifier.
+
+        Args:
+            ttl_seconds: Idle time after which a memo is dropped.
+            max_memos: Memos kept in memory (least recently used are evicted).
+            first_turns: Opening turns always included in the sample.
+            max_turns: Maximum turns sent to the LLM.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_memos = max_memos
+        self.first_turns = first_turns
+        self.max_turns = max_turns
+        self._memos: "OrderedDict[str, _RoleMemo]" = OrderedDict()
+        self._aliases: "OrderedDict[str, str]" = OrderedDict()
+        self._locks = KeyedLocks()
+
+        # Statistics
+        self._requests = 0
+        self._memo_hits = 0
+        self._llm_calls = 0
+        self._new_speaker_updates = 0
+        self._relabelled = 0
+        self._segments_received = 0
+        self._segments_sent = 0
+        self._total_latency = 0.0
+
+    def _resolve(self, key: str) -> str:
+        target = self._aliases.get(key)
+        if target is None:
+            return key
+        self._aliases.move_to_end(key)
+        return target
+
+    def _drop(self, key: str):
+        """Drop a memo and every alias pointing at it."""
+        self._memos.pop(key, None)
+        for alias in [alias for alias, target in self._aliases.items() if target == key]:
+            del self._aliases[alias]
+
+    def get(self, key: Optional[str], segments: Optional[List[dict]] = None) -> Optional[Dict[str, str]]:
+        """The memoised role mapping for a recording / consultation, if any (and if it labels `segments`)."""
+        if not key:
+            return None
+        key = self._resolve(key)
+        memo = self._memos.get(key)
+        if memo is None:
+            return None
+        if time.time() - memo.updated_at > self.ttl_seconds:
+            self.forget(key)
+            return None
+        if segments and memo.fingerprint and not same_labelling(memo.fingerprint, segments):
+            return None
+        self._memos.move_to_end(key)
+        return dict(memo.roles)
+
+    def resolve_key(self, *candidates: Optional[str]) -> Optional[str]:
+        """The first candidate key with a memo, else the first non-empty candidate."""
+        present = [c for c in candidates if c]
+        return next((c for c in present if self.get(c) is not None), present[0] if present else None)
+
+    def remember(self, key: str, roles: Dict[str, str], speakers: Optional[List[str]] = None,
+                 segments: Optional[List[dict]] = None):
+        """Store a mapping (e.g. one corrected by the doctor) for a recording, fingerprinting `segments`."""
+        key = self._resolve(key)
+        fingerprint = label_fingerprint(segments) if segments else None
+        self._memos[key] = _RoleMemo(dict(roles), list(speakers or roles), fingerprint)
+        self._memos.move_to_end(key)
+        while len(self._memos) > self.max_memos:
+            self._drop(next(iter(self._memos)))
+
+    def alias(self, alias: str, key: str):
+        """Make `alias` (e.g. a consultation ID) refer to the memo of `key` (its recording)."""
+        if alias and key and alias != key:
+            self._aliases[alias] = self._resolve(key)
+            self._aliases.move_to_end(alias)
+            while len(self._aliases) > self.max_memos:
+                self._aliases.popitem(last=False)
+
+    def forget(self, key: str):
+        self._drop(self._resolve(key))
+
+    async def identify(
+        self,
+        segments: List[dict],
+        key: Optional[str] = None,
+        language: Optional[str] = None,
+        refresh: bool = False,
+    ) -> RoleIdentification:
+        """
+        Identify speaker roles, reusing the memo for `key` when it covers every
+        speaker and the transcript is labelled like the one it was made from.
+
+        Args:
+            segments: Diarized segments ({speaker_id, text, ...}).
+            key: Recording or consultation ID to memoise under.
+            language: Conversation language (for logging).
+            refresh: Ignore the memo (e.g. after re-diarizing, when labels change).
+
+        Raises:
+            json.JSONDecodeError: If the LLM response cannot be parsed.
+        """
+        self._requests += 1
+        self._segments_received += len(segments)
+        speakers = list(dict.fromkeys(seg['speaker_id'] for seg in segments if seg.get('speaker_id')))
+
+        if not key:
+            return await self._ask_llm(segments, speakers, language)
+
+        key = self._resolve(key)
+        async with self._locks.get(key):
+            roles = None if refresh else self.get(key)
+            memo = self._memos.get(key)
+            if roles is not None and memo.fingerprint and not same_labelling(memo.fingerprint, segments):
+                self._relabelled += 1
+                print(f"🔁 Speaker labels in {key} come from another diarization pass - re-identifying roles")
+                roles = None
+
+            if roles is not None and all(s in roles for s in speakers):
+                self._memo_hits += 1
+                return RoleIdentification(roles=roles, cached=True, segments_analyzed=0)
+
+            if roles is not None:
+                self._new_speaker_updates += 1
+                print(f"🔁 New speaker in {key}: {[s for s in speakers if s not in roles]} - re-identifying roles")
+
+            result = await self._ask_llm(segments, speakers, language)
+            self.remember(key, result.roles, speakers, segments)
+            return result
+
+    async def _ask_llm(self, segments: List[dict], speakers: List[str], language: Optional[str]) -> RoleIdentification:
+        sample = select_role_sample(segments, self.first_turns, self.max_turns)
+        self._segments_sent += len(sample)
+        print(f"🔍 Identifying speaker roles from {len(sample)} of {len(segments)} segments "
+              f"({len(speakers)} speakers, {language or 'unknown language'})")
+
+        start_time = time.time()
+        response = await get_llm_gateway().create_message(
+            model=MODEL,
+            max_tokens=50 + 25 * max(len(speakers), 2),
+            temperature=0,
+            messages=[{
+                "role": "user",
+                "content": _build_prompt(sample, speakers, len(segments))
+            }],
+            timeout=30.0
+        )
+        latency = time.time() - start_time
+        self._llm_calls += 1
+        self._total_latency += latency
+
+        roles = parse_role_mapping(response.content[0].text)
+        return RoleIdentification(
+            roles=roles, cached=False, segments_analyzed=len(sample), latency_seconds=round(latency, 2)
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return identification statistics for the metrics endpoint."""
+        return {
+            'memos': len(self._memos),
+            'aliases': len(self._aliases),
+            'requests': self._requests,
+            'memo_hits': self._memo_hits,
+            'llm_calls': self._llm_calls,
+            'new_speaker_updates': self._new_speaker_updates,
+            'relabelled': self._relabelled,
+            'segments_received': self._segments_received,
+            'segments_sent': self._segments_sent,
+            'avg_llm_latency_ms': round(self._total_latency / self._llm_calls * 1000, 1) if self._llm_calls else 0.0,
+        }
+
+
+# Process-wide identifier instance
+_identifier: Optional[SpeakerRoleIdentifier] = None
+
+
+def get_speaker_role_identifier() -> SpeakerRoleIdentifier:
+    """Get or create the process-wide speaker role identifier."""
+    global _identifier
+    if _identifier is None:
+        _identifier = SpeakerRoleIdentifier()
+    return _identifier
+
+
+__all__ = [
+    'MIN_TURNS', 'RoleIdentification', 'SpeakerRoleIdentifier', 'apply_roles', 'get_speaker_role_identifier',
+    'label_fingerprint', 'parse_role_mapping', 'relabel_transcript', 'same_labelling', 'select_role_sample',
+]
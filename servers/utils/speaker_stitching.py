@@ -0,0 +1,427 @@
+#!/usr/bin/env python
+"""
+Server-side cross-chunk speaker stitching.
+
+During recording the frontend sends overlapping ~30 s chunks to
+/api/diarize-chunk (each chunk repeats the last 10 s of the previous one).
+Every chunk is diarized on its own, so its speaker labels are local: chunk 1's
+"speaker_0" may be chunk 0's "speaker_1". A RecordingStitcher keeps the
+per-recording state needed to fix that on the server:
+
+- a global speaker map - each chunk's local labels are matched to stable
+  global IDs by how much their speech co-occurs in the shared overlap audio,
+  falling back to activity rank (from calculate_overlap_stats) when the
+  overlap holds no usable speech
+- overlap de-duplication - the overlap is cut at its midpoint; the earlier
+  chunk keeps the words before the cut and the later chunk the words after
+- an incrementally merged transcript - everything before the latest cut is
+  final; only the newest chunk's tail can still change, so the complete
+  transcript is available as soon as the last chunk is stitched
+- speaker roles (Doctor/Patient) keyed by global ID, so every chunk
+  response can carry them once they are known
+
+Stitchers live in memory (LRU, expired after an idle TTL). Chunks that arrive
+out of order are buffered until the gap is filled.
+
+Usage:
+    from servers.utils.speaker_stitching import get_speaker_stitch_store
+
+    store = get_speaker_stitch_store()
+    async with store.lock(recording_id):
+        stitcher, result = store.add_chunk(recording_id, chunk_index, chunk_start, chunk_end, segments)
+    result["speaker_map"], result["stitched_segments"]
+
+    store.get(recording_id).merged_segments()
+"""
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from servers.utils.keyed_locks import KeyedLock, KeyedLocks
+
+
+# Seconds of audio shared by consecutive chunks
+OVERLAP_SECONDS = float(os.getenv("SPEAKER_STITCH_OVERLAP_SECONDS", "10"))
+
+# Recordings idle for longer than this are dropped
+TTL_SECONDS = float(os.getenv("SPEAKER_STITCH_TTL_SECONDS", str(4 * 3600)))
+
+# Maximum number of recordings kept in memory
+MAX_RECORDINGS = int(os.getenv("SPEAKER_STITCH_MAX_RECORDINGS", "256"))
+
+# Out-of-order chunks buffered before a missing chunk is given up on
+MAX_PENDING_CHUNKS = int(os.getenv("SPEAKER_STITCH_MAX_PENDING", "3"))
+
+# Same-speaker segments closer than this (seconds) are joined across a cut
+JOIN_GAP_SECONDS = 1.0
+
+
+def calculate_overlap_stats(segments: list, overlap_start: float, overlap_end: float) -> dict:
+    """Calculate speaker statistics in overlap region"""
+    # Filter segments in overlap region
+    overlap_segments = [
+        seg for seg in segments
+        if seg['start_time'] < overlap_end and seg['end_time'] > overlap_start
+    ]
+
+    speaker_stats = {}
+
+    for seg in overlap_segments:
+        speaker_id = seg['speaker_id']
+
+        if speaker_id not in speaker_stats:
+            speaker_stats[speaker_id] = {
+                'speaker_id': speaker_id,
+                'word_count': 0,
+                'duration': 0.0,
+                'segment_count': 0
+            }
+
+        stats = speaker_stats[speaker_id]
+
+        # Calculate actual overlap duration
+        seg_start = max(seg['start_time'], overlap_start)
+        seg_end = min(seg['end_time'], overlap_end)
+        duration = seg_end - seg_start
+
+        stats['word_count'] += len(seg['text'].split())
+        stats['duration'] += duration
+        stats['segment_count'] += 1
+
+    return speaker_stats
+
+
+def clip_segment(segment: dict, start: float, end: float) -> Optional[dict]:
+    """
+    Keep the part of a segment whose words fall in [start, end).
+
+    Segments only carry start/end times, so word times are interpolated
+    evenly across the segment. Returns None if no words remain.
+    """
+    seg_start, seg_end = segment['start_time'], segment['end_time']
+    if seg_start >= start and seg_end <= end:
+        return dict(segment)
+
+    words = segment['text'].split()
+    if not words or seg_end <= seg_start:
+        return dict(segment) if start <= seg_start < end and words else None
+
+    step = (seg_end - seg_start) / len(words)
+    kept = [i for i in range(len(words)) if start <= seg_start + (i + 0.5) * step < end]
+    if not kept:
+        return None
+
+    first, last = kept[0], kept[-1]
+    return {
+        **segment,
+        'text': ' '.join(words[first:last + 1]),
+        'start_time': round(seg_start + first * step, 3),
+        'end_time': round(seg_start + (last + 1) * step, 3),
+    }
+
+
+def _co_occurrence(previous: list, current: list, start: float, end: float) -> Dict[Tuple[str, str], float]:
+    """Seconds each (global speaker, local speaker) pair spoke over the same audio in [start, end)."""
+    totals: Dict[Tuple[str, str], float] = {}
+    for prev in previous:
+        for cur in current:
+            shared = min(prev['end_time'], cur['end_time'], end) - max(prev['start_time'], cur['start_time'], start)
+            if shared > 0:
+                key = (prev['speaker_id'], cur['speaker_id'])
+                totals[key] = totals.get(key, 0.0) + shared
+    return totals
+
+
+def _unstitched() -> dict:
+    """add_chunk result for a chunk that is buffered until an earlier chunk arrives."""
+    return {'stitched': False, 'speaker_map': {}, 'stitched_segments': [], 'replace_from': None}
+
+
+def _append_joined(transcript: List[dict], segments: List[dict]):
+    """Append segments, joining a speaker turn split by a chunk cut."""
+    for seg in segments:
+        last = transcript[-1] if transcript else None
+        if (last and last['speaker_id'] == seg['speaker_id']
+                and seg['start_time'] - last['end_time'] <= JOIN_GAP_SECONDS):
+            last['text'] = f"{last['text']} {seg['text']}".strip()
+            last['end_time'] = max(last['end_time'], seg['end_time'])
+        else:
+            transcript.append(dict(seg))
+
+
+@dataclass
+class _Chunk:
+    """A diarized chunk with segment times made absolute (recording time)."""
+
+    index: int
+    start: float
+    end: float
+    segments: List[dict]
+
+
+@dataclass
+class RecordingStitcher:
+    """Global speaker map and incrementally merged transcript for one recording."""
+
+    recording_id: str
+    speakers: List[str] = field(default_factory=list)          # global IDs in order of appearance
+    roles: Dict[str, str] = field(default_factory=dict)         # global ID -> "Doctor"/"Patient"
+    committed: List[dict] = field(default_factory=list)         # final segments (global IDs)
+    tail: List[dict] = field(default_factory=list)              # newest chunk's segments after its cut
+    speaker_maps: Dict[int, Dict[str, str]] = field(default_factory=dict)
+    next_index: int = 0
+    updated_at: float = field(default_factory=time.time)
+    _last: Optional[_Chunk] = None                              # last stitched chunk (global IDs)
+    _pending: Dict[int, _Chunk] = field(default_factory=dict)
+    _results: Dict[int, dict] = field(default_factory=dict)
+    _durations: Dict[str, float] = field(default_factory=dict)  # global ID -> total seconds spoken
+
+    def add_chunk(self, chunk_index: int, chunk_start: float, chunk_end: float, segments: list) -> dict:
+        """
+        Stitch a diarized chunk (segment times relative to chunk_start).
+
+        Returns a dict with "stitched" (False while an earlier chunk is
+        missing), the chunk's "speaker_map" (local -> global ID), its
+        de-duplicated "stitched_segments" in recording time with global IDs,
+        and "replace_from": the recording time from which these segments
+        replace the previously returned ones.
+        """
+        self.updated_at = time.time()
+
+        if chunk_index in self._results:  # retried chunk
+            return self._results[chunk_index]
+
+        chunk = _Chunk(chunk_index, chunk_start, chunk_end, [
+            {**seg, 'start_time': seg['start_time'] + chunk_start, 'end_time': seg['end_time'] + chunk_start}
+            for seg in sorted(segments, key=lambda s: s['start_time'])
+        ])
+
+        if chunk_index < self.next_index:  # arrived after it was given up on
+            return _unstitched()
+
+        self._pending[chunk_index] = chunk
+        if self.next_index not in self._pending and len(self._pending) > MAX_PENDING_CHUNKS:
+            # The missing chunk is not coming; stitch across the gap
+            self.next_index = min(self._pending)
+        self._drain_pending()
+        return self._results.get(chunk_index) or _unstitched()
+
+    def _drain_pending(self):
+        while self.next_index in self._pending:
+            self._stitch(self._pending.pop(self.next_index))
+
+    def flush(self):
+        """Stitch all buffered chunks, skipping any that never arrived."""
+        while self._pending:
+            self.next_index = min(self._pending)
+            self._drain_pending()
+
+    def _stitch(self, chunk: _Chunk) -> dict:
+        previous = self._last
+        overlap_end = previous.end if previous else chunk.start
+        overlapping = previous is not None and chunk.start < overlap_end
+
+        speaker_map = self._match_speakers(chunk, previous, overlapping)
+        labelled = [{**seg, 'speaker_id': speaker_map[seg['speaker_id']]} for seg in chunk.segments]
+        for seg in labelled:
+            self._durations[seg['speaker_id']] = (
+                self._durations.get(seg['speaker_id'], 0.0) + seg['end_time'] - seg['start_time']
+            )
+
+        # Cut the shared audio at its midpoint: earlier words come from the previous chunk
+        cut = (chunk.start + overlap_end) / 2 if overlapping else chunk.start
+        _append_joined(self.committed, [s for s in (clip_segment(seg, float('-inf'), cut) for seg in self.tail) if s])
+        self.tail = [s for s in (clip_segment(seg, cut, float('inf')) for seg in labelled) if s]
+
+        self._last = _Chunk(chunk.index, chunk.start, chunk.end, labelled)
+        self.speaker_maps[chunk.index] = speaker_map
+        self.next_index = chunk.index + 1
+
+        result = {
+            'stitched': True,
+            'speaker_map': speaker_map,
+            'stitched_segments': self._with_roles(self.tail),
+            'replace_from': round(cut, 3),
+        }
+        self._results[chunk.index] = result
+        return result
+
+    def _match_speakers(self, chunk: _Chunk, previous: Optional[_Chunk], overlapping: bool) -> Dict[str, str]:
+        """Map the chunk's local speaker labels to global IDs."""
+        local_speakers = list(dict.fromkeys(seg['speaker_id'] for seg in chunk.segments))
+        speaker_map: Dict[str, str] = {}
+
+        # 1. Whoever was speaking over the same audio in the previous chunk
+        if overlapping:
+            shared = _co_occurrence(previous.segments, chunk.segments, chunk.start, previous.end)
+            for (global_id, local_id), _ in sorted(shared.items(), key=lambda item: -item[1]):
+                if local_id not in speaker_map and global_id not in speaker_map.values():
+                    speaker_map[local_id] = global_id
+
+        # 2. Remaining speakers by activity rank: the most active unmatched
+        #    local speaker takes the most active unused global speaker
+        unmatched = [s for s in local_speakers if s not in speaker_map]
+        if unmatched:
+            local_stats = calculate_overlap_stats(chunk.segments, chunk.start, chunk.end)
+            unmatched.sort(key=lambda s: -local_stats.get(s, {}).get('duration', 0.0))
+            unused = sorted(
+                (g for g in self.speakers if g not in speaker_map.values()),
+                key=lambda g: -self._durations.get(g, 0.0)
+            )
+            for local_id, global_id in zip(unmatched, unused):
+                speaker_map[local_id] = global_id
+
+        # 3. Anyone left is a new speaker (numbered in order of appearance)
+        for local_id in local_speakers:
+            if local_id not in speaker_map:
+                speaker_map[local_id] = self._new_speaker()
+
+        return speaker_map
+
+    def _new_speaker(self) -> str:
+        global_id = f"speaker_{len(self.speakers)}"
+        self.speakers.append(global_id)
+        return global_id
+
+    def _with_roles(self, segments: List[dict]) -> List[dict]:
+        if not self.roles:
+            return [dict(seg) for seg in segments]
+        return [{**seg, 'speaker_role': self.roles.get(seg['speaker_id'], seg['speaker_id'])} for seg in segments]
+
+    def set_roles(self, roles: Dict[str, str]):
+        """Record speaker roles ({global ID: role}) for this recording."""
+        self.roles.update(roles)
+        self.updated_at = time.time()
+
+    def merged_segments(self) -> List[dict]:
+        """The full de-duplicated transcript so far (final part plus the newest chunk's tail)."""
+        merged = [dict(seg) for seg in self.committed]
+        _append_joined(merged, self.tail)
+        return self._with_roles(merged)
+
+    def formatted_transcript(self) -> str:
+        """Merged transcript as "Speaker: text" turns."""
+        return '\n\n'.join(
+            f"{seg.get('speaker_role') or seg['speaker_id']}: {seg['text']}" for seg in self.merged_segments()
+        )
+
+    @property
+    def chunks_stitched(self) -> int:
+        return len(self.speaker_maps)
+
+    @property
+    def pending_chunks(self) -> List[int]:
+        return sorted(self._pending)
+
+    def summary(self) -> Dict[str, Any]:
+        """Speaker and chunk state (without the transcript) for API responses."""
+        return {
+            'recording_id': self.recording_id,
+            'global_speakers': list(self.speakers),
+            'speaker_roles': dict(self.roles),
+            'chunks_stitched': self.chunks_stitched,
+            'pending_chunks': self.pending_chunks,
+        }
+
+
+class SpeakerStitchStore:
+    """
+    In-memory LRU of recording stitchers.
+
+    Recordings expire TTL seconds after their last chunk. Use lock() to
+    stitch one chunk of a recording at a time.
+    """
+
+    def __init__(self, ttl_seconds: float = TTL_SECONDS, max_recordings: int = MAX_RECORDINGS):
+        self.ttl_seconds = ttl_seconds
+        self.max_recordings = max_recordings
+        self._stitchers: "OrderedDict[str, RecordingStitcher]" = OrderedDict()
+        self._locks = KeyedLocks()
+
+        # Statistics
+        self._started = 0
+        self._chunks = 0
+        self._out_of_order = 0
+        self._expired = 0
+        self._evicted = 0
+
+    def get(self, recording_id: str) -> Optional[RecordingStitcher]:
+        """Return a live stitcher (None if missing or expired)."""
+        stitcher = self._stitchers.get(recording_id)
+        if stitcher is None:
+            return None
+        if time.time() - stitcher.updated_at > self.ttl_seconds:
+            self._expired += 1
+            self.delete(recording_id)
+            return None
+        self._stitchers.move_to_end(recording_id)
+        return stitcher
+
+    def start(self, recording_id: str) -> RecordingStitcher:
+        """Begin a new recording (replacing any previous state for the ID)."""
+        self._started += 1
+        stitcher = RecordingStitcher(recording_id)
+        self._stitchers[recording_id] = stitcher
+        self._stitchers.move_to_end(recording_id)
+        while len(self._stitchers) > self.max_recordings:
+            self._stitchers.popitem(last=False)
+            self._evicted += 1
+        return stitcher
+
+    def get_or_create(self, recording_id: str) -> RecordingStitcher:
+        return self.get(recording_id) or self.start(recording_id)
+
+    def add_chunk(self, recording_id: str, chunk_index: int, chunk_start: float, chunk_end: float,
+                  segments: list) -> Tuple[RecordingStitcher, dict]:
+        """
+        Stitch a chunk into its recording (started by whichever chunk arrives first).
+
+        A live recording is never restarted: a retried chunk 0 returns its
+        earlier result, and a late chunk 0 fills the gap before buffered chunks.
+        """
+        stitcher = self.get_or_create(recording_id)
+        result = stitcher.add_chunk(chunk_index, chunk_start, chunk_end, segments)
+        self._chunks += 1
+        if not result['stitched']:
+            self._out_of_order += 1
+        return stitcher, result
+
+    def delete(self, recording_id: str) -> bool:
+        return self._stitchers.pop(recording_id, None) is not None
+
+    def lock(self, recording_id: str) -> KeyedLock:
+        """Per-recording lock so concurrent chunk calls are stitched one at a time."""
+        return self._locks.get(recording_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return stitching statistics for the metrics endpoint."""
+        return {
+            'recordings': len(self._stitchers),
+            'started': self._started,
+            'chunks': self._chunks,
+            'out_of_order_chunks': self._out_of_order,
+            'expired': self._expired,
+            'evicted': self._evicted,
+            'ttl_seconds': self.ttl_seconds,
+        }
+
+
+# Process-wide store instance
+_store: Optional[SpeakerStitchStore] = None
+
+
+def get_speaker_stitch_store() -> SpeakerStitchStore:
+    """Get or create the process-wide speaker stitching store."""
+    global _store
+    if _store is None:
+        _store = SpeakerStitchStore()
+    return _store
+
+
+__all__ = [
+    'OVERLAP_SECONDS', 'RecordingStitcher', 'SpeakerStitchStore', 'calculate_overlap_stats', 'clip_segment',
+    'get_speaker_stitch_store',
+]
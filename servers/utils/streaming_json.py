@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+Incremental JSON member parser for streamed LLM output.
+
+Claude streams JSON like:
+
+    ```json
+    {
+      "field_updates": {
+        "weight": {"value": 61, "confidence": 0.95},
+        "bp": {"value": "120/80", "confidence": 0.9},
+        ...
+
+StreamingObjectParser is fed the text deltas as they arrive and returns
+each member of the watched object ("field_updates") as soon as that member
+is complete, so callers can act on a field without waiting for the rest of
+the response. Text outside the top-level object (markdown fences, prose)
+is ignored.
+
+Usage:
+    from servers.utils.streaming_json import StreamingObjectParser
+
+    parser = StreamingObjectParser("field_updates")
+    async for text in llm.stream_text(...):
+        for key, value in parser.feed(text):
+            ...
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+
+class StreamingObjectParser:
+    """
+    Yield (key, value) members of a top-level object property from partial JSON.
+
+    Only the object under `property_name` at depth 1 of the first top-level
+    object is watched. Members that fail to parse are skipped and counted in
+    `errors`.
+    """
+
+    def __init__(self, property_name: str):
+        self.property_name = property_name
+        self.errors = 0
+        self._pos = 0                 # scan position in self._text
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start: Optional[int] = None
+        self._last_key: Optional[str] = None   # last string seen at depth 1
+        self._member_start: Optional[int] = None
+        self._done = False
+        self._text = ""
+
+    @property
+    def done(self) -> bool:
+        """Whether the watched object has been closed."""
+        return self._done
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add streamed text and return the members completed by it.
+
+        Returns:
+            List of (key, value) pairs in stream order (empty if none completed).
+        """
+        if self._done:
+            return []
+
+        self._text += chunk
+        completed = []
+        text = self._text
+
+        while self._pos < len(text):
+            char = text[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        try:
+                            self._last_key = json.loads(text[self._string_start:self._pos + 1])
+                        except json.JSONDecodeError:
+                            self._last_key = None
+            elif self._depth == 0:
+                # Outside the top-level object: only its opening brace matters
+                if char == '{':
+                    self._depth = 1
+            elif char == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif char in '{[':
+                self._depth += 1
+                if self._depth == 2 and char == '{' and self._last_key == self.property_name:
+                    self._member_start = self._pos + 1
+            elif char in '}]':
+                if self._depth == 2 and self._member_start is not None:
+                    self._emit(text[self._member_start:self._pos], completed)
+                    self._member_start = None
+                    self._done = True
+                    self._pos += 1
+                    break
+                self._depth -= 1
+            elif char == ',' and self._depth == 2 and self._member_start is not None:
+                self._emit(text[self._member_start:self._pos], completed)
+                self._member_start = self._pos + 1
+
+            self._pos += 1
+
+        # Drop consumed text that no pending member or key string still needs
+        keep_from = min(
+            (i for i in (self._member_start, self._string_start if self._in_string else None) if i is not None),
+            default=self._pos
+        )
+        if keep_from > 0:
+            self._text = text[keep_from:]
+            self._pos -= keep_from
+            if self._member_start is not None:
+                self._member_start -= keep_from
+            if self._string_start is not None:
+                self._string_start -= keep_from
+
+        return completed
+
+    def _emit(self, member: str, completed: List[Tuple[str, Any]]):
+        if not member.strip():
+            return
+        try:
+            parsed = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            self.errors += 1
+            return
+        completed.extend(parsed.items())
+
+
+__all__ = ['StreamingObjectParser']
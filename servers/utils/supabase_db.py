@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""
+Async Supabase Data-Access Layer
+
+Process-wide PostgREST and Storage clients for all Supabase access.
+
+Every endpoint and helper that reads or writes Supabase goes through one
+shared AsyncPostgrestClient (and AsyncStorageClient) backed by a single
+pooled HTTP/2 httpx client so that:
+- TLS is negotiated once and connections are reused across requests
+- Queries never block the uvicorn event loop
+- Query latency and connection reuse are visible at /api/metrics
+
+The query builder API is the same as supabase-py, only `execute()` (and
+storage calls) are awaited:
+
+Usage:
+    from servers.utils.supabase_db import get_db
+
+    db = get_db()
+    result = await db.table('consultations')\\
+        .select('*')\\
+        .eq('id', consultation_id)\\
+        .execute()
+"""
+
+import os
+from typing import Optional, Any, Dict
+
+import httpx
+from postgrest import AsyncPostgrestClient, DEFAULT_POSTGREST_CLIENT_HEADERS
+from storage3 import AsyncStorageClient
+
+from servers.utils.http_stats import HttpClientStats
+
+
+# Default per-request timeout (seconds)
+DEFAULT_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "30"))
+
+# Connection pool sizing for the shared client
+MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "50"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SUPABASE_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY_SECONDS", "60"))
+
+
+class SupabaseDB:
+    """
+    Shared async PostgREST/Storage client with a pooled HTTP/2 connection.
+
+    The httpx client is created lazily on first query so the instance can be
+    constructed at import time, before the event loop is running.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_connections: int = MAX_CONNECTIONS,
+        max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Initialize the data-access layer.
+
+        Args:
+            url: Supabase project URL.
+            key: Supabase service key.
+            timeout: Per-request timeout in seconds.
+            max_connections: Maximum concurrent HTTP connections to PostgREST.
+            max_keepalive_connections: Idle connections kept open for reuse.
+            transport: Optional httpx transport (used by tests).
+        """
+        self.rest_url = f"{url.rstrip('/')}/rest/v1"
+        self.storage_url = f"{url.rstrip('/')}/storage/v1"
+        self._key = key
+        self._timeout = timeout
+        self._max_connections = max_connections
+        self._max_keepalive_connections = max_keepalive_connections
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+        self._postgrest: Optional[AsyncPostgrestClient] = None
+        self._storage: Optional[AsyncStorageClient] = None
+
+        # Request and connection statistics
+        self._stats = HttpClientStats()
+
+    @property
+    def auth_headers(self) -> Dict[str, str]:
+        """Service-key headers sent with every request."""
+        return {"apikey": self._key, "Authorization": f"Bearer {self._key}"}
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """The pooled HTTP/2 client shared by PostgREST and Storage."""
+        if self._http is None:
+            transport = self._transport or httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=self._max_connections,
+                    max_keepalive_connections=self._max_keepalive_connections,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+            )
+            self._http = httpx.AsyncClient(
+                headers=self.auth_headers,
+                timeout=self._timeout,
+                follow_redirects=True,
+                transport=self._stats.wrap(transport),
+            )
+        return self._http
+
+    @property
+    def postgrest(self) -> AsyncPostgrestClient:
+        """The shared AsyncPostgrestClient (created on first access)."""
+        if self._postgrest is None:
+            self._postgrest = AsyncPostgrestClient(
+                self.rest_url,
+                headers={**DEFAULT_POSTGREST_CLIENT_HEADERS, **self.auth_headers},
+                http_client=self.http,
+            )
+        return self._postgrest
+
+    @property
+    def storage(self) -> AsyncStorageClient:
+        """The shared AsyncStorageClient (created on first access)."""
+        if self._storage is None:
+            self._storage = AsyncStorageClient(
+                self.storage_url,
+                headers=self.auth_headers,
+                http_client=self.http,
+            )
+        return self._storage
+
+    def table(self, table_name: str):
+        """Start a query on a table (same builder API as supabase-py)."""
+        return self.postgrest.from_(table_name)
+
+    def from_(self, table_name: str):
+        """Alias for table()."""
+        return self.table(table_name)
+
+    def rpc(self, func: str, params: Optional[Dict[str, Any]] = None, **kwargs):
+        """Call a Postgres function."""
+        return self.postgrest.rpc(func, params or {}, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return request and connection statistics for the metrics endpoint."""
+        return {
+            **self._stats.get_stats(),
+            "max_connections": self._max_connections,
+            "max_keepalive_connections": self._max_keepalive_connections,
+        }
+
+    async def aclose(self):
+        """Close the shared client and its connection pool."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._postgrest = None
+            self._storage = None
+
+
+# Process-wide data-access instance
+_db: Optional[SupabaseDB] = None
+
+
+def get_db(url: Optional[str] = None, key: Optional[str] = None) -> SupabaseDB:
+    """
+    Get the process-wide Supabase data-access layer, creating it on first call.
+
+    Args:
+        url: Supabase URL. If None, reads SUPABASE_URL from env.
+        key: Supabase service key. If None, reads SUPABASE_SERVICE_KEY
+             (falling back to SUPABASE_SERVICE_ROLE_KEY) from env.
+
+    Returns:
+        The shared SupabaseDB instance.
+
+    Raises:
+        ValueError: If Supabase is not configured.
+    """
+    global _db
+    if _db is None:
+        url = url or os.getenv("SUPABASE_URL")
+        key = key or os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        if not url or not key:
+            raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_KEY must be set")
+        _db = SupabaseDB(url, key)
+    return _db
+
+
+def get_db_stats() -> Optional[Dict[str, Any]]:
+    """Stats for the shared instance, or None if it has not been created yet."""
+    return _db.get_stats() if _db is not None else None
+
+
+async def close_db():
+    """Close the process-wide data-access layer (called on API shutdown)."""
+    global _db
+    if _db is not None:
+        await _db.aclose()
+        _db = None
+
+
+__all__ = ['SupabaseDB', 'get_db', 'get_db_stats', 'close_db']
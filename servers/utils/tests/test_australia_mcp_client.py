@@ -66,7 +66,7 @@ class TestAustraliaMCPClientConnection:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -85,7 +85,7 @@ class TestAustraliaMCPClientConnection:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -225,7 +225,7 @@ class TestAustraliaMCPClientErrorHandling:
         """Test handling of NHMRC server connection failure."""
         client = AustraliaMCPClient(verbose=False)
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             mock_stdio.side_effect = Exception("NHMRC server unavailable")
 
             with pytest.raises(Exception):
@@ -363,7 +363,7 @@ class TestAustraliaMCPClientContextManager:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -382,7 +382,7 @@ class TestAustraliaMCPClientContextManager:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
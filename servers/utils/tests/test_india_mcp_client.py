@@ -69,7 +69,7 @@ class TestIndiaMCPClientConnection:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -94,7 +94,7 @@ class TestIndiaMCPClientConnection:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -512,7 +512,7 @@ class TestIndiaMCPClientErrorHandling:
                 raise Exception("ICMR server unavailable")
             return mock_stdio_transport
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.side_effect = mock_stdio_with_one_failure
 
@@ -577,7 +577,7 @@ class TestIndiaMCPClientIntegration:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -76,7 +76,7 @@ class TestInternationalMCPClientConnection:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -95,7 +95,7 @@ class TestInternationalMCPClientConnection:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -254,7 +254,7 @@ class TestInternationalMCPClientErrorHandling:
         """Test handling of PubMed server connection failure."""
         client = InternationalMCPClient(verbose=False)
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             mock_stdio.side_effect = Exception("PubMed server unavailable")
 
             with pytest.raises(Exception):
@@ -468,7 +468,7 @@ class TestInternationalMCPClientContextManager:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
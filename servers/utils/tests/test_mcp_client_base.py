@@ -66,7 +66,7 @@ class TestMCPClientConnection:
 
         client = MCPClient(servers=servers, verbose=False)
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_client_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -88,7 +88,7 @@ class TestMCPClientConnection:
 
         client = MCPClient(servers=servers, verbose=False)
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             mock_stdio.side_effect = Exception("Connection failed")
 
             with pytest.raises(Exception, match="Connection failed"):
@@ -105,7 +105,7 @@ class TestMCPClientConnection:
 
         client = MCPClient(servers=servers, verbose=False)
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_client_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -122,7 +122,7 @@ class TestMCPClientConnection:
         servers = {"test": {"command": "python", "args": ["test.py"]}}
         client = MCPClient(servers=servers, verbose=True)
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_client_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -382,7 +382,7 @@ class TestMCPClientCleanup:
         """Test using client as async context manager."""
         servers = {"test": {"command": "python", "args": ["test.py"]}}
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_client_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -512,7 +512,7 @@ class TestMCPClientErrorHandling:
         servers = {"slow_server": {"command": "python", "args": ["slow.py"]}}
         client = MCPClient(servers=servers, verbose=False)
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             mock_stdio.side_effect = asyncio.TimeoutError("Connection timeout")
 
             with pytest.raises(asyncio.TimeoutError):
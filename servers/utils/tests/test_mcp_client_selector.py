@@ -78,7 +78,7 @@ class TestGetMCPClientForCountry:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -96,7 +96,7 @@ class TestGetMCPClientForCountry:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -114,7 +114,7 @@ class TestGetMCPClientForCountry:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -132,7 +132,7 @@ class TestGetMCPClientForCountry:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -167,7 +167,7 @@ class TestFallbackToInternational:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -185,7 +185,7 @@ class TestFallbackToInternational:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -223,7 +223,7 @@ class TestCaseInsensitiveMatching:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -252,7 +252,7 @@ class TestWhitespaceHandling:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -274,7 +274,7 @@ class TestVerboseMode:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -296,7 +296,7 @@ class TestVerboseMode:
             types.Tool(name="test_tool", description="Test", inputSchema={})
         ]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -316,7 +316,7 @@ class TestConnectionFailure:
     @pytest.mark.asyncio
     async def test_connection_failure_cleans_up_client(self):
         """Test that client is cleaned up on connection failure."""
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             mock_stdio.side_effect = Exception("Connection failed")
 
             with pytest.raises(Exception, match="Connection failed"):
@@ -325,7 +325,7 @@ class TestConnectionFailure:
     @pytest.mark.asyncio
     async def test_connection_failure_verbose_output(self, capsys):
         """Test that verbose mode shows connection failure."""
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             mock_stdio.side_effect = Exception("Connection failed")
 
             with pytest.raises(Exception):
@@ -421,7 +421,7 @@ class TestGetClientConvenience:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -443,7 +443,7 @@ class TestClientReadiness:
         tool = types.Tool(name="test_tool", description="Test", inputSchema={})
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[tool]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -478,7 +478,7 @@ class TestClientReadiness:
 
         mock_session.list_tools = AsyncMock(side_effect=mock_list_tools)
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -501,7 +501,7 @@ class TestMultipleClientCreation:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -525,7 +525,7 @@ class TestMultipleClientCreation:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -549,7 +549,7 @@ class TestErrorMessages:
     @pytest.mark.asyncio
     async def test_connection_error_includes_country_code(self):
         """Test that connection errors include the country code for context."""
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             mock_stdio.side_effect = Exception("Connection failed")
 
             try:
@@ -75,7 +75,7 @@ class TestUKMCPClientConnection:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -95,7 +95,7 @@ class TestUKMCPClientConnection:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
@@ -330,7 +330,7 @@ class TestUKMCPClientErrorHandling:
         """Test handling of NICE server connection failure."""
         client = UKMCPClient(verbose=False)
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             mock_stdio.side_effect = Exception("NICE server unavailable")
 
             with pytest.raises(Exception):
@@ -449,7 +449,7 @@ class TestUKMCPClientContextManager:
         mock_session.initialize = AsyncMock()
         mock_session.list_tools = AsyncMock(return_value=types.ListToolsResult(tools=[]))
 
-        with patch('mcp_client_base.stdio_client', new_callable=AsyncMock) as mock_stdio:
+        with patch('mcp_client_base.connect_mcp_server', new_callable=AsyncMock) as mock_stdio:
             with patch('mcp_client_base.ClientSession', return_value=mock_session):
                 mock_stdio.return_value.__aenter__.return_value = mock_stdio_transport
 
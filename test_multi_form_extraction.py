@@ -6,6 +6,7 @@ to test the form filling logic without needing to click re-summarise.
 """
 
 import json
+import asyncio
 from mcp_servers.field_validator import validate_multiple_fields, filter_by_confidence
 
 # Exact LLM extraction output
@@ -104,10 +105,10 @@ for field, value in field_updates.items():
 
 # Validate fields
 print(f"\n🔍 Validating fields against {consultation_type} schema...")
-valid_updates, validation_errors = validate_multiple_fields(
+valid_updates, validation_errors = asyncio.run(validate_multiple_fields(
     consultation_type,
     field_updates
-)
+))
 
 if validation_errors:
     print(f"\n⚠️  Validation errors:")
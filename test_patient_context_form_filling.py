@@ -6,6 +6,7 @@ This test verifies that patient details (demographics, medications, conditions,
 are correctly fetched from Supabase and included in the LLM prompt during form filling.
 """
 
+import asyncio
 import os
 import sys
 from pathlib import Path
@@ -29,8 +30,13 @@ def test_fetch_patient_context():
     # Get a sample patient ID from the database
     supabase = get_supabase_client()
 
-    # Fetch a patient with data
-    patients_result = supabase.table('patients').select('id, name').limit(5).execute()
+    # Fetch a patient with data, then their context (one event loop: the client is async and pooled)
+    async def fetch():
+        patients = await supabase.table('patients').select('id, name').limit(5).execute()
+        context = await fetch_patient_context(patients.data[0]['id']) if patients.data else None
+        return patients, context
+
+    patients_result, context = asyncio.run(fetch())
 
     if not patients_result.data:
         print("❌ No patients found in database")
@@ -44,9 +50,7 @@ def test_fetch_patient_context():
 
     print(f"\n🔍 Testing with patient: {patient_name} (ID: {patient_id})")
 
-    # Fetch comprehensive patient context
-    context = fetch_patient_context(patient_id)
-
+    # Comprehensive patient context (fetched above)
     print("\n📊 Patient Context Retrieved:")
     print(f"   Demographics: {context.get('demographics', {})}")
     print(f"   Medications: {len(context.get('medications', []))} active")
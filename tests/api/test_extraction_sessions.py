@@ -0,0 +1,63 @@
+"""
+Tests for /api/extraction-sessions ownership checks.
+
+Firebase token verification is patched to map "Bearer <uid>" to <uid>.
+"""
+
+import pytest
+from unittest.mock import patch
+
+from servers.utils.extraction_sessions import ExtractionSession, get_extraction_session_store
+
+
+def bearer(user_id: str) -> dict:
+    return {"Authorization": f"Bearer {user_id}"}
+
+
+@pytest.fixture
+def owned_session(test_client):
+    store = get_extraction_session_store()
+    store.create(ExtractionSession(
+        appointment_id="appt-owned",
+        form_type="antenatal",
+        user_id="doctor-1",
+        patient_context={"demographics": {"name": "Test Patient"}},
+        form_state={"vital_signs": {"systolic_bp": 120}},
+    ))
+    with patch("api.verify_firebase_token_and_get_user_id", side_effect=lambda auth: auth.removeprefix("Bearer ")):
+        yield store
+    store.delete("appt-owned")
+
+
+class TestExtractionSessionOwnership:
+    """Only the user who opened a session can read, extend or close it."""
+
+    def test_owner_can_read(self, test_client, owned_session):
+        response = test_client.get("/api/extraction-sessions/appt-owned", headers=bearer("doctor-1"))
+        assert response.status_code == 200
+        assert response.json()["form_state"] == {"vital_signs": {"systolic_bp": 120}}
+
+    def test_other_user_cannot_read_or_extend(self, test_client, owned_session):
+        response = test_client.get("/api/extraction-sessions/appt-owned", headers=bearer("doctor-2"))
+        assert response.status_code == 403
+        assert "systolic_bp" not in response.text
+
+        response = test_client.post("/api/extraction-sessions/appt-owned/chunks", headers=bearer("doctor-2"),
+                                    json={"diarized_segments": [], "chunk_index": 0})
+        assert response.status_code == 403
+
+    def test_other_user_cannot_close(self, test_client, owned_session):
+        response = test_client.delete("/api/extraction-sessions/appt-owned", headers=bearer("doctor-2"))
+        assert response.status_code == 403
+        assert owned_session.get("appt-owned") is not None
+
+    def test_other_user_cannot_replace(self, test_client, owned_session):
+        response = test_client.post("/api/extraction-sessions", headers=bearer("doctor-2"), json={
+            "appointment_id": "appt-owned", "form_type": "obgyn", "patient_context": {},
+        })
+        assert response.status_code == 403
+        assert owned_session.get("appt-owned").form_type == "antenatal"
+
+    def test_token_required(self, test_client, owned_session):
+        response = test_client.get("/api/extraction-sessions/appt-owned")
+        assert response.status_code == 422
@@ -18,7 +18,7 @@ import pytest
 import asyncio
 from pathlib import Path
 from typing import Dict, Any, List, Optional
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, PropertyMock, patch
 
 import httpx
 
@@ -46,6 +46,15 @@ def pytest_configure(config):
         from dotenv import load_dotenv
         load_dotenv(env_file)
 
+    # Keep the local BNF monograph cache out of tests (no sqlite file, no cached lookups)
+    os.environ.setdefault("BNF_CACHE_ENABLED", "false")
+
+    # Keep extraction sessions in memory only (no sqlite file under data/)
+    os.environ.setdefault("EXTRACTION_SESSION_PERSIST", "false")
+
+    # Keep background jobs in an in-memory queue database
+    os.environ.setdefault("JOB_QUEUE_DB_PATH", ":memory:")
+
 
 @pytest.fixture(scope="session")
 def event_loop_policy():
@@ -188,6 +197,26 @@ def async_test_client():
 # EXTERNAL SERVICE MOCKS
 # ============================================================================
 
+def _patch_llm_gateway_client(response_text: str):
+    """
+    Patch the shared LLM gateway's AsyncAnthropic client.
+
+    All Claude calls go through servers.utils.llm_gateway, so patching the
+    gateway's client property covers every module at once.
+    """
+    mock_client = MagicMock()
+
+    mock_response = MagicMock()
+    mock_response.content = [MagicMock(text=response_text)]
+    mock_client.messages.create = AsyncMock(return_value=mock_response)
+
+    return mock_client, patch(
+        'servers.utils.llm_gateway.LLMGateway.client',
+        new_callable=PropertyMock,
+        return_value=mock_client
+    )
+
+
 @pytest.fixture
 def mock_anthropic():
     """
@@ -195,49 +224,31 @@ def mock_anthropic():
 
     Provides pre-configured responses for common LLM operations.
     """
-    with patch('anthropic.Anthropic') as mock_cls:
-        mock_client = MagicMock()
-        mock_cls.return_value = mock_client
-
-        mock_response = MagicMock()
-        mock_response.content = [MagicMock(text='{"success": true}')]
-        mock_client.messages.create.return_value = mock_response
-
+    mock_client, gateway_patch = _patch_llm_gateway_client('{"success": true}')
+    with gateway_patch:
         yield mock_client
 
 
 @pytest.fixture
 def mock_anthropic_speaker_roles():
     """Mock for speaker role identification endpoint."""
-    with patch('anthropic.Anthropic') as mock_cls:
-        mock_client = MagicMock()
-        mock_cls.return_value = mock_client
-
-        mock_response = MagicMock()
-        mock_response.content = [MagicMock(text=json.dumps({
-            "speaker_0": {"role": "Doctor", "confidence": 0.95, "reasoning": "Asks diagnostic questions"},
-            "speaker_1": {"role": "Patient", "confidence": 0.92, "reasoning": "Describes symptoms"}
-        }))]
-        mock_client.messages.create.return_value = mock_response
-
+    mock_client, gateway_patch = _patch_llm_gateway_client(json.dumps({
+        "speaker_0": {"role": "Doctor", "confidence": 0.95, "reasoning": "Asks diagnostic questions"},
+        "speaker_1": {"role": "Patient", "confidence": 0.92, "reasoning": "Describes symptoms"}
+    }))
+    with gateway_patch:
         yield mock_client
 
 
 @pytest.fixture
 def mock_anthropic_consultation_type():
     """Mock for consultation type determination endpoint."""
-    with patch('anthropic.Anthropic') as mock_cls:
-        mock_client = MagicMock()
-        mock_cls.return_value = mock_client
-
-        mock_response = MagicMock()
-        mock_response.content = [MagicMock(text=json.dumps({
-            "consultation_type": "antenatal",
-            "confidence": 0.9,
-            "reasoning": "Patient mentions being 6 weeks pregnant"
-        }))]
-        mock_client.messages.create.return_value = mock_response
-
+    mock_client, gateway_patch = _patch_llm_gateway_client(json.dumps({
+        "consultation_type": "antenatal",
+        "confidence": 0.9,
+        "reasoning": "Patient mentions being 6 weeks pregnant"
+    }))
+    with gateway_patch:
         yield mock_client
 
 
@@ -326,10 +337,10 @@ def mock_supabase():
         mock_result = MagicMock()
         mock_result.data = [{"id": "test-id", "status": "completed"}]
 
-        # Support both .from_() and .table() patterns
-        mock_client.from_.return_value.select.return_value.execute.return_value = mock_result
-        mock_client.from_.return_value.insert.return_value.execute.return_value = mock_result
-        mock_client.from_.return_value.update.return_value.execute.return_value = mock_result
+        # Support both .from_() and .table() patterns (execute() is awaited)
+        mock_client.from_.return_value.select.return_value.execute = AsyncMock(return_value=mock_result)
+        mock_client.from_.return_value.insert.return_value.execute = AsyncMock(return_value=mock_result)
+        mock_client.from_.return_value.update.return_value.execute = AsyncMock(return_value=mock_result)
 
         # Support chained .eq() calls for table queries
         mock_table = MagicMock()
@@ -337,7 +348,7 @@ def mock_supabase():
         mock_eq = MagicMock()
 
         mock_eq.eq.return_value = mock_eq
-        mock_eq.execute.return_value = mock_result
+        mock_eq.execute = AsyncMock(return_value=mock_result)
 
         mock_select.eq.return_value = mock_eq
         mock_table.select.return_value = mock_select
@@ -365,7 +376,7 @@ def mock_supabase_with_forms():
         # Support chained .eq() calls
         mock_eq = MagicMock()
         mock_eq.eq.return_value = mock_eq
-        mock_eq.execute.return_value = forms_result
+        mock_eq.execute = AsyncMock(return_value=forms_result)
 
         mock_select = MagicMock()
         mock_select.eq.return_value = mock_eq
@@ -0,0 +1,208 @@
+"""
+Tests for the async ffmpeg transcoding pool.
+
+Most tests replace ffmpeg with a small shell script that echoes stdin, so the
+pipe/process handling runs for real without needing ffmpeg installed.
+"""
+
+import asyncio
+import shutil
+import stat
+import subprocess
+import time
+import pytest
+
+from servers.utils.audio_transcoder import (
+    AudioTranscoder, TranscodeError, MP3_16K_MONO, WAV_16K_MONO, PCM_16K_MONO, ffmpeg_args,
+    mime_type_for, pcm_duration, pcm_slice, window_ranges,
+)
+
+
+def fake_ffmpeg(tmp_path, body: str = "cat") -> str:
+    """Write an executable standing in for ffmpeg (ignores its arguments)."""
+    path = tmp_path / "ffmpeg"
+    path.write_text(f"#!/bin/sh\n{body}\n")
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+class TestAudioTranscoder:
+    """Test AudioTranscoder."""
+
+    def test_ffmpeg_args_pipe_16k_mono(self):
+        args = ffmpeg_args(MP3_16K_MONO, "ffmpeg")
+
+        assert args[args.index("-i") + 1] == "pipe:0"
+        assert args[-1] == "pipe:1"
+        assert args[args.index("-ar") + 1] == "16000"
+        assert args[args.index("-ac") + 1] == "1"
+        assert args[args.index("-f") + 1] == "mp3"
+
+    def test_ffmpeg_args_raw_pcm_input(self):
+        args = ffmpeg_args(MP3_16K_MONO, "ffmpeg", input_format=PCM_16K_MONO)
+
+        assert args[args.index("-f") + 1] == "s16le"
+        assert args.index("-f") < args.index("-i")
+
+    def test_window_ranges_overlap_and_fold_short_tail(self):
+        assert window_ranges(90.0, 120.0, 10.0) == [(0.0, 90.0)]
+        assert window_ranges(340.0, 120.0, 10.0) == [(0.0, 120.0), (110.0, 230.0), (220.0, 340.0)]
+        # A 15 s tail is folded into the previous window
+        assert window_ranges(235.0, 120.0, 10.0) == [(0.0, 120.0), (110.0, 235.0)]
+        with pytest.raises(ValueError):
+            window_ranges(300.0, 10.0, 10.0)
+
+    def test_pcm_slice_on_sample_boundaries(self):
+        pcm = bytes(range(256)) * 250  # 2 s of 16 kHz 16-bit mono
+        assert pcm_duration(pcm) == 2.0
+        piece = pcm_slice(pcm, 0.5, 1.25)
+        assert len(piece) == 24000 and piece == pcm[16000:40000]
+        assert pcm_slice(pcm, 1.5, 9.0) == pcm[48000:]
+
+    async def test_transcode_pipes_bytes(self, tmp_path):
+        transcoder = AudioTranscoder(ffmpeg_bin=fake_ffmpeg(tmp_path))
+
+        result = await transcoder.transcode(b"webm-bytes")
+
+        assert result == b"webm-bytes"
+        stats = transcoder.get_stats()
+        assert (stats["transcodes"], stats["bytes_in"], stats["bytes_out"]) == (1, 10, 10)
+
+    async def test_mp4_input_read_from_temp_file(self, tmp_path):
+        # Echo the -i argument: the path must be a real file holding the bytes
+        script = 'while [ "$1" != "-i" ]; do shift; done; [ "$2" != pipe:0 ] && cat "$2"'
+        transcoder = AudioTranscoder(ffmpeg_bin=fake_ffmpeg(tmp_path, script))
+
+        result = await transcoder.transcode(b"m4a-bytes", input_suffix=".M4A")
+
+        assert result == b"m4a-bytes"
+        assert transcoder.get_stats()["file_inputs"] == 1
+
+    async def test_unreadable_pipe_retried_from_temp_file(self, tmp_path):
+        # Fails on stdin (like MP4 with a trailing moov atom), succeeds from a file
+        script = 'while [ "$1" != "-i" ]; do shift; done; [ "$2" = pipe:0 ] && exit 1; cat "$2"'
+        transcoder = AudioTranscoder(ffmpeg_bin=fake_ffmpeg(tmp_path, script))
+
+        audio = await transcoder.transcode_for_provider(b"mp4-bytes", "sarvam", ".bin")
+
+        assert (audio.data, audio.transcoded) == (b"mp4-bytes", True)
+        stats = transcoder.get_stats()
+        assert (stats["file_inputs"], stats["failures"]) == (1, 0)
+
+    async def test_provider_without_format_passes_through(self, tmp_path):
+        transcoder = AudioTranscoder(ffmpeg_bin=fake_ffmpeg(tmp_path, "exit 1"))
+
+        audio = await transcoder.transcode_for_provider(b"webm-bytes", "elevenlabs")
+
+        assert (audio.data, audio.suffix, audio.transcoded) == (b"webm-bytes", ".webm", False)
+        assert transcoder.get_stats()["transcodes"] == 0
+
+    async def test_provider_format(self, tmp_path):
+        transcoder = AudioTranscoder(ffmpeg_bin=fake_ffmpeg(tmp_path))
+
+        audio = await transcoder.transcode_for_provider(b"webm-bytes", "sarvam")
+
+        assert (audio.suffix, audio.mime_type, audio.filename) == (".mp3", "audio/mpeg", "audio.mp3")
+        assert audio.transcoded
+
+    async def test_failure_raises_with_stderr(self, tmp_path):
+        transcoder = AudioTranscoder(ffmpeg_bin=fake_ffmpeg(tmp_path, "echo 'Invalid data' >&2; exit 1"))
+
+        with pytest.raises(TranscodeError, match="Invalid data"):
+            await transcoder.transcode(b"garbage")
+        assert transcoder.get_stats()["failures"] == 1
+
+    async def test_missing_ffmpeg_raises(self, tmp_path):
+        transcoder = AudioTranscoder(ffmpeg_bin=str(tmp_path / "no-such-ffmpeg"))
+
+        with pytest.raises(TranscodeError, match="not found"):
+            await transcoder.transcode(b"webm-bytes")
+
+    async def test_timeout_kills_process(self, tmp_path):
+        transcoder = AudioTranscoder(ffmpeg_bin=fake_ffmpeg(tmp_path, "exec sleep 10"), timeout=0.2)
+
+        start = time.perf_counter()
+        with pytest.raises(TranscodeError, match="timed out"):
+            await transcoder.transcode(b"webm-bytes")
+
+        assert time.perf_counter() - start < 2
+        assert transcoder.get_stats()["timeouts"] == 1
+
+    async def test_cancellation_kills_process(self, tmp_path):
+        marker = tmp_path / "finished"
+        transcoder = AudioTranscoder(ffmpeg_bin=fake_ffmpeg(tmp_path, f"sleep 0.3; touch {marker}"))
+
+        task = asyncio.create_task(transcoder.transcode(b"webm-bytes"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        await asyncio.sleep(0.5)
+        assert not marker.exists()
+        assert transcoder.get_stats()["active"] == 0
+
+    def test_upload_mime_type_from_suffix(self):
+        assert mime_type_for(".webm") == "audio/webm"
+        assert mime_type_for(".MP3") == "audio/mpeg"
+        assert mime_type_for(".wav") == "audio/wav"
+        assert mime_type_for(".m4a") == "audio/mp4"
+        assert mime_type_for(".ogg") == "audio/ogg"
+
+    async def test_concurrency_bounded_by_workers(self, tmp_path):
+        transcoder = AudioTranscoder(max_workers=2, ffmpeg_bin=fake_ffmpeg(tmp_path, "sleep 0.1; cat"))
+
+        results = await asyncio.gather(*[transcoder.transcode(f"chunk-{i}".encode()) for i in range(6)])
+
+        assert results == [f"chunk-{i}".encode() for i in range(6)]
+        stats = transcoder.get_stats()
+        assert stats["peak_active"] == 2
+        assert stats["active"] == 0 and stats["waiting"] == 0
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+class TestRealFFmpeg:
+    """End-to-end transcodes with the real ffmpeg binary."""
+
+    @pytest.fixture
+    def webm_bytes(self, tmp_path) -> bytes:
+        path = tmp_path / "tone.webm"
+        subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=2:sample_rate=48000",
+             "-ac", "2", "-c:a", "libopus", str(path)],
+            check=True
+        )
+        return path.read_bytes()
+
+    async def test_webm_to_mp3(self, webm_bytes):
+        mp3 = await AudioTranscoder().transcode(webm_bytes, MP3_16K_MONO)
+
+        assert mp3[:3] == b"ID3" or mp3[0] == 0xFF
+
+    async def test_webm_to_wav_is_16k_mono(self, webm_bytes):
+        wav = await AudioTranscoder().transcode(webm_bytes, WAV_16K_MONO)
+
+        assert wav[:4] == b"RIFF"
+        channels = int.from_bytes(wav[22:24], "little")
+        sample_rate = int.from_bytes(wav[24:28], "little")
+        assert (channels, sample_rate) == (1, 16000)
+
+    async def test_pcm_windows_round_trip(self, webm_bytes):
+        transcoder = AudioTranscoder()
+        pcm = await transcoder.transcode(webm_bytes, PCM_16K_MONO)
+        assert abs(pcm_duration(pcm) - 2.0) < 0.1
+
+        mp3 = await transcoder.transcode(pcm_slice(pcm, 0.5, 1.5), MP3_16K_MONO, input_format=PCM_16K_MONO)
+        assert mp3[:3] == b"ID3" or mp3[0] == 0xFF
+
+    async def test_m4a_with_trailing_index(self, tmp_path):
+        path = tmp_path / "tone.m4a"
+        subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=2",
+             "-c:a", "aac", str(path)],  # No +faststart: the moov atom follows the audio
+            check=True
+        )
+
+        audio = await AudioTranscoder().transcode_for_provider(path.read_bytes(), "sarvam", ".m4a", "audio/mp4")
+
+        assert audio.transcoded and audio.suffix == ".mp3"
@@ -0,0 +1,58 @@
+"""
+Tests for BNFIndex search on the shipped BNF drug index.
+"""
+
+import pytest
+
+from servers.drug_lookup.bnf_index_utils import BNFIndex, normalize_name, trigrams
+
+
+@pytest.fixture(scope="module")
+def index():
+    return BNFIndex()
+
+
+class TestBNFIndexSearch:
+    """Test the trigram-backed BNFIndex.search."""
+
+    def test_exact_and_case_insensitive(self, index):
+        assert index.search("Amoxicillin")[0]['slug'] == "amoxicillin"
+        assert index.search("  PARACETAMOL ")[0]['slug'] == "paracetamol"
+
+    def test_synonyms(self, index):
+        """Brand names and aliases map to the BNF canonical drug."""
+        assert index.search("Augmentin") == [index.name_map["co-amoxiclav"]]
+        assert index.search("tylenol")[0]['slug'] == "paracetamol"
+        # Misspelt synonyms are found through the alias trigrams
+        assert index.search("augmentn")[0]['slug'] == "co-amoxiclav"
+
+    def test_typos(self, index):
+        assert index.search("ibuprufen")[0]['slug'] == "ibuprofen"
+        assert index.search("paracetmol")[0]['slug'] == "paracetamol"
+
+    def test_contains_matches_starting_with_query_first(self, index):
+        names = [d['name'] for d in index.search("amox")]
+        assert names[0] == "Amoxicillin"
+        assert "Co-amoxiclav" in names
+
+    def test_limit_and_no_match(self, index):
+        assert len(index.search("ol", limit=3)) == 3
+        assert index.search("ol", limit=0) == []
+        assert len(index.search("ol", limit=None)) > 3
+        assert index.search("zzzzqqqq") == []
+        assert index.search("") == []
+
+    def test_results_are_cached_but_not_shared(self, index):
+        """Repeated queries hit the LRU; callers get their own list."""
+        index.clear_search_cache()
+        first = index.search("metformin")
+        first.append({"slug": "mutated"})
+        second = index.search("metformin")
+
+        assert second[-1]['slug'] != "mutated"
+        assert index._search_cached.cache_info().hits >= 1
+
+    def test_normalize_and_trigrams(self):
+        assert normalize_name("  Co-Amoxiclav   500 ") == "co-amoxiclav 500"
+        assert "amo" in trigrams("amox")
+        assert "  a" in trigrams("a")
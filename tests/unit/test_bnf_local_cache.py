@@ -0,0 +1,118 @@
+"""
+Tests for the local SQLite BNF monograph cache.
+"""
+
+import time
+import pytest
+
+from servers.drug_lookup.bnf_local_cache import BNFLocalCache, slug_from_url
+
+
+def drug(name: str, success: bool = True) -> dict:
+    return {"drug_name": name, "url": f"https://bnf.nice.org.uk/drugs/{name.lower()}/",
+            "dosage": "500 mg three times a day", "success": success, "error": None}
+
+
+class CountingFetch:
+    """Fetch function that records how often it was called."""
+
+    def __init__(self, result: dict):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = BNFLocalCache(path=str(tmp_path / "bnf_cache.sqlite3"), ttl_days=30, stale_days=60, enabled=True)
+    yield c
+    c.close()
+
+
+class TestBNFLocalCache:
+    """Test BNFLocalCache."""
+
+    def test_slug_from_url(self):
+        assert slug_from_url("https://bnf.nice.org.uk/drugs/amoxicillin/") == "amoxicillin"
+        assert slug_from_url("https://bnf.nice.org.uk/drugs/co-amoxiclav") == "co-amoxiclav"
+        assert slug_from_url("https://bnf.nice.org.uk/treatment-summaries/asthma/") is None
+
+    def test_miss_then_hit(self, cache):
+        """First lookup fetches, second is served from the cache."""
+        fetch = CountingFetch(drug("Amoxicillin"))
+
+        first = cache.get_or_fetch("amoxicillin", fetch)
+        second = cache.get_or_fetch("amoxicillin", fetch)
+
+        assert first == second == drug("Amoxicillin")
+        assert fetch.calls == 1
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+    def test_failures_are_not_cached(self, cache):
+        """Failed fetches are returned but not stored."""
+        fetch = CountingFetch(drug("Unknown", success=False))
+
+        cache.get_or_fetch("unknown", fetch)
+        cache.get_or_fetch("unknown", fetch)
+
+        assert fetch.calls == 2
+        assert cache.get_stats()["entries"] == 0
+
+    def test_stale_entry_served_and_refreshed_in_background(self, cache):
+        """Past the TTL the old entry is returned immediately and refreshed."""
+        cache.set("paracetamol", drug("Paracetamol"))
+        cache.ttl_seconds = 0
+        time.sleep(0.01)
+
+        updated = dict(drug("Paracetamol"), dosage="1 g every 4-6 hours")
+        fetch = CountingFetch(updated)
+
+        result = cache.get_or_fetch("paracetamol", fetch)
+        assert result["dosage"] == "500 mg three times a day"
+
+        cache._executor.shutdown(wait=True)
+        assert fetch.calls == 1
+        cache.ttl_seconds = 3600
+        assert cache.get("paracetamol") == (updated, False)
+        assert cache.get_stats()["stale_hits"] == 1
+        assert cache.get_stats()["background_refreshes"] == 1
+
+    def test_entries_past_stale_window_are_misses(self, cache):
+        """Entries older than TTL + stale window are refetched synchronously."""
+        cache.set("ibuprofen", drug("Ibuprofen"))
+        cache.ttl_seconds = 0
+        cache.stale_seconds = 0
+        time.sleep(0.01)
+        fetch = CountingFetch(drug("Ibuprofen"))
+
+        cache.get_or_fetch("ibuprofen", fetch)
+
+        assert fetch.calls == 1
+        assert cache.get_stats()["misses"] == 1
+
+    def test_persists_across_instances(self, tmp_path):
+        """Entries survive a restart (new instance on the same file)."""
+        path = str(tmp_path / "bnf_cache.sqlite3")
+        first = BNFLocalCache(path=path, enabled=True)
+        first.set("amoxicillin", drug("Amoxicillin"))
+        first.close()
+
+        second = BNFLocalCache(path=path, enabled=True)
+        assert second.get("amoxicillin") == (drug("Amoxicillin"), False)
+        assert second.popular_slugs(5) == ["amoxicillin"]
+        second.close()
+
+    def test_disabled_cache_always_fetches(self):
+        """A disabled cache passes every call through."""
+        cache = BNFLocalCache(path=":memory:", enabled=False)
+        fetch = CountingFetch(drug("Amoxicillin"))
+
+        cache.get_or_fetch("amoxicillin", fetch)
+        cache.get_or_fetch("amoxicillin", fetch)
+
+        assert fetch.calls == 2
+        assert cache.get_stats() == {"enabled": False}
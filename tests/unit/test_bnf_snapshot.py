@@ -0,0 +1,91 @@
+"""
+Tests for the offline BNF snapshot store and builder.
+"""
+
+import pytest
+
+from servers.drug_lookup.bnf_snapshot import BNFSnapshot, build_snapshot, plan_build
+
+
+SLUGS = ["amoxicillin", "paracetamol", "ibuprofen", "warfarin"]
+
+
+def fake_fetch(fail: set = frozenset(), calls: list = None):
+    """Live-scrape stand-in returning the fields _get_bnf_drug_info_impl produces."""
+    def fetch(slug):
+        if calls is not None:
+            calls.append(slug)
+        if slug in fail:
+            return {'drug_name': 'Unknown', 'success': False, 'error': 'Failed to connect to BNF website'}
+        return {
+            'drug_name': slug.title(),
+            'url': f"https://bnf.nice.org.uk/drugs/{slug}/",
+            'indications': 'Infections',
+            'dosage': '500 mg three times a day',
+            'renal_impairment': 'Reduce dose',
+            'hepatic_impairment': 'Not specified',
+            'success': True,
+            'error': None,
+        }
+    return fetch
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    s = BNFSnapshot(str(tmp_path / "bnf_snapshot.sqlite3"))
+    yield s
+    s.close()
+
+
+class TestBNFSnapshot:
+    """Test the snapshot builder and store."""
+
+    def test_build_stores_structured_monographs(self, snapshot):
+        """Every index slug is scraped once and stored with its parsed fields."""
+        counts = build_snapshot(snapshot, SLUGS, fake_fetch(), delay=0)
+
+        assert counts == {'fetched': 4, 'failed': 0, 'remaining': 0}
+        drug = snapshot.get("amoxicillin")
+        assert drug['dosage'] == '500 mg three times a day'
+        assert drug['renal_impairment'] == 'Reduce dose'
+        assert snapshot.get("not-a-drug") is None
+        assert snapshot.get_meta('completed_at') is not None
+
+    def test_build_is_resumable(self, snapshot):
+        """A second run only fetches what the first run didn't finish."""
+        build_snapshot(snapshot, SLUGS, fake_fetch(), delay=0, limit=2)
+
+        calls = []
+        counts = build_snapshot(snapshot, SLUGS, fake_fetch(calls=calls), delay=0)
+
+        assert calls == ["ibuprofen", "warfarin"]
+        assert counts['remaining'] == 0
+
+    def test_failures_are_retried_up_to_max_attempts(self, snapshot):
+        """Failed drugs are recorded and retried until max_attempts."""
+        for _ in range(2):
+            counts = build_snapshot(snapshot, SLUGS, fake_fetch(fail={"warfarin"}), delay=0, max_attempts=2)
+        assert counts['failed'] == 1
+        assert snapshot.failure_attempts() == {"warfarin": 2}
+        assert plan_build(snapshot, SLUGS, max_attempts=2) == []
+
+        # A later success clears the failure
+        build_snapshot(snapshot, SLUGS, fake_fetch(), delay=0, max_attempts=3)
+        assert snapshot.get("warfarin") is not None
+        assert snapshot.failure_attempts() == {}
+
+    def test_refresh_older_than(self, snapshot):
+        """Stored drugs older than the refresh age are scraped again."""
+        build_snapshot(snapshot, SLUGS, fake_fetch(), delay=0)
+
+        assert plan_build(snapshot, SLUGS, refresh_older_than_days=1) == []
+        assert plan_build(snapshot, SLUGS, refresh_older_than_days=-1) == SLUGS
+
+    def test_stats(self, snapshot):
+        build_snapshot(snapshot, SLUGS, fake_fetch(fail={"warfarin"}), delay=0)
+        snapshot.get("amoxicillin")
+        snapshot.get("warfarin")
+
+        stats = snapshot.get_stats()
+        assert (stats['drugs'], stats['failed_drugs'], stats['index_count']) == (3, 1, 4)
+        assert (stats['hits'], stats['misses']) == (1, 1)
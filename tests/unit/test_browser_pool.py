@@ -0,0 +1,164 @@
+"""
+Tests for the headless Chromium pool.
+
+A fake browser stands in for Playwright, so Chromium does not need to be installed.
+"""
+
+import asyncio
+import pytest
+
+from servers.utils.browser_pool import BrowserPool, BrowserPoolBusy
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def new_page(self):
+        return object()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, number):
+        self.number = number
+        self.connected = True
+        self.contexts = []
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, viewport=None):
+        if not self.connected:
+            raise RuntimeError("Target closed")
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.connected = False
+
+
+def make_pool(**kwargs):
+    launched = []
+
+    async def launch():
+        await asyncio.sleep(0)
+        launched.append(FakeBrowser(len(launched)))
+        return launched[-1]
+
+    pool = BrowserPool(launch=launch, **kwargs)
+    return pool, launched
+
+
+async def render(pool, seconds=0.0):
+    async with pool.page() as page:
+        await asyncio.sleep(seconds)
+        return page
+
+
+class TestBrowserPool:
+    """Test BrowserPool."""
+
+    async def test_browsers_launched_once_and_reused(self):
+        pool, launched = make_pool(size=2)
+        await pool.start()
+        for _ in range(10):
+            await render(pool)
+
+        assert len(launched) == 2
+        assert all(ctx.closed for browser in launched for ctx in browser.contexts)
+        assert pool.get_stats()["renders"] == 10
+
+    async def test_concurrency_capped_at_capacity(self):
+        pool, launched = make_pool(size=1, pages_per_browser=2)
+        peak = 0
+
+        async def tracked():
+            nonlocal peak
+            async with pool.page():
+                peak = max(peak, pool.get_stats()["active"])
+                await asyncio.sleep(0.02)
+
+        await asyncio.gather(*[tracked() for _ in range(6)])
+        assert peak == 2
+        assert pool.get_stats()["peak_waiting"] >= 4
+
+    async def test_full_queue_rejects(self):
+        pool, _ = make_pool(size=1, pages_per_browser=1, queue_size=1)
+        await pool.start()
+        blocker = asyncio.create_task(render(pool, 0.1))
+        queued = asyncio.create_task(render(pool))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(BrowserPoolBusy):
+            await render(pool)
+        await asyncio.gather(blocker, queued)
+        assert pool.get_stats()["rejected"] == 1
+
+    async def test_queue_timeout_rejects(self):
+        pool, _ = make_pool(size=1, pages_per_browser=1, queue_timeout=0.02)
+        blocker = asyncio.create_task(render(pool, 0.1))
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(BrowserPoolBusy):
+            await render(pool)
+        await blocker
+
+    async def test_browser_recycled_after_max_renders(self):
+        pool, launched = make_pool(size=1, max_renders=3)
+        for _ in range(7):
+            await render(pool)
+        await asyncio.sleep(0)
+
+        assert len(launched) == 3
+        assert [b.connected for b in launched] == [False, False, True]
+        assert pool.get_stats()["recycled"] == 2
+
+    async def test_recycled_browser_closes_after_in_flight_render(self):
+        pool, launched = make_pool(size=1, pages_per_browser=2, max_renders=1)
+        slow = asyncio.create_task(render(pool, 0.05))
+        await asyncio.sleep(0.01)
+        await render(pool)  # hits max_renders while `slow` still uses the browser
+
+        assert launched[0].connected
+        await slow
+        await asyncio.sleep(0)
+        assert not launched[0].connected
+
+    async def test_crashed_browser_relaunched(self):
+        pool, launched = make_pool(size=1)
+        await render(pool)
+        launched[0].connected = False  # Chromium died
+
+        await render(pool)
+        assert len(launched) == 2
+        assert pool.get_stats()["crashes"] == 1
+
+    async def test_failed_render_releases_page(self):
+        pool, _ = make_pool(size=1, pages_per_browser=1)
+        with pytest.raises(ValueError):
+            async with pool.page():
+                raise ValueError("page.pdf failed")
+
+        await render(pool)
+        stats = pool.get_stats()
+        assert (stats["failures"], stats["renders"], stats["active"]) == (1, 1, 0)
+
+    async def test_close_closes_browsers(self):
+        pool, launched = make_pool(size=2)
+        await pool.start()
+        await pool.close()
+        assert not any(b.connected for b in launched)
+
+    async def test_close_during_render_past_max_renders(self):
+        pool, launched = make_pool(size=1, max_renders=1)
+        in_flight = asyncio.create_task(render(pool, 0.05))
+        await asyncio.sleep(0.01)
+
+        await pool.close()
+        await in_flight  # must not raise from _release
+        assert not launched[0].connected
@@ -0,0 +1,124 @@
+"""
+Tests for concurrent, completion-ordered drug lookups.
+
+The BNF index, BNF fetch and Claude personalization are replaced with fakes
+so no network is needed.
+"""
+
+import asyncio
+import time
+import threading
+import pytest
+from unittest.mock import patch
+
+from servers.clinical_decision_support import drug_info_retriever
+from servers.clinical_decision_support.client import ClinicalDecisionSupportClient
+
+
+# Simulated BNF fetch latency per drug (seconds)
+FETCH_DELAYS = {"amoxicillin": 0.3, "paracetamol": 0.05, "ibuprofen": 0.15}
+
+
+class FakeIndex:
+    def search(self, name, limit=1):
+        if name == "unknownium":
+            return []
+        return [{"slug": name, "name": name.title()}]
+
+
+def fake_fetch(drug_url):
+    """Blocking fetch like _get_bnf_drug_info_impl."""
+    slug = drug_url.rstrip('/').rsplit('/', 1)[-1]
+    time.sleep(FETCH_DELAYS.get(slug, 0.01))
+    return {"success": True, "url": drug_url, "drug_name": slug.title(), "thread": threading.current_thread().name}
+
+
+async def fake_personalize(self, bnf_data, patient_context, verbose=True):
+    return {"drug_name": bnf_data["drug_name"], "thread": bnf_data["thread"]}
+
+
+@pytest.fixture
+def client():
+    with patch.object(drug_info_retriever, 'get_bnf_index', return_value=FakeIndex()), \
+         patch.object(drug_info_retriever, 'fetch_bnf_drug_info', side_effect=fake_fetch), \
+         patch.object(drug_info_retriever.DrugInfoRetriever, '_personalize_drug_for_patient', fake_personalize):
+        yield ClinicalDecisionSupportClient(anthropic_api_key="test-key")
+
+
+def drugs(*names):
+    return [{"drug_name": name} for name in names]
+
+
+class TestStreamDrugLookups:
+    """Test ClinicalDecisionSupportClient.stream_drug_lookups."""
+
+    async def test_yields_in_completion_order_concurrently(self, client):
+        """Fast drugs are streamed first, total time is the slowest drug."""
+        start = time.perf_counter()
+        events = [e async for e in client.stream_drug_lookups(
+            drugs("amoxicillin", "paracetamol", "ibuprofen"), {}, verbose=False
+        )]
+        elapsed = time.perf_counter() - start
+
+        assert [e['drug_name'] for e in events] == ["paracetamol", "ibuprofen", "amoxicillin"]
+        assert all(e['status'] == 'complete' for e in events)
+        assert elapsed < 0.45
+
+    async def test_blocking_fetch_runs_off_the_event_loop(self, client):
+        """The blocking BNF fetch runs in a worker thread."""
+        events = [e async for e in client.stream_drug_lookups(drugs("paracetamol"), {}, verbose=False)]
+
+        assert events[0]['details']['bnf_data']['thread'] != threading.current_thread().name
+
+    async def test_not_found_is_failed_event(self, client):
+        """Drugs missing from the index produce a failed drug_update."""
+        events = [e async for e in client.stream_drug_lookups(drugs("unknownium"), {}, verbose=False)]
+
+        assert events == [{
+            'drug_name': 'unknownium',
+            'status': 'failed',
+            'error': 'Drug "unknownium" not found in BNF index'
+        }]
+
+    async def test_closing_stream_cancels_pending_lookups(self, client):
+        """Stopping iteration (client disconnect) cancels lookups still running."""
+        personalized = []
+
+        async def slow_personalize(self, bnf_data, patient_context, verbose=True):
+            await asyncio.sleep(0.5 if bnf_data["drug_name"] != "Paracetamol" else 0)
+            personalized.append(bnf_data["drug_name"])
+            return {"drug_name": bnf_data["drug_name"]}
+
+        with patch.object(drug_info_retriever.DrugInfoRetriever, '_personalize_drug_for_patient', slow_personalize):
+            stream = client.stream_drug_lookups(drugs("amoxicillin", "paracetamol"), {}, verbose=False)
+            first = await stream.__anext__()
+            await stream.aclose()
+            await asyncio.sleep(0.6)
+
+        assert first['drug_name'] == "paracetamol"
+        assert personalized == ["Paracetamol"]
+
+
+class TestLookupDrugsBatchWithContext:
+    """Test DrugInfoRetriever.lookup_drugs_batch_with_context."""
+
+    async def test_concurrency_limit_and_input_order(self, client):
+        """Results keep input order; at most max_concurrency lookups overlap."""
+        retriever = client.drug_retriever
+
+        start = time.perf_counter()
+        results = await retriever.lookup_drugs_batch_with_context(
+            drugs("amoxicillin", "paracetamol", "ibuprofen"), {}, verbose=False
+        )
+        elapsed = time.perf_counter() - start
+
+        assert [r['drug_name'] for r in results] == ["amoxicillin", "paracetamol", "ibuprofen"]
+        assert all(r['status'] == 'success' for r in results)
+        assert elapsed < 0.45
+
+        start = time.perf_counter()
+        sequential = [r async for r in retriever.stream_drugs_with_context(
+            drugs("amoxicillin", "paracetamol", "ibuprofen"), {}, max_concurrency=1, verbose=False
+        )]
+        assert time.perf_counter() - start >= 0.5
+        assert [r['drug_name'] for r in sequential] == ["amoxicillin", "paracetamol", "ibuprofen"]
@@ -0,0 +1,147 @@
+"""
+Tests for the shared ElevenLabs speech-to-text client.
+
+Uses an httpx MockTransport in place of ElevenLabs so no network is needed.
+"""
+
+import httpx
+import pytest
+
+from servers.utils.elevenlabs_stt import ElevenLabsSTT
+
+
+WORDS_RESPONSE = {
+    "text": "hello doctor",
+    "language_code": "en",
+    "words": [{"text": "hello", "speaker_id": "speaker_0"}, {"text": "doctor", "speaker_id": "speaker_0"}],
+}
+
+
+def _mock_transport(seen: list, statuses: list = None, headers: dict = None):
+    """Transport that records requests and replies with `statuses` in order (then 200)."""
+    statuses = list(statuses or [])
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        seen.append(request)
+        status = statuses.pop(0) if statuses else 200
+        if status != 200:
+            return httpx.Response(status, json={"detail": "busy"}, headers=headers or {})
+        return httpx.Response(200, json=WORDS_RESPONSE)
+
+    return httpx.MockTransport(handler)
+
+
+def _client(seen: list, **kwargs) -> ElevenLabsSTT:
+    transport = _mock_transport(seen, kwargs.pop("statuses", None), kwargs.pop("headers", None))
+    return ElevenLabsSTT(api_key="xi-key", transport=transport, backoff_base=0.001, backoff_max=0.01, **kwargs)
+
+
+class TestElevenLabsSTT:
+    """Test ElevenLabsSTT."""
+
+    async def test_bytes_sent_as_multipart_with_form_fields(self):
+        seen = []
+        stt = _client(seen)
+
+        data = await stt.speech_to_text(b"webm-bytes", "audio.webm", "audio/webm",
+                                        diarize=True, num_speakers=2, diarization_threshold=0.22,
+                                        timestamps_granularity="word")
+
+        assert data["words"][0]["speaker_id"] == "speaker_0"
+        request = seen[0]
+        assert request.url.path == "/v1/speech-to-text"
+        assert request.headers["xi-api-key"] == "xi-key"
+        body = request.content
+        assert b"webm-bytes" in body
+        assert b'name="model_id"\r\n\r\nscribe_v1' in body
+        assert b'name="diarize"\r\n\r\ntrue' in body
+        assert b'name="num_speakers"\r\n\r\n2' in body
+        await stt.aclose()
+
+    async def test_client_shared_across_calls(self):
+        seen = []
+        stt = _client(seen)
+
+        await stt.speech_to_text(b"a", "audio.webm", "audio/webm")
+        first_client = stt.http
+        await stt.single_use_token()
+
+        assert stt.http is first_client
+        assert seen[1].url.path == "/v1/single-use-token/realtime_scribe"
+        assert stt.get_stats()["calls"] == 2
+        await stt.aclose()
+
+    async def test_retries_rate_limit_and_server_errors(self):
+        seen = []
+        stt = _client(seen, statuses=[429, 503])
+
+        data = await stt.speech_to_text(b"webm-bytes", "audio.webm", "audio/webm")
+
+        assert data["text"] == "hello doctor"
+        assert len(seen) == 3
+        assert all(b"webm-bytes" in request.content for request in seen)
+        stats = stt.get_stats()
+        assert (stats["calls"], stats["requests"], stats["retries"], stats["rate_limited"]) == (1, 3, 2, 1)
+        await stt.aclose()
+
+    async def test_gives_up_after_max_retries(self):
+        seen = []
+        stt = _client(seen, statuses=[500] * 5, max_retries=2)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await stt.speech_to_text(b"webm-bytes", "audio.webm", "audio/webm")
+        assert len(seen) == 3
+        await stt.aclose()
+
+    async def test_client_errors_not_retried(self):
+        seen = []
+        stt = _client(seen, statuses=[400])
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await stt.speech_to_text(b"webm-bytes", "audio.webm", "audio/webm")
+        assert len(seen) == 1
+        assert stt.get_stats()["errors"] == 1
+        await stt.aclose()
+
+    async def test_failures_before_send_retried_and_settled(self):
+        attempts = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            attempts.append(request)
+            if len(attempts) == 1:
+                raise httpx.PoolTimeout("no free connection")
+            return httpx.Response(200, json=WORDS_RESPONSE)
+
+        stt = ElevenLabsSTT(api_key="xi-key", transport=httpx.MockTransport(handler), backoff_base=0.001)
+        await stt.speech_to_text(b"webm-bytes", "audio.webm", "audio/webm")
+
+        stats = stt.get_stats()
+        assert (len(attempts), stats["retries"], stats["errors"], stats["in_flight"]) == (2, 1, 1, 0)
+        await stt.aclose()
+
+    async def test_dropped_connection_after_send_not_retried(self):
+        attempts = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            attempts.append(request)
+            raise httpx.RemoteProtocolError("server disconnected")
+
+        stt = ElevenLabsSTT(api_key="xi-key", transport=httpx.MockTransport(handler), backoff_base=0.001)
+        with pytest.raises(httpx.RemoteProtocolError):
+            await stt.speech_to_text(b"webm-bytes", "audio.webm", "audio/webm")
+        assert len(attempts) == 1 and stt.get_stats()["in_flight"] == 0
+        await stt.aclose()
+
+    def test_backoff_honours_retry_after_and_jitter(self):
+        stt = ElevenLabsSTT(api_key="xi-key", backoff_base=1.0, backoff_max=4.0)
+
+        assert stt._backoff(0, "2") == 2.0
+        assert stt._backoff(0, "60") == 4.0
+        delays = [stt._backoff(3) for _ in range(50)]
+        assert all(0 <= d <= 4.0 for d in delays)
+        assert len(set(delays)) > 1
+
+    def test_unavailable_without_key(self, monkeypatch):
+        monkeypatch.delenv("ELEVENLABS_API_KEY", raising=False)
+        assert not ElevenLabsSTT().available
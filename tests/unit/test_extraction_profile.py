@@ -0,0 +1,90 @@
+"""
+Tests for cached extraction profiles (flattened schema, prompt hints, field mapping, aggregation plan).
+"""
+
+import pytest
+
+import api
+from servers.utils import extraction_profiles
+from servers.utils.extraction_profiles import ExtractionProfileCache, get_extraction_profile_stats
+from servers.utils.form_schema_cache import freeze
+
+
+SCHEMA = {
+    "vital_signs": {
+        "fields": [
+            {"name": "bp", "label": "Blood Pressure", "type": "string"},
+            {"name": "weight", "type": "number"},
+        ]
+    },
+    "scans": {
+        "fields": [
+            {"name": "scan_results", "type": "array", "row_fields": [{"name": "date"}, {"name": "finding"}]},
+            {"name": "visits", "type": "array", "requires_previous_consultations": True,
+             "aggregation_strategy": "merge", "row_fields": [{"name": "date"}]},
+        ]
+    },
+}
+
+TABLE_METADATA = {"tables": {"scan_results": {"data_source_type": "scan_results"}}}
+
+
+def schema_data(schema=None, version=1, name="antenatal"):
+    return {"schema": freeze(schema or SCHEMA), "table_metadata": freeze(TABLE_METADATA), "name": name, "version": version}
+
+
+@pytest.fixture(autouse=True)
+def empty_profile_cache(monkeypatch):
+    monkeypatch.setattr(extraction_profiles, "_cache", ExtractionProfileCache())
+
+
+class TestExtractionProfile:
+    """Test get_extraction_profile and the aggregation plan."""
+
+    def test_profile_matches_uncached_helpers(self):
+        data = schema_data()
+        profile = api.get_extraction_profile(data)
+
+        flattened, mapping = api.flatten_schema_for_extraction(data["schema"])
+        assert profile.field_mapping == mapping == {
+            "bp": "vital_signs.bp", "weight": "vital_signs.weight",
+            "scan_results": "scans.scan_results", "visits": "scans.visits",
+        }
+        assert profile.schema_hints == api.build_extraction_prompt_hints_from_flattened_schema(flattened)
+        assert [(path, strategy) for path, _, strategy in profile.aggregation_plan] == [
+            ("scans.scan_results", "append"), ("scans.visits", "merge"),
+        ]
+
+    def test_profile_reused_per_schema_version(self):
+        data = schema_data()
+        first = api.get_extraction_profile(data)
+        assert api.get_extraction_profile(data) is first
+
+        # New version (new schema object from the form schema cache) rebuilds
+        second = api.get_extraction_profile(schema_data(version=2))
+        assert second is not first and second.version == 2
+
+        stats = get_extraction_profile_stats()
+        assert (stats["builds"], stats["reuses"], stats["profiles"]) == (2, 1, 2)
+
+    def test_cache_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(extraction_profiles, "_cache", ExtractionProfileCache(max_entries=2))
+        for name in ("a", "b", "c"):
+            api.get_extraction_profile(schema_data(name=name))
+
+        assert [key[0] for key in extraction_profiles.get_extraction_profile_cache().keys()] == ["b", "c"]
+        assert get_extraction_profile_stats()["evictions"] == 1
+
+    async def test_empty_plan_skips_previous_form_lookup(self, monkeypatch):
+        """Forms without aggregated fields never fetch previous consultations."""
+        async def fail_fetch(*args, **kwargs):
+            raise AssertionError("previous forms should not be fetched")
+
+        monkeypatch.setattr(api, "fetch_patient_context", fail_fetch)
+        updates = {"vital_signs.bp": "120/80"}
+
+        result = await api.apply_historical_aggregation(
+            field_updates=updates, schema={}, patient_context={}, form_type="antenatal",
+            patient_id="p1", aggregation_plan=[],
+        )
+        assert result == updates
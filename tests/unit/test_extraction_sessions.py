@@ -0,0 +1,174 @@
+"""
+Tests for server-side extraction sessions.
+"""
+
+import asyncio
+import sqlite3
+import time
+import pytest
+from cryptography.fernet import Fernet
+
+from servers.utils.extraction_sessions import ExtractionSession, ExtractionSessionStore, set_nested_value
+
+
+def session(appointment_id: str = "appt-1", **kwargs) -> ExtractionSession:
+    return ExtractionSession(
+        appointment_id=appointment_id,
+        form_type="antenatal",
+        user_id="user-1",
+        patient_context={"demographics": {"patient_id": "patient-1", "age_years": 28}},
+        **kwargs
+    )
+
+
+KEY = Fernet.generate_key().decode()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "extraction_sessions.sqlite3")
+
+
+class TestExtractionSession:
+    """Test ExtractionSession state handling."""
+
+    def test_set_nested_value(self):
+        state = {"vital_signs": {"pulse": 80}}
+        set_nested_value(state, "vital_signs.systolic_bp", 120)
+        set_nested_value(state, "obstetric_history.gravida", 2)
+        assert state == {"vital_signs": {"pulse": 80, "systolic_bp": 120}, "obstetric_history": {"gravida": 2}}
+
+    def test_apply_updates_accumulates_deltas(self):
+        s = session()
+        s.apply_updates({"vital_signs.systolic_bp": 120})
+        s.apply_updates({"vital_signs.diastolic_bp": 80, "medications": [{"name": "Folic acid"}]})
+        assert s.form_state == {
+            "vital_signs": {"systolic_bp": 120, "diastolic_bp": 80},
+            "medications": [{"name": "Folic acid"}],
+        }
+        assert s.count_filled_fields() == 3
+
+    def test_processed_chunks(self):
+        s = session()
+        assert not s.has_processed(0)
+        s.mark_processed(0)
+        s.mark_processed(0)
+        assert s.has_processed(0)
+        assert s.processed_chunks == [0]
+
+    def test_json_round_trip(self):
+        s = session(form_state={"a": {"b": 1}}, previous_forms=[{"appointment_id": "old"}])
+        s.mark_processed(3)
+        assert ExtractionSession.from_json(s.to_json()) == s
+
+
+class TestExtractionSessionStore:
+    """Test ExtractionSessionStore."""
+
+    def test_create_get_delete(self, db_path):
+        store = ExtractionSessionStore(path=db_path, persist=True, encryption_key=KEY)
+        store.create(session())
+        assert store.get("appt-1").form_type == "antenatal"
+        assert store.get("missing") is None
+        assert store.delete("appt-1")
+        assert store.get("appt-1") is None
+        store.close()
+
+    def test_resume_after_restart(self, db_path):
+        store = ExtractionSessionStore(path=db_path, persist=True, encryption_key=KEY)
+        s = store.create(session())
+        s.apply_updates({"vital_signs.systolic_bp": 120})
+        s.mark_processed(0)
+        store.save(s)
+        store.close()
+
+        restarted = ExtractionSessionStore(path=db_path, persist=True, encryption_key=KEY)
+        resumed = restarted.get("appt-1")
+        assert resumed.form_state == {"vital_signs": {"systolic_bp": 120}}
+        assert resumed.processed_chunks == [0]
+        assert restarted.get_stats()["disk_loads"] == 1
+        restarted.close()
+
+    def test_ttl_eviction(self, db_path):
+        store = ExtractionSessionStore(path=db_path, ttl_seconds=60, persist=True, encryption_key=KEY)
+        s = store.create(session())
+        s.updated_at = time.time() - 120
+        assert store.get("appt-1") is None
+        assert store.get_stats()["stored"] == 0
+        store.close()
+
+    def test_purge_expired_from_disk(self, db_path):
+        store = ExtractionSessionStore(path=db_path, ttl_seconds=60, persist=True, encryption_key=KEY)
+        store.create(session("old"))
+        store.create(session("new"))
+        store._conn.execute("UPDATE extraction_sessions SET updated_at = ? WHERE appointment_id = 'old'",
+                            (time.time() - 120,))
+        store._sessions.clear()
+        assert store.purge_expired() == 1
+        assert store.get("old") is None
+        assert store.get("new") is not None
+        store.close()
+
+    def test_memory_lru_reloads_from_disk(self, db_path):
+        store = ExtractionSessionStore(path=db_path, max_in_memory=1, persist=True, encryption_key=KEY)
+        store.create(session("appt-1"))
+        store.create(session("appt-2"))
+        assert store.get_stats()["in_memory"] == 1
+        assert store.get("appt-1") is not None
+        assert store.get_stats()["disk_loads"] == 1
+        store.close()
+
+    def test_rows_encrypted_on_disk(self, db_path):
+        store = ExtractionSessionStore(path=db_path, persist=True, encryption_key=KEY)
+        store.create(session())
+        store.close()
+
+        (data,) = sqlite3.connect(db_path).execute("SELECT data FROM extraction_sessions").fetchone()
+        assert "patient-1" not in data and "antenatal" not in data
+
+        other_key = ExtractionSessionStore(path=db_path, persist=True, encryption_key=Fernet.generate_key().decode())
+        assert other_key.get("appt-1") is None
+        other_key.close()
+
+    def test_persistence_needs_a_key(self, db_path):
+        store = ExtractionSessionStore(path=db_path, persist=True, encryption_key="")
+        assert not store.persist
+        store.create(session())
+        assert store.get("appt-1") is not None
+
+    def test_memory_only(self):
+        store = ExtractionSessionStore(persist=False)
+        store.create(session())
+        assert store.get("appt-1") is not None
+        assert store.get_stats()["stored"] == 1
+
+    async def test_lock_is_per_appointment(self):
+        store = ExtractionSessionStore(persist=False)
+        assert store.lock("appt-1") is store.lock("appt-1")
+        assert store.lock("appt-1") is not store.lock("appt-2")
+
+    async def test_locks_dropped_once_released(self):
+        store = ExtractionSessionStore(persist=False)
+        for i in range(10):
+            store.create(session(f"appt-{i}"))
+            async with store.lock(f"appt-{i}"):
+                pass
+        assert len(store._locks) == 0
+
+    async def test_held_lock_survives_expiry(self):
+        store = ExtractionSessionStore(ttl_seconds=60, persist=False)
+        store.create(session()).updated_at = time.time() - 120
+        entered = asyncio.Event()
+
+        async def waiter():
+            async with store.lock("appt-1"):
+                entered.set()
+
+        async with store.lock("appt-1") as lock:
+            assert store.get("appt-1") is None  # expires while the chunk handler holds the lock
+            task = asyncio.create_task(waiter())
+            await asyncio.sleep(0)
+            assert store.lock("appt-1") is lock and not entered.is_set()
+
+        await task
+        assert len(store._locks) == 0
@@ -0,0 +1,103 @@
+"""
+Tests for the compiled per-form field validator.
+"""
+
+import pytest
+
+from mcp_servers import field_validator
+from mcp_servers.field_validator import CompiledFormValidator, validate_multiple_fields
+from servers.utils.form_schema_cache import freeze
+
+
+SCHEMA = {
+    "vital_signs": {
+        "fields": [
+            {"name": "temperature", "type": "number", "unit": "celsius", "range": [30, 45]},
+            {"name": "heart_rate", "type": "number", "range": [30, 220]},
+            {"name": "bp", "type": "string", "max_length": 20},
+        ]
+    },
+    "history": {
+        "fields": [
+            {"name": "lmp", "type": "string", "format": "YYYY-MM-DD"},
+            {"name": "edd", "type": "date"},
+            {"name": "smoker", "type": "boolean"},
+            {"name": "blood_group", "type": "string", "options": ["A+", "B+", "O+", "AB+"]},
+            {"name": "heart_rate", "type": "string"},
+            {"name": "scans", "type": "array", "row_fields": [{"name": "date", "type": "date"}]},
+        ]
+    },
+}
+
+
+@pytest.fixture
+def validator():
+    return CompiledFormValidator(freeze(SCHEMA), "antenatal")
+
+
+class TestCompiledFormValidator:
+    """Test CompiledFormValidator and the per-form validator cache."""
+
+    def test_field_index(self, validator):
+        """Fields resolve by nested path and by bare name (first section wins)."""
+        assert validator.get_field_metadata("history.lmp")["format"] == "YYYY-MM-DD"
+        assert validator.get_field_metadata("heart_rate")["type"] == "number"
+        assert validator.get_field_metadata("history.heart_rate")["type"] == "string"
+        assert validator.get_field_metadata("history.missing") is None
+
+    def test_type_specific_validation(self, validator):
+        valid, errors = validator.validate({
+            "vital_signs.temperature": 98.6,        # Fahrenheit converted
+            "heart_rate": "about 80",
+            "vital_signs.bp": "120 over 80",
+            "history.lmp": "Nov 11, 2024",
+            "edd": "18/08/2025",
+            "smoker": "no",
+            "blood_group": "o+",
+            "scans": {"date": "2025-01-01"},
+            "vital_signs.heart_rate": 400,
+            "history.unknown": 1,
+            "lmp": None,
+        })
+
+        assert valid == {
+            "vital_signs.temperature": 37.0,
+            "heart_rate": 80.0,
+            "vital_signs.bp": "120/80",
+            "history.lmp": "2024-11-11",
+            "edd": "2025-08-18",
+            "smoker": False,
+            "blood_group": "O+",
+            "scans": [{"date": "2025-01-01"}],
+            "lmp": None,
+        }
+        assert "outside valid range" in errors["vital_signs.heart_rate"]
+        assert "not found in schema" in errors["history.unknown"]
+
+    def test_rejects_unknown_option_and_bad_date(self, validator):
+        _, errors = validator.validate({"blood_group": "Z-", "lmp": "last spring"})
+        assert set(errors) == {"blood_group", "lmp"}
+
+    async def test_validator_reused_until_schema_changes(self, monkeypatch):
+        """One schema load per batch; recompiled only when the schema object changes."""
+        schemas = {"current": freeze(SCHEMA)}
+        loads = []
+
+        async def fake_get_form_schema_from_db(form_type, full_metadata=False):
+            loads.append(form_type)
+            return schemas["current"]
+
+        monkeypatch.setattr(field_validator, "get_form_schema_from_db", fake_get_form_schema_from_db)
+        monkeypatch.setattr(field_validator, "_validators", {})
+        monkeypatch.setattr(field_validator, "_validator_stats", {"compiles": 0, "reuses": 0})
+
+        updates = {"vital_signs.heart_rate": 70, "smoker": True, "bp": "110/70"}
+        first, _ = await validate_multiple_fields("antenatal", updates)
+        await validate_multiple_fields("antenatal", updates)
+        assert len(first) == 3 and loads == ["antenatal", "antenatal"]
+        assert field_validator.get_validator_stats()["compiles"] == 1
+
+        schemas["current"] = freeze({"vital_signs": {"fields": [{"name": "heart_rate", "type": "number"}]}})
+        _, errors = await validate_multiple_fields("antenatal", updates)
+        assert set(errors) == {"smoker", "bp"}
+        assert field_validator.get_validator_stats()["compiles"] == 2
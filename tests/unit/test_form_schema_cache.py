@@ -0,0 +1,141 @@
+"""
+Tests for the versioned form schema cache.
+
+Uses SupabaseDB with an httpx MockTransport serving an in-memory custom_forms table.
+"""
+
+import copy
+import json
+import httpx
+import pytest
+
+from servers.utils.supabase_db import SupabaseDB
+from servers.utils.form_schema_cache import FormSchemaCache, PROBE_COLUMNS, select_form
+
+
+def form_row(form_id: str, form_name: str, specialty: str, version: int = 1, updated_at: str = "2025-01-01T00:00:00"):
+    return {
+        "id": form_id, "form_name": form_name, "specialty": specialty, "version": version,
+        "updated_at": updated_at, "status": "active", "description": f"{form_name} form",
+        "table_metadata": {"tables": {}},
+        "form_schema": {"vitals": {"fields": [{"name": "bp", "type": "string"}]}},
+    }
+
+
+class FakeCustomForms:
+    """custom_forms rows behind a MockTransport; records probe and full fetches."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.probes = 0
+        self.fetches = 0
+
+    def db(self) -> SupabaseDB:
+        return SupabaseDB("https://example.supabase.co", "service-key", transport=httpx.MockTransport(self.handle))
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        if params["select"] == PROBE_COLUMNS.replace(" ", ""):
+            self.probes += 1
+            columns = PROBE_COLUMNS.replace(" ", "").split(",")
+            return httpx.Response(200, json=[{c: r[c] for c in columns} for r in self.rows])
+
+        self.fetches += 1
+        form_id = params["id"].removeprefix("eq.")
+        return httpx.Response(200, json=[r for r in self.rows if r["id"] == form_id])
+
+
+@pytest.fixture
+def forms():
+    return FakeCustomForms([form_row("f1", "antenatal", "obstetrics")])
+
+
+class TestFormSchemaCache:
+    """Test FormSchemaCache."""
+
+    async def test_unchanged_form_is_probed_not_refetched(self, forms):
+        """Repeated lookups only run the cheap probe."""
+        cache = FormSchemaCache(probe_seconds=0)
+        db = forms.db()
+
+        first = await cache.get(db, "antenatal")
+        second = await cache.get(db, "antenatal")
+
+        assert second is first
+        assert first["form_schema"]["vitals"]["fields"][0]["name"] == "bp"
+        assert (forms.probes, forms.fetches) == (2, 1)
+        stats = cache.get_stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+        await db.aclose()
+
+    async def test_probe_window_skips_probe(self, forms):
+        cache = FormSchemaCache(probe_seconds=60)
+        db = forms.db()
+
+        await cache.get(db, "antenatal")
+        await cache.get(db, "antenatal")
+
+        assert (forms.probes, forms.fetches) == (1, 1)
+        assert cache.get_stats()["probe_skips"] == 1
+        await db.aclose()
+
+    async def test_version_change_triggers_refetch(self, forms):
+        """A new version/updated_at is detected by the probe."""
+        cache = FormSchemaCache(probe_seconds=0)
+        db = forms.db()
+        await cache.get(db, "antenatal")
+
+        forms.rows[0] = dict(form_row("f1", "antenatal", "obstetrics", version=2, updated_at="2025-02-01T00:00:00"),
+                             form_schema={"history": {"fields": [{"name": "gravida", "type": "number"}]}})
+        form = await cache.get(db, "antenatal")
+
+        assert form["version"] == 2
+        assert "history" in form["form_schema"]
+        assert forms.fetches == 2
+        assert cache.get_stats()["refreshes"] == 1
+        await db.aclose()
+
+    async def test_invalidate_matches_name_and_specialty(self, forms):
+        """Explicit invalidation drops entries cached by name or specialty."""
+        cache = FormSchemaCache(probe_seconds=60)
+        db = forms.db()
+        await cache.get(db, "antenatal")
+        await cache.get(db, "obstetrics")  # specialty fallback
+
+        assert cache.invalidate("antenatal") == 2
+        await cache.get(db, "antenatal")
+        assert forms.fetches == 3
+        await db.aclose()
+
+    async def test_missing_form_returns_none(self, forms):
+        cache = FormSchemaCache()
+        db = forms.db()
+        assert await cache.get(db, "cardiology") is None
+        await db.aclose()
+
+    async def test_views_are_read_only_and_deepcopy_is_mutable(self, forms):
+        """Shared views reject mutation, serialise like dicts, and deepcopy to plain containers."""
+        cache = FormSchemaCache()
+        db = forms.db()
+        schema = (await cache.get(db, "antenatal"))["form_schema"]
+
+        with pytest.raises(TypeError):
+            schema["vitals"] = {}
+        with pytest.raises(TypeError):
+            schema["vitals"]["fields"].append({"name": "weight"})
+
+        assert json.loads(json.dumps(schema)) == form_row("f1", "antenatal", "obstetrics")["form_schema"]
+        mutable = copy.deepcopy(schema)
+        mutable["vitals"]["fields"].append({"name": "weight"})
+        assert type(mutable) is dict and len(schema["vitals"]["fields"]) == 1
+        await db.aclose()
+
+    def test_select_form_prefers_name_then_latest(self):
+        rows = [
+            form_row("a", "obgyn", "antenatal"),
+            form_row("b", "antenatal", "obstetrics", updated_at="2025-01-01"),
+            form_row("c", "antenatal", "obstetrics", updated_at="2025-03-01"),
+        ]
+        assert select_form(rows, "antenatal")["id"] == "c"
+        assert select_form(rows, "obstetrics")["id"] == "c"
+        assert select_form(rows, "gynae") is None
@@ -0,0 +1,267 @@
+"""
+Tests for the durable job queue.
+
+Uses a SQLite file under tmp_path so restart/recovery can be exercised.
+"""
+
+import asyncio
+import sqlite3
+import time
+import pytest
+
+from servers.utils.job_queue import (
+    JobQueue, SQLiteJobBackend, PermanentJobError, QUEUED, RUNNING, SUCCEEDED, FAILED,
+    parse_concurrency_limits,
+)
+
+
+def make_queue(path, **kwargs) -> JobQueue:
+    kwargs.setdefault("backoff_base", 0.01)
+    kwargs.setdefault("backoff_max", 0.02)
+    kwargs.setdefault("poll_seconds", 0.01)
+    return JobQueue(backend=SQLiteJobBackend(str(path)), **kwargs)
+
+
+class TestJobQueue:
+    """Test JobQueue."""
+
+    async def test_job_runs_with_payload_and_data(self, tmp_path):
+        queue = make_queue(tmp_path / "jobs.sqlite3")
+        seen = {}
+
+        async def handler(ctx):
+            seen.update(payload=ctx.payload, data=ctx.data)
+            ctx.set_progress(stage="done")
+            return {"ok": True}
+
+        queue.register("transcribe", handler)
+        await queue.start()
+        job = queue.enqueue("transcribe", {"consultation_id": "c1"}, data=b"audio")
+
+        assert await queue.wait(job.id, timeout=2) == {"ok": True}
+        assert seen == {"payload": {"consultation_id": "c1"}, "data": b"audio"}
+        stored = queue.get(job.id)
+        assert (stored.status, stored.attempts, stored.progress) == (SUCCEEDED, 1, {"stage": "done"})
+        assert queue.backend.load_data(job.id) is None  # payload blob dropped on success
+        await queue.aclose()
+
+    async def test_retries_with_backoff_then_succeeds(self, tmp_path):
+        queue = make_queue(tmp_path / "jobs.sqlite3")
+        attempts = []
+
+        async def flaky(ctx):
+            attempts.append(ctx.attempt)
+            if ctx.attempt < 3:
+                raise RuntimeError("provider 503")
+            return {"attempt": ctx.attempt}
+
+        queue.register("flaky", flaky, max_attempts=3)
+        await queue.start()
+        job = queue.enqueue("flaky", {})
+
+        assert await queue.wait(job.id, timeout=2) == {"attempt": 3}
+        assert attempts == [1, 2, 3]
+        assert queue.get_stats()["retried"] == 2
+        await queue.aclose()
+
+    async def test_exhausted_retries_call_on_failure(self, tmp_path):
+        queue = make_queue(tmp_path / "jobs.sqlite3")
+        failures = []
+
+        async def broken(ctx):
+            raise RuntimeError("always fails")
+
+        async def on_failure(ctx, error):
+            failures.append((ctx.payload["id"], str(error)))
+
+        queue.register("broken", broken, on_failure=on_failure, max_attempts=2)
+        await queue.start()
+        job = queue.enqueue("broken", {"id": "c1"})
+
+        with pytest.raises(RuntimeError, match="always fails"):
+            await queue.wait(job.id, timeout=2)
+        stored = queue.get(job.id)
+        assert (stored.status, stored.attempts) == (FAILED, 2)
+        assert "always fails" in stored.error
+        assert failures == [("c1", "always fails")]
+        await queue.aclose()
+
+    async def test_permanent_errors_not_retried(self, tmp_path):
+        queue = make_queue(tmp_path / "jobs.sqlite3")
+
+        async def not_found(ctx):
+            raise LookupError("consultation not found")
+
+        queue.register("lookup", not_found, retryable=lambda e: not isinstance(e, LookupError))
+        await queue.start()
+
+        with pytest.raises(LookupError):
+            await queue.wait(queue.enqueue("lookup", {}).id, timeout=2)
+
+        async def permanent(ctx):
+            raise PermanentJobError("bad input")
+
+        queue.register("permanent", permanent)
+        job = queue.enqueue("permanent", {})
+        with pytest.raises(PermanentJobError):
+            await queue.wait(job.id, timeout=2)
+        assert queue.get(job.id).attempts == 1
+        await queue.aclose()
+
+    async def test_concurrency_capped_per_key(self, tmp_path):
+        queue = make_queue(tmp_path / "jobs.sqlite3", max_workers=4, concurrency_limits={"sarvam": 1})
+        running = {"sarvam": 0, "elevenlabs": 0}
+        peak = {"sarvam": 0, "elevenlabs": 0}
+
+        async def handler(ctx):
+            key = ctx.payload["key"]
+            running[key] += 1
+            peak[key] = max(peak[key], running[key])
+            await asyncio.sleep(0.05)
+            running[key] -= 1
+
+        queue.register("chunk", handler)
+        await queue.start()
+        jobs = [queue.enqueue("chunk", {"key": key}, concurrency_key=key)
+                for key in ["sarvam"] * 3 + ["elevenlabs"] * 3]
+        await asyncio.gather(*[queue.wait(job.id, timeout=5) for job in jobs])
+
+        assert peak == {"sarvam": 1, "elevenlabs": 3}
+        await queue.aclose()
+
+    async def test_extra_slots_share_the_key_cap(self, tmp_path):
+        queue = make_queue(tmp_path / "jobs.sqlite3", concurrency_limits={"sarvam": 2})
+        running = peak = 0
+
+        async def call():
+            nonlocal running, peak
+            async with queue.slot("sarvam"):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.02)
+                running -= 1
+
+        await asyncio.gather(*[call() for _ in range(5)])
+
+        assert peak == 2
+        assert queue.get_stats()["extra_slots"] == 5
+        assert queue._running_by_key["sarvam"] == 0
+        await queue.aclose()
+
+    async def test_queued_jobs_survive_restart(self, tmp_path):
+        path = tmp_path / "jobs.sqlite3"
+        first = make_queue(path)
+        first.register("transcribe", lambda ctx: None)
+        job = first.enqueue("transcribe", {"consultation_id": "c1"}, data=b"audio")  # never started
+        await first.aclose()
+
+        second = make_queue(path)
+        done = asyncio.Event()
+
+        async def handler(ctx):
+            assert ctx.data == b"audio"
+            done.set()
+
+        second.register("transcribe", handler)
+        await second.start()
+        await asyncio.wait_for(done.wait(), timeout=2)
+        await asyncio.sleep(0.05)
+        assert second.get(job.id).status == SUCCEEDED
+        await second.aclose()
+
+    async def test_expired_lease_is_rerun(self, tmp_path):
+        path = tmp_path / "jobs.sqlite3"
+        backend = SQLiteJobBackend(str(path))
+        queue = make_queue(path, visibility_timeout=0.1)
+        queue.register("transcribe", lambda ctx: None)
+        job = queue.enqueue("transcribe", {})
+
+        # A worker that claims the job and then dies without completing it
+        claimed = backend.claim(time.time(), lease_seconds=0.1, exclude_keys=set())
+        assert claimed.id == job.id and queue.get(job.id).status == RUNNING
+
+        async def handler(ctx):
+            return {"attempt": ctx.attempt}
+
+        queue.register("transcribe", handler)
+        await queue.start()
+        await asyncio.sleep(0.3)
+
+        assert queue.get(job.id).status == SUCCEEDED
+        assert queue.get(job.id).result == {"attempt": 2}
+        assert queue.get_stats()["lease_expired"] == 1
+        await queue.aclose()
+        backend.close()
+
+    async def test_shutdown_returns_running_jobs_to_queue(self, tmp_path):
+        path = tmp_path / "jobs.sqlite3"
+        queue = make_queue(path)
+        started = asyncio.Event()
+
+        async def slow(ctx):
+            started.set()
+            await asyncio.sleep(10)
+
+        queue.register("slow", slow)
+        await queue.start()
+        job = queue.enqueue("slow", {})
+        await asyncio.wait_for(started.wait(), timeout=2)
+        await queue.aclose()
+
+        stored = SQLiteJobBackend(str(path)).get(job.id)
+        assert (stored.status, stored.attempts) == (QUEUED, 0)
+
+    async def test_dispatcher_survives_backend_errors(self, tmp_path):
+        queue = make_queue(tmp_path / "jobs.sqlite3")
+        claim = queue.backend.claim
+        failures = []
+
+        def flaky_claim(*args):
+            if not failures:
+                failures.append(1)
+                raise sqlite3.OperationalError("database is locked")
+            return claim(*args)
+
+        async def handler(ctx):
+            return {"ok": True}
+
+        queue.register("transcribe", handler)
+        queue.backend.claim = flaky_claim
+        await queue.start()
+        job = queue.enqueue("transcribe", {})
+
+        assert await queue.wait(job.id, timeout=2) == {"ok": True}
+        assert queue.get_stats()["dispatch_errors"] == 1
+        await queue.aclose()
+
+    async def test_failed_data_load_frees_the_worker_slot(self, tmp_path):
+        queue = make_queue(tmp_path / "jobs.sqlite3", concurrency_limits={"sarvam": 1})
+        load_data = queue.backend.load_data
+        failures = []
+
+        def flaky_load(job_id):
+            if not failures:
+                failures.append(1)
+                raise sqlite3.OperationalError("database is locked")
+            return load_data(job_id)
+
+        async def handler(ctx):
+            return {"data": ctx.data.decode()}
+
+        queue.register("transcribe", handler)
+        queue.backend.load_data = flaky_load
+        await queue.start()
+        job = queue.enqueue("transcribe", {}, data=b"audio", concurrency_key="sarvam")
+
+        assert await queue.wait(job.id, timeout=2) == {"data": "audio"}
+        assert queue.get_stats()["running"] == 0 and queue.get_stats()["retried"] == 1
+        await queue.aclose()
+
+    def test_enqueue_unknown_kind_raises(self, tmp_path):
+        queue = make_queue(tmp_path / "jobs.sqlite3")
+        with pytest.raises(ValueError):
+            queue.enqueue("missing", {})
+
+    def test_parse_concurrency_limits(self):
+        assert parse_concurrency_limits("sarvam=2, elevenlabs=4") == {"sarvam": 2, "elevenlabs": 4}
+        assert parse_concurrency_limits("") == {}
@@ -0,0 +1,58 @@
+"""
+Tests for per-key async locks.
+"""
+
+import asyncio
+import pytest
+
+from servers.utils.keyed_locks import KeyedLocks
+
+
+class TestKeyedLocks:
+    """Test KeyedLocks."""
+
+    async def test_same_key_serialised_other_keys_not(self):
+        locks = KeyedLocks()
+        order = []
+
+        async def work(key, name, delay):
+            async with locks.get(key):
+                order.append(f"{name} in")
+                await asyncio.sleep(delay)
+                order.append(f"{name} out")
+
+        await asyncio.gather(work("a", "a1", 0.02), work("a", "a2", 0), work("b", "b1", 0))
+
+        assert order.index("a1 out") < order.index("a2 in")
+        assert order.index("b1 in") < order.index("a1 out")
+        assert len(locks) == 0
+
+    async def test_lock_kept_while_awaited(self):
+        locks = KeyedLocks()
+
+        async with locks.get("a") as held:
+            waiter = asyncio.create_task(locks.get("a").__aenter__())
+            await asyncio.sleep(0)
+            assert locks.get("a") is held and held.users == 2
+
+        await waiter
+        assert "a" in locks
+        await held.__aexit__(None, None, None)
+        assert "a" not in locks
+
+    async def test_cancelled_waiter_does_not_leak(self):
+        locks = KeyedLocks()
+
+        async with locks.get("a") as held:
+            async def wait():
+                async with locks.get("a"):
+                    pass
+
+            task = asyncio.create_task(wait())
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert held.users == 1
+
+        assert len(locks) == 0
@@ -0,0 +1,172 @@
+"""
+Tests for the shared async LLM gateway.
+
+Verifies that concurrent Claude calls overlap instead of serialising,
+that per-call timeouts are forwarded, and that statistics are recorded.
+"""
+
+import time
+import asyncio
+import pytest
+from unittest.mock import MagicMock, PropertyMock, patch
+
+from servers.utils.llm_gateway import LLMGateway, get_llm_gateway, cached_system_prompt
+
+
+def _fake_client(latency: float = 0.0):
+    """Fake AsyncAnthropic client whose messages.create sleeps asynchronously."""
+    calls = []
+
+    response = MagicMock()
+    response.usage = MagicMock(input_tokens=10, output_tokens=5)
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(latency)
+        return response
+
+    client = MagicMock()
+    client.messages.create = create
+    return client, calls
+
+
+class TestLLMGateway:
+    """Test the LLMGateway wrapper."""
+
+    async def test_concurrent_calls_overlap(self):
+        """N concurrent calls should take about as long as one."""
+        gateway = LLMGateway(api_key="test-key")
+        client, _ = _fake_client(latency=0.2)
+
+        with patch.object(LLMGateway, 'client', new_callable=PropertyMock, return_value=client):
+            start = time.perf_counter()
+            await asyncio.gather(*[
+                gateway.create_message(model="claude-haiku-4-5", max_tokens=10, messages=[])
+                for _ in range(5)
+            ])
+            elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.6
+        assert gateway.get_stats()["peak_in_flight"] == 5
+
+    async def test_per_call_timeout_forwarded(self):
+        """Explicit timeout overrides the gateway default."""
+        gateway = LLMGateway(api_key="test-key", timeout=120.0)
+        client, calls = _fake_client()
+
+        with patch.object(LLMGateway, 'client', new_callable=PropertyMock, return_value=client):
+            await gateway.create_message(model="claude-haiku-4-5", max_tokens=10, messages=[], timeout=5.0)
+            await gateway.create_message(model="claude-haiku-4-5", max_tokens=10, messages=[])
+
+        assert calls[0]["timeout"] == 5.0
+        assert calls[1]["timeout"] == 120.0
+
+    async def test_stats_record_usage_and_errors(self):
+        """Token usage and errors are accumulated."""
+        gateway = LLMGateway(api_key="test-key")
+        client, _ = _fake_client()
+
+        with patch.object(LLMGateway, 'client', new_callable=PropertyMock, return_value=client):
+            await gateway.create_message(model="claude-haiku-4-5", max_tokens=10, messages=[])
+
+        failing = MagicMock()
+
+        async def fail(**kwargs):
+            raise RuntimeError("boom")
+
+        failing.messages.create = fail
+        with patch.object(LLMGateway, 'client', new_callable=PropertyMock, return_value=failing):
+            with pytest.raises(RuntimeError):
+                await gateway.create_message(model="claude-haiku-4-5", max_tokens=10, messages=[])
+
+        stats = gateway.get_stats()
+        assert stats["calls"] == 2
+        assert stats["errors"] == 1
+        assert stats["input_tokens"] == 10
+        assert stats["output_tokens"] == 5
+        assert stats["in_flight"] == 0
+
+    async def test_prompt_cache_usage_recorded_per_prompt(self):
+        """Cache reads/writes are tracked per prompt_name, which is not sent to the API."""
+        gateway = LLMGateway(api_key="test-key")
+        responses = [
+            MagicMock(usage=MagicMock(input_tokens=50, output_tokens=5,
+                                      cache_creation_input_tokens=4000, cache_read_input_tokens=0)),
+            MagicMock(usage=MagicMock(input_tokens=60, output_tokens=5,
+                                      cache_creation_input_tokens=0, cache_read_input_tokens=4000)),
+        ]
+        calls = []
+
+        async def create(**kwargs):
+            calls.append(kwargs)
+            return responses[len(calls) - 1]
+
+        client = MagicMock()
+        client.messages.create = create
+        system = cached_system_prompt("static rules", "per-call context")
+
+        with patch.object(LLMGateway, 'client', new_callable=PropertyMock, return_value=client):
+            for _ in range(2):
+                await gateway.create_message(model="claude-haiku-4-5", max_tokens=10, system=system,
+                                             messages=[], prompt_name="form_extraction")
+
+        assert "prompt_name" not in calls[0]
+        assert calls[0]["system"][0]["cache_control"] == {"type": "ephemeral"}
+        assert "cache_control" not in calls[0]["system"][1]
+
+        stats = gateway.get_stats()
+        assert (stats["cache_read_input_tokens"], stats["cache_creation_input_tokens"]) == (4000, 4000)
+        prompt = stats["prompts"]["form_extraction"]
+        assert (prompt["calls"], prompt["cache_hits"], prompt["input_tokens"]) == (2, 1, 110)
+        assert prompt["avg_latency_cache_hit_seconds"] is not None
+
+    async def test_stream_text_yields_deltas_and_records_usage(self):
+        """stream_text yields text deltas and records usage from the final message."""
+        gateway = LLMGateway(api_key="test-key", timeout=120.0)
+        calls = []
+
+        final = MagicMock(stop_reason="end_turn")
+        final.usage = MagicMock(input_tokens=10, output_tokens=5,
+                                cache_read_input_tokens=0, cache_creation_input_tokens=0)
+
+        class FakeStream:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            @property
+            async def text_stream(self):
+                for text in ('{"a"', ': 1}'):
+                    yield text
+
+            async def get_final_message(self):
+                return final
+
+        def stream(**kwargs):
+            calls.append(kwargs)
+            return FakeStream()
+
+        client = MagicMock()
+        client.messages.stream = stream
+
+        with patch.object(LLMGateway, 'client', new_callable=PropertyMock, return_value=client):
+            chunks = [text async for text in gateway.stream_text(
+                model="claude-haiku-4-5", max_tokens=10, messages=[], prompt_name="form_extraction")]
+
+        assert chunks == ['{"a"', ': 1}']
+        assert calls[0]["timeout"] == 120.0
+        stats = gateway.get_stats()
+        assert (stats["calls"], stats["in_flight"], stats["output_tokens"]) == (1, 0, 5)
+        assert stats["prompts"]["form_extraction"]["calls"] == 1
+
+    def test_get_llm_gateway_is_process_wide(self):
+        """get_llm_gateway returns the same instance every time."""
+        assert get_llm_gateway() is get_llm_gateway()
+
+    def test_available_requires_api_key(self, monkeypatch):
+        """Gateway without an API key reports unavailable."""
+        monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+        assert LLMGateway(api_key=None).available is False
+        assert LLMGateway(api_key="test-key").available is True
@@ -0,0 +1,128 @@
+"""
+Tests for the per-region MCP session pool.
+
+Uses a fake client in place of ClinicalDecisionSupportClient so no MCP
+server processes are started.
+"""
+
+import asyncio
+import pytest
+
+from servers.clinical_decision_support.session_pool import MCPSessionPool
+
+
+class FakeRegionClient:
+    """Records connect/cleanup calls like ClinicalDecisionSupportClient."""
+
+    instances = []
+
+    def __init__(self):
+        self.region = None
+        self.connected = False
+        self.cleanups = 0
+        FakeRegionClient.instances.append(self)
+
+    async def connect_to_servers(self, country_code=None, verbose=True):
+        await asyncio.sleep(0.01)
+        self.region = country_code
+        self.connected = True
+
+    async def cleanup(self):
+        self.connected = False
+        self.cleanups += 1
+
+
+@pytest.fixture
+def pool():
+    FakeRegionClient.instances = []
+    return MCPSessionPool(FakeRegionClient, max_sessions_per_region=2, idle_timeout=60)
+
+
+class TestMCPSessionPool:
+    """Test MCPSessionPool checkout, reuse and eviction."""
+
+    async def test_reuses_warm_client_for_same_region(self, pool):
+        """Second checkout for a region gets the already-connected client."""
+        async with pool.checkout("GB", verbose=False) as first:
+            pass
+        async with pool.checkout("gb", verbose=False) as second:
+            pass
+
+        assert first is second
+        assert first.region == "GB"
+        assert pool.get_stats()["connects"] == 1
+        assert pool.get_stats()["warm_hits"] == 1
+
+    async def test_region_switch_does_not_disconnect_in_use_sessions(self, pool):
+        """A request from another region leaves in-flight sessions untouched."""
+        async with pool.checkout("GB", verbose=False) as uk_client:
+            async with pool.checkout("IN", verbose=False) as india_client:
+                assert india_client is not uk_client
+                assert india_client.region == "IN"
+            assert uk_client.connected
+            assert uk_client.cleanups == 0
+
+    async def test_concurrent_requests_get_separate_clients_up_to_limit(self, pool):
+        """Concurrent same-region requests use separate clients; extras wait."""
+        held = []
+
+        async def use(delay):
+            async with pool.checkout("US", verbose=False) as region_client:
+                held.append(region_client)
+                await asyncio.sleep(delay)
+
+        await asyncio.gather(use(0.05), use(0.05), use(0.01))
+
+        assert len(FakeRegionClient.instances) == 2
+        assert held[0] is not held[1]
+        assert pool.get_stats()["waits"] >= 1
+        assert pool.get_stats()["regions"]["US"]["in_use"] == 0
+
+    async def test_uk_alias_and_default_region(self, pool):
+        """UK maps to GB and a missing country code maps to default."""
+        assert MCPSessionPool.region_key("uk") == "GB"
+        assert MCPSessionPool.region_key(None) == "default"
+
+        async with pool.checkout(None, verbose=False) as region_client:
+            assert region_client.region is None
+
+    async def test_idle_clients_are_evicted(self, pool):
+        """Clients idle past the timeout are disconnected on the next checkout."""
+        async with pool.checkout("AU", verbose=False) as stale:
+            pass
+
+        pool.idle_timeout = 0
+        await asyncio.sleep(0.01)
+        await pool.evict_idle(verbose=False)
+
+        assert stale.cleanups == 1
+        assert pool.get_stats()["evictions"] == 1
+        assert "AU" not in pool.get_stats()["regions"]
+
+    async def test_close_disconnects_everything(self, pool):
+        """close() disconnects all pooled clients."""
+        async with pool.checkout("GB", verbose=False):
+            pass
+        async with pool.checkout("IN", verbose=False):
+            pass
+
+        await pool.close()
+
+        assert all(c.cleanups == 1 for c in FakeRegionClient.instances)
+
+    async def test_cancelled_cold_connect_frees_the_slot(self):
+        """A request cancelled mid-connect doesn't leave its region deadlocked."""
+        FakeRegionClient.instances = []
+        pool = MCPSessionPool(FakeRegionClient, max_sessions_per_region=1, idle_timeout=60)
+
+        first = asyncio.create_task(pool.acquire("GB", verbose=False))
+        await asyncio.sleep(0.001)  # Mid-connect
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        async with asyncio.timeout(1):
+            async with pool.checkout("GB", verbose=False) as region_client:
+                assert region_client.connected
+        assert FakeRegionClient.instances[0].cleanups == 1
+        assert pool.get_stats()["regions"]["GB"]["sessions"] == 1
@@ -0,0 +1,177 @@
+"""
+Tests for the in-process MCP transport.
+
+Uses a tiny FastMCP server written to a temp file so no subprocesses are
+started.
+"""
+
+import asyncio
+import threading
+import textwrap
+import pytest
+from contextlib import AsyncExitStack
+from unittest.mock import AsyncMock, patch
+
+from servers.utils import mcp_transport
+from servers.utils.mcp_transport import (
+    InProcessSession,
+    connect_mcp_server,
+    load_fastmcp_server,
+    INPROCESS,
+)
+
+
+SERVER_SOURCE = textwrap.dedent('''
+    import threading
+    from fastmcp import FastMCP
+
+    mcp = FastMCP("Tiny")
+
+    @mcp.tool(name="echo")
+    async def echo(text: str) -> dict:
+        return {"text": text}
+
+    @mcp.tool(name="thread_name")
+    def thread_name() -> dict:
+        return {"thread": threading.current_thread().name}
+
+    @mcp.tool(name="double")
+    def double(n: int) -> dict:
+        return {"n": n * 2}
+
+    @mcp.tool(name="fail")
+    def fail() -> dict:
+        raise ValueError("lookup failed")
+''')
+
+
+@pytest.fixture
+def server_path(tmp_path):
+    path = tmp_path / "tiny_server.py"
+    path.write_text(SERVER_SOURCE)
+    yield str(path)
+    mcp_transport._servers.pop(str(path.resolve()), None)
+
+
+class TestInProcessSession:
+    """Test InProcessSession against a real FastMCP server object."""
+
+    async def test_list_tools(self, server_path):
+        """Tools are listed with their schemas, like over stdio."""
+        session = InProcessSession(load_fastmcp_server(server_path), "tiny")
+        await session.initialize()
+
+        result = await session.list_tools()
+
+        names = {tool.name for tool in result.tools}
+        assert names == {"echo", "thread_name", "double", "fail"}
+        echo = next(t for t in result.tools if t.name == "echo")
+        assert "text" in echo.inputSchema["properties"]
+
+    async def test_call_async_tool(self, server_path):
+        """Async tools return CallToolResult text content."""
+        session = InProcessSession(load_fastmcp_server(server_path), "tiny")
+
+        result = await session.call_tool("echo", {"text": "hello"})
+
+        assert not result.isError
+        assert '"text":"hello"' in result.content[0].text.replace(" ", "")
+
+    async def test_sync_tool_runs_off_the_event_loop(self, server_path):
+        """Sync tools run in a worker thread, not the event loop thread."""
+        session = InProcessSession(load_fastmcp_server(server_path), "tiny")
+
+        result = await session.call_tool("thread_name", {})
+
+        assert not result.isError
+        assert threading.current_thread().name not in result.content[0].text
+
+    async def test_sync_tool_arguments_are_validated(self, server_path):
+        """Sync tools get FastMCP's argument validation, like over stdio."""
+        session = InProcessSession(load_fastmcp_server(server_path), "tiny")
+
+        coerced = await session.call_tool("double", {"n": "21"})
+        invalid = await session.call_tool("double", {"n": "many"})
+        missing = await session.call_tool("double", {})
+
+        assert not coerced.isError and coerced.structuredContent == {"n": 42}
+        assert invalid.isError and missing.isError
+
+    async def test_tool_error_becomes_error_result(self, server_path):
+        """Exceptions are returned as isError results instead of raising."""
+        session = InProcessSession(load_fastmcp_server(server_path), "tiny")
+
+        result = await session.call_tool("fail", {})
+
+        assert result.isError
+        assert "lookup failed" in result.content[0].text
+
+    async def test_concurrent_calls(self, server_path):
+        """Concurrent calls on one session don't interfere."""
+        session = InProcessSession(load_fastmcp_server(server_path), "tiny")
+
+        results = await asyncio.gather(*[session.call_tool("echo", {"text": str(i)}) for i in range(5)])
+
+        assert all(not r.isError for r in results)
+
+
+class TestConnectMCPServer:
+    """Test transport selection and fallback."""
+
+    def test_server_loaded_once(self, server_path):
+        """The server module is imported once per process."""
+        assert load_fastmcp_server(server_path) is load_fastmcp_server(server_path)
+
+    async def test_inprocess_connect(self, server_path):
+        """transport='inprocess' returns an initialized InProcessSession."""
+        async with AsyncExitStack() as exit_stack:
+            session = await connect_mcp_server(exit_stack, "tiny", server_path, transport=INPROCESS)
+        assert isinstance(session, InProcessSession)
+
+    async def test_falls_back_to_stdio_when_import_fails(self, tmp_path):
+        """A server that exits on import falls back to the stdio transport."""
+        bad_path = tmp_path / "bad_server.py"
+        bad_path.write_text("import sys\nsys.exit(1)\n")
+
+        fake_session = AsyncMock()
+        with patch.object(mcp_transport, 'stdio_client') as mock_stdio, \
+             patch.object(mcp_transport, 'ClientSession') as mock_session:
+            mock_stdio.return_value.__aenter__ = AsyncMock(return_value=("read", "write"))
+            mock_stdio.return_value.__aexit__ = AsyncMock(return_value=None)
+            mock_session.return_value.__aenter__ = AsyncMock(return_value=fake_session)
+            mock_session.return_value.__aexit__ = AsyncMock(return_value=None)
+
+            async with AsyncExitStack() as exit_stack:
+                session = await connect_mcp_server(
+                    exit_stack, "bad", str(bad_path), transport=INPROCESS, verbose=False
+                )
+
+        assert session is fake_session
+        fake_session.initialize.assert_awaited_once()
+        assert "--transport" in mock_stdio.call_args[0][0].args
+
+    async def test_stdio_uses_configured_command(self, tmp_path):
+        """stdio_params replaces the default `fastmcp run` subprocess."""
+        params = mcp_transport.StdioServerParameters(command="python", args=["server.py"])
+
+        with patch.object(mcp_transport, 'stdio_client') as mock_stdio, \
+             patch.object(mcp_transport, 'ClientSession') as mock_session:
+            mock_stdio.return_value.__aenter__ = AsyncMock(return_value=("read", "write"))
+            mock_stdio.return_value.__aexit__ = AsyncMock(return_value=None)
+            mock_session.return_value.__aenter__ = AsyncMock(return_value=AsyncMock())
+            mock_session.return_value.__aexit__ = AsyncMock(return_value=None)
+
+            async with AsyncExitStack() as exit_stack:
+                await connect_mcp_server(exit_stack, "tiny", "server.py", stdio_params=params)
+
+        mock_stdio.assert_called_once_with(params)
+
+    def test_transport_for(self, monkeypatch):
+        """Per-server env var wins over MCP_TRANSPORT; in-process by default."""
+        monkeypatch.delenv("MCP_TRANSPORT", raising=False)
+        assert mcp_transport.transport_for("nice") == INPROCESS
+
+        monkeypatch.setenv("MCP_TRANSPORT", "stdio")
+        monkeypatch.setenv("MCP_TRANSPORT_BNF", INPROCESS)
+        assert mcp_transport.transport_for("nice") == "stdio"
+        assert mcp_transport.transport_for("bnf") == INPROCESS
@@ -0,0 +1,159 @@
+"""
+Tests for self-contained PDF HTML (inlined bundles and CSS, rendered signal).
+
+Assets are loaded from tmp_path and the browser pool is given a fake page,
+so neither the frontend checkout nor Chromium is needed.
+"""
+
+import pytest
+from fastapi import HTTPException
+
+import pdf_generator_headless
+from pdf_generator_headless import (
+    TAILWIND_CDN, build_html_for_doctor_report_card_with_data, build_html_template,
+    generate_pdf_from_react, get_default_clinic_branding, load_pdf_assets,
+)
+from servers.utils.browser_pool import BrowserPool
+
+
+def write_static(static_dir, css=True):
+    static_dir.mkdir()
+    (static_dir / "pdf-templates-bundle.js").write_text("var PdfTemplates={render(){}};")
+    (static_dir / "doctor-report-card-bundle.js").write_text("var DoctorReportCardBundle={render(){}};")
+    (static_dir / "pdf-print.css").write_text(".compact{margin:0}")
+    if css:
+        (static_dir / "pdf-templates.css").write_text(".p-4{padding:1rem}")
+        (static_dir / "doctor-report-card.css").write_text(".bg-navy{background:#0c3555}")
+
+
+@pytest.fixture
+def use_assets(monkeypatch):
+    def install(assets):
+        monkeypatch.setattr(pdf_generator_headless, "_assets", assets)
+        return assets
+    return install
+
+
+def consultation_html() -> str:
+    return build_html_template("PdfConsultationForm", {"formData": {}}, get_default_clinic_branding())
+
+
+class TestPdfAssets:
+    """Test asset loading and the generated HTML."""
+
+    def test_compiled_css_inlined_without_cdn(self, tmp_path, use_assets):
+        write_static(tmp_path / "static")
+        assets = use_assets(load_pdf_assets(tmp_path / "static", tmp_path / "frontend"))
+
+        assert assets.self_contained
+        html = consultation_html()
+        assert TAILWIND_CDN not in html
+        assert ".p-4{padding:1rem}" in html and ".compact{margin:0}" in html
+        assert "var PdfTemplates" in html
+        assert "window.__pdfRendered = true" in html
+
+        report = build_html_for_doctor_report_card_with_data({"patientName": "A"}, [])
+        assert TAILWIND_CDN not in report and ".bg-navy" in report and "window.__pdfRendered" in report
+
+    def test_missing_css_fails_outside_development(self, tmp_path, use_assets):
+        write_static(tmp_path / "static", css=False)
+        use_assets(load_pdf_assets(tmp_path / "static", tmp_path / "frontend"))
+
+        with pytest.raises(HTTPException) as excinfo:
+            consultation_html()
+        assert excinfo.value.status_code == 503
+
+    def test_missing_css_falls_back_to_cdn_in_development(self, tmp_path, use_assets, monkeypatch):
+        monkeypatch.setattr(pdf_generator_headless, "ALLOW_CDN_CSS", True)
+        write_static(tmp_path / "static", css=False)
+        assets = use_assets(load_pdf_assets(tmp_path / "static", tmp_path / "frontend"))
+
+        assert not assets.self_contained
+        html = consultation_html()
+        assert TAILWIND_CDN in html
+        assert 'style.textContent = ".compact{margin:0}"' in html
+
+    def test_version_tracks_content(self, tmp_path):
+        static_dir = tmp_path / "static"
+        write_static(static_dir)
+        first = load_pdf_assets(static_dir, tmp_path / "frontend").version
+        assert load_pdf_assets(static_dir, tmp_path / "frontend").version == first
+
+        (static_dir / "pdf-templates.css").write_text(".p-8{padding:2rem}")
+        assert load_pdf_assets(static_dir, tmp_path / "frontend").version != first
+
+    def test_assets_read_once(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(pdf_generator_headless, "_assets", None)
+        monkeypatch.setattr(pdf_generator_headless, "load_pdf_assets", lambda: calls.append(1) or "assets")
+
+        assert pdf_generator_headless.get_pdf_assets() == pdf_generator_headless.get_pdf_assets() == "assets"
+        assert len(calls) == 1
+
+
+class FakePage:
+    def __init__(self):
+        self.calls = []
+
+    def on(self, event, handler):
+        pass
+
+    async def set_content(self, html, wait_until):
+        self.calls.append(("set_content", wait_until))
+
+    async def wait_for_function(self, expression, timeout):
+        self.calls.append(("wait_for_function", expression))
+
+    async def wait_for_timeout(self, ms):
+        self.calls.append(("wait_for_timeout", ms))
+
+    async def pdf(self, **kwargs):
+        return b"%PDF-1.4"
+
+
+class FakeBrowser:
+    def __init__(self, page):
+        self.page = page
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self, viewport=None):
+        browser = self
+
+        class Context:
+            async def new_page(self):
+                return browser.page
+
+            async def close(self):
+                pass
+
+        return Context()
+
+
+class TestGeneratePdf:
+    """Test generate_pdf_from_react waits on the rendered signal."""
+
+    @pytest.fixture
+    def page(self, monkeypatch):
+        page = FakePage()
+
+        async def launch():
+            return FakeBrowser(page)
+
+        pool = BrowserPool(launch=launch)
+        monkeypatch.setattr(pdf_generator_headless, "get_browser_pool", lambda: pool)
+        return page
+
+    async def test_waits_for_rendered_signal_not_network(self, page):
+        pdf = await generate_pdf_from_react("<html><div id='root'></div></html>")
+
+        assert pdf.getvalue() == b"%PDF-1.4"
+        assert page.calls == [
+            ("set_content", "load"),
+            ("wait_for_function", "window.__pdfRendered === true"),
+        ]
+
+    async def test_cdn_fallback_still_waits_for_network(self, page):
+        await generate_pdf_from_react(f'<script src="{TAILWIND_CDN}"></script>')
+        assert page.calls[0] == ("set_content", "networkidle")
@@ -0,0 +1,191 @@
+"""
+Tests for the content-addressed rendered-PDF cache.
+
+Uses a cache directory under tmp_path; renders are plain coroutines returning bytes.
+"""
+
+import asyncio
+import pytest
+
+from servers.utils import pdf_cache
+from servers.utils.pdf_cache import (
+    RenderedPdfCache, cached_pdf_response, etag_for, etag_matches, pdf_cache_key,
+)
+
+
+def renderer(content: bytes = b"%PDF-1.4 test", delay: float = 0.0):
+    calls = []
+
+    async def render() -> bytes:
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return content
+
+    render.calls = calls
+    return render
+
+
+class TestKeys:
+    """Test key and ETag helpers."""
+
+    def test_key_covers_inputs_and_versions(self):
+        inputs = {"form_data": {"a": 1, "b": [1, 2]}, "clinic_branding": {"primary_color": "#000"}}
+        key = pdf_cache_key("consultation", inputs, "v1")
+
+        assert key == pdf_cache_key("consultation", {"clinic_branding": {"primary_color": "#000"},
+                                                     "form_data": {"b": [1, 2], "a": 1}}, "v1")
+        assert key != pdf_cache_key("consultation", {**inputs, "form_data": {"a": 2, "b": [1, 2]}}, "v1")
+        assert key != pdf_cache_key("consultation", inputs, "v2")
+        assert key != pdf_cache_key("analysis", inputs, "v1")
+
+    def test_etag_matching(self):
+        etag = etag_for("ab" * 32)
+        assert etag_matches(etag, etag)
+        assert etag_matches(f'"other", W/{etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches('"other"', etag)
+        assert not etag_matches(None, etag)
+
+
+class TestRenderedPdfCache:
+    """Test RenderedPdfCache."""
+
+    async def test_render_once_then_hit(self, tmp_path):
+        cache = RenderedPdfCache(str(tmp_path))
+        render = renderer()
+
+        assert await cache.get_or_render("k1", render) == (b"%PDF-1.4 test", False)
+        assert await cache.get_or_render("k1", render) == (b"%PDF-1.4 test", True)
+        assert len(render.calls) == 1
+        assert cache.get_stats()["hits"] == 1
+
+    async def test_concurrent_misses_share_one_render(self, tmp_path):
+        cache = RenderedPdfCache(str(tmp_path))
+        render = renderer(delay=0.02)
+
+        results = await asyncio.gather(*[cache.get_or_render("k1", render) for _ in range(5)])
+        assert len(render.calls) == 1
+        assert all(data == b"%PDF-1.4 test" for data, _ in results)
+        assert cache.get_stats()["coalesced"] == 4
+
+    async def test_disconnected_caller_does_not_cancel_shared_render(self, tmp_path):
+        cache = RenderedPdfCache(str(tmp_path))
+        render = renderer(delay=0.05)
+
+        first = asyncio.create_task(cache.get_or_render("k1", render))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(cache.get_or_render("k1", render))
+        await asyncio.sleep(0.01)
+        first.cancel()  # Client went away mid-render
+
+        assert await second == (b"%PDF-1.4 test", False)
+        assert first.cancelled() and len(render.calls) == 1
+
+    async def test_render_finishes_after_every_caller_left(self, tmp_path):
+        cache = RenderedPdfCache(str(tmp_path))
+        render = renderer(delay=0.02)
+
+        only = asyncio.create_task(cache.get_or_render("k1", render))
+        await asyncio.sleep(0.005)
+        only.cancel()
+        await asyncio.sleep(0.05)
+
+        assert cache.contains("k1")
+        assert await cache.get_or_render("k1", render) == (b"%PDF-1.4 test", True)
+
+    async def test_failed_render_not_cached(self, tmp_path):
+        cache = RenderedPdfCache(str(tmp_path))
+
+        async def broken():
+            raise RuntimeError("chromium crashed")
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_render("k1", broken)
+        assert not cache.contains("k1")
+        assert await cache.get_or_render("k1", renderer()) == (b"%PDF-1.4 test", False)
+
+    async def test_lru_eviction_by_size(self, tmp_path):
+        cache = RenderedPdfCache(str(tmp_path), max_bytes=250)
+        for key in ("a", "b", "c"):
+            await cache.put(key, b"x" * 100)
+            if key == "b":
+                await cache.get("a")  # a is now more recent than b
+
+        assert cache.contains("a") and cache.contains("c") and not cache.contains("b")
+        assert not (tmp_path / "b" / "b.pdf").exists()
+        assert cache.get_stats()["evictions"] == 1
+
+    async def test_invalidate_by_tag(self, tmp_path):
+        cache = RenderedPdfCache(str(tmp_path))
+        await cache.put("k1", b"one", tags=["appointment:1", "doctor:7"])
+        await cache.put("k2", b"two", tags=["appointment:2", "doctor:7"])
+        await cache.put("k3", b"three", tags=["appointment:3", "doctor:8"])
+
+        assert cache.invalidate("appointment:1") == 1
+        assert cache.invalidate("doctor:7", "doctor:None") == 1
+        assert [cache.contains(k) for k in ("k1", "k2", "k3")] == [False, False, True]
+
+    async def test_index_and_tags_survive_restart(self, tmp_path):
+        first = RenderedPdfCache(str(tmp_path))
+        await first.put("k1", b"one", tags=["doctor:7"])
+
+        second = RenderedPdfCache(str(tmp_path))
+        assert await second.get("k1") == b"one"
+        assert second.invalidate("doctor:7") == 1
+
+
+class TestCachedPdfResponse:
+    """Test cached_pdf_response."""
+
+    @pytest.fixture(autouse=True)
+    def cache(self, tmp_path, monkeypatch):
+        cache = RenderedPdfCache(str(tmp_path))
+        monkeypatch.setattr(pdf_cache, "_cache", cache)
+        return cache
+
+    async def test_etag_and_conditional_get(self, cache):
+        render = renderer()
+        key = pdf_cache_key("consultation", {"form_data": {}}, "v1")
+
+        first = await cached_pdf_response(key, render, "consultation.pdf", ["appointment:1"])
+        assert first.status_code == 200 and first.body == b"%PDF-1.4 test"
+        assert first.headers["x-pdf-cache"] == "miss"
+        assert first.headers["content-disposition"] == "attachment; filename=consultation.pdf"
+        etag = first.headers["etag"]
+
+        second = await cached_pdf_response(key, render, "consultation.pdf", if_none_match=etag)
+        assert second.status_code == 304 and second.headers["etag"] == etag
+        assert len(render.calls) == 1
+        assert cache.get_stats()["not_modified"] == 1
+
+    async def test_invalidated_pdf_rerendered_despite_matching_etag(self, cache):
+        render = renderer()
+        key = pdf_cache_key("consultation", {"logo_url": "https://x/logo.png"}, "v1")
+        etag = (await cached_pdf_response(key, render, "c.pdf", ["doctor:7"])).headers["etag"]
+
+        cache.invalidate("doctor:7")  # Logo replaced at the same URL
+        response = await cached_pdf_response(key, render, "c.pdf", if_none_match=etag)
+        assert response.status_code == 200
+        assert len(render.calls) == 2
+
+
+class TestPrerender:
+    """Test that consultation prerenders are skipped when the cache is disabled."""
+
+    def test_not_scheduled_when_cache_disabled(self, monkeypatch):
+        import api
+
+        enqueued = []
+
+        class Queue:
+            def enqueue(self, kind, payload, concurrency_key=None):
+                enqueued.append(kind)
+
+        monkeypatch.setattr(api, "get_job_queue", lambda: Queue())
+        monkeypatch.setattr(pdf_cache, "ENABLED", False)
+        api._schedule_pdf_prerender("appt-1")
+        assert enqueued == []
+
+        monkeypatch.setattr(pdf_cache, "ENABLED", True)
+        api._schedule_pdf_prerender("appt-1")
+        assert enqueued == ["pdf_prerender"]
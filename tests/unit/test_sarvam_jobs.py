@@ -0,0 +1,168 @@
+"""
+Tests for the async Sarvam batch job manager.
+
+Uses a fake synchronous SDK client so no Sarvam calls are made.
+"""
+
+import asyncio
+import os
+import time
+import pytest
+from unittest.mock import MagicMock
+
+from servers.utils import sarvam_jobs
+from servers.utils.sarvam_jobs import SarvamJobManager, SarvamJobError
+
+
+class FakeSDKJob:
+    """Sync SDK job that completes (or fails) after a number of status polls."""
+
+    def __init__(self, job_id: str, polls_until_done: int, final_state: str = "Completed", results: dict = None):
+        self.job_id = job_id
+        self.polls_until_done = polls_until_done
+        self.final_state = final_state
+        self.results = results if results is not None else {"successful": [{"file_name": "a.mp3"}], "failed": []}
+        self.status_calls = 0
+
+    def upload_files(self, paths, timeout=None):
+        return True
+
+    def start(self):
+        pass
+
+    def get_status(self):
+        self.status_calls += 1
+        time.sleep(0.01)  # blocking SDK call; must run off the event loop
+        state = self.final_state if self.status_calls >= self.polls_until_done else "Running"
+        return MagicMock(job_state=state, error_message="boom", job_details=[])
+
+    def get_file_results(self):
+        return self.results
+
+
+def fake_client(*jobs):
+    """Fake SarvamAI client handing out the given jobs in order."""
+    client = MagicMock()
+    client.speech_to_text_translate_job.create_job.side_effect = list(jobs)
+    return client
+
+
+def manager_for(*jobs, **kwargs) -> SarvamJobManager:
+    return SarvamJobManager(client=fake_client(*jobs), poll_min=0.01, poll_max=0.05, backoff=2.0, **kwargs)
+
+
+class TestSarvamJobManager:
+    """Test SarvamJobManager."""
+
+    async def test_run_job_returns_results(self):
+        job = FakeSDKJob("job-1", polls_until_done=3)
+        manager = manager_for(job)
+
+        completed = await manager.run_job("/tmp/chunk.mp3", num_speakers=2)
+
+        assert completed.results == job.results
+        assert job.status_calls == 3
+        stats = manager.get_stats()
+        assert (stats["submitted"], stats["completed"], stats["outstanding"]) == (1, 1, 0)
+        await manager.aclose()
+
+    async def test_concurrent_jobs_polled_together(self):
+        jobs = [FakeSDKJob(f"job-{i}", polls_until_done=3) for i in range(5)]
+        manager = manager_for(*jobs)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[manager.run_job(f"/tmp/chunk{i}.mp3") for i in range(5)])
+        elapsed = time.perf_counter() - start
+
+        # Serialised jobs would take ~5x as long as one
+        assert elapsed < 0.5
+        assert manager.get_stats()["peak_outstanding"] == 5
+        await manager.aclose()
+
+    async def test_slow_result_fetch_does_not_hold_up_other_polls(self, monkeypatch):
+        monkeypatch.setattr(sarvam_jobs, "RESULTS_RETRY_SECONDS", 0.1)
+        slow = FakeSDKJob("slow", polls_until_done=1, results={})  # retries get_file_results
+        fast = FakeSDKJob("fast", polls_until_done=4)
+        manager = manager_for(slow, fast)
+        finished = []
+
+        async def run(path):
+            job = await manager.run_job(path)
+            finished.append(job.job_id)
+
+        await asyncio.gather(run("/tmp/slow.mp3"), run("/tmp/fast.mp3"))
+        assert finished == ["fast", "slow"]
+        await manager.aclose()
+
+    async def test_poll_interval_backs_off(self):
+        job = FakeSDKJob("job-1", polls_until_done=10)
+        manager = manager_for(job)
+
+        submitted = await manager.submit("/tmp/chunk.mp3")
+        await submitted.future
+
+        assert submitted.poll_interval == manager.poll_max
+        await manager.aclose()
+
+    async def test_failed_job_raises(self):
+        manager = manager_for(FakeSDKJob("job-1", polls_until_done=2, final_state="Failed"))
+
+        with pytest.raises(SarvamJobError, match="boom"):
+            await manager.run_job("/tmp/chunk.mp3")
+        assert manager.get_stats()["failed"] == 1
+        await manager.aclose()
+
+    async def test_timeout_raises(self):
+        manager = manager_for(FakeSDKJob("job-1", polls_until_done=1000), job_timeout=0.1)
+
+        with pytest.raises(SarvamJobError, match="timed out"):
+            await manager.run_job("/tmp/chunk.mp3")
+        assert manager.get_stats()["timeouts"] == 1
+        await manager.aclose()
+
+    async def test_bytes_uploaded_from_temp_file(self):
+        job = FakeSDKJob("job-1", polls_until_done=1)
+        uploaded = {}
+
+        def upload_files(paths, timeout=None):
+            with open(paths[0], 'rb') as f:
+                uploaded[paths[0]] = f.read()
+            return True
+
+        job.upload_files = upload_files
+        manager = manager_for(job)
+
+        await manager.run_job(b"mp3-bytes", suffix=".mp3")
+
+        [(path, data)] = uploaded.items()
+        assert data == b"mp3-bytes"
+        assert path.endswith(".mp3")
+        assert not os.path.exists(path)  # removed once uploaded
+        await manager.aclose()
+
+    async def test_upload_failure_raises(self):
+        job = FakeSDKJob("job-1", polls_until_done=1)
+        job.upload_files = lambda paths, timeout=None: False
+        manager = manager_for(job)
+
+        with pytest.raises(SarvamJobError, match="upload"):
+            await manager.run_job("/tmp/chunk.mp3")
+        await manager.aclose()
+
+    async def test_event_loop_not_blocked(self):
+        """Other coroutines keep running while jobs are outstanding."""
+        manager = manager_for(FakeSDKJob("job-1", polls_until_done=5))
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        await manager.run_job("/tmp/chunk.mp3")
+        task.cancel()
+
+        assert ticks > 5
+        await manager.aclose()
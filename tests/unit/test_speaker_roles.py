@@ -0,0 +1,184 @@
+"""
+Tests for memoised speaker role identification.
+
+The LLM gateway is replaced by a fake that records prompts, so no API key is needed.
+"""
+
+import asyncio
+import json
+import pytest
+from unittest.mock import MagicMock
+
+from servers.utils import speaker_roles
+from servers.utils.speaker_roles import (
+    SpeakerRoleIdentifier, apply_roles, parse_role_mapping, relabel_transcript, select_role_sample,
+)
+
+
+def turn(speaker_id: str, text: str) -> dict:
+    return {'speaker_id': speaker_id, 'text': text, 'start_time': 0.0, 'end_time': 0.0}
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Fake gateway answering with `fake_llm.reply` and recording each prompt."""
+    class FakeGateway:
+        reply = {"speaker_0": "Doctor", "speaker_1": "Patient"}
+        prompts = []
+
+        async def create_message(self, **kwargs):
+            self.prompts.append(kwargs["messages"][0]["content"])
+            await asyncio.sleep(0.01)
+            return MagicMock(content=[MagicMock(text=json.dumps(self.reply))])
+
+    gateway = FakeGateway()
+    gateway.prompts = []
+    monkeypatch.setattr(speaker_roles, "get_llm_gateway", lambda: gateway)
+    return gateway
+
+
+def long_consultation(turns: int = 200) -> list:
+    segments = []
+    for i in range(turns):
+        if i % 2 == 0:
+            segments.append(turn('speaker_0', f"Okay, noted point {i}." if i % 10 else f"How long has pain {i} lasted?"))
+        else:
+            segments.append(turn('speaker_1', f"It has been there since day {i}."))
+    return segments
+
+
+class TestSampling:
+    """Test sample selection and response parsing helpers."""
+
+    def test_short_conversation_sent_whole(self):
+        segments = [turn('speaker_0', 'Hello'), turn('speaker_1', 'Hi doctor'), turn('speaker_0', '')]
+        assert select_role_sample(segments) == segments[:2]
+
+    def test_sample_bounded_and_question_heavy(self):
+        segments = long_consultation()
+        sample = select_role_sample(segments, first_turns=6, max_turns=20)
+
+        assert len(sample) == 20
+        assert sample[:6] == segments[:6]
+        assert sum('?' in seg['text'] for seg in sample) >= 5
+        # Question turns are followed by their answers, in original order
+        assert [segments.index(seg) for seg in sample] == sorted(segments.index(seg) for seg in sample)
+
+    def test_late_speaker_represented(self):
+        segments = long_consultation(100) + [turn('speaker_2', 'I am his wife, he snores too.')]
+        sample = select_role_sample(segments, first_turns=6, max_turns=12)
+        assert any(seg['speaker_id'] == 'speaker_2' for seg in sample)
+
+    def test_parse_role_mapping_formats(self):
+        assert parse_role_mapping('{"speaker_0": "Doctor"}') == {"speaker_0": "Doctor"}
+        fenced = '```json\n{"speaker_0": {"role": "Patient", "confidence": 0.9}}\n```'
+        assert parse_role_mapping(fenced) == {"speaker_0": "Patient"}
+        with pytest.raises(json.JSONDecodeError):
+            parse_role_mapping("speaker_0 is the doctor")
+
+    def test_apply_and_relabel(self):
+        roles = {"speaker_0": "Doctor", "speaker_1": "Patient"}
+        segments = apply_roles([turn('speaker_0', 'Hi'), turn('speaker_2', 'Hello')], roles)
+        assert [seg['speaker_role'] for seg in segments] == ['Doctor', 'speaker_2']
+        assert relabel_transcript("speaker_0: Hi\n\nspeaker_1: Hello", roles) == "Doctor: Hi\n\nPatient: Hello"
+
+
+class TestSpeakerRoleIdentifier:
+    """Test SpeakerRoleIdentifier memoisation."""
+
+    async def test_memo_reused_for_same_recording(self, fake_llm):
+        identifier = SpeakerRoleIdentifier()
+        segments = long_consultation(40)
+
+        first = await identifier.identify(segments, key="rec-1")
+        second = await identifier.identify(segments + long_consultation(10), key="rec-1")
+
+        assert first.roles == second.roles == {"speaker_0": "Doctor", "speaker_1": "Patient"}
+        assert (first.cached, second.cached) == (False, True)
+        assert len(fake_llm.prompts) == 1
+        assert identifier.get_stats()["memo_hits"] == 1
+
+    async def test_new_speaker_triggers_update(self, fake_llm):
+        identifier = SpeakerRoleIdentifier()
+        await identifier.identify(long_consultation(20), key="rec-1")
+
+        fake_llm.reply = {"speaker_0": "Doctor", "speaker_1": "Patient", "speaker_2": "Family Member"}
+        result = await identifier.identify(long_consultation(20) + [turn('speaker_2', 'I am his wife.')], key="rec-1")
+
+        assert not result.cached
+        assert result.roles["speaker_2"] == "Family Member"
+        assert '"speaker_2"' in fake_llm.prompts[-1]
+        assert identifier.get_stats()["new_speaker_updates"] == 1
+
+    async def test_prompt_uses_bounded_sample(self, fake_llm):
+        identifier = SpeakerRoleIdentifier(first_turns=6, max_turns=20)
+        result = await identifier.identify(long_consultation(400), key="rec-1")
+
+        assert result.segments_analyzed == 20
+        assert "20 of 400 turns" in fake_llm.prompts[0]
+
+    async def test_concurrent_calls_share_one_llm_call(self, fake_llm):
+        identifier = SpeakerRoleIdentifier()
+        results = await asyncio.gather(*[identifier.identify(long_consultation(20), key="rec-1") for _ in range(5)])
+
+        assert len(fake_llm.prompts) == 1
+        assert sum(not r.cached for r in results) == 1
+
+    async def test_alias_and_refresh(self, fake_llm):
+        identifier = SpeakerRoleIdentifier()
+        await identifier.identify(long_consultation(20), key="appt-1")
+        identifier.alias("consultation-1", "appt-1")
+
+        assert identifier.get("consultation-1") == {"speaker_0": "Doctor", "speaker_1": "Patient"}
+        assert identifier.resolve_key(None, "consultation-9", "consultation-1") == "consultation-1"
+
+        fake_llm.reply = {"speaker_0": "Patient", "speaker_1": "Doctor"}
+        result = await identifier.identify(long_consultation(20), key="consultation-1", refresh=True)
+        assert not result.cached
+        assert identifier.get("appt-1") == {"speaker_0": "Patient", "speaker_1": "Doctor"}
+
+    async def test_swapped_labels_from_another_pass_reidentified(self, fake_llm):
+        identifier = SpeakerRoleIdentifier()
+        segments = long_consultation(20)
+        await identifier.identify(segments, key="consultation-1")
+
+        # A windowed rerun labels the same conversation with the speakers swapped
+        swap = {'speaker_0': 'speaker_1', 'speaker_1': 'speaker_0'}
+        rerun = [{**seg, 'speaker_id': swap[seg['speaker_id']]} for seg in segments]
+        fake_llm.reply = {"speaker_0": "Patient", "speaker_1": "Doctor"}
+        result = await identifier.identify(rerun, key="consultation-1")
+
+        assert not result.cached and result.roles == {"speaker_0": "Patient", "speaker_1": "Doctor"}
+        assert identifier.get_stats()["relabelled"] == 1
+        assert (await identifier.identify(rerun, key="consultation-1")).cached
+
+    async def test_expiry_while_identifying_keeps_the_lock(self, fake_llm):
+        identifier = SpeakerRoleIdentifier(ttl_seconds=60)
+        identifier.remember("rec-1", {"speaker_0": "Doctor"})
+        identifier._memos["rec-1"].updated_at -= 120
+
+        async with identifier._locks.get("rec-1") as lock:
+            assert identifier.get("rec-1") is None  # expiry forgets the memo
+            assert identifier._locks.get("rec-1") is lock
+
+    async def test_calls_without_key_not_memoised(self, fake_llm):
+        identifier = SpeakerRoleIdentifier()
+        await identifier.identify(long_consultation(10))
+        await identifier.identify(long_consultation(10))
+        assert len(fake_llm.prompts) == 2
+        assert identifier.get_stats()["memos"] == 0
+
+    def test_aliases_dropped_with_their_memo_and_bounded(self):
+        identifier = SpeakerRoleIdentifier(max_memos=2)
+        roles = {"speaker_0": "Doctor", "speaker_1": "Patient"}
+        for i in range(5):
+            identifier.remember(f"rec-{i}", roles)
+            identifier.alias(f"consultation-{i}", f"rec-{i}")
+
+        assert set(identifier._aliases) == {"consultation-3", "consultation-4"}
+        identifier.forget("consultation-4")
+        assert set(identifier._aliases) == {"consultation-3"}
+
+        for i in range(5):
+            identifier.alias(f"pending-{i}", f"rec-new-{i}")  # recordings not identified yet
+        assert identifier.get_stats()["aliases"] == 2
@@ -0,0 +1,173 @@
+"""
+Tests for server-side cross-chunk speaker stitching.
+
+Chunks are 30 s long with a 10 s overlap (chunk 1 covers 20-50 s), matching
+what the frontend sends to /api/diarize-chunk.
+"""
+
+import time
+
+from servers.utils.speaker_stitching import (
+    RecordingStitcher, SpeakerStitchStore, calculate_overlap_stats, clip_segment,
+)
+
+
+def seg(speaker_id: str, text: str, start: float, end: float) -> dict:
+    return {'speaker_id': speaker_id, 'text': text, 'start_time': start, 'end_time': end}
+
+
+CHUNK_0 = [
+    seg('speaker_0', 'hello how are you feeling today', 0.0, 6.0),
+    seg('speaker_1', 'not great my head hurts since monday', 7.0, 15.0),
+    seg('speaker_0', 'i see any fever or nausea with that', 21.0, 29.0),
+]
+
+# Same people, labels swapped by the provider; starts 1 s into the overlap
+CHUNK_1 = [
+    seg('speaker_1', 'see any fever or nausea with that', 1.2, 9.0),
+    seg('speaker_0', 'yes a little fever last night', 20.5, 27.0),
+]
+
+# Covers 40-70 s; the provider missed the first word of the overlap
+CHUNK_2 = [
+    seg('speaker_1', 'a little fever last night', 0.8, 7.0),
+    seg('speaker_0', 'lets check your temperature', 11.0, 14.0),
+]
+
+
+class TestHelpers:
+    """Test the overlap statistics and segment clipping helpers."""
+
+    def test_calculate_overlap_stats(self):
+        stats = calculate_overlap_stats(CHUNK_0, 20.0, 30.0)
+        assert list(stats) == ['speaker_0']
+        assert stats['speaker_0']['duration'] == 8.0
+        assert stats['speaker_0']['word_count'] == 8
+
+    def test_clip_segment_by_interpolated_word_times(self):
+        segment = seg('speaker_0', 'one two three four', 0.0, 4.0)
+        assert clip_segment(segment, float('-inf'), 2.0)['text'] == 'one two'
+        tail = clip_segment(segment, 2.0, float('inf'))
+        assert (tail['text'], tail['start_time'], tail['end_time']) == ('three four', 2.0, 4.0)
+        assert clip_segment(segment, 5.0, 9.0) is None
+        assert clip_segment(segment, -1.0, 9.0) == segment
+
+
+class TestRecordingStitcher:
+    """Test RecordingStitcher."""
+
+    def test_swapped_labels_mapped_to_global_ids(self):
+        stitcher = RecordingStitcher('rec-1')
+        stitcher.add_chunk(0, 0.0, 30.0, CHUNK_0)
+        result = stitcher.add_chunk(1, 20.0, 50.0, CHUNK_1)
+
+        assert result['stitched']
+        assert result['speaker_map'] == {'speaker_1': 'speaker_0', 'speaker_0': 'speaker_1'}
+        assert result['replace_from'] == 25.0
+        assert stitcher.speakers == ['speaker_0', 'speaker_1']
+
+    def test_overlap_words_not_duplicated(self):
+        stitcher = RecordingStitcher('rec-1')
+        for index, (start, chunk) in enumerate([(0.0, CHUNK_0), (20.0, CHUNK_1), (40.0, CHUNK_2)]):
+            stitcher.add_chunk(index, start, start + 30.0, chunk)
+
+        merged = stitcher.merged_segments()
+        assert [s['speaker_id'] for s in merged] == ['speaker_0', 'speaker_1', 'speaker_0', 'speaker_1', 'speaker_0']
+        assert merged[2]['text'] == 'i see any fever or nausea with that'
+        assert merged[3]['text'] == 'yes a little fever last night'
+        assert stitcher.formatted_transcript().count('fever') == 2
+
+    def test_roles_attached_to_later_chunks(self):
+        stitcher = RecordingStitcher('rec-1')
+        stitcher.add_chunk(0, 0.0, 30.0, CHUNK_0)
+        stitcher.set_roles({'speaker_0': 'Doctor', 'speaker_1': 'Patient'})
+        result = stitcher.add_chunk(1, 20.0, 50.0, CHUNK_1)
+
+        assert [s['speaker_role'] for s in result['stitched_segments']] == ['Doctor', 'Patient']
+        assert stitcher.formatted_transcript().startswith('Doctor: hello')
+
+    def test_silent_overlap_falls_back_to_activity_rank(self):
+        stitcher = RecordingStitcher('rec-1')
+        stitcher.add_chunk(0, 0.0, 30.0, [seg('a', 'long turn ' * 10, 0.0, 15.0), seg('b', 'short', 16.0, 18.0)])
+        result = stitcher.add_chunk(1, 20.0, 50.0, [seg('x', 'brief', 12.0, 13.0), seg('y', 'long turn ' * 8, 14.0, 28.0)])
+
+        assert result['speaker_map'] == {'y': 'speaker_0', 'x': 'speaker_1'}
+
+    def test_new_speaker_gets_new_global_id(self):
+        stitcher = RecordingStitcher('rec-1')
+        stitcher.add_chunk(0, 0.0, 30.0, CHUNK_0)
+        chunk = CHUNK_1 + [seg('speaker_2', 'nurse here with the results', 20.0, 25.0)]
+        result = stitcher.add_chunk(1, 20.0, 50.0, chunk)
+
+        assert result['speaker_map']['speaker_2'] == 'speaker_2'
+        assert stitcher.speakers == ['speaker_0', 'speaker_1', 'speaker_2']
+
+    def test_out_of_order_chunk_buffered_until_gap_filled(self):
+        stitcher = RecordingStitcher('rec-1')
+        stitcher.add_chunk(0, 0.0, 30.0, CHUNK_0)
+
+        early = stitcher.add_chunk(2, 40.0, 70.0, CHUNK_2)
+        assert not early['stitched'] and stitcher.pending_chunks == [2]
+
+        stitcher.add_chunk(1, 20.0, 50.0, CHUNK_1)
+        assert stitcher.pending_chunks == []
+        assert stitcher.chunks_stitched == 3
+        assert stitcher.speaker_maps[2] == {'speaker_1': 'speaker_1', 'speaker_0': 'speaker_0'}
+
+    def test_retried_chunk_returns_same_result(self):
+        stitcher = RecordingStitcher('rec-1')
+        stitcher.add_chunk(0, 0.0, 30.0, CHUNK_0)
+        first = stitcher.add_chunk(1, 20.0, 50.0, CHUNK_1)
+        assert stitcher.add_chunk(1, 20.0, 50.0, CHUNK_1) is first
+        assert stitcher.formatted_transcript().count('yes a little fever') == 1
+
+    def test_flush_stitches_across_missing_chunk(self):
+        stitcher = RecordingStitcher('rec-1')
+        stitcher.add_chunk(0, 0.0, 30.0, CHUNK_0)
+        stitcher.add_chunk(2, 40.0, 70.0, CHUNK_2)
+        stitcher.flush()
+
+        assert stitcher.pending_chunks == []
+        assert 'check your temperature' in stitcher.formatted_transcript()
+
+
+class TestSpeakerStitchStore:
+    """Test SpeakerStitchStore."""
+
+    def test_retried_chunk_zero_keeps_the_recording(self):
+        store = SpeakerStitchStore()
+        first, result = store.add_chunk('appt-1', 0, 0.0, 30.0, CHUNK_0)
+        store.add_chunk('appt-1', 1, 20.0, 50.0, CHUNK_1)
+        second, retried = store.add_chunk('appt-1', 0, 0.0, 30.0, CHUNK_0)
+
+        assert second is first and retried == result
+        assert store.get('appt-1').chunks_stitched == 2
+        assert store.get_stats()['started'] == 1
+
+    def test_late_chunk_zero_fills_the_gap(self):
+        store = SpeakerStitchStore()
+        _, buffered = store.add_chunk('appt-1', 1, 20.0, 50.0, CHUNK_1)
+        stitcher, _ = store.add_chunk('appt-1', 0, 0.0, 30.0, CHUNK_0)
+
+        assert not buffered['stitched']
+        assert stitcher.chunks_stitched == 2 and stitcher.pending_chunks == []
+
+    async def test_held_lock_survives_delete(self):
+        store = SpeakerStitchStore()
+        store.start('appt-1')
+        async with store.lock('appt-1') as lock:
+            store.delete('appt-1')
+            assert store.lock('appt-1') is lock
+        assert len(store._locks) == 0
+
+    def test_expired_and_evicted_recordings(self):
+        store = SpeakerStitchStore(ttl_seconds=60, max_recordings=2)
+        for recording_id in ('a', 'b', 'c'):
+            store.start(recording_id)
+        assert store.get('a') is None
+
+        store.get('b').updated_at = time.time() - 120
+        assert store.get('b') is None
+        assert store.get('c') is not None
+        stats = store.get_stats()
+        assert (stats['evicted'], stats['expired']) == (1, 1)
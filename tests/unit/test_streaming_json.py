@@ -0,0 +1,63 @@
+"""
+Tests for the incremental JSON member parser used by streaming field extraction.
+"""
+
+from servers.utils.streaming_json import StreamingObjectParser
+
+
+RESPONSE = '''Here are the extracted fields:
+```json
+{
+  "field_updates": {
+    "weight": {"value": 61, "confidence": 0.95},
+    "bp": {"value": "120/80 \\"sitting\\", {left arm}", "confidence": 0.9},
+    "peripheral_pulses": {"value": [{"side": "Left", "radial": "2+"}, {"side": "Right", "radial": "2+"}], "confidence": 0.8}
+  },
+  "notes": {"ignored": true}
+}
+```'''
+
+EXPECTED = [
+    ("weight", {"value": 61, "confidence": 0.95}),
+    ("bp", {"value": '120/80 "sitting", {left arm}', "confidence": 0.9}),
+    ("peripheral_pulses", {"value": [{"side": "Left", "radial": "2+"}, {"side": "Right", "radial": "2+"}], "confidence": 0.8}),
+]
+
+
+def feed_in_chunks(text: str, size: int):
+    parser = StreamingObjectParser("field_updates")
+    members = []
+    for i in range(0, len(text), size):
+        members.extend(parser.feed(text[i:i + size]))
+    return parser, members
+
+
+class TestStreamingObjectParser:
+    """Test StreamingObjectParser."""
+
+    def test_members_independent_of_chunking(self):
+        for size in (1, 2, 5, 17, len(RESPONSE)):
+            parser, members = feed_in_chunks(RESPONSE, size)
+            assert members == EXPECTED
+            assert parser.done
+            assert parser.errors == 0
+
+    def test_member_emitted_as_soon_as_complete(self):
+        parser = StreamingObjectParser("field_updates")
+        assert parser.feed('{"field_updates": {"weight": {"value": 61, "confidence": 0.9}') == []
+        assert parser.feed(', "bp"') == [("weight", {"value": 61, "confidence": 0.9})]
+        assert not parser.done
+
+    def test_other_properties_ignored(self):
+        parser, members = feed_in_chunks('{"other": {"a": 1}, "field_updates": {"b": 2}}', 3)
+        assert members == [("b", 2)]
+
+    def test_empty_object(self):
+        parser, members = feed_in_chunks('{"field_updates": {}}', 1)
+        assert members == []
+        assert parser.done
+
+    def test_malformed_member_skipped(self):
+        parser, members = feed_in_chunks('{"field_updates": {"a": 1, "b": nope, "c": 3}}', 4)
+        assert members == [("a", 1), ("c", 3)]
+        assert parser.errors == 1
@@ -0,0 +1,87 @@
+"""
+Tests for the shared async Supabase data-access layer.
+
+Uses an httpx MockTransport in place of PostgREST so no network is needed.
+"""
+
+import asyncio
+import httpx
+import pytest
+
+from servers.utils import supabase_db
+from servers.utils.supabase_db import SupabaseDB, get_db
+
+
+def _mock_transport(seen: list, delay: float = 0.0, status: int = 200):
+    """Transport that records requests and returns a single-row JSON array."""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        if delay:
+            await asyncio.sleep(delay)
+        return httpx.Response(status, json=[{"id": "row-1"}] if status < 400 else {"message": "boom"})
+
+    return httpx.MockTransport(handler)
+
+
+class TestSupabaseDB:
+    """Test the SupabaseDB wrapper."""
+
+    async def test_query_is_awaitable_and_authenticated(self):
+        """Queries hit /rest/v1 with the service key and return data."""
+        seen = []
+        db = SupabaseDB("https://example.supabase.co", "service-key", transport=_mock_transport(seen))
+
+        result = await db.table('consultations').select('*').eq('id', 'abc').execute()
+
+        assert result.data == [{"id": "row-1"}]
+        request = seen[0]
+        assert request.url.path == "/rest/v1/consultations"
+        assert request.url.params["id"] == "eq.abc"
+        assert request.headers["apikey"] == "service-key"
+        assert request.headers["authorization"] == "Bearer service-key"
+        await db.aclose()
+
+    async def test_single_client_reused_across_queries(self):
+        """All queries share one httpx client."""
+        db = SupabaseDB("https://example.supabase.co", "service-key", transport=_mock_transport([]))
+
+        await db.table('patients').select('*').execute()
+        first_client = db.http
+        await db.table('doctors').select('*').execute()
+
+        assert db.http is first_client
+        await db.aclose()
+
+    async def test_stats_record_latency_and_errors(self):
+        """Concurrent queries are tracked; 4xx responses count as errors."""
+        db = SupabaseDB("https://example.supabase.co", "service-key", transport=_mock_transport([], delay=0.05))
+
+        await asyncio.gather(*[db.table('patients').select('*').execute() for _ in range(3)])
+
+        stats = db.get_stats()
+        assert stats["requests"] == 3
+        assert stats["in_flight"] == 0
+        assert stats["peak_in_flight"] == 3
+        assert stats["avg_latency_ms"] > 0
+        await db.aclose()
+
+        failing = SupabaseDB("https://example.supabase.co", "service-key", transport=_mock_transport([], status=400))
+        with pytest.raises(Exception):
+            await failing.table('patients').select('*').execute()
+        assert failing.get_stats()["errors"] == 1
+        await failing.aclose()
+
+    def test_get_db_is_process_wide(self, monkeypatch):
+        """get_db returns the same instance every time."""
+        monkeypatch.setattr(supabase_db, "_db", None)
+        db = get_db("https://example.supabase.co", "service-key")
+        assert get_db() is db
+        monkeypatch.setattr(supabase_db, "_db", None)
+
+    def test_get_db_requires_configuration(self, monkeypatch):
+        """Missing credentials raise a clear error."""
+        monkeypatch.setattr(supabase_db, "_db", None)
+        for var in ("SUPABASE_URL", "SUPABASE_SERVICE_KEY", "SUPABASE_SERVICE_ROLE_KEY"):
+            monkeypatch.delenv(var, raising=False)
+        with pytest.raises(ValueError):
+            get_db()
@@ -0,0 +1,78 @@
+"""
+Tests for concurrent tool_use execution in the clinical decision support engines.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from servers.clinical_decision_support.utils import execute_tool_uses
+
+
+def tool_use(block_id: str, name: str, **tool_input):
+    """Build a tool_use content block like the Anthropic SDK returns."""
+    return SimpleNamespace(type="tool_use", id=block_id, name=name, input=tool_input)
+
+
+def make_call_tool(delays: dict, in_flight: list = None):
+    """Fake engine call_tool whose tools sleep for a per-tool delay."""
+    active = [0]
+
+    async def call_tool(tool_name, arguments):
+        active[0] += 1
+        if in_flight is not None:
+            in_flight.append(active[0])
+        try:
+            delay = delays[tool_name]
+            if isinstance(delay, Exception):
+                raise delay
+            await asyncio.sleep(delay)
+            return MagicMock(content=[MagicMock(text=f"{tool_name} result")])
+        finally:
+            active[0] -= 1
+
+    return call_tool
+
+
+class TestExecuteToolUses:
+    """Test execute_tool_uses."""
+
+    async def test_runs_concurrently_and_keeps_order(self):
+        """Turn latency is the slowest tool, results stay in tool_use order."""
+        call_tool = make_call_tool({"search_nice": 0.2, "search_cks": 0.05, "bnf_summary": 0.1})
+        blocks = [
+            tool_use("tu_1", "search_nice", keyword="asthma"),
+            tool_use("tu_2", "search_cks", keyword="asthma"),
+            tool_use("tu_3", "bnf_summary", drug="salbutamol"),
+        ]
+
+        start = time.perf_counter()
+        results = await execute_tool_uses(call_tool, blocks)
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.3
+        assert [r["tool_use_id"] for r in results] == ["tu_1", "tu_2", "tu_3"]
+        assert results[0] == {"type": "tool_result", "tool_use_id": "tu_1", "content": "search_nice result"}
+
+    async def test_concurrency_limit(self):
+        """No more than max_concurrency tool calls run at once."""
+        in_flight = []
+        call_tool = make_call_tool({"search": 0.02}, in_flight)
+        blocks = [tool_use(f"tu_{i}", "search") for i in range(6)]
+
+        results = await execute_tool_uses(call_tool, blocks, max_concurrency=2)
+
+        assert len(results) == 6
+        assert max(in_flight) == 2
+
+    async def test_timeout_and_failure_become_error_results(self):
+        """A slow or failing tool is reported to Claude without failing the turn."""
+        call_tool = make_call_tool({"slow": 1.0, "broken": ValueError("server down"), "ok": 0})
+        blocks = [tool_use("tu_1", "slow"), tool_use("tu_2", "broken"), tool_use("tu_3", "ok")]
+
+        results = await execute_tool_uses(call_tool, blocks, timeout=0.05)
+
+        assert results[0]["is_error"] and "timed out" in results[0]["content"]
+        assert results[1]["is_error"] and "server down" in results[1]["content"]
+        assert "is_error" not in results[2]
@@ -0,0 +1,111 @@
+"""
+Tests for transcription reruns (waiting on the job, concurrent windows stitched in order).
+
+The transcoder and provider are faked, so neither ffmpeg nor an STT key is needed.
+"""
+
+import asyncio
+import pytest
+
+import api
+from servers.utils.audio_transcoder import PCM_BYTES_PER_SECOND
+from servers.utils.job_queue import Job, JobContext, JobQueue, SQLiteJobBackend
+
+
+class FakeBackend:
+    def set_progress(self, job_id, progress):
+        pass
+
+
+class FakeTranscoder:
+    async def transcode(self, data, audio_format, input_format=None):
+        return data
+
+
+@pytest.fixture
+def windows(monkeypatch):
+    """12 s windows with 2 s overlap; each window's PCM is replaced by its start time."""
+    monkeypatch.setattr(api, "RERUN_WINDOW_SECONDS", 12.0)
+    monkeypatch.setattr(api, "RERUN_WINDOW_OVERLAP_SECONDS", 2.0)
+    monkeypatch.setattr(api, "RERUN_WINDOW_CONCURRENCY", 5)
+    monkeypatch.setattr(api, "get_audio_transcoder", lambda: FakeTranscoder())
+    queue = JobQueue(backend=SQLiteJobBackend(":memory:"), concurrency_limits={"sarvam": 2})
+    monkeypatch.setattr(api, "get_job_queue", lambda: queue)
+    monkeypatch.setattr(api, "pcm_slice", lambda pcm, start, end: str(start).encode())
+
+
+def context(concurrency_key=None) -> JobContext:
+    job = Job(id="job-1", kind="transcription_rerun", payload={}, concurrency_key=concurrency_key)
+    return JobContext(job=job, data=None, _backend=FakeBackend())
+
+
+class TestDiarizeWindowed:
+    """Test _diarize_windowed."""
+
+    async def test_windows_finishing_out_of_order_are_all_kept(self, windows, monkeypatch):
+        completed = []
+
+        async def diarize(audio, provider, language):
+            index = int(float(audio.data) // 10)
+            await asyncio.sleep(0.05 if index == 0 else 0.01 * index)  # window 0 finishes last
+            completed.append(index)
+            return {"segments": [
+                {"speaker_id": "speaker_0", "text": f"window{index}", "start_time": 4.0, "end_time": 5.0},
+            ]}
+
+        monkeypatch.setattr(api, "_diarize_rerun_audio", diarize)
+        segments, count = await api._diarize_windowed(context(), b"\0" * 50 * PCM_BYTES_PER_SECOND, "elevenlabs", "en")
+
+        assert count == 5 and completed[-1] == 0
+        text = " ".join(seg["text"] for seg in segments)
+        assert text.split() == ["window0", "window1", "window2", "window3", "window4"]
+        assert segments[0]["start_time"] == 4.0
+
+    async def test_provider_calls_stay_within_the_queue_cap(self, windows, monkeypatch):
+        running = peak = 0
+
+        async def diarize(audio, provider, language):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"segments": []}
+
+        monkeypatch.setattr(api, "_diarize_rerun_audio", diarize)
+        queue = api.get_job_queue()
+        queue._running_by_key["sarvam"] = 1  # the rerun job's own slot
+
+        _, count = await api._diarize_windowed(context("sarvam"), b"\0" * 50 * PCM_BYTES_PER_SECOND, "sarvam", "hi")
+
+        # sarvam=2: the job's own slot plus one extra, not RERUN_WINDOW_CONCURRENCY (5)
+        assert count == 5 and peak == 2
+        assert queue._running_by_key["sarvam"] == 1
+
+
+class FakeQueue:
+    def enqueue(self, kind, payload, concurrency_key=None):
+        return Job(id="job-1", kind=kind, payload=payload)
+
+    async def wait(self, job_id, timeout=None):
+        await asyncio.wait_for(asyncio.Event().wait(), timeout)  # job never finishes
+
+    def get(self, job_id):
+        return None
+
+
+class TestRerunTranscription:
+    """Test the /api/rerun-transcription endpoint's wait."""
+
+    async def test_slow_job_answers_202_with_job_id(self, monkeypatch):
+        async def fetch(consultation_id):
+            return {"id": consultation_id, "transcription_language": "en-IN"}
+
+        monkeypatch.setattr(api, "_fetch_rerun_consultation", fetch)
+        monkeypatch.setattr(api, "get_job_queue", lambda: FakeQueue())
+        monkeypatch.setattr(api, "RERUN_WAIT_TIMEOUT_SECONDS", 0.01)
+
+        response = await api.rerun_transcription(api.RerunTranscriptionRequest(consultation_id="c1"))
+
+        assert response.status_code == 202
+        assert b'"job_id":"job-1"' in response.body
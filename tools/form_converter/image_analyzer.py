@@ -551,7 +551,10 @@ Return ONLY the JSON object, no additional text. If you don't find specific rela
         for file_path in image_paths:
             image_content.append(self.encode_file_for_claude(file_path))
 
-        # Schema-only prompt
+        # Schema-only prompt. The instructions are identical for every upload, so they are
+        # sent as a prompt-cached system block (reused by later uploads to the same model;
+        # caches are per model, so the fallback model starts cold); the form files are the
+        # per-call part.
         prompt = """Analyze these medical form images to extract the complete form data schema.
 
 **IMPORTANT: DETECT TABLES**
@@ -738,12 +741,16 @@ Pla    | G    |H |I           "row_names": ["Date", "Single/Multiple", "GA", "Li
                 message = self.client.messages.create(
                     model=model,
                     max_tokens=16384,
+                    system=[{"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}],
                     messages=[{
                         "role": "user",
-                        "content": image_content + [{"type": "text", "text": prompt}]
+                        "content": image_content + [{"type": "text", "text": "Extract the complete form data schema from these form pages."}]
                     }]
                 )
                 print(f"✅ Success with {model}")
+                usage = getattr(message, "usage", None)
+                print(f"📦 Prompt cache: read {getattr(usage, 'cache_read_input_tokens', 0) or 0}, "
+                      f"wrote {getattr(usage, 'cache_creation_input_tokens', 0) or 0} tokens")
                 break
             except Exception as e:
                 if "529" in str(e) or "overloaded" in str(e).lower():